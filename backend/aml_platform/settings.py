@@ -230,6 +230,12 @@ CELERY_ACCEPT_CONTENT = ["json"]
 CELERY_TASK_SERIALIZER = "json"
 CELERY_RESULT_SERIALIZER = "json"
 CELERY_TIMEZONE = TIME_ZONE
+CELERY_BEAT_SCHEDULE = {
+    "sweep-pending-transactions": {
+        "task": "transaction_monitoring.tasks.sweep_pending_transactions",
+        "schedule": 300.0,
+    },
+}
 
 # API Documentation
 SPECTACULAR_SETTINGS = {
@@ -248,6 +254,7 @@ AML_SETTINGS = {
     'AUTO_CASE_CREATION': True,
     'RISK_SCORING_ENABLED': True,
 }
+AML_SYSTEM_USER_EMAIL = env("AML_SYSTEM_USER_EMAIL", default=None)  # Owner of rows written by background jobs; first superuser when unset
 
 # Feature flags
 FEATURES = {
@@ -320,6 +327,30 @@ UAE_PASS_SCOPE = UAE_PASS["SCOPE"]
 # AML Transaction Monitoring Settings
 AML_STRUCTURING_THRESHOLD = env("AML_STRUCTURING_THRESHOLD", default=10000)  # AED
 AML_RAPID_MOVEMENT_THRESHOLD = env("AML_RAPID_MOVEMENT_THRESHOLD", default=5)  # Number of transactions
+AML_VELOCITY_STORE = env("AML_VELOCITY_STORE", default="redis")  # "redis", "memory" or "database"
+AML_MONITORING_PIPELINE = env("AML_MONITORING_PIPELINE", default="fused")  # "fused" or "fanout"
+AML_MONITORING_BATCH_SIZE = env.int("AML_MONITORING_BATCH_SIZE", default=500)  # Transactions per batch task (1 disables batching)
+AML_MONITORING_BATCH_WAIT_MS = env.int("AML_MONITORING_BATCH_WAIT_MS", default=200)  # Max wait before flushing
+AML_MONITORING_SWEEP_AGE_SECONDS = env.int("AML_MONITORING_SWEEP_AGE_SECONDS", default=600)  # PENDING transactions older than this are resubmitted
+AML_BENCHMARK_DATABASE = env("AML_BENCHMARK_DATABASE", default=None)  # Only database benchmark_monitoring may write to
+
+# Watchlist Screening Settings
+SCREENING_INDEX_VERSION_CHECK_SECONDS = env.int("SCREENING_INDEX_VERSION_CHECK_SECONDS", default=30)
+SCREENING_MAX_CANDIDATES = env.int("SCREENING_MAX_CANDIDATES", default=50)  # Candidates scored per name
+SCREENING_RESULT_CACHE_SIZE = env.int("SCREENING_RESULT_CACHE_SIZE", default=10000)  # In-process LRU entries; 0 disables
+SCREENING_RESULT_CACHE_TIMEOUT = env.int("SCREENING_RESULT_CACHE_TIMEOUT", default=86400)  # Redis tier, seconds
+SCREENING_HISTORY_BATCH_SIZE = env.int("SCREENING_HISTORY_BATCH_SIZE", default=500)  # History rows per insert; 0 disables
+SCREENING_HISTORY_BATCH_WAIT_SECONDS = env.int("SCREENING_HISTORY_BATCH_WAIT_SECONDS", default=5)  # Max buffering time
+SCREENING_RELATIONSHIP_HOPS = env.int("SCREENING_RELATIONSHIP_HOPS", default=2)  # Connected-party expansion depth; 0 disables
+SCREENING_RELATIONSHIP_MAX_PARTIES = env.int("SCREENING_RELATIONSHIP_MAX_PARTIES", default=500)  # Parties per expansion
+SCREENING_RELATIONSHIP_CACHE_SIZE = env.int("SCREENING_RELATIONSHIP_CACHE_SIZE", default=10000)  # Cached expansions
+SCREENING_API_LATENCY_BUDGET_MS = env.int("SCREENING_API_LATENCY_BUDGET_MS", default=50)  # Real-time screening deadline
+SCREENING_API_MAX_BUDGET_MS = env.int("SCREENING_API_MAX_BUDGET_MS", default=1000)  # Largest budget a caller may ask for
+SCREENING_API_WORKERS = env.int("SCREENING_API_WORKERS", default=16)  # Threads running real-time screening sources
+
+# Risk Scoring Settings
+RISK_RESCORE_BATCH_SIZE = env.int("RISK_RESCORE_BATCH_SIZE", default=500)  # Dirty customers scored per batch
+RISK_RESCORE_DELAY_SECONDS = env.int("RISK_RESCORE_DELAY_SECONDS", default=30)  # Coalescing window before a rescore runs
 
 # goAML Configuration
 GOAML_BASE_URL = env("GOAML_BASE_URL", default="https://goaml-api.example.com")
@@ -0,0 +1,10 @@
+"""
+Core signals shared across apps
+"""
+from django.dispatch import Signal
+
+# Sent when the risk inputs of customers change through a path that skips
+# model signals (bulk writes, queryset updates) or that changes the risk of
+# their connected parties too. Arguments: ``customer_ids``, ``reason`` and
+# ``related`` (whether the customers' connected parties are affected).
+risk_inputs_changed = Signal()
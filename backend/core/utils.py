@@ -4,8 +4,10 @@ Core utility functions used across the AML platform
 import re
 from typing import Any, Dict, List, Optional, Union
 from datetime import datetime, date
+from django.conf import settings
+from django.contrib.auth import get_user_model
 from django.utils import timezone
-from django.core.exceptions import ValidationError
+from django.core.exceptions import ImproperlyConfigured, ValidationError
 from django.utils.translation import gettext_lazy as _
 
 def validate_emirates_id(value: str) -> None:
@@ -156,4 +158,28 @@ def clean_dict(data: Dict[str, Any]) -> Dict[str, Any]:
     Returns:
         Cleaned dictionary
     """
-    return {k: v for k, v in data.items() if v is not None and v != ''} 
\ No newline at end of file
+    return {k: v for k, v in data.items() if v is not None and v != ''} 
+
+def get_system_user_id():
+    """
+    Returns the user that background jobs record their rows under
+
+    This is the active user with the ``AML_SYSTEM_USER_EMAIL`` address when
+    that is set, otherwise the first active superuser.
+
+    Raises:
+        ImproperlyConfigured: when no such user exists
+    """
+    users = get_user_model().objects.filter(is_active=True)
+    email = settings.AML_SYSTEM_USER_EMAIL
+    if email:
+        users = users.filter(email__iexact=email)
+    else:
+        users = users.filter(is_superuser=True).order_by('date_joined')
+    user_id = users.values_list('pk', flat=True).first()
+    if user_id is None:
+        raise ImproperlyConfigured(
+            f"No active system user {email}" if email else
+            'Background jobs need a system user: create a superuser or set AML_SYSTEM_USER_EMAIL'
+        )
+    return user_id
@@ -0,0 +1,45 @@
+"""
+Backfill the stored duplicate detection blocking keys (identification,
+phone and email) of customers in bulk
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from customer_management.models import Customer
+from customer_management.services.blocking_keys import BLOCKING_KEY_FIELDS, set_blocking_keys
+
+
+class Command(BaseCommand):
+    help = 'Compute identification, phone and email blocking keys for existing customers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=5000)
+        parser.add_argument(
+            '--all-rows', action='store_true',
+            help='Recompute every row, not only rows without keys'
+        )
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        queryset = Customer.objects.all()
+        if not options['all_rows']:
+            queryset = queryset.filter(identification_key='', phone_key='', email_key='')
+
+        started = time.monotonic()
+        updated = 0
+        chunk = []
+        for customer in queryset.only('id', 'identification_number', 'phone', 'email').iterator(chunk_size=chunk_size):
+            set_blocking_keys(customer)
+            chunk.append(customer)
+            if len(chunk) >= chunk_size:
+                Customer.objects.bulk_update(chunk, BLOCKING_KEY_FIELDS)
+                updated += len(chunk)
+                chunk = []
+        if chunk:
+            Customer.objects.bulk_update(chunk, BLOCKING_KEY_FIELDS)
+            updated += len(chunk)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Backfilled blocking keys for {updated} customers in {time.monotonic() - started:.1f}s"
+        ))
@@ -0,0 +1,61 @@
+"""
+Cluster likely duplicate customers across the whole portfolio, in
+parallel shards, and store the clusters for review
+"""
+import os
+
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import BaseCommand, CommandError
+
+from customer_management.models import DuplicateDetectionRun
+from customer_management.services.duplicate_clustering import (
+    DEFAULT_CHUNK_SIZE,
+    DEFAULT_SHARDS,
+    create_detection_run,
+    run_detection_pool
+)
+from customer_management.services.entity_resolution import DUPLICATE_CONFIDENCE_THRESHOLD, MAX_BLOCK_SIZE
+from customer_management.tasks import cluster_duplicate_customers
+
+
+class Command(BaseCommand):
+    help = 'Cluster likely duplicate customers over a process pool or Celery workers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--shards', type=int, default=DEFAULT_SHARDS, help='Blocking key shards')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Local pool size')
+        parser.add_argument('--executor', choices=['process', 'celery'], default='process')
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+        parser.add_argument('--threshold', type=float, default=DUPLICATE_CONFIDENCE_THRESHOLD)
+        parser.add_argument('--max-block-size', type=int, default=MAX_BLOCK_SIZE)
+        parser.add_argument('--resume', metavar='RUN_ID', help='Resume an interrupted run from its checkpoints')
+
+    def handle(self, *args, **options):
+        if options['resume']:
+            try:
+                run = DuplicateDetectionRun.objects.get(pk=options['resume'])
+            except DuplicateDetectionRun.DoesNotExist:
+                raise CommandError(f"Duplicate detection run {options['resume']} not found")
+        else:
+            try:
+                run = create_detection_run(options['shards'], options['threshold'], options['max_block_size'])
+            except ImproperlyConfigured as e:
+                raise CommandError(str(e))
+        self.stdout.write(f"Duplicate detection run {run.pk}: {run.total_customers} customers")
+
+        if options['executor'] == 'celery':
+            cluster_duplicate_customers.delay(str(run.pk), chunk_size=options['chunk_size'])
+            self.stdout.write(self.style.SUCCESS(
+                f"Queued run {run.pk}; resume with --resume {run.pk} if it is interrupted"
+            ))
+            return
+
+        run = run_detection_pool(run, options['workers'], options['chunk_size'])
+        message = (
+            f"Run {run.pk} {run.status.lower()}: {run.duplicate_pairs} likely duplicate pairs "
+            f"in {run.cluster_count} clusters"
+        )
+        if run.status == 'COMPLETED':
+            self.stdout.write(self.style.SUCCESS(message))
+        else:
+            raise CommandError(f"{message}; resume with --resume {run.pk}")
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.4 on 2026-10-16 13:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customer_management', '0003_customer_last_segment_review_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customer',
+            name='normalized_name',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='customer',
+            name='sorted_name',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='customer',
+            name='phonetic_key',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=255),
+        ),
+    ]
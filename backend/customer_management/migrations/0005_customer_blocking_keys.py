@@ -0,0 +1,32 @@
+# Generated by Django 5.2.4 on 2026-10-16 15:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customer_management', '0004_customer_name_keys'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customer',
+            name='identification_key',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='customer',
+            name='phone_key',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=20),
+        ),
+        migrations.AddField(
+            model_name='customer',
+            name='email_key',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=254),
+        ),
+        migrations.AddIndex(
+            model_name='customer',
+            index=models.Index(fields=['date_of_birth', 'normalized_name'], name='customer_ma_date_of_190b45_idx'),
+        ),
+    ]
@@ -0,0 +1,108 @@
+# Generated by Django 5.2.4 on 2026-10-16 16:00
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customer_management', '0005_customer_blocking_keys'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DuplicateDetectionRun',
+            fields=[
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('ip_address', models.GenericIPAddressField(blank=True, null=True)),
+                ('user_agent', models.CharField(blank=True, max_length=255)),
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('is_active', models.BooleanField(db_index=True, default=True)),
+                ('notes', models.TextField(blank=True)),
+                ('metadata', models.JSONField(default=dict, help_text='Additional metadata')),
+                ('hash', models.CharField(blank=True, help_text='SHA-256 hash of critical fields', max_length=64)),
+                ('status', models.CharField(choices=[('PENDING', 'Pending'), ('RUNNING', 'Running'), ('COMPLETED', 'Completed'), ('FAILED', 'Failed')], default='PENDING', max_length=20)),
+                ('confidence_threshold', models.FloatField(default=0.85)),
+                ('max_block_size', models.IntegerField(default=1000)),
+                ('start_time', models.DateTimeField(blank=True, null=True)),
+                ('end_time', models.DateTimeField(blank=True, null=True)),
+                ('total_customers', models.IntegerField(default=0)),
+                ('candidate_pairs', models.IntegerField(default=0)),
+                ('duplicate_pairs', models.IntegerField(default=0)),
+                ('cluster_count', models.IntegerField(default=0)),
+                ('error_details', models.JSONField(blank=True, help_text='Error information if failed', null=True)),
+                ('created_by', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='created_duplicate_detection_runs', to=settings.AUTH_USER_MODEL)),
+                ('updated_by', models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='%(class)s_updated', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'duplicate detection run',
+                'verbose_name_plural': 'duplicate detection runs',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['status', 'created_at'], name='customer_ma_status_e5928e_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='DuplicateCluster',
+            fields=[
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('ip_address', models.GenericIPAddressField(blank=True, null=True)),
+                ('user_agent', models.CharField(blank=True, max_length=255)),
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('is_active', models.BooleanField(db_index=True, default=True)),
+                ('notes', models.TextField(blank=True)),
+                ('metadata', models.JSONField(default=dict, help_text='Additional metadata')),
+                ('hash', models.CharField(blank=True, help_text='SHA-256 hash of critical fields', max_length=64)),
+                ('size', models.IntegerField()),
+                ('max_confidence', models.FloatField()),
+                ('review_status', models.CharField(choices=[('PENDING', 'Pending Review'), ('CONFIRMED', 'Confirmed Duplicates'), ('DISMISSED', 'Not Duplicates'), ('MERGED', 'Merged')], default='PENDING', max_length=20)),
+                ('reviewed_by', models.UUIDField(blank=True, null=True)),
+                ('review_date', models.DateTimeField(blank=True, null=True)),
+                ('review_notes', models.TextField(blank=True)),
+                ('run', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='clusters', to='customer_management.duplicatedetectionrun')),
+                ('customers', models.ManyToManyField(related_name='duplicate_clusters', to='customer_management.customer')),
+                ('created_by', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='created_duplicate_clusters', to=settings.AUTH_USER_MODEL)),
+                ('updated_by', models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='%(class)s_updated', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'duplicate cluster',
+                'verbose_name_plural': 'duplicate clusters',
+                'ordering': ['-max_confidence'],
+                'indexes': [models.Index(fields=['run', 'review_status'], name='customer_ma_run_id_7358c2_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='DuplicateCustomerPair',
+            fields=[
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('ip_address', models.GenericIPAddressField(blank=True, null=True)),
+                ('user_agent', models.CharField(blank=True, max_length=255)),
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('is_active', models.BooleanField(db_index=True, default=True)),
+                ('notes', models.TextField(blank=True)),
+                ('metadata', models.JSONField(default=dict, help_text='Additional metadata')),
+                ('hash', models.CharField(blank=True, help_text='SHA-256 hash of critical fields', max_length=64)),
+                ('confidence', models.FloatField()),
+                ('name_similarity', models.FloatField()),
+                ('criteria', models.JSONField(default=list)),
+                ('run', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pairs', to='customer_management.duplicatedetectionrun')),
+                ('cluster', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='pairs', to='customer_management.duplicatecluster')),
+                ('customer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='duplicate_pairs', to='customer_management.customer')),
+                ('duplicate', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='duplicate_of_pairs', to='customer_management.customer')),
+                ('created_by', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='created_duplicate_customer_pairs', to=settings.AUTH_USER_MODEL)),
+                ('updated_by', models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='%(class)s_updated', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'duplicate customer pair',
+                'verbose_name_plural': 'duplicate customer pairs',
+                'ordering': ['-confidence'],
+                'unique_together': {('run', 'customer', 'duplicate')},
+            },
+        ),
+    ]
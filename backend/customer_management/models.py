@@ -5,6 +5,9 @@ from django.utils import timezone
 from django.conf import settings
 from core.models import AbstractBaseModel, RiskLevelMixin, StatusMixin
 from core.constants import CustomerType
+from core.signals import risk_inputs_changed
+from screening_watchlist.services.name_keys import set_name_keys
+from .services.blocking_keys import set_blocking_keys
 import uuid
 from typing import Dict, Any
 
@@ -45,6 +48,9 @@ class Customer(AbstractBaseModel, RiskLevelMixin, StatusMixin):
         db_index=True
     )
     name = models.CharField(max_length=255)
+    normalized_name = models.CharField(max_length=255, blank=True, db_index=True, editable=False)
+    sorted_name = models.CharField(max_length=255, blank=True, db_index=True, editable=False)
+    phonetic_key = models.CharField(max_length=255, blank=True, db_index=True, editable=False)
     email = models.EmailField(unique=True)
     phone = models.CharField(max_length=20)
     address = models.TextField()
@@ -52,6 +58,9 @@ class Customer(AbstractBaseModel, RiskLevelMixin, StatusMixin):
     date_of_birth = models.DateField(null=True, blank=True)
     identification_type = models.CharField(max_length=50)
     identification_number = models.CharField(max_length=100)
+    identification_key = models.CharField(max_length=100, blank=True, db_index=True, editable=False)
+    phone_key = models.CharField(max_length=20, blank=True, db_index=True, editable=False)
+    email_key = models.CharField(max_length=254, blank=True, db_index=True, editable=False)
     is_pep = models.BooleanField(default=False, db_index=True)
     is_sanctioned = models.BooleanField(default=False, db_index=True)
     kyc_status = models.CharField(max_length=50, default='PENDING')
@@ -86,11 +95,18 @@ class Customer(AbstractBaseModel, RiskLevelMixin, StatusMixin):
             models.Index(fields=['customer_type', 'kyc_status']),
             models.Index(fields=['is_pep', 'is_sanctioned']),
             models.Index(fields=['identification_type', 'identification_number']),
+            models.Index(fields=['date_of_birth', 'normalized_name']),
         ]
 
     def __str__(self):
         return f"{self.name} ({self.customer_id})"
 
+    def save(self, *args, **kwargs):
+        """Keep the stored name and blocking keys in sync with their source fields"""
+        kwargs['update_fields'] = set_name_keys(self, self.name, kwargs.get('update_fields'))
+        kwargs['update_fields'] = set_blocking_keys(self, kwargs['update_fields'])
+        super().save(*args, **kwargs)
+
     def update_kyc_status(self, new_status: str, expiry_date=None, documents=None) -> None:
         """Update KYC status and related information"""
         self.kyc_status = new_status
@@ -110,6 +126,8 @@ class Customer(AbstractBaseModel, RiskLevelMixin, StatusMixin):
             }
             self.risk_level = 'HIGH'
             self.save()
+            # Also raises the related party exposure of connected customers
+            risk_inputs_changed.send(sender=Customer, customer_ids=[self.pk], reason='PEP', related=True)
 
     def update_segment(self, new_segment: CustomerSegment, score: int = None, reason: str = "") -> None:
         """Update customer segment and maintain history"""
@@ -379,3 +397,141 @@ class CustomerJourney(AbstractBaseModel):
         self.metrics.update(metrics)
         self.metrics['last_updated'] = timezone.now().isoformat()
         self.save()
+
+class DuplicateDetectionRun(AbstractBaseModel):
+    """
+    A portfolio-wide duplicate clustering run; shard checkpoints are kept
+    in ``metadata``
+    """
+    status = models.CharField(
+        max_length=20,
+        choices=[
+            ('PENDING', _('Pending')),
+            ('RUNNING', _('Running')),
+            ('COMPLETED', _('Completed')),
+            ('FAILED', _('Failed'))
+        ],
+        default='PENDING'
+    )
+    confidence_threshold = models.FloatField(default=0.85)
+    max_block_size = models.IntegerField(default=1000)
+    start_time = models.DateTimeField(null=True, blank=True)
+    end_time = models.DateTimeField(null=True, blank=True)
+    total_customers = models.IntegerField(default=0)
+    candidate_pairs = models.IntegerField(default=0)
+    duplicate_pairs = models.IntegerField(default=0)
+    cluster_count = models.IntegerField(default=0)
+    error_details = models.JSONField(
+        null=True,
+        blank=True,
+        help_text=_('Error information if failed')
+    )
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name='created_duplicate_detection_runs'
+    )
+
+    class Meta:
+        verbose_name = _('duplicate detection run')
+        verbose_name_plural = _('duplicate detection runs')
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f"Duplicate detection {self.created_at:%Y-%m-%d %H:%M} ({self.status})"
+
+class DuplicateCluster(AbstractBaseModel):
+    """
+    Customers linked by likely duplicate pairs, for review
+    """
+    run = models.ForeignKey(
+        DuplicateDetectionRun,
+        on_delete=models.CASCADE,
+        related_name='clusters'
+    )
+    customers = models.ManyToManyField(
+        Customer,
+        related_name='duplicate_clusters'
+    )
+    size = models.IntegerField()
+    max_confidence = models.FloatField()
+    review_status = models.CharField(
+        max_length=20,
+        choices=[
+            ('PENDING', _('Pending Review')),
+            ('CONFIRMED', _('Confirmed Duplicates')),
+            ('DISMISSED', _('Not Duplicates')),
+            ('MERGED', _('Merged'))
+        ],
+        default='PENDING'
+    )
+    reviewed_by = models.UUIDField(null=True, blank=True)
+    review_date = models.DateTimeField(null=True, blank=True)
+    review_notes = models.TextField(blank=True)
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name='created_duplicate_clusters'
+    )
+
+    class Meta:
+        verbose_name = _('duplicate cluster')
+        verbose_name_plural = _('duplicate clusters')
+        ordering = ['-max_confidence']
+        indexes = [
+            models.Index(fields=['run', 'review_status']),
+        ]
+
+    def __str__(self):
+        return f"Duplicate cluster of {self.size} customers ({self.review_status})"
+
+class DuplicateCustomerPair(AbstractBaseModel):
+    """
+    A likely duplicate pair found by a run; ``customer`` sorts before
+    ``duplicate``
+    """
+    run = models.ForeignKey(
+        DuplicateDetectionRun,
+        on_delete=models.CASCADE,
+        related_name='pairs'
+    )
+    cluster = models.ForeignKey(
+        DuplicateCluster,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='pairs'
+    )
+    customer = models.ForeignKey(
+        Customer,
+        on_delete=models.CASCADE,
+        related_name='duplicate_pairs'
+    )
+    duplicate = models.ForeignKey(
+        Customer,
+        on_delete=models.CASCADE,
+        related_name='duplicate_of_pairs'
+    )
+    confidence = models.FloatField()
+    name_similarity = models.FloatField()
+    criteria = models.JSONField(default=list)
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name='created_duplicate_customer_pairs'
+    )
+
+    class Meta:
+        verbose_name = _('duplicate customer pair')
+        verbose_name_plural = _('duplicate customer pairs')
+        ordering = ['-confidence']
+        unique_together = ['run', 'customer', 'duplicate']
+
+    def __str__(self):
+        return f"{self.customer_id} ~ {self.duplicate_id} ({self.confidence:.2f})"
@@ -0,0 +1,61 @@
+"""
+Stored blocking keys for duplicate customer detection.
+
+``Customer`` persists canonical, indexed forms of the fields duplicates
+are most often found on, so candidates can be looked up by index instead
+of by scanning:
+
+* ``identification_key`` - the identification number without separators
+  or case (``784-1985-1234567-1`` -> ``784198512345671``)
+* ``phone_key`` - the last ``PHONE_SUFFIX_LENGTH`` digits of the phone
+  number, so ``+971 50 123 4567`` and ``050-1234567`` agree
+* ``email_key`` - the lowercased address without a ``+tag`` in the local
+  part
+"""
+from typing import Iterable, Optional
+
+from screening_watchlist.services.identifiers import normalize_identifier
+
+BLOCKING_KEY_FIELDS = ('identification_key', 'phone_key', 'email_key')
+# Fields the keys are computed from
+BLOCKING_SOURCE_FIELDS = ('identification_number', 'phone', 'email')
+
+# Subscriber number length of UAE mobile numbers
+PHONE_SUFFIX_LENGTH = 9
+# Shorter digit runs are extensions or placeholders
+MIN_PHONE_DIGITS = 7
+
+
+def identification_key(identification_number) -> str:
+    return normalize_identifier(identification_number)
+
+
+def phone_key(phone) -> str:
+    digits = ''.join(char for char in str(phone or '') if char.isdigit())
+    if len(digits) < MIN_PHONE_DIGITS:
+        return ''
+    return digits[-PHONE_SUFFIX_LENGTH:]
+
+
+def email_key(email) -> str:
+    email = str(email or '').strip().lower()
+    local, at, domain = email.partition('@')
+    if not at or not local or not domain:
+        return ''
+    return f"{local.split('+', 1)[0]}@{domain}"
+
+
+def set_blocking_keys(instance, update_fields: Optional[Iterable[str]] = None):
+    """
+    Fill the blocking key fields of a customer from its identification
+    number, phone and email
+
+    Returns ``update_fields`` extended with the key fields when any source
+    field is among them, for use in ``save()``.
+    """
+    instance.identification_key = identification_key(instance.identification_number)
+    instance.phone_key = phone_key(instance.phone)
+    instance.email_key = email_key(instance.email)
+    if update_fields is not None and set(update_fields) & set(BLOCKING_SOURCE_FIELDS):
+        update_fields = set(update_fields) | set(BLOCKING_KEY_FIELDS)
+    return update_fields
@@ -0,0 +1,293 @@
+"""
+Portfolio-wide duplicate customer clustering.
+
+Likely duplicate pairs link customers into clusters: A ~ B and B ~ C put
+A, B and C in one cluster even when A and C share no blocking key. A run
+has two phases:
+
+1. Pair finding, in parallel shards. Blocking keys are spread over the
+   shards by a stable hash. Each shard streams the active customers once
+   (``iterator(chunk_size=...)``), keeps those holding a key of the shard,
+   and scores the candidate pairs of its blocks. A shard's pairs are
+   stored in the same transaction as its checkpoint in the run's
+   ``metadata``, so an interrupted run resumes with the shards that had
+   not finished. A pair sharing keys in several shards is stored once.
+2. Clustering, once every shard is done: the run's pairs are merged with
+   a union-find structure, and each connected component is stored as a
+   ``DuplicateCluster`` pending review.
+
+Shards run on a forked local process pool or as Celery tasks; the
+``cluster_duplicate_customers`` task is meant to be scheduled nightly
+through django-celery-beat.
+"""
+import logging
+import multiprocessing
+import time
+import zlib
+from collections import defaultdict
+from typing import Dict, Hashable, List, Optional
+
+from django.db import connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from core.utils import get_system_user_id
+from ..models import Customer, DuplicateCluster, DuplicateCustomerPair, DuplicateDetectionRun
+from .entity_resolution import (
+    CUSTOMER_FIELDS,
+    DUPLICATE_CONFIDENCE_THRESHOLD,
+    MAX_BLOCK_SIZE,
+    CustomerRecord,
+    blocking_keys,
+    candidate_pairs,
+    score_pairs
+)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SHARDS = 16
+DEFAULT_CHUNK_SIZE = 10000
+WRITE_BATCH_SIZE = 1000
+
+
+class UnionFind:
+    """Disjoint sets of hashable items, with path halving and union by size"""
+
+    def __init__(self):
+        self._parent: Dict[Hashable, Hashable] = {}
+        self._size: Dict[Hashable, int] = {}
+
+    def find(self, item: Hashable) -> Hashable:
+        parent = self._parent
+        if item not in parent:
+            parent[item] = item
+            self._size[item] = 1
+            return item
+        while parent[item] != item:
+            parent[item] = parent[parent[item]]
+            item = parent[item]
+        return item
+
+    def union(self, first: Hashable, second: Hashable) -> Hashable:
+        first, second = self.find(first), self.find(second)
+        if first == second:
+            return first
+        if self._size[first] < self._size[second]:
+            first, second = second, first
+        self._parent[second] = first
+        self._size[first] += self._size[second]
+        return first
+
+    def groups(self) -> Dict[Hashable, List[Hashable]]:
+        """Members of every set of two or more items, by root"""
+        members: Dict[Hashable, List[Hashable]] = defaultdict(list)
+        for item in self._parent:
+            members[self.find(item)].append(item)
+        return {root: items for root, items in members.items() if len(items) > 1}
+
+
+def shard_of(key: str, shards: int) -> int:
+    """Stable shard of a blocking key (the same in every process)"""
+    return zlib.crc32(key.encode()) % shards
+
+
+def create_detection_run(
+    shards: int = DEFAULT_SHARDS,
+    threshold: float = DUPLICATE_CONFIDENCE_THRESHOLD,
+    max_block_size: int = MAX_BLOCK_SIZE,
+    created_by=None
+) -> DuplicateDetectionRun:
+    """
+    ``DuplicateDetectionRun`` row with one pending checkpoint per shard
+
+    Nightly and command-line runs have no requesting user and are recorded
+    under the system user.
+    """
+    return DuplicateDetectionRun.objects.create(
+        confidence_threshold=threshold,
+        max_block_size=max_block_size,
+        total_customers=Customer.objects.filter(is_active=True).count(),
+        created_by_id=created_by.pk if created_by else get_system_user_id(),
+        metadata={
+            'shards': {
+                str(number): {'customers': 0, 'candidate_pairs': 0, 'duplicate_pairs': 0, 'done': False}
+                for number in range(shards)
+            }
+        }
+    )
+
+
+def pending_shards(run: DuplicateDetectionRun) -> List[str]:
+    return [key for key, state in run.metadata['shards'].items() if not state['done']]
+
+
+def start_detection_run(run: DuplicateDetectionRun) -> DuplicateDetectionRun:
+    """Mark a new or interrupted run as running"""
+    if run.status == 'COMPLETED':
+        raise ValueError(f"Duplicate detection run {run.id} has already completed")
+    run.status = 'RUNNING'
+    run.start_time = run.start_time or timezone.now()
+    run.error_details = None
+    run.save(update_fields=['status', 'start_time', 'error_details'])
+    return run
+
+
+def fail_detection_run(run_id, error: Exception) -> None:
+    DuplicateDetectionRun.objects.filter(pk=run_id).update(
+        status='FAILED',
+        end_time=timezone.now(),
+        error_details={'error': str(error)}
+    )
+
+
+def _checkpoint(run_id, key: str, customers: int, pairs: int, duplicates: int) -> None:
+    """Mark a shard done (inside the transaction storing its pairs)"""
+    run = DuplicateDetectionRun.objects.select_for_update().only('metadata').get(pk=run_id)
+    run.metadata['shards'][key].update(
+        customers=customers,
+        candidate_pairs=pairs,
+        duplicate_pairs=duplicates,
+        done=True
+    )
+    DuplicateDetectionRun.objects.filter(pk=run_id).update(
+        metadata=run.metadata,
+        candidate_pairs=F('candidate_pairs') + pairs
+    )
+
+
+def detect_shard(run_id, key: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> int:
+    """
+    Find and store the likely duplicate pairs of one shard, unless it is
+    already done
+
+    Returns the number of pairs found by this call.
+    """
+    run = DuplicateDetectionRun.objects.only(
+        'metadata', 'confidence_threshold', 'max_block_size', 'created_by_id'
+    ).get(pk=run_id)
+    if run.metadata['shards'][key]['done']:
+        return 0
+    shards, shard = len(run.metadata['shards']), int(key)
+
+    records: List[CustomerRecord] = []
+    keys_by_id: Dict[str, List[str]] = {}
+    rows = Customer.objects.filter(is_active=True).order_by().values_list(*CUSTOMER_FIELDS)
+    for row in rows.iterator(chunk_size=chunk_size):
+        record = CustomerRecord.from_row(row)
+        keys = [block_key for block_key in blocking_keys(record) if shard_of(block_key, shards) == shard]
+        if keys:
+            records.append(record)
+            keys_by_id[record.id] = keys
+
+    pairs = candidate_pairs(records, run.max_block_size, keys=lambda record: keys_by_id[record.id])
+    found = []
+    for pair in score_pairs(records, pairs, run.confidence_threshold):
+        duplicate = DuplicateCustomerPair(
+            run_id=run_id,
+            customer_id=min(pair.customer_id, pair.duplicate_id),
+            duplicate_id=max(pair.customer_id, pair.duplicate_id),
+            confidence=pair.confidence,
+            name_similarity=pair.name_similarity,
+            criteria=list(pair.criteria),
+            created_by_id=run.created_by_id
+        )
+        duplicate.hash = duplicate._generate_hash()
+        found.append(duplicate)
+
+    with transaction.atomic():
+        DuplicateCustomerPair.objects.bulk_create(found, batch_size=WRITE_BATCH_SIZE, ignore_conflicts=True)
+        _checkpoint(run_id, key, len(records), sum(len(rights) for rights in pairs.values()), len(found))
+    logger.info(
+        f"Duplicate detection run {run_id} shard {key}: {len(records)} customers, "
+        f"{len(found)} likely duplicate pairs"
+    )
+    return len(found)
+
+
+def _cluster_pairs(run: DuplicateDetectionRun) -> int:
+    """Replace the run's clusters with the connected components of its pairs"""
+    run.clusters.all().delete()
+
+    union = UnionFind()
+    pairs = list(run.pairs.values_list('id', 'customer_id', 'duplicate_id', 'confidence').iterator(
+        chunk_size=DEFAULT_CHUNK_SIZE
+    ))
+    for _, customer_id, duplicate_id, _ in pairs:
+        union.union(customer_id, duplicate_id)
+
+    clusters = {}
+    for root, members in union.groups().items():
+        cluster = DuplicateCluster(run=run, size=len(members), max_confidence=0.0, created_by_id=run.created_by_id)
+        clusters[root] = (cluster, members)
+    for _, customer_id, _, confidence in pairs:
+        cluster = clusters[union.find(customer_id)][0]
+        cluster.max_confidence = max(cluster.max_confidence, confidence)
+    for cluster, _ in clusters.values():
+        cluster.hash = cluster._generate_hash()
+    DuplicateCluster.objects.bulk_create([cluster for cluster, _ in clusters.values()], batch_size=WRITE_BATCH_SIZE)
+
+    DuplicateCluster.customers.through.objects.bulk_create(
+        [
+            DuplicateCluster.customers.through(duplicatecluster_id=cluster.pk, customer_id=customer_id)
+            for cluster, members in clusters.values()
+            for customer_id in members
+        ],
+        batch_size=WRITE_BATCH_SIZE
+    )
+    DuplicateCustomerPair.objects.bulk_update(
+        [
+            DuplicateCustomerPair(id=pair_id, cluster_id=clusters[union.find(customer_id)][0].pk)
+            for pair_id, customer_id, _, _ in pairs
+        ],
+        ['cluster'],
+        batch_size=WRITE_BATCH_SIZE
+    )
+    return len(clusters)
+
+
+def finish_detection_run(run_id) -> Optional[DuplicateDetectionRun]:
+    """Cluster the pairs and complete the run once every shard is done; returns it then"""
+    with transaction.atomic():
+        run = DuplicateDetectionRun.objects.select_for_update().get(pk=run_id)
+        if run.status != 'RUNNING' or pending_shards(run):
+            return None
+        run.cluster_count = _cluster_pairs(run)
+        run.duplicate_pairs = run.pairs.count()
+        run.status = 'COMPLETED'
+        run.end_time = timezone.now()
+        run.save(update_fields=['cluster_count', 'duplicate_pairs', 'status', 'end_time'])
+    logger.info(
+        f"Duplicate detection run {run.id} completed: {run.total_customers} customers, "
+        f"{run.duplicate_pairs} likely duplicate pairs in {run.cluster_count} clusters"
+    )
+    return run
+
+
+def _pool_worker(args) -> int:
+    run_id, key, chunk_size = args
+    return detect_shard(run_id, key, chunk_size)
+
+
+def run_detection_pool(
+    run: DuplicateDetectionRun,
+    workers: int,
+    chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> DuplicateDetectionRun:
+    """Run the pending shards of ``run`` on a forked local process pool, then cluster"""
+    start_detection_run(run)
+    started = time.monotonic()
+    work = [(run.pk, key, chunk_size) for key in pending_shards(run)]
+
+    # Children open their own database connections
+    connections.close_all()
+    try:
+        with multiprocessing.get_context('fork').Pool(workers) as pool:
+            for _ in pool.imap_unordered(_pool_worker, work):
+                pass
+    except Exception as e:
+        logger.exception(f"Duplicate detection run {run.pk} failed")
+        fail_detection_run(run.pk, e)
+
+    finished = finish_detection_run(run.pk)
+    logger.info(f"Duplicate detection run {run.pk} took {time.monotonic() - started:.1f}s")
+    return finished or DuplicateDetectionRun.objects.get(pk=run.pk)
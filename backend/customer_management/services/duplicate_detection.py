@@ -1,118 +1,68 @@
 from typing import List, Dict, Any
-from django.db.models import Q
 from django.utils import timezone
 from ..models import Customer
-from core.utils import calculate_string_similarity
+from .entity_resolution import REVIEW_CONFIDENCE_THRESHOLD, DuplicatePair, find_customer_duplicates
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Reported match type of a duplicate, by the strongest criterion it matched on
+MATCH_TYPES = (
+    ('IDENTIFICATION', 'EXACT'),
+    ('EMAIL', 'EXACT'),
+    ('NAME', 'NAME'),
+    ('IDENTIFICATION_PREFIX', 'IDENTIFICATION'),
+    ('PHONE', 'CONTACT'),
+)
+
 class DuplicateDetectionService:
     """Service for detecting potential duplicate customers"""
 
-    def __init__(self):
-        self.similarity_threshold = 0.85  # Configurable threshold
+    def __init__(self, threshold: float = REVIEW_CONFIDENCE_THRESHOLD):
+        self.threshold = threshold  # Combined confidence below which candidates are not reported
 
     def find_potential_duplicates(self, customer: Customer) -> List[Dict[str, Any]]:
         """
         Find potential duplicate customers based on various criteria
+
+        Candidates are looked up and scored by ``find_customer_duplicates``,
+        so each is reported once with the combined confidence of every
+        criterion it matched, as in portfolio duplicate detection.
         """
         try:
-            potential_duplicates = []
-
-            # Check exact matches
-            exact_matches = self._find_exact_matches(customer)
-            potential_duplicates.extend(self._format_matches(exact_matches, 'EXACT'))
-
-            # Check similar names
-            name_matches = self._find_similar_names(customer)
-            potential_duplicates.extend(self._format_matches(name_matches, 'NAME'))
+            pairs = find_customer_duplicates(customer, self.threshold)
+            if not pairs:
+                return []
 
-            # Check similar identifications
-            id_matches = self._find_similar_identifications(customer)
-            potential_duplicates.extend(self._format_matches(id_matches, 'IDENTIFICATION'))
-
-            # Check contact info matches
-            contact_matches = self._find_contact_matches(customer)
-            potential_duplicates.extend(self._format_matches(contact_matches, 'CONTACT'))
-
-            return potential_duplicates
+            matches = {
+                str(match.pk): match
+                for match in Customer.objects.filter(pk__in=[pair.duplicate_id for pair in pairs])
+            }
+            return [self._format_match(matches[pair.duplicate_id], pair) for pair in pairs]
 
         except Exception as e:
             logger.error(f"Error in duplicate detection: {str(e)}")
             return []
 
-    def _find_exact_matches(self, customer: Customer) -> List[Customer]:
-        """Find exact matches based on identification or email"""
-        return Customer.objects.filter(
-            ~Q(id=customer.id) &
-            (
-                Q(identification_number=customer.identification_number) |
-                Q(email=customer.email)
-            )
-        )
-
-    def _find_similar_names(self, customer: Customer) -> List[Customer]:
-        """Find customers with similar names"""
-        # Get potential matches from DB
-        potential_matches = Customer.objects.filter(
-            ~Q(id=customer.id) &
-            Q(customer_type=customer.customer_type)
-        )
-
-        # Filter based on name similarity
-        similar_matches = []
-        for match in potential_matches:
-            similarity = calculate_string_similarity(
-                customer.name.lower(),
-                match.name.lower()
-            )
-            if similarity >= self.similarity_threshold:
-                similar_matches.append(match)
-
-        return similar_matches
-
-    def _find_similar_identifications(self, customer: Customer) -> List[Customer]:
-        """Find customers with similar identification numbers"""
-        return Customer.objects.filter(
-            ~Q(id=customer.id) &
-            Q(identification_type=customer.identification_type) &
-            Q(identification_number__icontains=customer.identification_number[:5])
-        )
-
-    def _find_contact_matches(self, customer: Customer) -> List[Customer]:
-        """Find customers with matching contact information"""
-        return Customer.objects.filter(
-            ~Q(id=customer.id) &
-            (
-                Q(phone=customer.phone) |
-                Q(email=customer.email)
-            )
-        )
-
-    def _format_matches(self, matches: List[Customer], match_type: str) -> List[Dict[str, Any]]:
-        """Format matches with match type and confidence score"""
-        formatted_matches = []
-        for match in matches:
-            formatted_matches.append({
-                'customer_id': match.customer_id,
-                'name': match.name,
-                'match_type': match_type,
-                'confidence_score': self._calculate_confidence_score(match_type),
-                'matched_fields': self._get_matched_fields(match),
-                'detection_date': timezone.now().isoformat()
-            })
-        return formatted_matches
-
-    def _calculate_confidence_score(self, match_type: str) -> float:
-        """Calculate confidence score based on match type"""
-        scores = {
-            'EXACT': 1.0,
-            'NAME': 0.85,
-            'IDENTIFICATION': 0.90,
-            'CONTACT': 0.75
+    def _format_match(
+        self,
+        match: Customer,
+        pair: DuplicatePair
+    ) -> Dict[str, Any]:
+        """Format a match with its match type, matched criteria and combined confidence"""
+        return {
+            'customer_id': match.customer_id,
+            'name': match.name,
+            'match_type': next(
+                (match_type for criterion, match_type in MATCH_TYPES if criterion in pair.criteria),
+                'OTHER'
+            ),
+            'matched_criteria': list(pair.criteria),
+            'confidence_score': pair.confidence,
+            'name_similarity': pair.name_similarity,
+            'matched_fields': self._get_matched_fields(match),
+            'detection_date': timezone.now().isoformat()
         }
-        return scores.get(match_type, 0.5)
 
     def _get_matched_fields(self, customer: Customer) -> Dict[str, Any]:
         """Get relevant fields for duplicate detection"""
@@ -127,4 +77,4 @@ class DuplicateDetectionService:
             },
             'address': customer.address,
             'nationality': customer.nationality
-        } 
\ No newline at end of file
+        }
@@ -0,0 +1,334 @@
+"""
+Blocking-based duplicate customer detection.
+
+Comparing a customer with every other customer is O(N) per onboarding
+and O(N^2) for the portfolio. Instead each customer is given a handful of
+blocking keys, and only customers sharing a key are compared:
+
+* ``N`` - phonetic name key
+* ``D`` - date of birth and first letter of the normalized name
+* ``I`` - identification number prefix (typos are usually towards the end)
+* ``P`` - phone number suffix
+* ``E`` - canonical email address
+
+Keys include the customer type, so individuals are never paired with
+corporates. A single customer is resolved with one indexed query over the
+stored keys (``find_customer_duplicates``); the whole portfolio is
+streamed once and blocked in memory (``find_portfolio_duplicates``).
+Blocks larger than ``max_block_size`` (a shared company phone, a common
+name) are skipped, as their pairs are too many and too weak to review.
+
+Candidate pairs are scored on the criteria they agree on. Each criterion
+is independent evidence of a duplicate, so they combine as a noisy-or:
+``1 - prod(1 - weight)``, with the name weight scaled by the name
+similarity.
+"""
+import logging
+import operator
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import date
+from functools import reduce
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Set, Tuple
+
+from django.db.models import BooleanField, ExpressionWrapper, F, Q
+
+from screening_watchlist.services.identifiers import MIN_IDENTIFIER_LENGTH
+from screening_watchlist.services.name_keys import name_keys
+from screening_watchlist.services.name_scoring import score_names
+from ..models import Customer
+from .blocking_keys import email_key, identification_key, phone_key
+
+logger = logging.getLogger(__name__)
+
+CUSTOMER_FIELDS = (
+    'id', 'customer_type', 'name', 'normalized_name', 'phonetic_key', 'date_of_birth',
+    'identification_type', 'identification_key', 'phone_key', 'email_key'
+)
+
+CRITERION_WEIGHTS = {
+    'IDENTIFICATION': 0.9,
+    # Same number up to the last digits; often a typo, sometimes a relative
+    'IDENTIFICATION_PREFIX': 0.3,
+    'EMAIL': 0.75,
+    'NAME': 0.8,
+    'PHONE': 0.5,
+    'DATE_OF_BIRTH': 0.4,
+}
+NAME_SIMILARITY_THRESHOLD = 0.85
+# Pairs clustered as duplicates by the portfolio job
+DUPLICATE_CONFIDENCE_THRESHOLD = 0.85
+# Candidates reported at onboarding for a reviewer to confirm; any exact
+# identification, email or phone match, or a similar name, is reported
+REVIEW_CONFIDENCE_THRESHOLD = 0.5
+
+ID_PREFIX_LENGTH = 10
+MAX_BLOCK_SIZE = 1000
+# Candidates scored per customer by the single-customer lookup
+MAX_CANDIDATES = 500
+# Criteria whose candidates are kept first when the lookup is capped, strongest first
+RANKED_CRITERIA = ('IDENTIFICATION', 'EMAIL', 'PHONE', 'IDENTIFICATION_PREFIX')
+
+
+@dataclass(frozen=True)
+class CustomerRecord:
+    """The fields of a customer used for blocking and scoring"""
+    id: str
+    customer_type: str
+    name: str
+    normalized_name: str
+    phonetic_key: str
+    date_of_birth: Optional[date]
+    identification_type: str
+    identification_key: str
+    phone_key: str
+    email_key: str
+
+    @classmethod
+    def from_row(cls, row: Sequence) -> 'CustomerRecord':
+        """From a ``values_list(*CUSTOMER_FIELDS)`` row"""
+        return cls(str(row[0]), *row[1:])
+
+    @classmethod
+    def from_customer(cls, customer: Customer) -> 'CustomerRecord':
+        """From a customer instance, saved or not; keys are computed from the source fields"""
+        keys = name_keys(customer.name)
+        return cls(
+            id=str(customer.pk) if customer.pk else '',
+            customer_type=customer.customer_type,
+            name=customer.name,
+            normalized_name=keys.normalized_name,
+            phonetic_key=keys.phonetic_key,
+            date_of_birth=customer.date_of_birth,
+            identification_type=customer.identification_type,
+            identification_key=identification_key(customer.identification_number),
+            phone_key=phone_key(customer.phone),
+            email_key=email_key(customer.email)
+        )
+
+    @property
+    def identification_prefix(self) -> str:
+        if len(self.identification_key) < MIN_IDENTIFIER_LENGTH:
+            return ''
+        return self.identification_key[:ID_PREFIX_LENGTH]
+
+
+@dataclass(frozen=True)
+class DuplicatePair:
+    customer_id: str
+    duplicate_id: str
+    confidence: float
+    name_similarity: float
+    # Criteria the two customers agree on
+    criteria: Tuple[str, ...]
+
+
+def blocking_keys(record: CustomerRecord) -> List[str]:
+    keys = []
+    if record.phonetic_key:
+        keys.append(f"N:{record.customer_type}:{record.phonetic_key}")
+    if record.date_of_birth and record.normalized_name:
+        keys.append(f"D:{record.customer_type}:{record.date_of_birth.isoformat()}:{record.normalized_name[0]}")
+    if record.identification_prefix:
+        keys.append(f"I:{record.customer_type}:{record.identification_prefix}")
+    if record.phone_key:
+        keys.append(f"P:{record.customer_type}:{record.phone_key}")
+    if record.email_key:
+        keys.append(f"E:{record.customer_type}:{record.email_key}")
+    return keys
+
+
+def matched_criteria(record: CustomerRecord, other: CustomerRecord, name_similarity: float) -> Tuple[str, ...]:
+    criteria = []
+    if record.identification_key and record.identification_key == other.identification_key:
+        criteria.append('IDENTIFICATION')
+    elif record.identification_prefix and record.identification_prefix == other.identification_prefix:
+        criteria.append('IDENTIFICATION_PREFIX')
+    if record.email_key and record.email_key == other.email_key:
+        criteria.append('EMAIL')
+    if name_similarity >= NAME_SIMILARITY_THRESHOLD:
+        criteria.append('NAME')
+    if record.phone_key and record.phone_key == other.phone_key:
+        criteria.append('PHONE')
+    if record.date_of_birth and record.date_of_birth == other.date_of_birth:
+        criteria.append('DATE_OF_BIRTH')
+    return tuple(criteria)
+
+
+def combined_confidence(criteria: Sequence[str], name_similarity: float = 1.0) -> float:
+    """Noisy-or of the weights of the matched ``criteria``"""
+    remaining = 1.0
+    for criterion in criteria:
+        weight = CRITERION_WEIGHTS.get(criterion, 0.0)
+        if criterion == 'NAME':
+            weight *= name_similarity
+        remaining *= 1 - weight
+    return round(1 - remaining, 4)
+
+
+def score_candidates(
+    record: CustomerRecord,
+    candidates: Sequence[CustomerRecord],
+    threshold: float = DUPLICATE_CONFIDENCE_THRESHOLD
+) -> List[DuplicatePair]:
+    """Pairs of ``record`` with the ``candidates`` at or above ``threshold``, most confident first"""
+    candidates = [candidate for candidate in candidates if candidate.id != record.id]
+    if not candidates:
+        return []
+
+    similarities = score_names(record.name, [candidate.name for candidate in candidates]).combined
+    pairs = []
+    for candidate, similarity in zip(candidates, similarities.tolist()):
+        criteria = matched_criteria(record, candidate, similarity)
+        confidence = combined_confidence(criteria, similarity)
+        if criteria and confidence >= threshold:
+            pairs.append(DuplicatePair(
+                customer_id=record.id,
+                duplicate_id=candidate.id,
+                confidence=confidence,
+                name_similarity=round(similarity, 4),
+                criteria=criteria
+            ))
+    pairs.sort(key=lambda pair: pair.confidence, reverse=True)
+    return pairs
+
+
+def criterion_lookups(record: CustomerRecord) -> Dict[str, Q]:
+    """
+    Indexed lookup of the customers agreeing with ``record`` on each
+    criterion; ``NAME`` selects the phonetic and date of birth blocks, to be
+    confirmed by name scoring
+    """
+    lookups = {}
+    if record.identification_prefix:
+        lookups['IDENTIFICATION'] = Q(identification_key=record.identification_key)
+        lookups['IDENTIFICATION_PREFIX'] = Q(identification_key__startswith=record.identification_prefix)
+    if record.email_key:
+        lookups['EMAIL'] = Q(email_key=record.email_key)
+    if record.phone_key:
+        lookups['PHONE'] = Q(phone_key=record.phone_key)
+    name_lookups = []
+    if record.phonetic_key:
+        name_lookups.append(Q(phonetic_key=record.phonetic_key))
+    if record.date_of_birth and record.normalized_name:
+        name_lookups.append(Q(date_of_birth=record.date_of_birth, normalized_name__startswith=record.normalized_name[0]))
+    if name_lookups:
+        lookups['NAME'] = reduce(operator.or_, name_lookups)
+    return lookups
+
+
+def candidate_queryset(record: CustomerRecord, lookups: Optional[Dict[str, Q]] = None):
+    """
+    Active customers sharing a blocking key with ``record``, as one OR of
+    indexed lookups
+    """
+    if lookups is None:
+        lookups = criterion_lookups(record)
+    if not lookups:
+        return Customer.objects.none()
+
+    queryset = Customer.objects.filter(
+        reduce(operator.or_, lookups.values()),
+        customer_type=record.customer_type,
+        is_active=True
+    )
+    if record.id:
+        queryset = queryset.exclude(pk=record.id)
+    return queryset
+
+
+def ranked_candidate_queryset(record: CustomerRecord, lookups: Optional[Dict[str, Q]] = None):
+    """
+    ``candidate_queryset`` with the customers agreeing on the strongest
+    criteria first, so capping it drops name block members before an exact
+    identification, email or phone match
+    """
+    if lookups is None:
+        lookups = criterion_lookups(record)
+    flags = {
+        f"matches_{criterion.lower()}": ExpressionWrapper(lookups[criterion], output_field=BooleanField())
+        for criterion in RANKED_CRITERIA if criterion in lookups
+    }
+    return candidate_queryset(record, lookups).annotate(**flags).order_by(
+        *(F(flag).desc(nulls_last=True) for flag in flags), 'pk'
+    )
+
+
+def find_customer_duplicates(
+    customer: Customer,
+    threshold: float = DUPLICATE_CONFIDENCE_THRESHOLD,
+    max_candidates: int = MAX_CANDIDATES
+) -> List[DuplicatePair]:
+    """Likely duplicates of one customer (e.g. at onboarding, before it is saved)"""
+    record = CustomerRecord.from_customer(customer)
+    rows = ranked_candidate_queryset(record).values_list(*CUSTOMER_FIELDS)[:max_candidates]
+    return score_candidates(record, [CustomerRecord.from_row(row) for row in rows], threshold)
+
+
+def load_records(queryset=None, chunk_size: int = 10000) -> List[CustomerRecord]:
+    """Stream the blocking fields of ``queryset`` (all active customers by default)"""
+    if queryset is None:
+        queryset = Customer.objects.filter(is_active=True)
+    return [
+        CustomerRecord.from_row(row)
+        for row in queryset.order_by().values_list(*CUSTOMER_FIELDS).iterator(chunk_size=chunk_size)
+    ]
+
+
+def candidate_pairs(
+    records: Sequence[CustomerRecord],
+    max_block_size: int = MAX_BLOCK_SIZE,
+    keys: Callable[[CustomerRecord], List[str]] = blocking_keys
+) -> Dict[int, Set[int]]:
+    """
+    Positions of the records sharing a blocking key, as
+    ``{i: {j, ...}}`` with ``i < j``; each pair appears once however many
+    keys it shares
+
+    ``keys`` gives the blocking keys of a record (e.g. only those of one
+    shard).
+    """
+    blocks: Dict[str, List[int]] = defaultdict(list)
+    for position, record in enumerate(records):
+        for key in keys(record):
+            blocks[key].append(position)
+
+    pairs: Dict[int, Set[int]] = defaultdict(set)
+    skipped = 0
+    for key, members in blocks.items():
+        if len(members) < 2:
+            continue
+        if len(members) > max_block_size:
+            skipped += 1
+            logger.info(f"Skipping duplicate block {key} of {len(members)} customers")
+            continue
+        for offset, left in enumerate(members[:-1]):
+            pairs[left].update(members[offset + 1:])
+    if skipped:
+        logger.warning(f"Skipped {skipped} duplicate blocks larger than {max_block_size} customers")
+    return pairs
+
+
+def score_pairs(
+    records: Sequence[CustomerRecord],
+    pairs: Dict[int, Set[int]],
+    threshold: float = DUPLICATE_CONFIDENCE_THRESHOLD
+) -> Iterator[DuplicatePair]:
+    """Score candidate pairs, one vectorized name scoring call per left-hand record"""
+    for left, rights in pairs.items():
+        yield from score_candidates(records[left], [records[right] for right in sorted(rights)], threshold)
+
+
+def find_portfolio_duplicates(
+    queryset=None,
+    threshold: float = DUPLICATE_CONFIDENCE_THRESHOLD,
+    chunk_size: int = 10000,
+    max_block_size: int = MAX_BLOCK_SIZE
+) -> Iterator[DuplicatePair]:
+    """Likely duplicate pairs across the portfolio (or ``queryset``)"""
+    records = load_records(queryset, chunk_size)
+    pairs = candidate_pairs(records, max_block_size)
+    logger.info(
+        f"Blocked {len(records)} customers into {sum(len(rights) for rights in pairs.values())} candidate pairs"
+    )
+    return score_pairs(records, pairs, threshold)
@@ -0,0 +1,242 @@
+"""
+In-memory graph of customer relationships (directors, shareholders,
+beneficial owners, ...).
+
+Active ``CustomerRelationship`` rows are loaded once into compressed
+adjacency arrays: customer IDs are numbered, and the neighbours of node
+``i`` are ``neighbors[offsets[i]:offsets[i + 1]]`` with the relationship
+type of each edge alongside. Relationships are traversed in both
+directions - a sanctioned owner exposes the company, and a sanctioned
+company exposes its directors.
+
+``expand`` walks the graph breadth-first up to ``max_hops`` and stops
+once ``max_parties`` parties are found, so the cost of an expansion is
+bounded however dense the network. Expansions are cached per customer
+until the graph is rebuilt.
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+import numpy as np
+from django.conf import settings
+from django.db.models import Count, Max, Q
+from django.utils import timezone
+
+from ..models import CustomerRelationship
+
+logger = logging.getLogger(__name__)
+
+RELATIONSHIP_TYPES = (
+    'DIRECTOR',
+    'SHAREHOLDER',
+    'BENEFICIAL_OWNER',
+    'FAMILY_MEMBER',
+    'BUSINESS_ASSOCIATE',
+    'AUTHORIZED_PERSON',
+    'OTHER',
+)
+_TYPE_CODES = {relationship_type: code for code, relationship_type in enumerate(RELATIONSHIP_TYPES)}
+
+
+@dataclass(frozen=True)
+class ConnectedParty:
+    """A customer reached from the expanded customer"""
+    customer_id: str
+    hops: int
+    # Relationship types along the path, from the expanded customer outwards
+    path: Tuple[str, ...]
+    # Customer the party was reached from
+    via: str
+
+
+class RelationshipGraph:
+    """Customer relationships as CSR adjacency arrays"""
+
+    def __init__(
+        self,
+        edges: Iterable[Tuple[str, str, str]],
+        version: str = '',
+        cache_size: int = 10000
+    ):
+        self.version = version
+        self.cache_size = cache_size
+        self._node_ids: Dict[str, int] = {}
+        self.customer_ids: List[str] = []
+
+        sources, targets, types = [], [], []
+        for from_id, to_id, relationship_type in edges:
+            source, target = self._node(str(from_id)), self._node(str(to_id))
+            code = _TYPE_CODES.get(relationship_type, _TYPE_CODES['OTHER'])
+            # Both directions, so the walk reaches owners and owned alike
+            sources += (source, target)
+            targets += (target, source)
+            types += (code, code)
+
+        sources = np.asarray(sources, dtype=np.int32)
+        order = np.argsort(sources, kind='stable')
+        self.neighbors = np.asarray(targets, dtype=np.int32)[order]
+        self.edge_types = np.asarray(types, dtype=np.int8)[order]
+        self.offsets = np.zeros(len(self.customer_ids) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(sources, minlength=len(self.customer_ids)), out=self.offsets[1:])
+
+        self._cache: 'OrderedDict[tuple, Tuple[ConnectedParty, ...]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _node(self, customer_id: str) -> int:
+        node = self._node_ids.get(customer_id)
+        if node is None:
+            node = self._node_ids[customer_id] = len(self.customer_ids)
+            self.customer_ids.append(customer_id)
+        return node
+
+    def __len__(self) -> int:
+        return len(self.customer_ids)
+
+    @property
+    def edge_count(self) -> int:
+        return len(self.neighbors) // 2
+
+    def expand(
+        self,
+        customer_id,
+        max_hops: int = 2,
+        max_parties: int = 500,
+        relationship_types: Optional[FrozenSet[str]] = None
+    ) -> Tuple[ConnectedParty, ...]:
+        """
+        Customers connected to ``customer_id`` within ``max_hops``, nearest
+        first, at most ``max_parties`` of them
+
+        ``relationship_types`` restricts the edges followed.
+        """
+        key = (str(customer_id), max_hops, max_parties, relationship_types)
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                return cached
+
+        parties = self._walk(str(customer_id), max_hops, max_parties, relationship_types)
+        with self._lock:
+            self._cache[key] = parties
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return parties
+
+    def _walk(
+        self,
+        customer_id: str,
+        max_hops: int,
+        max_parties: int,
+        relationship_types: Optional[FrozenSet[str]]
+    ) -> Tuple[ConnectedParty, ...]:
+        start = self._node_ids.get(customer_id)
+        if start is None or max_hops <= 0:
+            return ()
+        allowed = None
+        if relationship_types is not None:
+            allowed = np.zeros(len(RELATIONSHIP_TYPES), dtype=bool)
+            allowed[[_TYPE_CODES[t] for t in relationship_types if t in _TYPE_CODES]] = True
+
+        paths: Dict[int, Tuple[str, ...]] = {start: ()}
+        parties: List[ConnectedParty] = []
+        frontier = [start]
+        for hop in range(1, max_hops + 1):
+            next_frontier = []
+            for node in frontier:
+                begin, end = self.offsets[node], self.offsets[node + 1]
+                neighbors = self.neighbors[begin:end]
+                types = self.edge_types[begin:end]
+                if allowed is not None:
+                    keep = allowed[types]
+                    neighbors, types = neighbors[keep], types[keep]
+                for neighbor, code in zip(neighbors.tolist(), types.tolist()):
+                    if neighbor in paths:
+                        continue
+                    paths[neighbor] = paths[node] + (RELATIONSHIP_TYPES[code],)
+                    parties.append(ConnectedParty(
+                        customer_id=self.customer_ids[neighbor],
+                        hops=hop,
+                        path=paths[neighbor],
+                        via=self.customer_ids[node]
+                    ))
+                    if len(parties) >= max_parties:
+                        return tuple(parties)
+                    next_frontier.append(neighbor)
+            if not next_frontier:
+                break
+            frontier = next_frontier
+        return tuple(parties)
+
+
+def _active_relationships():
+    today = timezone.localdate()
+    return CustomerRelationship.objects.filter(
+        Q(end_date__isnull=True) | Q(end_date__gte=today),
+        is_active=True,
+        start_date__lte=today
+    ).exclude(verification_status='REJECTED')
+
+
+def get_relationship_graph_version() -> str:
+    """
+    Version stamp of the relationship graph
+
+    Changes whenever a relationship is added, removed or updated, and
+    daily, as relationships start and end by date.
+    """
+    summary = CustomerRelationship.objects.aggregate(latest=Max('updated_at'), relationships=Count('id'))
+    latest = summary['latest'].isoformat() if summary['latest'] else 'never'
+    return f"{latest}:{summary['relationships']}:{timezone.localdate().isoformat()}"
+
+
+def build_relationship_graph(version: Optional[str] = None) -> RelationshipGraph:
+    """Load all active relationships and build a fresh graph"""
+    if version is None:
+        version = get_relationship_graph_version()
+    started = time.monotonic()
+    edges = _active_relationships().values_list('from_customer_id', 'to_customer_id', 'relationship_type')
+    graph = RelationshipGraph(
+        edges.iterator(chunk_size=10000),
+        version=version,
+        cache_size=settings.SCREENING_RELATIONSHIP_CACHE_SIZE
+    )
+    logger.info(
+        f"Built relationship graph version {version} with {len(graph)} customers and "
+        f"{graph.edge_count} relationships in {time.monotonic() - started:.2f}s"
+    )
+    return graph
+
+
+_graph: Optional[RelationshipGraph] = None
+_graph_lock = threading.Lock()
+_last_version_check = 0.0
+
+
+def get_relationship_graph(force_refresh: bool = False) -> RelationshipGraph:
+    """
+    Process-wide relationship graph
+
+    The version is re-checked at most every
+    ``SCREENING_INDEX_VERSION_CHECK_SECONDS``; the graph (and with it the
+    expansion cache) is rebuilt only when it has changed.
+    """
+    global _graph, _last_version_check
+
+    now = time.monotonic()
+    if (
+        not force_refresh and _graph is not None and
+        now - _last_version_check < settings.SCREENING_INDEX_VERSION_CHECK_SECONDS
+    ):
+        return _graph
+
+    with _graph_lock:
+        version = get_relationship_graph_version()
+        _last_version_check = time.monotonic()
+        if force_refresh or _graph is None or _graph.version != version:
+            _graph = build_relationship_graph(version)
+        return _graph
@@ -0,0 +1,59 @@
+from celery import group, shared_task
+from .models import DuplicateDetectionRun
+from .services.duplicate_clustering import (
+    DEFAULT_CHUNK_SIZE,
+    DEFAULT_SHARDS,
+    create_detection_run,
+    detect_shard,
+    fail_detection_run,
+    finish_detection_run,
+    pending_shards,
+    start_detection_run
+)
+from typing import Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+@shared_task
+def cluster_duplicate_customers(
+    run_id: Optional[str] = None,
+    shards: int = DEFAULT_SHARDS,
+    chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> str:
+    """
+    Fan the pending shards of a duplicate detection run out as Celery tasks
+    (nightly); a new run is created unless ``run_id`` names an interrupted
+    one to resume
+    """
+    if run_id is None:
+        run = create_detection_run(shards)
+    else:
+        run = DuplicateDetectionRun.objects.get(pk=run_id)
+    start_detection_run(run)
+    pending = pending_shards(run)
+    if not pending:
+        # Every shard finished before the interruption; no task is left to
+        # cluster the pairs and complete the run
+        finish_detection_run(str(run.pk))
+        return str(run.pk)
+    group(
+        detect_duplicate_shard.s(str(run.pk), key, chunk_size)
+        for key in pending
+    ).apply_async()
+    return str(run.pk)
+
+@shared_task
+def detect_duplicate_shard(run_id: str, key: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> int:
+    """
+    Find the duplicate pairs of one shard; the last shard to finish
+    clusters the pairs and completes the run
+    """
+    try:
+        found = detect_shard(run_id, key, chunk_size)
+    except Exception as e:
+        logger.error(f"Duplicate detection run {run_id} shard {key} failed: {str(e)}")
+        fail_detection_run(run_id, e)
+        raise
+    finish_detection_run(run_id)
+    return found
@@ -1,3 +1,209 @@
-from django.test import TestCase
+from datetime import date
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase
+
+from screening_watchlist.services.name_keys import name_keys
+from .models import Customer
+from .services.duplicate_clustering import UnionFind, create_detection_run, shard_of
+from .services.duplicate_detection import DuplicateDetectionService
+from .services.blocking_keys import email_key, identification_key, phone_key
+from .services.entity_resolution import (
+    DUPLICATE_CONFIDENCE_THRESHOLD,
+    CustomerRecord,
+    blocking_keys,
+    candidate_pairs,
+    combined_confidence,
+    find_customer_duplicates,
+    matched_criteria,
+    score_pairs
+)
+from .services.relationship_graph import RelationshipGraph
+from .tasks import cluster_duplicate_customers
+
+
+class RelationshipGraphTests(SimpleTestCase):
+    def setUp(self):
+        # company -> director -> other company -> its owner; an unrelated pair
+        self.graph = RelationshipGraph([
+            ('company', 'director', 'DIRECTOR'),
+            ('other', 'director', 'DIRECTOR'),
+            ('other', 'owner', 'BENEFICIAL_OWNER'),
+            ('family', 'owner', 'FAMILY_MEMBER'),
+            ('x', 'y', 'SHAREHOLDER'),
+        ], version='v1')
+
+    def test_expansion_follows_both_directions_by_hop(self):
+        parties = self.graph.expand('company', max_hops=3)
+        self.assertEqual(
+            [(party.customer_id, party.hops) for party in parties],
+            [('director', 1), ('other', 2), ('owner', 3)]
+        )
+        self.assertEqual(parties[-1].path, ('DIRECTOR', 'DIRECTOR', 'BENEFICIAL_OWNER'))
+        self.assertEqual(parties[-1].via, 'other')
+
+    def test_expansion_is_bounded(self):
+        self.assertEqual(len(self.graph.expand('company', max_hops=1)), 1)
+        self.assertEqual(len(self.graph.expand('company', max_hops=10, max_parties=2)), 2)
+        self.assertEqual(self.graph.expand('unknown'), ())
+
+    def test_relationship_types_filter_edges(self):
+        parties = self.graph.expand('owner', max_hops=3, relationship_types=frozenset({'BENEFICIAL_OWNER'}))
+        self.assertEqual([party.customer_id for party in parties], ['other'])
+
+    def test_expansions_are_cached(self):
+        first = self.graph.expand('company', max_hops=2)
+        self.assertIs(self.graph.expand('company', max_hops=2), first)
+        self.assertEqual((len(self.graph), self.graph.edge_count), (7, 5))
+
+
+def _customer(id, name, date_of_birth=None, identification='', phone='', email='', customer_type='INDIVIDUAL'):
+    keys = name_keys(name)
+    return CustomerRecord(
+        id=id,
+        customer_type=customer_type,
+        name=name,
+        normalized_name=keys.normalized_name,
+        phonetic_key=keys.phonetic_key,
+        date_of_birth=date_of_birth,
+        identification_type='EMIRATES_ID',
+        identification_key=identification_key(identification),
+        phone_key=phone_key(phone),
+        email_key=email_key(email)
+    )
+
+
+class BlockingKeyTests(SimpleTestCase):
+    def test_keys_are_canonical(self):
+        self.assertEqual(identification_key('784-1985-1234567-1'), '784198512345671')
+        self.assertEqual(phone_key('+971 50 123 4567'), phone_key('050-1234567'))
+        self.assertEqual(phone_key('123'), '')
+        self.assertEqual(email_key(' John.Smith+bank@Example.com'), 'john.smith@example.com')
+        self.assertEqual(email_key('not-an-email'), '')
+
+    def test_blocking_keys_are_per_customer_type(self):
+        person = _customer('1', 'John Smith', phone='0501234567')
+        company = _customer('2', 'John Smith', phone='0501234567', customer_type='CORPORATE')
+        self.assertFalse(set(blocking_keys(person)) & set(blocking_keys(company)))
+
+
+class EntityResolutionTests(SimpleTestCase):
+    def setUp(self):
+        self.records = [
+            _customer('1', 'Mohammed Al Rashid', date(1985, 3, 1), '784-1985-1234567-1', '+971501234567'),
+            # Same person, transliterated name and reformatted ID
+            _customer('2', 'Mohamed Al-Rashid', date(1985, 3, 1), '784198512345671', '0501234567'),
+            # Shares a phone only
+            _customer('3', 'Fatima Hassan', date(1990, 7, 9), '784-1990-7654321-2', '0501234567'),
+            _customer('4', 'Unrelated Person', date(1970, 1, 1), 'P1234567', '0559999999'),
+        ]
+
+    def test_candidate_pairs_come_from_shared_blocks_only(self):
+        pairs = candidate_pairs(self.records)
+        self.assertEqual({left: sorted(rights) for left, rights in pairs.items()}, {0: [1, 2], 1: [2]})
+        # Blocks above the size limit are skipped
+        self.assertEqual(dict(candidate_pairs(self.records, max_block_size=2)), {0: {1}})
+
+    def test_pairs_are_scored_on_agreeing_criteria(self):
+        found = list(score_pairs(self.records, candidate_pairs(self.records)))
+        self.assertEqual([(pair.customer_id, pair.duplicate_id) for pair in found], [('1', '2')])
+        self.assertEqual(found[0].criteria, ('IDENTIFICATION', 'NAME', 'PHONE', 'DATE_OF_BIRTH'))
+        self.assertGreater(found[0].confidence, 0.99)
+
+    def test_combined_confidence(self):
+        self.assertEqual(combined_confidence([]), 0.0)
+        self.assertEqual(combined_confidence(['IDENTIFICATION']), 0.9)
+        # A name alone is not enough; a name and date of birth are
+        self.assertLess(combined_confidence(['NAME'], 0.95), 0.85)
+        self.assertGreater(combined_confidence(['NAME', 'DATE_OF_BIRTH'], 0.95), 0.85)
+
+    def test_identification_prefix_is_weak_evidence(self):
+        record = _customer('1', 'John Smith', identification='784-1985-1234567-1')
+        typo = _customer('2', 'Jon Smith', identification='784-1985-1234576-1')
+        self.assertEqual(matched_criteria(record, typo, 0.9), ('IDENTIFICATION_PREFIX', 'NAME'))
+        self.assertEqual(matched_criteria(record, record, 1.0)[0], 'IDENTIFICATION')
+
+
+class FindCustomerDuplicatesTests(TestCase):
+    def setUp(self):
+        self.admin = get_user_model().objects.create_superuser(
+            email='admin@example.com', username='admin', password='secret'
+        )
+
+    def customer(self, name, identification_number, phone, **fields):
+        fields.setdefault('email', f"{identification_number}.{phone[-4:]}@example.com")
+        return Customer(
+            customer_type='INDIVIDUAL', name=name,
+            phone=phone, address='Dubai', nationality='ARE', identification_type='PASSPORT',
+            identification_number=identification_number, created_by=self.admin, **fields
+        )
+
+    def test_capped_lookup_keeps_exact_identification_matches(self):
+        for number in range(20):
+            self.customer('Mohammed Al Rashid', f"P20000{number:02d}", f"+9715000000{number:02d}").save()
+        holder = self.customer('Fatima Hassan', 'P1234567', '+971559999999')
+        holder.save()
+
+        applicant = self.customer('Mohammed Al Rashid', 'P1234567', '+971551111111')
+        found = find_customer_duplicates(applicant, max_candidates=3)
+        self.assertEqual([(pair.duplicate_id, pair.criteria) for pair in found], [(str(holder.pk), ('IDENTIFICATION',))])
+
+
+class DuplicateDetectionServiceTests(FindCustomerDuplicatesTests):
+    def test_similar_names_are_reported_for_review(self):
+        twin = self.customer('Mohammed Al Rashid', 'P7000001', '+971501234567', date_of_birth=date(1985, 3, 1))
+        twin.save()
+        namesake = self.customer('Mohammed Al Rashid', 'P7000002', '+971507654321')
+        namesake.save()
+
+        applicant = self.customer('Mohamed Al-Rashid', 'P7000003', '0501234567', date_of_birth=date(1985, 3, 1))
+        found = DuplicateDetectionService().find_potential_duplicates(applicant)
+        self.assertEqual([match['customer_id'] for match in found], [twin.customer_id, namesake.customer_id])
+        self.assertEqual(found[0]['matched_criteria'], ['NAME', 'PHONE', 'DATE_OF_BIRTH'])
+        self.assertEqual([match['match_type'] for match in found], ['NAME', 'NAME'])
+        # Only the twin is clustered as a duplicate by the portfolio job
+        clustered = DuplicateDetectionService(DUPLICATE_CONFIDENCE_THRESHOLD).find_potential_duplicates(applicant)
+        self.assertEqual([match['customer_id'] for match in clustered], [twin.customer_id])
+
+    def test_exact_email_match_is_reported(self):
+        holder = self.customer('Acme Trading LLC', 'C1000001', '+97145550001', email='Accounts@Acme.example')
+        holder.save()
+
+        applicant = self.customer('Gulf Freight FZE', 'C2000002', '+97145550002', email='accounts@acme.example')
+        found = DuplicateDetectionService().find_potential_duplicates(applicant)
+        self.assertEqual([(match['customer_id'], match['match_type']) for match in found], [(holder.customer_id, 'EXACT')])
+        self.assertEqual(found[0]['matched_criteria'], ['EMAIL'])
+
+
+class DuplicateClusteringTests(SimpleTestCase):
+    def test_union_find_merges_transitive_pairs(self):
+        union = UnionFind()
+        for first, second in [('a', 'b'), ('c', 'd'), ('b', 'c'), ('e', 'f'), ('a', 'd')]:
+            union.union(first, second)
+        union.find('lonely')
+        groups = sorted(sorted(members) for members in union.groups().values())
+        self.assertEqual(groups, [['a', 'b', 'c', 'd'], ['e', 'f']])
+        self.assertEqual(union.find('a'), union.find('d'))
+
+    def test_shards_are_stable_and_cover_the_keys(self):
+        keys = [f"P:INDIVIDUAL:50123{number:04d}" for number in range(1000)]
+        shards = [shard_of(key, 8) for key in keys]
+        self.assertEqual(shards, [shard_of(key, 8) for key in keys])
+        self.assertEqual(set(shards), set(range(8)))
+
+
+class DuplicateDetectionRunTests(TestCase):
+    def test_resuming_a_run_with_no_pending_shards_completes_it(self):
+        get_user_model().objects.create_superuser(
+            email='admin@example.com', username='admin', password='secret'
+        )
+        run = create_detection_run(2)
+        for state in run.metadata['shards'].values():
+            state['done'] = True
+        run.status = 'FAILED'
+        run.save(update_fields=['metadata', 'status'])
+
+        cluster_duplicate_customers(str(run.pk))
+        run.refresh_from_db()
+        self.assertEqual(run.status, 'COMPLETED')
+        self.assertEqual(run.cluster_count, 0)
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class RiskScoringConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'risk_scoring'
+
+    def ready(self):
+        import risk_scoring.signals  # noqa
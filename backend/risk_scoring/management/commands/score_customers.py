@@ -0,0 +1,32 @@
+"""
+Score customers with the active risk configuration, in bulk
+"""
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import BaseCommand, CommandError
+
+from risk_scoring.services.risk_engine import DEFAULT_CHUNK_SIZE, score_customers, score_portfolio
+
+
+class Command(BaseCommand):
+    help = 'Score the risk of the given customers, or of every active customer'
+
+    def add_arguments(self, parser):
+        parser.add_argument('customer_ids', nargs='*', help='Customer primary keys (default: all active customers)')
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+        parser.add_argument('--assessment-type', default='PERIODIC',
+                            choices=['CUSTOMER', 'TRANSACTION', 'PERIODIC', 'TRIGGERED'])
+        parser.add_argument('--created-by', metavar='USER_ID', help='User recorded on the assessments (default: the system user)')
+
+    def handle(self, *args, **options):
+        try:
+            if options['customer_ids']:
+                scored = score_customers(
+                    options['customer_ids'],
+                    assessment_type=options['assessment_type'],
+                    created_by_id=options['created_by']
+                )
+            else:
+                scored = score_portfolio(options['chunk_size'], options['assessment_type'], options['created_by'])
+        except ImproperlyConfigured as e:
+            raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS(f"Scored {scored} customers"))
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.4 on 2026-10-16 18:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customer_management', '0006_duplicate_clusters'),
+        ('risk_scoring', '0002_remove_eddapproval_risk_scorin_decisio_ff26b9_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PendingRescore',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('reason', models.CharField(help_text='Event that first marked the customer', max_length=50)),
+                ('marked_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('customer', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='pending_rescore', to='customer_management.customer')),
+            ],
+            options={
+                'verbose_name': 'Pending Rescore',
+                'verbose_name_plural': 'Pending Rescores',
+                'ordering': ['marked_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-16 21:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('risk_scoring', '0003_pendingrescore'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pendingrescore',
+            name='claimed_at',
+            field=models.DateTimeField(blank=True, help_text='When a rescoring run took the customer; the claim lapses after a lease', null=True),
+        ),
+    ]
@@ -566,3 +566,32 @@ class RiskScore(AbstractBaseModel):
 
     def __str__(self):
         return f"Risk Score for {self.entity} - {self.base_score}"
+
+class PendingRescore(models.Model):
+    """
+    Customer whose risk inputs changed since it was last scored; one row
+    per customer, so repeated events before the next rescore coalesce
+    """
+    customer = models.OneToOneField(
+        Customer,
+        on_delete=models.CASCADE,
+        related_name='pending_rescore'
+    )
+    reason = models.CharField(
+        max_length=50,
+        help_text=_('Event that first marked the customer')
+    )
+    marked_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    claimed_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text=_('When a rescoring run took the customer; the claim lapses after a lease')
+    )
+
+    class Meta:
+        ordering = ['marked_at']
+        verbose_name = _('Pending Rescore')
+        verbose_name_plural = _('Pending Rescores')
+
+    def __str__(self):
+        return f"Pending rescore of {self.customer_id} ({self.reason})"
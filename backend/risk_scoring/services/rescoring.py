@@ -0,0 +1,196 @@
+"""
+Incremental, event-driven risk rescoring.
+
+Events that change a customer's risk inputs mark only the affected
+customers dirty, as ``PendingRescore`` rows:
+
+* a new or updated ``TransactionAlert`` - the transaction's originator
+* a ``WatchlistMatch`` (new, reviewed or retired) - the matched customer
+* ``Customer.mark_as_pep`` or an edit of a risk field - the customer, and
+  for the PEP flag its connected parties (their related party exposure)
+* a ``CountryRiskCategory`` or ``SanctionedCountry`` change - the
+  customers of that nationality
+* a ``CustomerRelationship`` change - both parties
+* a rescore moving a customer into or out of ``HIGH_RISK_LEVELS`` - its
+  connected parties
+
+A customer has at most one row, so any number of events before the next
+rescore coalesce. Dirty customers are claimed in batches by stamping
+``claimed_at``, and each batch is scored with one model load (see
+``risk_engine``). The rows are deleted in the transaction that writes the
+scores, so a run that dies leaves them to be claimed again once the
+``CLAIM_LEASE_SECONDS`` lease lapses. An event during a rescore clears the
+claim, so the customer stays marked, and a failed batch is released and
+marked ``RETRY``.
+Time-driven changes (activity leaving the transaction windows, KYC
+expiry) are picked up when a customer's review falls due
+(``RiskScore.next_assessment``), not by rescoring the whole portfolio.
+"""
+import logging
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Optional, Set
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from core.utils import get_system_user_id
+from customer_management.models import Customer, CustomerRelationship
+from ..models import PendingRescore, RiskScore
+from .risk_engine import HIGH_RISK_LEVELS, load_country_risk, load_risk_model, score_customers
+
+logger = logging.getLogger(__name__)
+
+RELATED_PARTY_REASON = 'RELATED_PARTY'
+RETRY_REASON = 'RETRY'
+REVIEW_DUE_REASON = 'REVIEW_DUE'
+# Time after which the claim of a run that never finished lapses
+CLAIM_LEASE_SECONDS = 600
+
+
+def connected_customers(customer_ids: Iterable) -> Set[str]:
+    """Customers directly related to ``customer_ids`` (excluding them)"""
+    ids = {str(customer_id) for customer_id in customer_ids}
+    if not ids:
+        return set()
+    rows = CustomerRelationship.objects.filter(
+        Q(from_customer_id__in=ids) | Q(to_customer_id__in=ids),
+        is_active=True
+    ).values_list('from_customer_id', 'to_customer_id')
+    return {str(customer_id) for row in rows for customer_id in row} - ids
+
+
+def country_customers(*names: str) -> Set[str]:
+    """Active customers whose nationality is one of ``names`` (codes or names, any case)"""
+    names = [name for name in names if name]
+    if not names:
+        return set()
+    lookup = Q()
+    for name in names:
+        lookup |= Q(nationality__iexact=name)
+    return {
+        str(customer_id)
+        for customer_id in Customer.objects.filter(lookup, is_active=True).values_list('pk', flat=True)
+    }
+
+
+def mark_dirty(customer_ids: Iterable, reason: str, related: bool = False) -> int:
+    """
+    Mark active customers for rescoring (and their connected parties when
+    ``related``); customers already marked keep their first reason, and
+    lose any claim, so a rescore in progress does not clear the new mark
+
+    Returns the number of customers marked or already marked.
+    """
+    ids = {str(customer_id) for customer_id in customer_ids if customer_id}
+    reasons = {customer_id: reason for customer_id in ids}
+    if related:
+        reasons.update(dict.fromkeys(connected_customers(ids), RELATED_PARTY_REASON))
+
+    batch_size = settings.RISK_RESCORE_BATCH_SIZE
+    candidates = list(reasons)
+    marked = 0
+    for start in range(0, len(candidates), batch_size):
+        active = Customer.objects.filter(
+            pk__in=candidates[start:start + batch_size],
+            is_active=True
+        ).values_list('pk', flat=True)
+        pending = [
+            PendingRescore(customer_id=customer_id, reason=reasons[str(customer_id)])
+            for customer_id in active
+        ]
+        PendingRescore.objects.bulk_create(
+            pending,
+            update_conflicts=True,
+            unique_fields=['customer'],
+            update_fields=['claimed_at']
+        )
+        marked += len(pending)
+    return marked
+
+
+def claim_dirty(batch_size: int, claimed_at: datetime) -> Dict[str, str]:
+    """
+    Claim up to ``batch_size`` unclaimed (or lapsed) dirty customers, oldest
+    first, as ``{customer_id: reason}``; rows locked by another worker are
+    skipped
+    """
+    lapsed = claimed_at - timedelta(seconds=CLAIM_LEASE_SECONDS)
+    with transaction.atomic():
+        claimed = list(
+            PendingRescore.objects.select_for_update(skip_locked=True)
+            .filter(Q(claimed_at__isnull=True) | Q(claimed_at__lt=lapsed))
+            .order_by('marked_at')
+            .values_list('pk', 'customer_id', 'reason')[:batch_size]
+        )
+        PendingRescore.objects.filter(pk__in=[pk for pk, _, _ in claimed]).update(claimed_at=claimed_at)
+    return {str(customer_id): reason for _, customer_id, reason in claimed}
+
+
+def _claimed(customer_ids: Iterable, claimed_at: datetime):
+    """Rows of ``customer_ids`` still held by the claim made at ``claimed_at``"""
+    return PendingRescore.objects.filter(customer_id__in=list(customer_ids), claimed_at=claimed_at)
+
+
+def _high_risk(customer_ids: Iterable) -> Set[str]:
+    return {
+        str(customer_id)
+        for customer_id in Customer.objects.filter(
+            pk__in=list(customer_ids),
+            risk_level__in=HIGH_RISK_LEVELS
+        ).values_list('pk', flat=True)
+    }
+
+
+def rescore_dirty(batch_size: Optional[int] = None, created_by_id=None) -> int:
+    """
+    Rescore dirty customers in batches until none are left, recording the
+    assessments under ``created_by_id`` (default: the system user)
+
+    Returns the number of customers rescored.
+    """
+    batch_size = batch_size or settings.RISK_RESCORE_BATCH_SIZE
+    model = None
+    country_risk = None
+    rescored = 0
+    while True:
+        claimed_at = timezone.now()
+        claimed = claim_dirty(batch_size, claimed_at)
+        if not claimed:
+            break
+
+        try:
+            if model is None:
+                # Resolved once there is work, and shared by every batch of the run
+                created_by_id = created_by_id or get_system_user_id()
+                model = load_risk_model()
+                country_risk = load_country_risk()
+            high_risk = _high_risk(claimed)
+            with transaction.atomic():
+                rescored += score_customers(
+                    list(claimed), model, 'TRIGGERED', created_by_id, country_risk=country_risk
+                )
+                # Marks made while scoring have lost the claim and are kept
+                _claimed(claimed, claimed_at).delete()
+        except Exception:
+            _claimed(claimed, claimed_at).update(claimed_at=None, reason=RETRY_REASON)
+            raise
+
+        # Connected parties' exposure depends on whether these are high risk
+        changed = high_risk ^ _high_risk(claimed)
+        if changed:
+            mark_dirty(connected_customers(changed), RELATED_PARTY_REASON)
+        logger.info(f"Rescored {len(claimed)} dirty customers: {dict(Counter(claimed.values()))}")
+    return rescored
+
+
+def mark_due_reviews(now: Optional[datetime] = None) -> int:
+    """Mark the customers whose next risk assessment is due"""
+    now = now or timezone.now()
+    due = RiskScore.objects.filter(
+        next_assessment__lte=now,
+        entity__is_active=True
+    ).values_list('entity_id', flat=True).distinct()
+    return mark_dirty(due, REVIEW_DUE_REASON)
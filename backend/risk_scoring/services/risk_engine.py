@@ -0,0 +1,317 @@
+"""
+Batch customer risk scoring.
+
+A batch of customers is turned into one feature matrix with a handful of
+grouped queries (customer fields, country risk, watchlist matches, open
+alerts, transaction windows, connected parties) and scored at once by the
+risk model (see ``scoring_model``). The results are written in bulk: one
+``RiskAssessment`` per customer, each customer's ``RiskScore`` updated or
+created, and the score and level stored on the customer.
+"""
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from core.models import CountryRiskCategory
+from core.utils import get_system_user_id
+from customer_management.models import Customer, CustomerRelationship
+from screening_watchlist.models import SanctionedCountry, WatchlistMatch
+from transaction_monitoring.models import TransactionAlert
+from transaction_monitoring.services.pattern_analysis import LAST_24_HOURS, LAST_30_DAYS, batch_window_aggregates
+from ..models import RiskAssessment, RiskCategory, RiskFactor, RiskMatrix, RiskScore
+from .scoring_model import FEATURE_INDEX, FEATURES, RISK_LEVELS, RiskModel, build_risk_model, score_features
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 2000
+
+CUSTOMER_TYPE_RISK = {
+    'GOVERNMENT': 0.1,
+    'INDIVIDUAL': 0.2,
+    'SOLE_PROPRIETOR': 0.4,
+    'CORPORATE': 0.5,
+    'LLC': 0.5,
+    'PARTNERSHIP': 0.5,
+    'NGO': 0.7,
+    'TRUST': 0.8,
+}
+KYC_STATUS_RISK = {
+    'VERIFIED': 0.0,
+    'APPROVED': 0.0,
+    'COMPLETED': 0.0,
+    'PENDING': 0.5,
+    'IN_PROGRESS': 0.5,
+    'REJECTED': 1.0,
+    'EXPIRED': 1.0,
+}
+COUNTRY_LEVEL_RISK = {'LOW': 0.1, 'MEDIUM': 0.5, 'HIGH': 0.8, 'CRITICAL': 1.0}
+# Nationalities in neither the country risk nor the sanctions list
+UNKNOWN_COUNTRY_RISK = 0.3
+OPEN_ALERT_STATUSES = ('PENDING', 'IN_PROGRESS', 'ON_HOLD')
+OPEN_MATCH_STATUSES = ('PENDING', 'UNDER_INVESTIGATION')
+PENDING_MATCH_RISK = 0.6
+# 30-day outgoing total, in multiples of the STR threshold, that scores 1
+VOLUME_STR_MULTIPLE = 5
+RELATED_PARTY_RISK = {'sanctioned': 1.0, 'pep': 0.6, 'high_risk': 0.5}
+# Levels of a connected party that count as high risk exposure
+HIGH_RISK_LEVELS = ('HIGH', 'CRITICAL')
+REVIEW_INTERVAL_DAYS = {'LOW': 365, 'MEDIUM': 180, 'HIGH': 90, 'CRITICAL': 30}
+HISTORY_LENGTH = 50
+
+
+def load_risk_model() -> RiskModel:
+    """Risk model of the active categories, factors and customer (else combined) risk matrix"""
+    categories = list(RiskCategory.objects.filter(is_active=True).order_by('name').values(
+        'name', 'category_type', 'weight', 'risk_factors', 'scoring_method', 'custom_formula'
+    ))
+    factors = RiskFactor.objects.filter(is_active=True).values('name', 'category', 'weight')
+    matrices = {
+        matrix['matrix_type']: matrix
+        for matrix in RiskMatrix.objects.filter(
+            is_active=True, matrix_type__in=('CUSTOMER', 'COMBINED')
+        ).order_by('-name').values('matrix_type', 'thresholds', 'scoring_criteria')
+    }
+    matrix = matrices.get('CUSTOMER') or matrices.get('COMBINED')
+    return build_risk_model(categories, factors, matrix)
+
+
+def load_country_risk() -> Dict[str, float]:
+    """Risk of every known country code and name (upper case)"""
+    risk = {}
+    for code, name, level in CountryRiskCategory.objects.filter(is_active=True).values_list('code', 'name', 'risk_level'):
+        risk[code.upper()] = risk[name.upper()] = COUNTRY_LEVEL_RISK.get(level, UNKNOWN_COUNTRY_RISK)
+    for code, name in SanctionedCountry.objects.filter(is_active=True).values_list('country_code', 'country_name'):
+        risk[code.upper()] = risk[name.upper()] = 1.0
+    return risk
+
+
+def build_features(
+    customer_ids: Sequence,
+    now: Optional[datetime] = None,
+    country_risk: Optional[Dict[str, float]] = None
+) -> Tuple[List[str], np.ndarray]:
+    """
+    Feature matrix of the active customers among ``customer_ids``; returns
+    their IDs in row order and the matrix
+    """
+    now = now or timezone.now()
+    country_risk = load_country_risk() if country_risk is None else country_risk
+    rows = list(Customer.objects.filter(pk__in=customer_ids, is_active=True).values_list(
+        'id', 'customer_type', 'nationality', 'is_pep', 'is_sanctioned', 'kyc_status', 'kyc_expiry'
+    ))
+    ids = [str(row[0]) for row in rows]
+    position = {customer_id: row_number for row_number, customer_id in enumerate(ids)}
+    features = np.zeros((len(ids), len(FEATURES)))
+    if not ids:
+        return ids, features
+
+    today = now.date()
+    for row_number, (_, customer_type, nationality, is_pep, is_sanctioned, kyc_status, kyc_expiry) in enumerate(rows):
+        kyc = KYC_STATUS_RISK.get(kyc_status, 0.5)
+        if kyc_expiry and kyc_expiry < today:
+            kyc = 1.0
+        features[row_number, [
+            FEATURE_INDEX['pep'], FEATURE_INDEX['sanctioned'], FEATURE_INDEX['customer_type'],
+            FEATURE_INDEX['kyc'], FEATURE_INDEX['nationality']
+        ]] = (
+            float(is_pep), float(is_sanctioned), CUSTOMER_TYPE_RISK.get(customer_type, 0.5),
+            kyc, country_risk.get((nationality or '').strip().upper(), UNKNOWN_COUNTRY_RISK)
+        )
+
+    matches = WatchlistMatch.objects.filter(customer_id__in=ids).values('customer_id').annotate(
+        confirmed=Count('id', filter=Q(status='CONFIRMED')),
+        open=Count('id', filter=Q(status__in=OPEN_MATCH_STATUSES))
+    ).order_by()
+    for row in matches:
+        features[position[str(row['customer_id'])], FEATURE_INDEX['watchlist']] = (
+            1.0 if row['confirmed'] else PENDING_MATCH_RISK if row['open'] else 0.0
+        )
+
+    alerts = TransactionAlert.objects.filter(
+        transaction__originator_id__in=ids,
+        status__in=OPEN_ALERT_STATUSES
+    ).values('transaction__originator_id').annotate(open=Count('id')).order_by()
+    for row in alerts:
+        # 1 open alert -> 0.5, 2 -> 0.75, 3 -> 0.875, ...
+        features[position[str(row['transaction__originator_id'])], FEATURE_INDEX['alerts']] = 1 - 0.5 ** row['open']
+
+    windows = batch_window_aggregates(ids, (LAST_24_HOURS, LAST_30_DAYS), now)
+    volume_reference = float(settings.AML_SETTINGS['STR_THRESHOLD_AED']) * VOLUME_STR_MULTIPLE
+    velocity_reference = 2 * int(settings.AML_RAPID_MOVEMENT_THRESHOLD)
+    for customer_id, customer_windows in windows.items():
+        row_number = position[customer_id]
+        features[row_number, FEATURE_INDEX['volume']] = min(float(customer_windows[LAST_30_DAYS].total) / volume_reference, 1.0)
+        features[row_number, FEATURE_INDEX['velocity']] = min(customer_windows[LAST_24_HOURS].count / velocity_reference, 1.0)
+
+    relationships = CustomerRelationship.objects.filter(
+        Q(from_customer_id__in=ids) | Q(to_customer_id__in=ids),
+        Q(end_date__isnull=True) | Q(end_date__gte=today),
+        is_active=True
+    ).exclude(verification_status='REJECTED').values_list(
+        'from_customer_id', 'to_customer_id',
+        'from_customer__is_sanctioned', 'from_customer__is_pep', 'from_customer__risk_level',
+        'to_customer__is_sanctioned', 'to_customer__is_pep', 'to_customer__risk_level'
+    )
+    exposure = features[:, FEATURE_INDEX['related_exposure']]
+    for from_id, to_id, *parties in relationships:
+        for customer_id, (is_sanctioned, is_pep, risk_level) in (
+            (str(from_id), parties[3:]),
+            (str(to_id), parties[:3])
+        ):
+            if customer_id not in position:
+                continue
+            risk = max(
+                RELATED_PARTY_RISK['sanctioned'] if is_sanctioned else 0.0,
+                RELATED_PARTY_RISK['pep'] if is_pep else 0.0,
+                RELATED_PARTY_RISK['high_risk'] if risk_level in HIGH_RISK_LEVELS else 0.0
+            )
+            exposure[position[customer_id]] = max(exposure[position[customer_id]], risk)
+    return ids, features
+
+
+def score_customers(
+    customer_ids: Sequence,
+    model: Optional[RiskModel] = None,
+    assessment_type: str = 'PERIODIC',
+    created_by_id=None,
+    now: Optional[datetime] = None,
+    country_risk: Optional[Dict[str, float]] = None
+) -> int:
+    """
+    Score a batch of customers and write the results in bulk
+
+    Assessments are recorded under ``created_by_id``, else the system user.
+    Returns the number of customers scored.
+    """
+    model = model or load_risk_model()
+    created_by_id = created_by_id or get_system_user_id()
+    now = now or timezone.now()
+
+    ids, features = build_features(customer_ids, now, country_risk)
+    if not ids:
+        return 0
+    scores = score_features(model, features)
+    category_names = [category.name for category in model.categories]
+    transaction_categories = [
+        number for number, category in enumerate(model.categories) if category.category_type == 'TRANSACTION'
+    ]
+    behavioral = (
+        scores['categories'][:, transaction_categories].mean(axis=1) * 100
+        if transaction_categories else np.zeros(len(ids))
+    )
+
+    assessments = []
+    existing = {str(score.entity_id): score for score in RiskScore.objects.filter(entity_id__in=ids)}
+    customers = {
+        str(customer.pk): customer
+        for customer in Customer.objects.filter(pk__in=ids).only('risk_score', 'previous_risk_levels')
+    }
+    new_scores, updated_scores = [], []
+    for row_number, customer_id in enumerate(ids):
+        overall = round(float(scores['overall'][row_number]), 2)
+        level = RISK_LEVELS[scores['levels'][row_number]]
+        next_review = now + timedelta(days=REVIEW_INTERVAL_DAYS[level])
+        factors = {
+            feature: round(float(value), 4)
+            for feature, value in zip(FEATURES, features[row_number]) if value
+        }
+        category_scores = {
+            name: round(float(value) * 100, 2)
+            for name, value in zip(category_names, scores['categories'][row_number])
+        }
+
+        assessment = RiskAssessment(
+            assessment_type=assessment_type,
+            customer_id=customer_id,
+            risk_scores=category_scores,
+            overall_score=overall,
+            risk_level=level,
+            assessment_date=now,
+            next_review_date=next_review,
+            factors_considered=factors,
+            created_by_id=created_by_id
+        )
+        assessment.hash = assessment._generate_hash()
+        assessments.append(assessment)
+
+        score = existing.get(customer_id)
+        if score is None:
+            score = RiskScore(entity_id=customer_id, historical_scores=[], created_by_id=created_by_id)
+            score.hash = score._generate_hash()
+            new_scores.append(score)
+        else:
+            updated_scores.append(score)
+        score.base_score = overall
+        # No machine learning model is deployed yet
+        score.ml_score = 0.0
+        score.behavioral_score = round(float(behavioral[row_number]), 2)
+        score.risk_factors = {'features': factors, 'categories': category_scores, 'level': level}
+        score.historical_scores = (score.historical_scores + [
+            {'date': now.isoformat(), 'score': overall, 'level': level}
+        ])[-HISTORY_LENGTH:]
+        score.last_assessment = now
+        score.next_assessment = next_review
+        score.confidence_level = 1.0
+
+        customer = customers[customer_id]
+        new_score = int(round(overall))
+        if new_score != customer.risk_score:
+            # Same audit trail as RiskLevelMixin.update_risk_score
+            customer.previous_risk_levels = customer.previous_risk_levels + [{
+                'date': now.isoformat(),
+                'old_score': customer.risk_score,
+                'new_score': new_score,
+                'factors': factors,
+                'notes': f"{assessment_type} assessment"
+            }]
+        customer.risk_score = new_score
+        customer.risk_level = level
+        customer.risk_assessment_date = now
+        customer.risk_factors = factors
+        # bulk_update skips auto_now
+        customer.updated_at = now
+
+    with transaction.atomic():
+        RiskAssessment.objects.bulk_create(assessments, batch_size=DEFAULT_CHUNK_SIZE)
+        RiskScore.objects.bulk_create(new_scores, batch_size=DEFAULT_CHUNK_SIZE)
+        RiskScore.objects.bulk_update(updated_scores, [
+            'base_score', 'ml_score', 'behavioral_score', 'risk_factors', 'historical_scores',
+            'last_assessment', 'next_assessment', 'confidence_level'
+        ], batch_size=DEFAULT_CHUNK_SIZE)
+        Customer.objects.bulk_update(
+            list(customers.values()),
+            ['risk_score', 'risk_level', 'risk_assessment_date', 'risk_factors', 'previous_risk_levels', 'updated_at'],
+            batch_size=DEFAULT_CHUNK_SIZE
+        )
+    return len(ids)
+
+
+def score_portfolio(
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    assessment_type: str = 'PERIODIC',
+    created_by_id=None
+) -> int:
+    """Score every active customer in primary key chunks with one model and country table"""
+    created_by_id = created_by_id or get_system_user_id()
+    model = load_risk_model()
+    country_risk = load_country_risk()
+    started = time.monotonic()
+    customers = Customer.objects.filter(is_active=True).order_by('pk').values_list('pk', flat=True)
+    scored, last_id = 0, None
+    while True:
+        chunk = list((customers.filter(pk__gt=last_id) if last_id else customers)[:chunk_size])
+        if not chunk:
+            break
+        scored += score_customers(
+            chunk, model, assessment_type, created_by_id, country_risk=country_risk
+        )
+        last_id = chunk[-1]
+    logger.info(f"Scored {scored} customers in {time.monotonic() - started:.1f}s")
+    return scored
@@ -0,0 +1,250 @@
+"""
+Risk scoring model: the active ``RiskCategory``/``RiskFactor``/``RiskMatrix``
+configuration as weight matrices, applied to batches of customers.
+
+Customers are described by a feature matrix ``X`` of shape (customers,
+features), each feature a risk signal between 0 and 1 (see ``FEATURES``).
+Each category holds a weight per feature, taken from its ``risk_factors``
+JSON or, for features of its ``category_type``, from the matching
+``RiskFactor`` (by name, e.g. ``pep`` or ``PEP``). Categories score all
+customers at once with their ``scoring_method``:
+
+* ``WEIGHTED_AVERAGE`` - ``X @ w / sum(w)``
+* ``MAXIMUM`` - the largest feature value, scaled by its relative weight
+* ``MULTIPLICATIVE`` - ``1 - prod(1 - w * x)``; independent risks compound
+* ``CUSTOM`` - ``custom_formula``: ``intercept`` plus ``coefficients`` per
+  feature (default: the category weights), through a ``logistic`` or
+  ``linear`` (clipped) ``link``
+
+The overall score (0-100) is the average of the category scores weighted
+by ``RiskCategory.weight``. Levels come from the active customer (else
+combined) ``RiskMatrix``: ``thresholds`` are the lower bounds of
+``MEDIUM``, ``HIGH`` and ``CRITICAL``, and ``scoring_criteria
+["minimum_levels"]`` raises customers with a feature present (e.g.
+``{"sanctioned": "CRITICAL", "pep": "HIGH"}``) to at least that level.
+Without any active category the built-in ``DEFAULT_CATEGORIES`` apply.
+"""
+import logging
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+FEATURES = (
+    'pep',
+    'sanctioned',
+    'customer_type',
+    'kyc',
+    'nationality',
+    'watchlist',
+    'related_exposure',
+    'alerts',
+    'volume',
+    'velocity',
+)
+FEATURE_INDEX = {feature: position for position, feature in enumerate(FEATURES)}
+# Category type whose RiskFactor rows weight each feature
+FEATURE_CATEGORIES = {
+    'pep': 'CUSTOMER',
+    'customer_type': 'CUSTOMER',
+    'kyc': 'CUSTOMER',
+    'nationality': 'GEOGRAPHIC',
+    'sanctioned': 'BUSINESS',
+    'watchlist': 'BUSINESS',
+    'related_exposure': 'BUSINESS',
+    'alerts': 'TRANSACTION',
+    'volume': 'TRANSACTION',
+    'velocity': 'TRANSACTION',
+}
+
+SCORING_METHODS = ('WEIGHTED_AVERAGE', 'MAXIMUM', 'MULTIPLICATIVE', 'CUSTOM')
+RISK_LEVELS = ('LOW', 'MEDIUM', 'HIGH', 'CRITICAL')
+DEFAULT_CRITICAL_THRESHOLD = 90
+# Feature value from which a minimum level applies
+MINIMUM_LEVEL_FEATURE_VALUE = 0.5
+
+DEFAULT_CATEGORIES = (
+    {
+        'name': 'Customer profile', 'category_type': 'CUSTOMER', 'weight': 0.25,
+        'scoring_method': 'WEIGHTED_AVERAGE',
+        'risk_factors': {'pep': 1.0, 'customer_type': 0.4, 'kyc': 0.6},
+    },
+    {
+        'name': 'Geography', 'category_type': 'GEOGRAPHIC', 'weight': 0.2,
+        'scoring_method': 'MAXIMUM',
+        'risk_factors': {'nationality': 1.0},
+    },
+    {
+        'name': 'Screening', 'category_type': 'BUSINESS', 'weight': 0.3,
+        'scoring_method': 'MAXIMUM',
+        'risk_factors': {'sanctioned': 1.0, 'watchlist': 0.9, 'related_exposure': 0.6},
+    },
+    {
+        'name': 'Transaction behaviour', 'category_type': 'TRANSACTION', 'weight': 0.25,
+        'scoring_method': 'MULTIPLICATIVE',
+        'risk_factors': {'alerts': 0.8, 'volume': 0.5, 'velocity': 0.5},
+    },
+)
+DEFAULT_MINIMUM_LEVELS = {'sanctioned': 'CRITICAL', 'pep': 'HIGH'}
+
+
+def factor_key(name: str) -> str:
+    """Feature name of a ``RiskFactor`` or ``risk_factors`` key (``PEP Status`` -> ``pep_status``)"""
+    return '_'.join(str(name).lower().split())
+
+
+@dataclass
+class CategoryModel:
+    name: str
+    category_type: str
+    weight: float
+    scoring_method: str
+    # Weight per feature, shape (features,)
+    factor_weights: np.ndarray
+    custom_formula: Dict = field(default_factory=dict)
+
+    def score(self, features: np.ndarray) -> np.ndarray:
+        """Scores (0-1) of every customer, shape (customers,)"""
+        weights = self.factor_weights
+        if self.scoring_method == 'MAXIMUM':
+            return (features * (weights / weights.max())).max(axis=1)
+        if self.scoring_method == 'MULTIPLICATIVE':
+            return 1 - np.prod(1 - np.clip(features * weights, 0, 1), axis=1)
+        if self.scoring_method == 'CUSTOM':
+            return self._custom(features)
+        return features @ weights / weights.sum()
+
+    def _custom(self, features: np.ndarray) -> np.ndarray:
+        coefficients = self.factor_weights.copy()
+        for name, value in (self.custom_formula.get('coefficients') or {}).items():
+            if factor_key(name) in FEATURE_INDEX:
+                coefficients[FEATURE_INDEX[factor_key(name)]] = float(value)
+        linear = float(self.custom_formula.get('intercept', 0.0)) + features @ coefficients
+        if self.custom_formula.get('link', 'logistic') == 'linear':
+            return np.clip(linear, 0, 1)
+        return 1 / (1 + np.exp(-linear))
+
+
+@dataclass
+class RiskModel:
+    categories: List[CategoryModel]
+    # Lower bounds (0-100) of MEDIUM, HIGH and CRITICAL
+    thresholds: Dict[str, float]
+    minimum_levels: Dict[str, str] = field(default_factory=dict)
+
+    @property
+    def category_weights(self) -> np.ndarray:
+        return np.array([category.weight for category in self.categories], dtype=float)
+
+    def category_scores(self, features: np.ndarray) -> np.ndarray:
+        """Shape (customers, categories), 0-1"""
+        return np.column_stack([category.score(features) for category in self.categories])
+
+    def overall_scores(self, category_scores: np.ndarray) -> np.ndarray:
+        """Shape (customers,), 0-100"""
+        weights = self.category_weights
+        return np.clip(category_scores @ weights / weights.sum() * 100, 0, 100)
+
+    def levels(self, overall: np.ndarray, features: np.ndarray) -> np.ndarray:
+        """Risk level index (into ``RISK_LEVELS``) of every customer"""
+        bounds = [self.thresholds[level] for level in RISK_LEVELS[1:]]
+        levels = np.searchsorted(bounds, overall, side='right')
+        for feature, level in self.minimum_levels.items():
+            if feature in FEATURE_INDEX and level in RISK_LEVELS:
+                present = features[:, FEATURE_INDEX[feature]] >= MINIMUM_LEVEL_FEATURE_VALUE
+                levels = np.where(present, np.maximum(levels, RISK_LEVELS.index(level)), levels)
+        return levels
+
+
+def _factor_weights(risk_factors: Dict, category_type: str, factor_weights: Dict) -> np.ndarray:
+    """Feature weights of a category: its own ``risk_factors``, else the ``RiskFactor`` weights of its type"""
+    weights = np.zeros(len(FEATURES))
+    own = {factor_key(name): value for name, value in (risk_factors or {}).items()}
+    for feature, position in FEATURE_INDEX.items():
+        value = own.get(feature)
+        if value is None and FEATURE_CATEGORIES[feature] == category_type:
+            value = factor_weights.get((feature, category_type))
+        if isinstance(value, dict):
+            value = value.get('weight')
+        if isinstance(value, (int, float)) and value > 0:
+            weights[position] = float(value)
+    return weights
+
+
+def default_thresholds() -> Dict[str, float]:
+    return {
+        'MEDIUM': float(settings.AML_SETTINGS['MEDIUM_RISK_THRESHOLD']),
+        'HIGH': float(settings.AML_SETTINGS['HIGH_RISK_THRESHOLD']),
+        'CRITICAL': float(settings.AML_SETTINGS.get('CRITICAL_RISK_THRESHOLD', DEFAULT_CRITICAL_THRESHOLD)),
+    }
+
+
+def build_risk_model(
+    categories: Iterable[Dict],
+    factors: Iterable[Dict] = (),
+    matrix: Optional[Dict] = None
+) -> RiskModel:
+    """
+    Risk model from category, factor and matrix values (dicts of the model
+    fields); categories without a positive weight or without weighted
+    features are left out
+    """
+    factor_weights = {
+        (factor_key(factor['name']), factor['category']): float(factor['weight'])
+        for factor in factors
+    }
+    models = []
+    for category in categories:
+        weights = _factor_weights(category.get('risk_factors'), category['category_type'], factor_weights)
+        method = category.get('scoring_method') or 'WEIGHTED_AVERAGE'
+        if method not in SCORING_METHODS:
+            logger.warning(f"Unknown scoring method {method} of risk category {category['name']}; using WEIGHTED_AVERAGE")
+            method = 'WEIGHTED_AVERAGE'
+        if not weights.any() or not category['weight']:
+            logger.warning(f"Risk category {category['name']} has no weighted factors; skipped")
+            continue
+        models.append(CategoryModel(
+            name=category['name'],
+            category_type=category['category_type'],
+            weight=float(category['weight']),
+            scoring_method=method,
+            factor_weights=weights,
+            custom_formula=category.get('custom_formula') or {}
+        ))
+    if not models:
+        return build_risk_model(DEFAULT_CATEGORIES, matrix=matrix)
+
+    thresholds = default_thresholds()
+    minimum_levels = dict(DEFAULT_MINIMUM_LEVELS)
+    if matrix:
+        thresholds.update({
+            level: float(value) for level, value in (matrix.get('thresholds') or {}).items()
+            if level in thresholds and isinstance(value, (int, float))
+        })
+        criteria = matrix.get('scoring_criteria') or {}
+        if 'minimum_levels' in criteria:
+            minimum_levels = {factor_key(name): level for name, level in criteria['minimum_levels'].items()}
+    return RiskModel(models, thresholds, minimum_levels)
+
+
+def score_features(model: RiskModel, features: np.ndarray) -> Dict[str, np.ndarray]:
+    """Category scores, overall scores and level indexes of a feature matrix"""
+    category_scores = model.category_scores(features)
+    overall = model.overall_scores(category_scores)
+    return {
+        'categories': category_scores,
+        'overall': overall,
+        'levels': model.levels(overall, features)
+    }
+
+
+def feature_matrix(rows: Sequence[Dict[str, float]]) -> np.ndarray:
+    """Feature matrix from one ``{feature: value}`` mapping per customer (missing features are 0)"""
+    features = np.zeros((len(rows), len(FEATURES)))
+    for row_number, row in enumerate(rows):
+        for feature, value in row.items():
+            features[row_number, FEATURE_INDEX[feature]] = value
+    return features
@@ -0,0 +1,86 @@
+"""
+Risk Scoring signals
+
+Mark the customers affected by each risk event for rescoring once the
+event is committed (see ``services.rescoring``)
+"""
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from core.models import CountryRiskCategory
+from core.signals import risk_inputs_changed
+from customer_management.models import Customer, CustomerRelationship
+from screening_watchlist.models import SanctionedCountry, WatchlistMatch
+from transaction_monitoring.models import Transaction, TransactionAlert
+from .services.rescoring import country_customers, mark_dirty
+from .tasks import schedule_rescore
+
+# Customer fields the risk engine reads
+CUSTOMER_RISK_FIELDS = frozenset({
+    'customer_type', 'nationality', 'is_pep', 'is_sanctioned', 'kyc_status', 'kyc_expiry', 'is_active'
+})
+
+def _mark_on_commit(customer_ids, reason: str, related: bool = False) -> None:
+    """Mark after commit, so rolled back events and deleted customers are never marked"""
+    customer_ids = list(customer_ids)
+
+    def mark():
+        if mark_dirty(customer_ids, reason, related):
+            schedule_rescore()
+
+    if customer_ids:
+        transaction.on_commit(mark)
+
+@receiver(risk_inputs_changed)
+def mark_changed_customers(sender, customer_ids, reason, related=False, **kwargs):
+    """
+    Bulk writes and model methods report the customers they changed
+    """
+    _mark_on_commit(customer_ids, reason, related)
+
+@receiver(post_save, sender=TransactionAlert)
+def mark_alerted_customer(sender, instance, raw=False, **kwargs):
+    """
+    An alert raised or moved (e.g. closed) changes the originator's open alerts
+    """
+    if not raw:
+        _mark_on_commit(
+            Transaction.objects.filter(pk=instance.transaction_id).values_list('originator_id', flat=True),
+            'ALERT'
+        )
+
+@receiver(post_save, sender=WatchlistMatch)
+def mark_matched_customer(sender, instance, raw=False, **kwargs):
+    if not raw and instance.customer_id:
+        _mark_on_commit([instance.customer_id], 'WATCHLIST_MATCH')
+
+@receiver(post_save, sender=Customer)
+def mark_updated_customer(sender, instance, created, update_fields=None, raw=False, **kwargs):
+    """
+    New customers get their first score; saves that may change a risk
+    field rescore the customer
+    """
+    if raw:
+        return
+    if created:
+        _mark_on_commit([instance.pk], 'CUSTOMER_CREATED')
+    elif update_fields is None or CUSTOMER_RISK_FIELDS & set(update_fields):
+        _mark_on_commit([instance.pk], 'CUSTOMER_UPDATED')
+
+@receiver(post_save, sender=CustomerRelationship)
+@receiver(post_delete, sender=CustomerRelationship)
+def mark_related_customers(sender, instance, raw=False, **kwargs):
+    if not raw:
+        _mark_on_commit([instance.from_customer_id, instance.to_customer_id], 'RELATIONSHIP')
+
+@receiver(post_save, sender=CountryRiskCategory)
+@receiver(post_delete, sender=CountryRiskCategory)
+def mark_country_risk_customers(sender, instance, raw=False, **kwargs):
+    if not raw:
+        _mark_on_commit(country_customers(instance.code, instance.name), 'COUNTRY_RISK')
+
+@receiver(post_save, sender=SanctionedCountry)
+@receiver(post_delete, sender=SanctionedCountry)
+def mark_sanctioned_country_customers(sender, instance, raw=False, **kwargs):
+    if not raw:
+        _mark_on_commit(country_customers(instance.country_code, instance.country_name), 'COUNTRY_RISK')
@@ -0,0 +1,41 @@
+from celery import shared_task
+from django.conf import settings
+from django.core.cache import cache
+from .services.rescoring import mark_due_reviews, rescore_dirty
+import logging
+
+logger = logging.getLogger(__name__)
+
+RESCORE_SCHEDULED_KEY = 'risk_scoring:rescore_scheduled'
+
+def schedule_rescore() -> None:
+    """
+    Queue one delayed rescore per coalescing window; events in the
+    meantime only mark customers, and are picked up by that run
+    """
+    delay = settings.RISK_RESCORE_DELAY_SECONDS
+    if cache.add(RESCORE_SCHEDULED_KEY, True, timeout=delay):
+        rescore_dirty_customers.apply_async(countdown=delay)
+
+@shared_task
+def rescore_dirty_customers() -> int:
+    """
+    Rescore the customers marked dirty since the last run, in batches
+    """
+    try:
+        return rescore_dirty()
+    except Exception as e:
+        logger.error(f"Dirty customer rescoring failed: {str(e)}")
+        return 0
+
+@shared_task
+def rescore_due_customers() -> int:
+    """
+    Mark the customers whose risk review is due and rescore every dirty
+    customer; meant to be scheduled (e.g. hourly) through
+    django-celery-beat, which also picks up anything a missed scheduled
+    run left behind
+    """
+    marked = mark_due_reviews()
+    logger.info(f"Marked {marked} customers due for risk review")
+    return rescore_dirty_customers()
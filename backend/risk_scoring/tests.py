@@ -1,3 +1,297 @@
-from django.test import TestCase
+from datetime import date, timedelta
+from decimal import Decimal
 
-# Create your tests here.
+import numpy as np
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from core.models import CountryRiskCategory
+from core.signals import risk_inputs_changed
+from customer_management.models import Customer, CustomerRelationship
+from screening_watchlist.models import SanctionedCountry, WatchlistEntry, WatchlistMatch
+from transaction_monitoring.models import Transaction, TransactionAlert
+from .models import PendingRescore, RiskAssessment
+from .services.rescoring import CLAIM_LEASE_SECONDS, RETRY_REASON, claim_dirty, mark_dirty, rescore_dirty
+from .services.risk_engine import score_customers
+from .tasks import RESCORE_SCHEDULED_KEY
+from .services.scoring_model import (
+    DEFAULT_CATEGORIES,
+    FEATURE_INDEX,
+    RISK_LEVELS,
+    build_risk_model,
+    feature_matrix,
+    score_features
+)
+
+THRESHOLDS_MATRIX = {'thresholds': {'MEDIUM': 30, 'HIGH': 60, 'CRITICAL': 85}}
+
+
+def category(method, risk_factors, **fields):
+    return {
+        'name': method.title(), 'category_type': 'CUSTOMER', 'weight': 1.0,
+        'scoring_method': method, 'risk_factors': risk_factors, **fields
+    }
+
+
+class ScoringMethodTests(SimpleTestCase):
+    def setUp(self):
+        self.features = feature_matrix([
+            {'pep': 1.0, 'kyc': 0.5},
+            {'kyc': 1.0},
+            {},
+        ])
+
+    def scores(self, *categories):
+        model = build_risk_model(categories, matrix=THRESHOLDS_MATRIX)
+        return model.category_scores(self.features)[:, 0]
+
+    def test_weighted_average(self):
+        np.testing.assert_allclose(
+            self.scores(category('WEIGHTED_AVERAGE', {'pep': 3, 'kyc': 1})),
+            [(3 + 0.5) / 4, 0.25, 0]
+        )
+
+    def test_maximum_scales_by_relative_weight(self):
+        np.testing.assert_allclose(
+            self.scores(category('MAXIMUM', {'pep': 1.0, 'kyc': 0.5})),
+            [1.0, 0.5, 0]
+        )
+
+    def test_multiplicative_compounds_independent_risks(self):
+        np.testing.assert_allclose(
+            self.scores(category('MULTIPLICATIVE', {'pep': 0.5, 'kyc': 0.5})),
+            [1 - 0.5 * 0.75, 0.5, 0]
+        )
+
+    def test_custom_formula(self):
+        linear = category('CUSTOM', {'pep': 1.0}, custom_formula={
+            'intercept': 0.1, 'coefficients': {'PEP': 0.6, 'kyc': 0.4}, 'link': 'linear'
+        })
+        np.testing.assert_allclose(self.scores(linear), [0.9, 0.5, 0.1])
+
+        logistic = category('CUSTOM', {'pep': 1.0}, custom_formula={'intercept': -2})
+        np.testing.assert_allclose(self.scores(logistic), 1 / (1 + np.exp(-np.array([-1.0, -2.0, -2.0]))))
+
+    def test_unknown_method_falls_back_to_weighted_average(self):
+        np.testing.assert_allclose(self.scores(category('MEDIAN', {'kyc': 1})), [0.5, 1.0, 0])
+
+
+class RiskModelTests(SimpleTestCase):
+    def test_defaults_without_weighted_categories(self):
+        model = build_risk_model([category('MAXIMUM', {})])
+        self.assertEqual([c.name for c in model.categories], [c['name'] for c in DEFAULT_CATEGORIES])
+
+    def test_factor_weights_fill_categories_of_their_type(self):
+        model = build_risk_model(
+            [category('WEIGHTED_AVERAGE', {'kyc': 1.0})],
+            [{'name': 'PEP', 'category': 'CUSTOMER', 'weight': 3.0},
+             {'name': 'alerts', 'category': 'TRANSACTION', 'weight': 1.0}]
+        )
+        weights = model.categories[0].factor_weights
+        self.assertEqual(weights[FEATURE_INDEX['pep']], 3.0)
+        self.assertEqual(weights[FEATURE_INDEX['kyc']], 1.0)
+        self.assertEqual(weights[FEATURE_INDEX['alerts']], 0.0)
+
+    def test_overall_score_weights_categories(self):
+        model = build_risk_model([
+            category('MAXIMUM', {'pep': 1.0}, weight=3.0),
+            category('MAXIMUM', {'kyc': 1.0}, weight=1.0),
+        ], matrix=THRESHOLDS_MATRIX)
+        scores = score_features(model, feature_matrix([{'pep': 1.0}, {'kyc': 1.0}]))
+        np.testing.assert_allclose(scores['overall'], [75, 25])
+
+    def test_levels_use_matrix_thresholds_and_minimum_levels(self):
+        model = build_risk_model([category('WEIGHTED_AVERAGE', {'kyc': 1.0})], matrix=THRESHOLDS_MATRIX)
+        features = feature_matrix([{'kyc': 0.2}, {'kyc': 0.3}, {'kyc': 0.9}, {'sanctioned': 1.0}, {'pep': 1.0}])
+        levels = [RISK_LEVELS[level] for level in score_features(model, features)['levels']]
+        self.assertEqual(levels, ['LOW', 'MEDIUM', 'CRITICAL', 'CRITICAL', 'HIGH'])
+
+    def test_matrix_can_replace_minimum_levels(self):
+        matrix = dict(THRESHOLDS_MATRIX, scoring_criteria={'minimum_levels': {'PEP': 'MEDIUM'}})
+        model = build_risk_model([category('WEIGHTED_AVERAGE', {'kyc': 1.0})], matrix=matrix)
+        levels = score_features(model, feature_matrix([{'pep': 1.0}, {'sanctioned': 1.0}]))['levels']
+        self.assertEqual([RISK_LEVELS[level] for level in levels], ['MEDIUM', 'LOW'])
+
+
+def create_customer(user, name='Jane Smith', **fields):
+    fields = {
+        'customer_type': 'INDIVIDUAL', 'phone': '+971500000000', 'address': 'Dubai', 'nationality': 'ARE',
+        'identification_type': 'PASSPORT', **fields
+    }
+    return Customer.objects.create(
+        name=name, email=f"{name.replace(' ', '.').lower()}@example.com",
+        identification_number=f"P-{name}", created_by=user, **fields
+    )
+
+
+class ScoreCustomersTests(TestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.analyst = User.objects.create_user(email='analyst@example.com', username='analyst')
+        self.customer = create_customer(self.analyst)
+
+    def test_assessments_are_recorded_under_the_system_user(self):
+        with self.assertRaises(ImproperlyConfigured):
+            score_customers([self.customer.pk])
+
+        admin = get_user_model().objects.create_superuser(
+            email='admin@example.com', username='admin', password='secret'
+        )
+        score_customers([self.customer.pk])
+        self.assertEqual(RiskAssessment.objects.get().created_by_id, admin.pk)
+
+        with override_settings(AML_SYSTEM_USER_EMAIL='ANALYST@example.com'):
+            score_customers([self.customer.pk])
+        self.assertEqual(RiskAssessment.objects.filter(created_by=self.analyst).count(), 1)
+
+    def test_score_changes_are_kept_in_the_customer_history(self):
+        updated_at = self.customer.updated_at
+        score_customers([self.customer.pk], created_by_id=self.analyst.pk)
+        self.customer.refresh_from_db()
+        self.assertGreater(self.customer.updated_at, updated_at)
+        self.assertEqual(len(self.customer.previous_risk_levels), 1)
+        change = self.customer.previous_risk_levels[0]
+        self.assertEqual((change['old_score'], change['new_score']), (0, self.customer.risk_score))
+
+        # An unchanged score adds no entry
+        score_customers([self.customer.pk], created_by_id=self.analyst.pk)
+        self.customer.refresh_from_db()
+        self.assertEqual(len(self.customer.previous_risk_levels), 1)
+
+
+class RescoringTestCase(TestCase):
+    def setUp(self):
+        self.analyst = get_user_model().objects.create_user(email='analyst@example.com', username='analyst')
+        self.customer = create_customer(self.analyst)
+        self.director = create_customer(self.analyst, 'Omar Haddad')
+        self.unrelated = create_customer(self.analyst, 'Wei Chen', nationality='CHN')
+        CustomerRelationship.objects.create(
+            from_customer=self.director, to_customer=self.customer, relationship_type='DIRECTOR',
+            details={}, start_date=date(2020, 1, 1), verification_status='VERIFIED', created_by=self.analyst
+        )
+        PendingRescore.objects.all().delete()
+        # A rescore counts as already scheduled, so marking queues no task
+        cache.set(RESCORE_SCHEDULED_KEY, True)
+        self.addCleanup(cache.delete, RESCORE_SCHEDULED_KEY)
+
+    def pending(self):
+        return dict(PendingRescore.objects.values_list('customer_id', 'reason'))
+
+
+class MarkDirtyTests(RescoringTestCase):
+    def test_events_coalesce_and_keep_the_first_reason(self):
+        self.assertEqual(mark_dirty([self.customer.pk], 'ALERT'), 1)
+        mark_dirty([self.customer.pk, self.customer.pk], 'WATCHLIST_MATCH')
+        self.assertEqual(self.pending(), {self.customer.pk: 'ALERT'})
+
+    def test_inactive_customers_are_not_marked(self):
+        Customer.objects.filter(pk=self.unrelated.pk).update(is_active=False)
+        self.assertEqual(mark_dirty([self.unrelated.pk], 'ALERT'), 0)
+        self.assertEqual(self.pending(), {})
+
+    def test_related_marks_connected_parties(self):
+        mark_dirty([self.customer.pk], 'PEP', related=True)
+        self.assertEqual(self.pending(), {self.customer.pk: 'PEP', self.director.pk: 'RELATED_PARTY'})
+
+    def test_marking_clears_a_claim_in_progress(self):
+        mark_dirty([self.customer.pk], 'ALERT')
+        claimed_at = timezone.now()
+        self.assertEqual(claim_dirty(10, claimed_at), {str(self.customer.pk): 'ALERT'})
+        self.assertEqual(claim_dirty(10, claimed_at), {})
+        mark_dirty([self.customer.pk], 'WATCHLIST_MATCH')
+        self.assertIsNone(PendingRescore.objects.get().claimed_at)
+
+    def test_lapsed_claims_are_claimed_again(self):
+        mark_dirty([self.customer.pk], 'ALERT')
+        claimed_at = timezone.now()
+        claim_dirty(10, claimed_at)
+        later = claimed_at + timedelta(seconds=CLAIM_LEASE_SECONDS + 1)
+        self.assertEqual(claim_dirty(10, later), {str(self.customer.pk): 'ALERT'})
+
+
+class RescoreDirtyTests(RescoringTestCase):
+    def test_rescored_customers_are_unmarked(self):
+        mark_dirty([self.customer.pk, self.director.pk], 'ALERT')
+        self.assertEqual(rescore_dirty(created_by_id=self.analyst.pk), 2)
+        self.assertEqual(self.pending(), {})
+        self.assertEqual(RiskAssessment.objects.filter(assessment_type='TRIGGERED').count(), 2)
+
+    def test_failed_batch_is_marked_again(self):
+        mark_dirty([self.customer.pk], 'ALERT')
+        # No system user to record the assessments under
+        with self.assertRaises(ImproperlyConfigured):
+            rescore_dirty()
+        self.assertEqual(self.pending(), {self.customer.pk: RETRY_REASON})
+        self.assertIsNone(PendingRescore.objects.get().claimed_at)
+        self.assertFalse(RiskAssessment.objects.exists())
+
+
+class RiskEventSignalTests(RescoringTestCase):
+    def marked_by(self, event):
+        PendingRescore.objects.all().delete()
+        with self.captureOnCommitCallbacks(execute=True):
+            event()
+        return self.pending()
+
+    def test_risk_inputs_changed(self):
+        marked = self.marked_by(lambda: risk_inputs_changed.send(
+            sender=Customer, customer_ids=[self.customer.pk], reason='PEP', related=True
+        ))
+        self.assertEqual(marked, {self.customer.pk: 'PEP', self.director.pk: 'RELATED_PARTY'})
+
+    def test_alert_marks_the_originator(self):
+        txn = Transaction.objects.create(
+            transaction_type='WIRE_TRANSFER', amount=Decimal('100'), source_account='A1',
+            destination_account='B1', transaction_date=timezone.now(), originator=self.customer,
+            created_by=self.analyst
+        )
+        marked = self.marked_by(lambda: TransactionAlert.objects.create(
+            transaction=txn, alert_type='PATTERN', severity='HIGH', alert_message='Structuring',
+            created_by=self.analyst
+        ))
+        self.assertEqual(marked, {self.customer.pk: 'ALERT'})
+
+    def test_watchlist_match_marks_the_customer(self):
+        entry = WatchlistEntry.objects.create(
+            name='Jane Smith', nationality='ARE', country='ARE', risk_level='HIGH', source='OFAC',
+            details={}, identifiers={}, created_by=self.analyst
+        )
+        marked = self.marked_by(lambda: WatchlistMatch.objects.create(
+            entry=entry, customer=self.customer, match_type='EXACT', match_score=100,
+            match_details={}, created_by=self.analyst
+        ))
+        self.assertEqual(marked, {self.customer.pk: 'WATCHLIST_MATCH'})
+
+    def test_customer_saves(self):
+        marked = self.marked_by(lambda: create_customer(self.analyst, 'Layla Nasser'))
+        self.assertEqual(list(marked.values()), ['CUSTOMER_CREATED'])
+
+        self.customer.notes = 'Called the customer'
+        self.assertEqual(self.marked_by(lambda: self.customer.save(update_fields=['notes'])), {})
+        self.customer.is_pep = True
+        marked = self.marked_by(lambda: self.customer.save(update_fields=['is_pep']))
+        self.assertEqual(marked, {self.customer.pk: 'CUSTOMER_UPDATED'})
+
+    def test_relationship_marks_both_parties(self):
+        relationship = CustomerRelationship(
+            from_customer=self.unrelated, to_customer=self.customer, relationship_type='SHAREHOLDER',
+            details={}, start_date=date(2020, 1, 1), verification_status='VERIFIED', created_by=self.analyst
+        )
+        expected = {self.unrelated.pk: 'RELATIONSHIP', self.customer.pk: 'RELATIONSHIP'}
+        self.assertEqual(self.marked_by(relationship.save), expected)
+        self.assertEqual(self.marked_by(relationship.delete), expected)
+
+    def test_country_risk_marks_its_nationals(self):
+        marked = self.marked_by(lambda: CountryRiskCategory.objects.create(
+            name='China', code='CHN', risk_level='HIGH', sanctions_data={}
+        ))
+        self.assertEqual(marked, {self.unrelated.pk: 'COUNTRY_RISK'})
+
+        marked = self.marked_by(lambda: SanctionedCountry.objects.create(
+            country_name='United Arab Emirates', country_code='ARE', sanctions_programs=[], restrictions=[],
+            effective_date=date(2024, 1, 1), last_updated=timezone.now(), created_by=self.analyst
+        ))
+        self.assertEqual(marked, {self.customer.pk: 'COUNTRY_RISK', self.director.pk: 'COUNTRY_RISK'})
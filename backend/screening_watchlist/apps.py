@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class ScreeningWatchlistConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'screening_watchlist'
+
+    def ready(self):
+        import screening_watchlist.signals  # noqa
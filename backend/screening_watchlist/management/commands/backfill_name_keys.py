@@ -0,0 +1,55 @@
+"""
+Backfill the stored name keys (normalized, token-sorted and phonetic) of
+customers and watchlist entries in bulk
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from customer_management.models import Customer
+from screening_watchlist.models import WatchlistEntry
+from screening_watchlist.services.name_keys import NAME_KEY_FIELDS, set_name_keys
+
+MODELS = {
+    'customers': Customer,
+    'watchlist': WatchlistEntry,
+}
+
+
+class Command(BaseCommand):
+    help = 'Compute normalized, sorted and phonetic name keys for existing rows'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model', choices=['all', *MODELS], default='all')
+        parser.add_argument('--chunk-size', type=int, default=5000)
+        parser.add_argument(
+            '--all-rows', action='store_true',
+            help='Recompute every row, not only rows without keys'
+        )
+
+    def handle(self, *args, **options):
+        targets = MODELS if options['model'] == 'all' else {options['model']: MODELS[options['model']]}
+        for label, model in targets.items():
+            queryset = model.objects.all()
+            if not options['all_rows']:
+                queryset = queryset.filter(normalized_name='')
+            self._backfill(label, model, queryset, options['chunk_size'])
+
+    def _backfill(self, label, model, queryset, chunk_size: int) -> None:
+        started = time.monotonic()
+        updated = 0
+        chunk = []
+        for instance in queryset.only('id', 'name').iterator(chunk_size=chunk_size):
+            set_name_keys(instance, instance.name)
+            chunk.append(instance)
+            if len(chunk) >= chunk_size:
+                model.objects.bulk_update(chunk, NAME_KEY_FIELDS)
+                updated += len(chunk)
+                chunk = []
+        if chunk:
+            model.objects.bulk_update(chunk, NAME_KEY_FIELDS)
+            updated += len(chunk)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Backfilled name keys for {updated} {label} in {time.monotonic() - started:.1f}s"
+        ))
@@ -0,0 +1,64 @@
+"""
+Benchmark per-pair cost of name scoring: pairwise SequenceMatcher versus
+the vectorized batch scorer
+"""
+import random
+import time
+from difflib import SequenceMatcher
+
+from django.core.management.base import BaseCommand
+
+from screening_watchlist.services.name_scoring import score_name_matrix, score_names
+
+SYLLABLES = [
+    'al', 'ah', 'mad', 'mo', 'ham', 'med', 'ab', 'dul', 'la', 'vik', 'tor',
+    'bo', 'ut', 'ka', 'rim', 'sa', 'ra', 'na', 'el', 'de', 'von', 'li', 'ang',
+    'chen', 'pet', 'rov', 'ivan', 'ov', 'fa', 'tima', 'zah', 'ir', 'hus', 'sein',
+]
+
+
+def _random_name(rng: random.Random) -> str:
+    return ' '.join(
+        ''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 3))).capitalize()
+        for _ in range(rng.randint(2, 3))
+    )
+
+
+class Command(BaseCommand):
+    help = 'Benchmark per-pair name scoring cost before and after vectorization'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--candidates', type=int, default=2000, help='Candidate names (N)')
+        parser.add_argument('--queries', type=int, default=50, help='Query names for the M x N run (M)')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        candidates = [_random_name(rng) for _ in range(options['candidates'])]
+        queries = [_random_name(rng) for _ in range(options['queries'])]
+
+        # Baseline: one SequenceMatcher per pair
+        started = time.perf_counter()
+        for query in queries:
+            for candidate in candidates:
+                SequenceMatcher(None, query.lower(), candidate.lower()).ratio()
+        baseline = (time.perf_counter() - started) / (len(queries) * len(candidates))
+
+        # Batch: one query against N candidates per call
+        started = time.perf_counter()
+        for query in queries:
+            score_names(query, candidates)
+        one_to_n = (time.perf_counter() - started) / (len(queries) * len(candidates))
+
+        # Batch: M x N in a single call
+        started = time.perf_counter()
+        score_name_matrix(queries, candidates)
+        m_by_n = (time.perf_counter() - started) / (len(queries) * len(candidates))
+
+        self.stdout.write(f"Pairs scored per run: {len(queries) * len(candidates)}")
+        self.stdout.write(f"SequenceMatcher (1 metric):  {baseline * 1e6:8.2f} us/pair")
+        self.stdout.write(f"Batch 1 x N (3 metrics):     {one_to_n * 1e6:8.2f} us/pair")
+        self.stdout.write(f"Batch M x N (3 metrics):     {m_by_n * 1e6:8.2f} us/pair")
+        self.stdout.write(self.style.SUCCESS(
+            f"Speed-up (1 x N): {baseline / one_to_n:.1f}x, (M x N): {baseline / m_by_n:.1f}x"
+        ))
@@ -0,0 +1,64 @@
+"""
+Rescreen the whole customer portfolio against the watchlists, in parallel
+partitions, as a PERIODIC or BACKFILL screening batch
+"""
+import os
+
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import BaseCommand, CommandError
+
+from screening_watchlist.models import ScreeningBatch
+from screening_watchlist.services.rescreen import (
+    DEFAULT_CHUNK_SIZE,
+    RESCREEN_BATCH_TYPES,
+    create_rescreen_batch,
+    rescreen_progress,
+    run_rescreen_pool
+)
+from screening_watchlist.tasks import rescreen_customers
+
+
+class Command(BaseCommand):
+    help = 'Rescreen all active customers over a process pool or Celery workers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--partitions', type=int, default=64, help='Customer ID ranges')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Local pool size')
+        parser.add_argument('--executor', choices=['process', 'celery'], default='process')
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+        parser.add_argument('--batch-type', choices=RESCREEN_BATCH_TYPES, default='PERIODIC')
+        parser.add_argument('--resume', metavar='BATCH_ID', help='Resume an interrupted batch from its checkpoints')
+
+    def handle(self, *args, **options):
+        if options['resume']:
+            try:
+                batch = ScreeningBatch.objects.get(pk=options['resume'])
+            except ScreeningBatch.DoesNotExist:
+                raise CommandError(f"Screening batch {options['resume']} not found")
+            if batch.filters.get('mode') != 'FULL':
+                raise CommandError(f"Screening batch {batch.pk} is not a portfolio rescreen")
+        else:
+            try:
+                batch = create_rescreen_batch(options['partitions'], options['batch_type'])
+            except ImproperlyConfigured as e:
+                raise CommandError(str(e))
+        self.stdout.write(f"Screening batch {batch.pk}: {batch.total_records} customers")
+
+        if options['executor'] == 'celery':
+            rescreen_customers.delay(str(batch.pk), options['chunk_size'])
+            self.stdout.write(self.style.SUCCESS(
+                f"Queued batch {batch.pk}; resume with --resume {batch.pk} if it is interrupted"
+            ))
+            return
+
+        batch = run_rescreen_pool(batch, options['workers'], options['chunk_size'])
+        progress = rescreen_progress(batch)
+        message = (
+            f"Batch {batch.pk} {progress['status'].lower()}: {progress['processed']}/{progress['total']} "
+            f"customers screened, {progress['matched']} matched, "
+            f"{batch.metadata.get('rows_per_second', progress['rows_per_second'])} rows/s"
+        )
+        if batch.status == 'COMPLETED':
+            self.stdout.write(self.style.SUCCESS(message))
+        else:
+            raise CommandError(f"{message}; resume with --resume {batch.pk}")
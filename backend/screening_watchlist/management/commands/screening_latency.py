@@ -0,0 +1,30 @@
+"""
+Report screening processing time percentiles per screening configuration,
+from the recorded screening history
+"""
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from screening_watchlist.services.screening_history import LATENCY_PERCENTILES, latency_percentiles
+
+
+class Command(BaseCommand):
+    help = 'Screening latency percentiles per screening configuration'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=int, default=24, help='Screenings of the last N hours (0: all)')
+
+    def handle(self, *args, **options):
+        since = timezone.now() - timedelta(hours=options['hours']) if options['hours'] else None
+        percentiles = latency_percentiles(since)
+        if not percentiles:
+            self.stdout.write('No screening history recorded')
+            return
+
+        columns = ''.join(f"{f'p{percentile} ms':>12}" for percentile in LATENCY_PERCENTILES)
+        self.stdout.write(f"{'Configuration':<32}{'Screenings':>12}{columns}")
+        for name, row in percentiles.items():
+            values = ''.join(f"{row[f'p{percentile}']:>12.2f}" for percentile in LATENCY_PERCENTILES)
+            self.stdout.write(f"{name:<32}{row['count']:>12}{values}")
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.4 on 2026-10-16 13:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('screening_watchlist', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='watchlistentry',
+            name='normalized_name',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=200),
+        ),
+        migrations.AddField(
+            model_name='watchlistentry',
+            name='sorted_name',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=200),
+        ),
+        migrations.AddField(
+            model_name='watchlistentry',
+            name='phonetic_key',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=200),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.4 on 2026-10-16 14:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('screening_watchlist', '0002_watchlistentry_name_keys'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='watchlistentry',
+            name='screening_fingerprint',
+            field=models.CharField(blank=True, default='', editable=False, help_text='Fingerprint of the screened fields as of the last delta screening', max_length=64),
+        ),
+        migrations.AddIndex(
+            model_name='watchlistentry',
+            index=models.Index(fields=['source', 'is_active'], name='screening_w_source_d8aa48_idx'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.4 on 2026-10-16 15:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('screening_watchlist', '0003_watchlistentry_screening_fingerprint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='watchlistentry',
+            name='external_id',
+            field=models.CharField(blank=True, help_text='Identifier of the entry in its source list (e.g. OFAC UID, UN DATAID)', max_length=100, null=True),
+        ),
+        migrations.AlterUniqueTogether(
+            name='watchlistentry',
+            unique_together={('source', 'external_id')},
+        ),
+    ]
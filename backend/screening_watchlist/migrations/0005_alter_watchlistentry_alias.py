@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-16 22:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('screening_watchlist', '0004_watchlistentry_external_id'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='watchlistentry',
+            name='alias',
+            field=models.TextField(blank=True),
+        ),
+    ]
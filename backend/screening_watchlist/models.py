@@ -8,6 +8,7 @@ from core.models import AbstractBaseModel, CountryRiskCategory, UserActionMixin,
 from core.constants import RiskLevel
 from customer_management.models import Customer
 from transaction_monitoring.models import Transaction
+from .services.name_keys import set_name_keys
 
 class WatchlistSource(AbstractBaseModel):
     """
@@ -59,8 +60,17 @@ class WatchlistEntry(AbstractBaseModel, RiskLevelMixin):
     """
     Model for watchlist entries with multilingual support
     """
+    external_id = models.CharField(
+        max_length=100,
+        null=True,
+        blank=True,
+        help_text=_('Identifier of the entry in its source list (e.g. OFAC UID, UN DATAID)')
+    )
     name = models.CharField(max_length=200)
-    alias = models.CharField(max_length=200, blank=True)
+    normalized_name = models.CharField(max_length=200, blank=True, db_index=True, editable=False)
+    sorted_name = models.CharField(max_length=200, blank=True, db_index=True, editable=False)
+    phonetic_key = models.CharField(max_length=200, blank=True, db_index=True, editable=False)
+    alias = models.TextField(blank=True)
     date_of_birth = models.DateField(null=True, blank=True)
     nationality = models.CharField(max_length=100)
     country = models.CharField(max_length=100)
@@ -70,6 +80,13 @@ class WatchlistEntry(AbstractBaseModel, RiskLevelMixin):
     source_url = models.URLField(blank=True)
     is_active = models.BooleanField(default=True)
     last_checked = models.DateTimeField(null=True, blank=True)
+    screening_fingerprint = models.CharField(
+        max_length=64,
+        blank=True,
+        default='',
+        editable=False,
+        help_text=_('Fingerprint of the screened fields as of the last delta screening')
+    )
     
     # Detailed Information
     details = models.JSONField(
@@ -97,13 +114,20 @@ class WatchlistEntry(AbstractBaseModel, RiskLevelMixin):
         verbose_name = _('watchlist entry')
         verbose_name_plural = _('watchlist entries')
         ordering = ['-created_at']
+        unique_together = ['source', 'external_id']
         indexes = [
-            models.Index(fields=['risk_level', 'is_active'])
+            models.Index(fields=['risk_level', 'is_active']),
+            models.Index(fields=['source', 'is_active']),
         ]
 
     def __str__(self):
         return f"{self.name} ({self.nationality})"
 
+    def save(self, *args, **kwargs):
+        """Keep the stored name keys in sync with the name"""
+        kwargs['update_fields'] = set_name_keys(self, self.name, kwargs.get('update_fields'))
+        super().save(*args, **kwargs)
+
 class SanctionedCountry(AbstractBaseModel, RiskLevelMixin):
     """
     Model for managing sanctioned and high-risk countries
@@ -0,0 +1,32 @@
+from django.conf import settings
+from django.utils.translation import gettext_lazy as _
+from rest_framework import serializers
+
+from .services.realtime_screening import SOURCES
+
+
+class RealtimeScreeningSerializer(serializers.Serializer):
+    name = serializers.CharField(max_length=255)
+    date_of_birth = serializers.DateField(required=False, allow_null=True)
+    nationality = serializers.CharField(max_length=100, required=False, allow_blank=True, default='')
+    country = serializers.CharField(max_length=100, required=False, allow_blank=True, default='')
+    identifiers = serializers.ListField(
+        child=serializers.CharField(max_length=100), required=False, default=list
+    )
+    customer_id = serializers.UUIDField(required=False, allow_null=True)
+    budget_ms = serializers.IntegerField(required=False, min_value=1)
+    sources = serializers.ListField(
+        child=serializers.ChoiceField(choices=SOURCES), required=False, allow_empty=False
+    )
+
+    def validate_name(self, value):
+        if not value.strip():
+            raise serializers.ValidationError(_('Name cannot be blank.'))
+        return value.strip()
+
+    def validate_budget_ms(self, value):
+        if value > settings.SCREENING_API_MAX_BUDGET_MS:
+            raise serializers.ValidationError(
+                _('Latency budget cannot exceed %(max)s ms.') % {'max': settings.SCREENING_API_MAX_BUDGET_MS}
+            )
+        return value
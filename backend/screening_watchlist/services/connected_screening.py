@@ -0,0 +1,143 @@
+"""
+Screening exposure through customer relationships.
+
+A watchlist hit on one customer exposes the customers connected to it
+(the companies a sanctioned person directs or owns, the directors and
+owners of a sanctioned company). Connected parties are found in the
+in-memory relationship graph instead of recursive relationship queries,
+up to ``SCREENING_RELATIONSHIP_HOPS`` hops and
+``SCREENING_RELATIONSHIP_MAX_PARTIES`` parties per customer.
+
+Exposure is recorded as a ``PARTIAL`` match of the connected customer on
+the watchlist entry, with ``match_basis`` ``RELATED`` and the relationship
+path in ``match_details``.
+"""
+from typing import Dict, List, Optional, Tuple
+
+from django.conf import settings
+
+from customer_management.models import Customer
+from customer_management.services.relationship_graph import (
+    ConnectedParty,
+    RelationshipGraph,
+    get_relationship_graph
+)
+from ..models import WatchlistMatch
+from .screening import NameHit, PartyAttributes, screen_name
+from .watchlist_index import WatchlistIndex
+
+RELATED_MATCH_TYPE = 'PARTIAL'
+
+
+def relationship_graph() -> Optional[RelationshipGraph]:
+    """Process-wide relationship graph; None when expansion is disabled (``SCREENING_RELATIONSHIP_HOPS = 0``)"""
+    if settings.SCREENING_RELATIONSHIP_HOPS <= 0:
+        return None
+    return get_relationship_graph()
+
+
+def related_matches(
+    graph: Optional[RelationshipGraph],
+    hits_by_customer: Dict,
+    version: str,
+    **details
+) -> List[WatchlistMatch]:
+    """
+    Unsaved matches of the customers connected to the matched customers
+    in ``hits_by_customer`` (customer ID -> (name, hits))
+
+    One match per connected customer and entry, through the nearest
+    matched customer; customers holding a direct hit on the entry are
+    skipped.
+    """
+    if graph is None or not hits_by_customer:
+        return []
+    direct = {
+        (str(customer_id), entry.entry_id)
+        for customer_id, (_, hits) in hits_by_customer.items()
+        for entry, _, _ in hits
+    }
+
+    # (connected customer, entry) -> (party, matched customer ID and name, hit)
+    nearest: Dict[Tuple[str, str], Tuple[ConnectedParty, str, str, NameHit]] = {}
+    for customer_id, (name, hits) in hits_by_customer.items():
+        parties = graph.expand(
+            customer_id,
+            settings.SCREENING_RELATIONSHIP_HOPS,
+            settings.SCREENING_RELATIONSHIP_MAX_PARTIES
+        )
+        for party in parties:
+            for hit in hits:
+                pair = (party.customer_id, hit[0].entry_id)
+                if pair in direct:
+                    continue
+                if pair not in nearest or party.hops < nearest[pair][0].hops:
+                    nearest[pair] = (party, str(customer_id), name, hit)
+
+    return [
+        WatchlistMatch(
+            entry_id=entry.entry_id,
+            customer_id=party_id,
+            match_type=RELATED_MATCH_TYPE,
+            match_score=match_strength * 100,
+            match_details={
+                'match_basis': 'RELATED',
+                'related_match_type': match_type,
+                'watchlist_entry_id': entry.entry_id,
+                'watchlist_type': entry.source_type,
+                'matched_name': entry.name,
+                'related_customer_id': related_id,
+                'related_customer_name': related_name,
+                'hops': party.hops,
+                # Relationship types from the matched customer to this one
+                'relationship_path': list(party.path),
+                'watchlist_version': version,
+                **details
+            }
+        )
+        for (party_id, _), (party, related_id, related_name, hit) in nearest.items()
+        for entry, match_strength, match_type in (hit,)
+    ]
+
+
+def screen_customer_network(
+    index: WatchlistIndex,
+    customer_id,
+    graph: Optional[RelationshipGraph] = None
+) -> Tuple[List[NameHit], List[Tuple[ConnectedParty, List[NameHit]]]]:
+    """
+    Screen a customer and its connected parties
+
+    Returns the customer's own hits and, nearest first, the hits of each
+    connected party that has any. The customer and its connected parties
+    are loaded in one query.
+    """
+    graph = graph if graph is not None else relationship_graph()
+    parties = graph.expand(
+        customer_id,
+        settings.SCREENING_RELATIONSHIP_HOPS,
+        settings.SCREENING_RELATIONSHIP_MAX_PARTIES
+    ) if graph is not None else ()
+
+    rows = Customer.objects.filter(
+        pk__in=[customer_id] + [party.customer_id for party in parties],
+        is_active=True
+    ).values_list(
+        'id', 'name', 'normalized_name', 'sorted_name', 'phonetic_key',
+        'date_of_birth', 'nationality', 'identification_number'
+    )
+    hits_by_id = {}
+    for (
+        row_id, name, normalized, sorted_normalized, phonetic,
+        date_of_birth, nationality, identification_number
+    ) in rows:
+        hits_by_id[str(row_id)] = screen_name(
+            index, name, normalized, sorted_normalized, phonetic,
+            PartyAttributes.build(date_of_birth, nationality, identifiers=identification_number)
+        )
+
+    connected = [
+        (party, hits_by_id[party.customer_id]) for party in parties
+        if hits_by_id.get(party.customer_id)
+    ]
+    return hits_by_id.get(str(customer_id), []), connected
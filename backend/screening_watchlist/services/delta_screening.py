@@ -0,0 +1,312 @@
+"""
+Delta screening of the customer base after a watchlist refresh.
+
+Each watchlist entry keeps a fingerprint of its screened fields as of the
+last delta screening. Diffing the current entries against those
+fingerprints gives the entries added, changed and removed by the refresh:
+
+* added and changed entries are put in a small index of their own; the
+  customer base is streamed through its candidate retrieval (document
+  numbers, name keys, tokens and n-grams) using the stored name keys, and
+  only the customers it retrieves are screened against it, together with
+  the customers already matched to them, so scoring and history follow
+  the size of the delta rather than of the customer base;
+* open matches against removed entries are retired.
+
+Fingerprints are only advanced once the run has completed, so a failed
+run is repeated in full by the next one.
+"""
+import hashlib
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from django.db import transaction
+from django.utils import timezone
+
+from core.signals import risk_inputs_changed
+from core.utils import get_system_user_id
+from customer_management.models import Customer
+from ..models import ScreeningBatch, WatchlistEntry, WatchlistMatch, WatchlistProvider, WatchlistSource
+from .connected_screening import related_matches, relationship_graph
+from .identifiers import extract_identifiers
+from .name_normalization import normalize_name
+from .screening import PartyAttributes, customer_matches, save_matches, screen_name
+from .screening_history import flush_screening_history, record_screening
+from .watchlist_index import WatchlistIndex, build_watchlist_index, get_watchlist_version
+
+logger = logging.getLogger(__name__)
+
+FINGERPRINT_FIELDS = ('name', 'alias', 'date_of_birth', 'nationality', 'country', 'identifiers')
+# Matches still awaiting a decision; these are retired or superseded by a delta
+OPEN_MATCH_STATUSES = ('PENDING', 'UNDER_INVESTIGATION')
+RETIRED_MATCH_STATUS = 'CLOSED'
+
+
+def entry_fingerprint(*values) -> str:
+    """Fingerprint of the screened fields of a watchlist entry"""
+    return hashlib.sha256('\x1f'.join(str(value or '') for value in values).encode()).hexdigest()
+
+
+@dataclass
+class WatchlistDelta:
+    """Watchlist entries changed since the last delta screening"""
+    added: List[str] = field(default_factory=list)
+    changed: List[str] = field(default_factory=list)
+    removed: List[str] = field(default_factory=list)
+    # New fingerprint per entry, written back once the delta is screened
+    fingerprints: Dict[str, str] = field(default_factory=dict)
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.changed or self.removed)
+
+    @property
+    def to_screen(self) -> List[str]:
+        return self.added + self.changed
+
+    def summary(self) -> Dict[str, int]:
+        return {
+            'added': len(self.added),
+            'changed': len(self.changed),
+            'removed': len(self.removed)
+        }
+
+
+def diff_watchlist(sources: Optional[Iterable[str]] = None) -> WatchlistDelta:
+    """Diff the current entries of ``sources`` (all sources by default) against their fingerprints"""
+    entries = WatchlistEntry.objects.all()
+    if sources is not None:
+        entries = entries.filter(source__in=list(sources))
+
+    delta = WatchlistDelta()
+    rows = entries.values_list('id', 'is_active', 'screening_fingerprint', *FINGERPRINT_FIELDS)
+    for entry_id, is_active, previous, *values in rows.iterator(chunk_size=5000):
+        entry_id = str(entry_id)
+        if not is_active:
+            if previous:
+                delta.removed.append(entry_id)
+                delta.fingerprints[entry_id] = ''
+            continue
+        current = entry_fingerprint(*values)
+        if current == previous:
+            continue
+        (delta.changed if previous else delta.added).append(entry_id)
+        delta.fingerprints[entry_id] = current
+    return delta
+
+
+def create_delta_batch(sources: Optional[Iterable[str]], delta: WatchlistDelta) -> ScreeningBatch:
+    """``ScreeningBatch`` row tracking the delta screening of ``sources``"""
+    source_names = sorted(sources) if sources is not None else None
+    batch = ScreeningBatch.objects.create(
+        name=f"Watchlist delta {timezone.now():%Y-%m-%d %H:%M}",
+        batch_type='TRIGGERED',
+        filters={'mode': 'DELTA', 'sources': source_names},
+        metadata={'delta': delta.summary()},
+        created_by_id=get_system_user_id()
+    )
+    providers = WatchlistSource.objects.all()
+    if source_names is not None:
+        providers = providers.filter(name__in=source_names)
+    batch.providers.set(WatchlistProvider.objects.filter(name__in=providers.values('provider')))
+    return batch
+
+
+def _retire_matches(entry_ids: Iterable[str], reason: str, keep: Set[Tuple[str, str]] = frozenset()) -> int:
+    """Close open customer matches of ``entry_ids``, except (entry, customer) pairs in ``keep``"""
+    open_matches = WatchlistMatch.objects.filter(
+        entry_id__in=list(entry_ids),
+        customer__isnull=False,
+        transaction__isnull=True,
+        status__in=OPEN_MATCH_STATUSES
+    )
+    retire = {
+        match_id: customer_id for match_id, entry_id, customer_id
+        in open_matches.values_list('id', 'entry_id', 'customer_id')
+        if (str(entry_id), str(customer_id)) not in keep
+    }
+    retired = WatchlistMatch.objects.filter(id__in=list(retire)).update(
+        status=RETIRED_MATCH_STATUS,
+        review_date=timezone.now(),
+        review_notes=reason
+    )
+    risk_inputs_changed.send(sender=WatchlistMatch, customer_ids=set(retire.values()), reason='WATCHLIST_MATCH')
+    return retired
+
+
+def _open_pairs(entry_ids: Iterable[str]) -> Set[Tuple[str, str]]:
+    """(entry, customer) pairs that already have an open or confirmed customer match"""
+    return {
+        (str(entry_id), str(customer_id))
+        for entry_id, customer_id in WatchlistMatch.objects.filter(
+            entry_id__in=list(entry_ids),
+            customer__isnull=False,
+            transaction__isnull=True,
+            status__in=OPEN_MATCH_STATUSES + ('CONFIRMED',)
+        ).values_list('entry_id', 'customer_id')
+    }
+
+
+def _new_matches(
+    hits_by_customer: Dict,
+    graph,
+    version: str,
+    batch: ScreeningBatch,
+    existing: Set[Tuple[str, str]],
+    rematched: Set[Tuple[str, str]]
+) -> List[WatchlistMatch]:
+    """
+    Unsaved direct and relationship matches of a chunk of customers,
+    leaving out (entry, customer) pairs that already have an open match;
+    every pair found is added to ``rematched``
+    """
+    matches = []
+    for customer_id, (name, hits) in hits_by_customer.items():
+        new_hits = []
+        for hit in hits:
+            pair = (hit[0].entry_id, str(customer_id))
+            rematched.add(pair)
+            if pair not in existing:
+                new_hits.append(hit)
+        matches += customer_matches(
+            customer_id, name, new_hits, version,
+            screening_batch_id=str(batch.id)
+        )
+    for match in related_matches(graph, hits_by_customer, version, screening_batch_id=str(batch.id)):
+        pair = (match.entry_id, str(match.customer_id))
+        rematched.add(pair)
+        if pair not in existing:
+            matches.append(match)
+    return matches
+
+
+def candidate_customers(index: WatchlistIndex, chunk_size: int = 5000) -> List[str]:
+    """
+    IDs of the active customers for whom ``index`` retrieves an entry
+
+    The customer base is streamed through the delta index using the stored
+    name keys and document numbers only; retrieval is the same document
+    number, name key and token/n-gram lookup screening starts from, so
+    every customer screening could match is returned, fuzzy matches
+    included, without scoring the rest.
+    """
+    rows = Customer.objects.filter(is_active=True).order_by().values_list(
+        'id', 'name', 'normalized_name', 'sorted_name', 'phonetic_key', 'identification_number'
+    )
+    return sorted(
+        str(customer_id)
+        for customer_id, name, normalized, sorted_normalized, phonetic, identification_number
+        in rows.iterator(chunk_size=chunk_size)
+        if index.retrieves(
+            normalized or normalize_name(name), sorted_normalized, phonetic,
+            extract_identifiers(identification_number)
+        )
+    )
+
+
+def screen_delta(batch: ScreeningBatch, delta: WatchlistDelta, chunk_size: int = 5000) -> ScreeningBatch:
+    """
+    Screen the candidate customers of the added and changed entries of
+    ``delta`` against them, retire matches of removed entries and record
+    progress on ``batch``
+    """
+    started = time.monotonic()
+    batch.status = 'RUNNING'
+    batch.start_time = timezone.now()
+    batch.processed_records = batch.matched_records = batch.total_records = 0
+    batch.save(update_fields=['status', 'start_time', 'processed_records', 'matched_records', 'total_records'])
+
+    try:
+        existing = _open_pairs(delta.to_screen)
+        rematched: Set[Tuple[str, str]] = set()
+        if delta.to_screen:
+            index = build_watchlist_index(version=get_watchlist_version(), entry_ids=delta.to_screen)
+            # Customers already matched to these entries are rescreened too,
+            # so each superseded match has a screening showing it no longer holds
+            candidate_ids = sorted(
+                set(candidate_customers(index, chunk_size)) |
+                {customer_id for _, customer_id in existing}
+            )
+            batch.total_records = len(candidate_ids)
+            ScreeningBatch.objects.filter(pk=batch.pk).update(total_records=batch.total_records)
+            graph = relationship_graph()
+            for start in range(0, len(candidate_ids), chunk_size):
+                rows = Customer.objects.filter(
+                    pk__in=candidate_ids[start:start + chunk_size],
+                    is_active=True
+                ).order_by('pk').values_list(
+                    'id', 'name', 'normalized_name', 'sorted_name', 'phonetic_key',
+                    'date_of_birth', 'nationality', 'identification_number'
+                )
+                hits_by_customer = {}
+                for (
+                    customer_id, name, normalized, sorted_normalized, phonetic,
+                    date_of_birth, nationality, identification_number
+                ) in rows:
+                    screened_at, screen_started = timezone.now(), time.perf_counter()
+                    hits = screen_name(
+                        index, name, normalized, sorted_normalized, phonetic,
+                        PartyAttributes.build(date_of_birth, nationality, identifiers=identification_number)
+                    )
+                    record_screening(
+                        index.matchers, customer_id, 'CUSTOMER', hits,
+                        screened_at, time.perf_counter() - screen_started,
+                        batch.created_by_id, screening_batch_id=str(batch.id)
+                    )
+                    batch.matched_records += bool(hits)
+                    if hits:
+                        hits_by_customer[customer_id] = (name, hits)
+                    batch.processed_records += 1
+                save_matches(_new_matches(hits_by_customer, graph, index.version, batch, existing, rematched))
+                ScreeningBatch.objects.filter(pk=batch.pk).update(
+                    processed_records=batch.processed_records,
+                    matched_records=batch.matched_records
+                )
+            flush_screening_history()
+
+        with transaction.atomic():
+            # Matches of changed entries that no longer hold are superseded
+            superseded = _retire_matches(
+                delta.changed,
+                'Superseded by delta screening after a watchlist change',
+                keep=rematched
+            )
+            retired = _retire_matches(delta.removed, 'Watchlist entry removed')
+            entries = [
+                WatchlistEntry(id=entry_id, screening_fingerprint=fingerprint)
+                for entry_id, fingerprint in delta.fingerprints.items()
+            ]
+            WatchlistEntry.objects.bulk_update(entries, ['screening_fingerprint'], batch_size=chunk_size)
+
+        elapsed = time.monotonic() - started
+        batch.status = 'COMPLETED'
+        batch.metadata = {
+            **batch.metadata,
+            'retired_matches': retired,
+            'superseded_matches': superseded,
+            'elapsed_seconds': round(elapsed, 2),
+            'rows_per_second': round(batch.processed_records / elapsed, 1) if elapsed else None
+        }
+    except Exception as e:
+        logger.exception(f"Delta screening batch {batch.id} failed")
+        batch.status = 'FAILED'
+        batch.error_details = {'error': str(e)}
+
+    batch.end_time = timezone.now()
+    batch.save()
+    logger.info(
+        f"Delta screening batch {batch.id} {batch.status.lower()}: {delta.summary()}, "
+        f"{batch.processed_records} customers screened, {batch.matched_records} matched"
+    )
+    return batch
+
+
+def run_delta_screening(sources: Optional[Iterable[str]] = None) -> Optional[ScreeningBatch]:
+    """Diff and screen the watchlist delta of ``sources``; None when nothing changed"""
+    if sources is not None:
+        sources = list(sources)
+    delta = diff_watchlist(sources)
+    if not delta:
+        return None
+    return screen_delta(create_delta_batch(sources, delta), delta)
@@ -0,0 +1,47 @@
+"""
+Identity document numbers (passport, Emirates ID, national ID) of watchlist
+entries and customers, normalized for exact lookups.
+
+Numbers are compared without separators or case, so ``784-1985-1234567-1``
+and ``784198512345671`` are the same Emirates ID. Very short values are
+ignored; they are too often partial numbers or placeholders.
+"""
+import re
+from typing import Iterable, Set
+
+MIN_IDENTIFIER_LENGTH = 6
+EMIRATES_ID_RE = re.compile(r'784[-\s]?\d{4}[-\s]?\d{7}[-\s]?\d')
+NUMBER_KEYS = ('number', 'idNumber', 'id_number', 'value')
+
+
+def normalize_identifier(value) -> str:
+    return ''.join(char for char in str(value or '').upper() if char.isalnum())
+
+
+def _values(identifiers) -> Iterable[str]:
+    """Raw numbers in the free-form ``identifiers`` JSON (list, mapping or string)"""
+    if not identifiers:
+        return
+    if isinstance(identifiers, str):
+        yield identifiers
+        yield from EMIRATES_ID_RE.findall(identifiers)
+    elif isinstance(identifiers, dict):
+        if any(key in identifiers for key in NUMBER_KEYS):
+            for key in NUMBER_KEYS:
+                if identifiers.get(key):
+                    yield str(identifiers[key])
+        else:
+            # {"passport": "...", "emirates_id": "..."}
+            for value in identifiers.values():
+                yield from _values(value)
+    elif isinstance(identifiers, (list, tuple)):
+        for item in identifiers:
+            yield from _values(item)
+    else:
+        yield str(identifiers)
+
+
+def extract_identifiers(identifiers) -> Set[str]:
+    """Normalized identity document numbers found in ``identifiers``"""
+    numbers = {normalize_identifier(value) for value in _values(identifiers)}
+    return {number for number in numbers if len(number) >= MIN_IDENTIFIER_LENGTH}
@@ -0,0 +1,413 @@
+"""
+Configurable cascade of name matchers.
+
+A screened name goes through matcher stages ordered from cheapest to most
+expensive:
+
+* ``EXACT`` - token-sorted normalized or transliterated name lookup; a hit
+  is decided here and skips every later stage;
+* ``PHONETIC`` - phonetic key lookup; hits are kept for scoring against
+  the (lower) phonetic threshold;
+* ``TOKEN`` - token set overlap of the remaining candidates; candidates
+  that could not reach their threshold even with perfect character scores
+  are rejected here;
+* ``EDIT`` - Jaro-Winkler and Levenshtein scoring of the survivors.
+
+The stages, thresholds, scoring weights and secondary attribute weights
+come from the active NAME ``ScreeningConfiguration`` and the active
+``NameMatchingRule`` rows; they are loaded with the watchlist index, so a
+configuration change (which changes the watchlist version) rebuilds both.
+Each stage keeps call, candidate and timing counters for tuning.
+"""
+import logging
+import threading
+import time
+from dataclasses import dataclass, field, fields
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Set, Tuple, Type
+
+from .name_scoring import DEFAULT_WEIGHTS, score_names, score_token_sets
+
+if TYPE_CHECKING:
+    from .watchlist_index import IndexedName, WatchlistIndex
+
+logger = logging.getLogger(__name__)
+
+FUZZY_MATCH_THRESHOLD = 0.8
+# Names sharing a phonetic key need less string similarity to be reported
+PHONETIC_MATCH_THRESHOLD = 0.6
+
+
+@dataclass(frozen=True)
+class AttributeWeights:
+    """Name score adjustments for secondary attribute agreement and conflict"""
+    dob_match: float = 0.05
+    dob_conflict: float = 0.25
+    # Birth years this far apart still count as the same person
+    dob_year_tolerance: int = 1
+    nationality_match: float = 0.03
+    nationality_conflict: float = 0.10
+    country_match: float = 0.02
+    country_conflict: float = 0.05
+
+
+DEFAULT_ATTRIBUTE_WEIGHTS = AttributeWeights()
+
+
+@dataclass(frozen=True)
+class ScreeningQuery:
+    """Keys of a screened name, computed once for all stages"""
+    normalized: str
+    canonical: str
+    sorted_normalized: str
+    sorted_canonical: str
+    phonetic: str
+
+
+@dataclass
+class CascadeState:
+    """Candidates of one screened name while they move through the stages"""
+    query: ScreeningQuery
+    # Secondary attribute score adjustment of a watchlist name
+    attribute_adjustment: Callable[['IndexedName'], float] = lambda record: 0.0
+    # entry_id -> (record, match type) of candidates still undecided
+    pending: Dict[str, Tuple['IndexedName', str]] = field(default_factory=dict)
+    adjustments: Dict[str, float] = field(default_factory=dict)
+    # entry_id -> latest name score of an undecided candidate
+    scores: Dict[str, float] = field(default_factory=dict)
+    hits: List[Tuple['IndexedName', float, str]] = field(default_factory=list)
+    # Entries decided either way; later stages and retrieval skip them
+    decided: Set[str] = field(default_factory=set)
+
+    def adjustment(self, record: 'IndexedName') -> float:
+        if record.entry_id not in self.adjustments:
+            self.adjustments[record.entry_id] = self.attribute_adjustment(record)
+        return self.adjustments[record.entry_id]
+
+    def accept(self, entry_id: str, strength: float) -> None:
+        record, match_type = self.pending.pop(entry_id)
+        self.scores.pop(entry_id, None)
+        self.decided.add(entry_id)
+        self.hits.append((record, strength, match_type))
+
+    def reject(self, entry_id: str) -> None:
+        self.pending.pop(entry_id)
+        self.scores.pop(entry_id, None)
+        self.decided.add(entry_id)
+
+
+@dataclass
+class StageStats:
+    """Counters of one matcher stage, for tuning"""
+    calls: int = 0
+    candidates: int = 0
+    accepted: int = 0
+    rejected: int = 0
+    seconds: float = 0.0
+
+    def as_dict(self) -> Dict[str, float]:
+        return {
+            'calls': self.calls,
+            'candidates': self.candidates,
+            'accepted': self.accepted,
+            'rejected': self.rejected,
+            'seconds': round(self.seconds, 6),
+            'avg_us': round(self.seconds / self.calls * 1e6, 1) if self.calls else 0.0
+        }
+
+
+class Matcher:
+    """A cascade stage; ``cost`` orders the stages, cheapest first"""
+    name = ''
+    cost = 0
+    # Stages that score index candidates; retrieval runs before the first one
+    needs_candidates = False
+
+    def __init__(self, cascade: 'MatcherCascade', config: Optional[dict] = None):
+        self.cascade = cascade
+        self.config = config or {}
+
+    def run(self, index: 'WatchlistIndex', state: CascadeState) -> None:
+        raise NotImplementedError
+
+
+MATCHERS: Dict[str, Type[Matcher]] = {}
+
+
+def register_matcher(matcher_class: Type[Matcher]) -> Type[Matcher]:
+    """Make a matcher stage available to screening configurations by its name"""
+    MATCHERS[matcher_class.name] = matcher_class
+    return matcher_class
+
+
+@register_matcher
+class ExactMatcher(Matcher):
+    """Identical token-sorted name, directly or after transliteration"""
+    name = 'EXACT'
+    cost = 10
+
+    def run(self, index, state):
+        query = state.query
+        for record, match_type in index.key_matches(query.sorted_normalized, '', query.sorted_canonical):
+            if record.entry_id in state.decided:
+                continue
+            state.pending[record.entry_id] = (record, match_type)
+            strength = min(max(1.0 + state.adjustment(record), 0.0), 1.0)
+            if strength >= self.cascade.phonetic_threshold:
+                state.accept(record.entry_id, strength)
+            else:
+                state.reject(record.entry_id)
+
+
+@register_matcher
+class PhoneticMatcher(Matcher):
+    """Same phonetic key; the candidate is scored against the phonetic threshold"""
+    name = 'PHONETIC'
+    cost = 20
+
+    def run(self, index, state):
+        if not state.query.phonetic:
+            return
+        for record, match_type in index.key_matches('', state.query.phonetic):
+            if record.entry_id not in state.decided and record.entry_id not in state.pending:
+                state.pending[record.entry_id] = (record, match_type)
+
+
+@register_matcher
+class TokenMatcher(Matcher):
+    """
+    Token set overlap; rejects candidates whose best possible combined
+    score (perfect character similarity) is below their threshold
+    """
+    name = 'TOKEN'
+    cost = 30
+    needs_candidates = True
+
+    def run(self, index, state):
+        entry_ids = list(state.pending)
+        if not entry_ids:
+            return
+        records = [state.pending[entry_id][0] for entry_id in entry_ids]
+        token_scores = score_token_sets(state.query.canonical, [record.comparable for record in records])
+
+        weights = self.cascade.weights
+        total = sum(weights.values())
+        best_possible = (total - weights['token_set'] * (1.0 - token_scores)) / total
+        for entry_id, token_score, bound in zip(entry_ids, token_scores, best_possible):
+            if not self.cascade.reachable(bound, entry_id, state):
+                state.reject(entry_id)
+            else:
+                state.scores[entry_id] = float(token_score)
+
+
+@register_matcher
+class EditDistanceMatcher(Matcher):
+    """Weighted Jaro-Winkler, Levenshtein and token set score, in one vectorized call"""
+    name = 'EDIT'
+    cost = 40
+    needs_candidates = True
+
+    def run(self, index, state):
+        entry_ids = list(state.pending)
+        if not entry_ids:
+            return
+        # Scored on the transliterated forms so that cross-script pairs are comparable
+        scores = score_names(
+            state.query.canonical,
+            [state.pending[entry_id][0].comparable for entry_id in entry_ids],
+            weights=self.cascade.weights,
+            normalized=True
+        )
+        state.scores.update(zip(entry_ids, scores.combined.tolist()))
+
+
+DEFAULT_STAGES = ('EXACT', 'PHONETIC', 'TOKEN', 'EDIT')
+
+
+class MatcherCascade:
+    """Matcher stages built from a screening configuration, cheapest first"""
+
+    def __init__(
+        self,
+        stages=DEFAULT_STAGES,
+        fuzzy_threshold: float = FUZZY_MATCH_THRESHOLD,
+        phonetic_threshold: float = PHONETIC_MATCH_THRESHOLD,
+        weights: Optional[Dict[str, float]] = None,
+        attribute_weights: AttributeWeights = DEFAULT_ATTRIBUTE_WEIGHTS,
+        stage_config: Optional[Dict[str, dict]] = None,
+        configuration: str = '',
+        configuration_id=None
+    ):
+        self.fuzzy_threshold = fuzzy_threshold
+        self.phonetic_threshold = phonetic_threshold
+        self.weights = {**DEFAULT_WEIGHTS, **(weights or {})}
+        self.attribute_weights = attribute_weights
+        self.configuration = configuration
+        self.configuration_id = configuration_id
+
+        matchers = []
+        for name in stages:
+            if name not in MATCHERS:
+                logger.warning(f"Unknown matcher stage {name!r} in screening configuration {configuration!r}")
+                continue
+            matchers.append(MATCHERS[name](self, (stage_config or {}).get(name)))
+        self.matchers: List[Matcher] = sorted(matchers, key=lambda matcher: matcher.cost)
+        self._stats: Dict[str, StageStats] = {
+            name: StageStats() for name in ['RETRIEVAL'] + [matcher.name for matcher in self.matchers]
+        }
+        self._stats_lock = threading.Lock()
+
+    def threshold(self, match_type: str) -> float:
+        """Lowest match strength still reported for a match type"""
+        return self.fuzzy_threshold if match_type == 'FUZZY' else self.phonetic_threshold
+
+    def reachable(self, score: float, entry_id: str, state: CascadeState) -> bool:
+        """Whether an adjusted name ``score`` reaches the candidate's threshold"""
+        record, match_type = state.pending[entry_id]
+        strength = min(max(score + state.adjustment(record), 0.0), 1.0)
+        if match_type == 'FUZZY':
+            return strength > self.fuzzy_threshold
+        return strength >= self.phonetic_threshold
+
+    def _record(self, stage: str, started: float, candidates: int, state: CascadeState, hits: int, decided: int) -> None:
+        with self._stats_lock:
+            stats = self._stats[stage]
+            stats.calls += 1
+            stats.candidates += candidates
+            stats.accepted += len(state.hits) - hits
+            stats.rejected += len(state.decided) - decided - (len(state.hits) - hits)
+            stats.seconds += time.perf_counter() - started
+
+    def screen(self, index: 'WatchlistIndex', state: CascadeState) -> List[tuple]:
+        """Run the stages over ``state``; returns the hits, decided ones first"""
+        retrieved = False
+        for matcher in self.matchers:
+            if matcher.needs_candidates and not retrieved:
+                started = time.perf_counter()
+                hits, decided = len(state.hits), len(state.decided)
+                self._retrieve(index, state)
+                self._record('RETRIEVAL', started, len(state.pending), state, hits, decided)
+                retrieved = True
+
+            started = time.perf_counter()
+            candidates, hits, decided = len(state.pending), len(state.hits), len(state.decided)
+            matcher.run(index, state)
+            self._record(matcher.name, started, candidates, state, hits, decided)
+
+        # Undecided candidates are judged on their latest score
+        for entry_id in list(state.pending):
+            if entry_id in state.scores and self.reachable(state.scores[entry_id], entry_id, state):
+                strength = state.scores[entry_id] + state.adjustment(state.pending[entry_id][0])
+                state.accept(entry_id, float(min(max(strength, 0.0), 1.0)))
+        return state.hits
+
+    def _retrieve(self, index: 'WatchlistIndex', state: CascadeState) -> None:
+        """
+        Add fuzzy candidates from the index, and drop every candidate whose
+        attribute adjustment rules out its threshold even for a perfect name
+        """
+        for candidate in index.candidates(state.query.normalized):
+            entry_id = candidate.record.entry_id
+            if entry_id not in state.decided and entry_id not in state.pending:
+                state.pending[entry_id] = (candidate.record, 'FUZZY')
+        for entry_id in list(state.pending):
+            if not self.reachable(1.0, entry_id, state):
+                state.reject(entry_id)
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """Per-stage counters since the cascade was built (or last reset)"""
+        with self._stats_lock:
+            return {stage: stats.as_dict() for stage, stats in self._stats.items()}
+
+    def reset_stats(self) -> None:
+        with self._stats_lock:
+            for stats in self._stats.values():
+                stats.__init__()
+
+
+def _attribute_weights(config: dict) -> AttributeWeights:
+    names = {f.name for f in fields(AttributeWeights)}
+    return AttributeWeights(**{key: value for key, value in (config or {}).items() if key in names})
+
+
+def load_matcher_cascade(screening_type: str = 'NAME') -> MatcherCascade:
+    """
+    Cascade of the active screening configuration
+
+    ``NameMatchingRule`` rows set the stage defaults: the lowest active
+    FUZZY and PHONETIC thresholds (screening favours recall) and FUZZY
+    ``algorithm_config['weights']``; an inactive EXACT or PHONETIC rule
+    disables that stage. The first active ``ScreeningConfiguration`` of
+    ``screening_type`` overrides them: ``matching_rules`` may hold
+    ``stages``, ``weights``, ``attribute_weights`` and per-stage
+    ``stage_config``; ``threshold_settings`` may hold ``fuzzy`` and
+    ``phonetic``.
+    """
+    from ..models import NameMatchingRule, ScreeningConfiguration
+
+    stages = list(DEFAULT_STAGES)
+    thresholds = {'fuzzy': FUZZY_MATCH_THRESHOLD, 'phonetic': PHONETIC_MATCH_THRESHOLD}
+    weights: Dict[str, float] = {}
+    active_thresholds: Dict[str, List[float]] = {'FUZZY': [], 'PHONETIC': []}
+
+    rules = NameMatchingRule.objects.filter(
+        matching_algorithm__in=['EXACT', 'FUZZY', 'PHONETIC']
+    ).values_list('matching_algorithm', 'algorithm_config', 'threshold', 'is_active')
+    disabled = set()
+    enabled = set()
+    for algorithm, config, threshold, is_active in rules:
+        if not is_active:
+            disabled.add(algorithm)
+            continue
+        enabled.add(algorithm)
+        if algorithm in active_thresholds and threshold is not None:
+            active_thresholds[algorithm].append(threshold)
+        if algorithm == 'FUZZY':
+            weights.update((config or {}).get('weights', {}))
+    for algorithm in disabled - enabled:
+        if algorithm in stages:
+            stages.remove(algorithm)
+    if active_thresholds['FUZZY']:
+        thresholds['fuzzy'] = min(active_thresholds['FUZZY'])
+    if active_thresholds['PHONETIC']:
+        thresholds['phonetic'] = min(active_thresholds['PHONETIC'])
+
+    configuration = ScreeningConfiguration.objects.filter(
+        screening_type=screening_type,
+        is_active=True
+    ).order_by('name').values('id', 'name', 'matching_rules', 'threshold_settings').first()
+    matching_rules: dict = {}
+    name = ''
+    configuration_id = None
+    if configuration:
+        name = configuration['name']
+        configuration_id = configuration['id']
+        matching_rules = configuration['matching_rules'] or {}
+        stages = matching_rules.get('stages', stages)
+        weights.update(matching_rules.get('weights', {}))
+        thresholds.update({
+            key: float(value) for key, value in (configuration['threshold_settings'] or {}).items()
+            if key in thresholds
+        })
+
+    return MatcherCascade(
+        stages=stages,
+        fuzzy_threshold=thresholds['fuzzy'],
+        phonetic_threshold=thresholds['phonetic'],
+        weights=weights,
+        attribute_weights=_attribute_weights(matching_rules.get('attribute_weights')),
+        stage_config=matching_rules.get('stage_config'),
+        configuration=name,
+        configuration_id=configuration_id
+    )
+
+
+_default_cascade: Optional[MatcherCascade] = None
+
+
+def default_cascade() -> MatcherCascade:
+    """Cascade with the built-in stages and thresholds, for indexes built without one"""
+    global _default_cascade
+
+    if _default_cascade is None:
+        _default_cascade = MatcherCascade()
+    return _default_cascade
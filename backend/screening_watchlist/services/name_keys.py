@@ -0,0 +1,48 @@
+"""
+Stored name keys for ``Customer`` and ``WatchlistEntry``.
+
+Both models persist three indexed forms of their ``name`` so screening
+does not rebuild them on every call, and exact or phonetic matches can be
+found with an index lookup before any fuzzy scoring:
+
+* ``normalized_name`` - accents and punctuation stripped, casefolded
+* ``sorted_name`` - the normalized tokens in alphabetical order
+* ``phonetic_key`` - sorted Arabic-aware phonetic token keys
+"""
+from dataclasses import astuple, dataclass
+from typing import Iterable, Optional
+
+from .name_normalization import normalize_name, sorted_name
+from .phonetic import phonetic_key
+
+NAME_KEY_FIELDS = ('normalized_name', 'sorted_name', 'phonetic_key')
+
+
+@dataclass(frozen=True)
+class NameKeys:
+    normalized_name: str
+    sorted_name: str
+    phonetic_key: str
+
+
+def name_keys(name: str) -> NameKeys:
+    normalized = normalize_name(name)
+    return NameKeys(
+        normalized_name=normalized,
+        sorted_name=sorted_name(normalized),
+        phonetic_key=phonetic_key(normalized)
+    )
+
+
+def set_name_keys(instance, name: str, update_fields: Optional[Iterable[str]] = None):
+    """
+    Fill the key fields of a model instance from ``name``
+
+    Returns ``update_fields`` extended with the key fields when the name is
+    among them, for use in ``save()``.
+    """
+    for field, value in zip(NAME_KEY_FIELDS, astuple(name_keys(name))):
+        setattr(instance, field, value)
+    if update_fields is not None and 'name' in update_fields:
+        update_fields = set(update_fields) | set(NAME_KEY_FIELDS)
+    return update_fields
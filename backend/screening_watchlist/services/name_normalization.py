@@ -0,0 +1,56 @@
+"""
+Name normalization helpers shared by watchlist indexing and screening
+"""
+import re
+import unicodedata
+from typing import List, Set
+
+_NON_WORD_RE = re.compile(r'[\W_]+', re.UNICODE)
+_WHITESPACE_RE = re.compile(r'\s+')
+
+NGRAM_SIZE = 3
+NGRAM_PAD = '#'
+
+
+def normalize_name(name: str) -> str:
+    """
+    Normalize a name for matching
+
+    Strips Latin diacritics, lowercases, replaces punctuation with spaces
+    and collapses whitespace. Non-Latin letters (e.g. Arabic) are kept.
+    """
+    if not name:
+        return ''
+    decomposed = unicodedata.normalize('NFKD', name)
+    stripped = ''.join(ch for ch in decomposed if not unicodedata.combining(ch))
+    cleaned = _NON_WORD_RE.sub(' ', stripped.casefold())
+    return _WHITESPACE_RE.sub(' ', cleaned).strip()
+
+
+def name_tokens(normalized_name: str) -> List[str]:
+    """Split a normalized name into tokens"""
+    return normalized_name.split() if normalized_name else []
+
+
+def char_ngrams(token: str, size: int = NGRAM_SIZE) -> Set[str]:
+    """
+    Character n-grams of a single token, padded so that short tokens and
+    token boundaries still produce n-grams
+    """
+    padded = f"{NGRAM_PAD}{token}{NGRAM_PAD}"
+    if len(padded) <= size:
+        return {padded}
+    return {padded[i:i + size] for i in range(len(padded) - size + 1)}
+
+
+def name_ngrams(normalized_name: str, size: int = NGRAM_SIZE) -> Set[str]:
+    """Character n-grams over all tokens of a normalized name"""
+    grams = set()
+    for token in name_tokens(normalized_name):
+        grams |= char_ngrams(token, size)
+    return grams
+
+
+def sorted_name(normalized_name: str) -> str:
+    """Normalized name with its tokens in alphabetical order"""
+    return ' '.join(sorted(name_tokens(normalized_name)))
@@ -0,0 +1,274 @@
+"""
+Vectorized batch similarity scoring for names.
+
+Scores one query against N candidate names, or M queries against N
+candidates, in a single call. Names are encoded as padded code-point
+matrices and every name pair is processed as a row of a NumPy array, so
+the Python-level loop runs over character positions rather than over
+pairs.
+"""
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .name_normalization import name_tokens, normalize_name
+
+DEFAULT_WEIGHTS = {
+    'jaro_winkler': 0.4,
+    'levenshtein': 0.3,
+    'token_set': 0.3,
+}
+
+# Number of name pairs scored per NumPy pass; bounds peak memory for M x N calls
+PAIR_CHUNK_SIZE = 50000
+
+WINKLER_PREFIX = 4
+WINKLER_SCALING = 0.1
+WINKLER_BOOST_THRESHOLD = 0.7
+
+_PAD = -1
+
+
+@dataclass
+class NameScores:
+    """Similarity scores (0-1) for every query/candidate pair"""
+    jaro_winkler: np.ndarray
+    levenshtein: np.ndarray
+    token_set: np.ndarray
+    combined: np.ndarray
+
+    @property
+    def shape(self) -> Tuple[int, ...]:
+        return self.combined.shape
+
+    def row(self, index: int) -> 'NameScores':
+        """Scores of a single query against all candidates"""
+        return NameScores(
+            jaro_winkler=self.jaro_winkler[index],
+            levenshtein=self.levenshtein[index],
+            token_set=self.token_set[index],
+            combined=self.combined[index]
+        )
+
+
+def _encode(names: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """Encode names as a (len(names), max_length) matrix of code points"""
+    lengths = np.fromiter((len(name) for name in names), dtype=np.int32, count=len(names))
+    width = max(int(lengths.max()) if len(names) else 0, 1)
+    codes = np.full((len(names), width), _PAD, dtype=np.int32)
+    for row, name in enumerate(names):
+        if name:
+            codes[row, :len(name)] = np.frombuffer(name.encode('utf-32-le'), dtype=np.uint32)
+    return codes, lengths
+
+
+def _levenshtein_similarity(
+    a: np.ndarray,
+    a_len: np.ndarray,
+    b: np.ndarray,
+    b_len: np.ndarray
+) -> np.ndarray:
+    """
+    Normalized Levenshtein similarity for each row pair of ``a`` and ``b``
+
+    The DP runs one row per character of ``a`` for all pairs at once. The
+    sequential insertion step along a row is resolved with a running
+    minimum: ``cur[j] = j + min(x[k] - k for k <= j)``.
+    """
+    pairs, width_b = b.shape
+    columns = np.arange(width_b + 1, dtype=np.int32)
+    prev = np.broadcast_to(columns, (pairs, width_b + 1)).copy()
+
+    for i in range(a.shape[1]):
+        cost = (a[:, i:i + 1] != b).astype(np.int32)
+        step = np.empty_like(prev)
+        step[:, 0] = i + 1
+        step[:, 1:] = np.minimum(prev[:, :-1] + cost, prev[:, 1:] + 1)
+        current = np.minimum.accumulate(step - columns, axis=1) + columns
+        # Rows past the end of a shorter name keep their final DP row
+        prev = np.where((i < a_len)[:, None], current, prev)
+
+    distance = prev[np.arange(pairs), b_len]
+    longest = np.maximum(a_len, b_len)
+    return np.where(longest > 0, 1.0 - distance / np.maximum(longest, 1), 1.0)
+
+
+def _matched_sequence(codes: np.ndarray, matched: np.ndarray, width: int) -> np.ndarray:
+    """Matched characters of each row, in order of appearance, padded to ``width``"""
+    order = np.argsort(~matched, axis=1, kind='stable')
+    sequence = np.where(
+        np.take_along_axis(matched, order, axis=1),
+        np.take_along_axis(codes, order, axis=1),
+        _PAD
+    )
+    if sequence.shape[1] < width:
+        padding = np.full((sequence.shape[0], width - sequence.shape[1]), _PAD, dtype=sequence.dtype)
+        sequence = np.hstack([sequence, padding])
+    return sequence
+
+
+def _jaro_winkler_similarity(
+    a: np.ndarray,
+    a_len: np.ndarray,
+    b: np.ndarray,
+    b_len: np.ndarray
+) -> np.ndarray:
+    """Jaro-Winkler similarity for each row pair of ``a`` and ``b``"""
+    pairs, width_a = a.shape
+    width_b = b.shape[1]
+    rows = np.arange(pairs)
+    b_positions = np.arange(width_b)
+    window = np.maximum(np.maximum(a_len, b_len) // 2 - 1, 0)
+
+    a_matched = np.zeros((pairs, width_a), dtype=bool)
+    b_matched = np.zeros((pairs, width_b), dtype=bool)
+    b_valid = b_positions < b_len[:, None]
+
+    for i in range(width_a):
+        eligible = (
+            (b == a[:, i:i + 1]) &
+            ~b_matched &
+            b_valid &
+            (b_positions >= (i - window)[:, None]) &
+            (b_positions <= (i + window)[:, None])
+        )
+        found = eligible.any(axis=1) & (i < a_len)
+        first = eligible.argmax(axis=1)
+        a_matched[found, i] = True
+        b_matched[rows[found], first[found]] = True
+
+    matches = a_matched.sum(axis=1)
+    width = max(width_a, width_b)
+    a_sequence = _matched_sequence(a, a_matched, width)
+    b_sequence = _matched_sequence(b, b_matched, width)
+    in_range = np.arange(width) < matches[:, None]
+    transpositions = ((a_sequence != b_sequence) & in_range).sum(axis=1) / 2.0
+
+    jaro = np.where(
+        matches > 0,
+        (
+            matches / np.maximum(a_len, 1) +
+            matches / np.maximum(b_len, 1) +
+            (matches - transpositions) / np.maximum(matches, 1)
+        ) / 3.0,
+        0.0
+    )
+
+    prefix_width = min(WINKLER_PREFIX, width_a, width_b)
+    prefix_equal = (
+        (a[:, :prefix_width] == b[:, :prefix_width]) &
+        (np.arange(prefix_width) < np.minimum(a_len, b_len)[:, None])
+    )
+    prefix = np.cumprod(prefix_equal, axis=1).sum(axis=1)
+    boost = np.where(jaro > WINKLER_BOOST_THRESHOLD, prefix * WINKLER_SCALING * (1.0 - jaro), 0.0)
+    return jaro + boost
+
+
+def _token_set_similarity(
+    query_tokens: List[List[str]],
+    candidate_tokens: List[List[str]]
+) -> np.ndarray:
+    """
+    Dice coefficient of token sets for every query/candidate pair
+
+    Token sets are encoded as 0/1 incidence matrices over the query
+    vocabulary, so all intersections come out of one matrix product.
+    """
+    vocabulary: Dict[str, int] = {}
+    for tokens in query_tokens:
+        for token in tokens:
+            vocabulary.setdefault(token, len(vocabulary))
+
+    queries = np.zeros((len(query_tokens), max(len(vocabulary), 1)), dtype=np.float32)
+    for row, tokens in enumerate(query_tokens):
+        queries[row, [vocabulary[token] for token in set(tokens)]] = 1.0
+
+    candidates = np.zeros((len(candidate_tokens), queries.shape[1]), dtype=np.float32)
+    candidate_sizes = np.zeros(len(candidate_tokens), dtype=np.float32)
+    for row, tokens in enumerate(candidate_tokens):
+        unique = set(tokens)
+        candidate_sizes[row] = len(unique)
+        columns = [vocabulary[token] for token in unique if token in vocabulary]
+        if columns:
+            candidates[row, columns] = 1.0
+
+    common = queries @ candidates.T
+    sizes = queries.sum(axis=1)[:, None] + candidate_sizes[None, :]
+    return np.where(sizes > 0, 2.0 * common / np.maximum(sizes, 1.0), 0.0)
+
+
+def score_name_matrix(
+    queries: Sequence[str],
+    candidates: Sequence[str],
+    weights: Optional[Dict[str, float]] = None,
+    normalized: bool = False
+) -> NameScores:
+    """
+    Score M query names against N candidate names
+
+    Returns ``NameScores`` whose arrays have shape (M, N). Pass
+    ``normalized=True`` when the names already went through
+    ``normalize_name`` (e.g. names held by the watchlist index).
+    """
+    weights = weights or DEFAULT_WEIGHTS
+    if not normalized:
+        queries = [normalize_name(name) for name in queries]
+        candidates = [normalize_name(name) for name in candidates]
+
+    shape = (len(queries), len(candidates))
+    if not queries or not candidates:
+        empty = np.zeros(shape)
+        return NameScores(empty, empty.copy(), empty.copy(), empty.copy())
+
+    query_codes, query_lengths = _encode(queries)
+    candidate_codes, candidate_lengths = _encode(candidates)
+
+    total = shape[0] * shape[1]
+    jaro_winkler = np.empty(total)
+    levenshtein = np.empty(total)
+    for start in range(0, total, PAIR_CHUNK_SIZE):
+        pair_ids = np.arange(start, min(start + PAIR_CHUNK_SIZE, total))
+        query_ids = pair_ids // shape[1]
+        candidate_ids = pair_ids % shape[1]
+        pair = (
+            query_codes[query_ids], query_lengths[query_ids],
+            candidate_codes[candidate_ids], candidate_lengths[candidate_ids]
+        )
+        jaro_winkler[pair_ids] = _jaro_winkler_similarity(*pair)
+        levenshtein[pair_ids] = _levenshtein_similarity(*pair)
+
+    token_set = _token_set_similarity(
+        [name_tokens(name) for name in queries],
+        [name_tokens(name) for name in candidates]
+    )
+    jaro_winkler = jaro_winkler.reshape(shape)
+    levenshtein = levenshtein.reshape(shape)
+
+    combined = (
+        weights['jaro_winkler'] * jaro_winkler +
+        weights['levenshtein'] * levenshtein +
+        weights['token_set'] * token_set
+    ) / sum(weights.values())
+
+    return NameScores(
+        jaro_winkler=jaro_winkler,
+        levenshtein=levenshtein,
+        token_set=token_set,
+        combined=combined
+    )
+
+
+def score_names(
+    query: str,
+    candidates: Sequence[str],
+    weights: Optional[Dict[str, float]] = None,
+    normalized: bool = False
+) -> NameScores:
+    """Score one query name against N candidate names; arrays have shape (N,)"""
+    return score_name_matrix([query], candidates, weights=weights, normalized=normalized).row(0)
+
+
+def score_token_sets(query: str, candidates: Sequence[str]) -> np.ndarray:
+    """Token set similarity of one normalized query against N normalized candidates"""
+    return _token_set_similarity([name_tokens(query)], [name_tokens(name) for name in candidates])[0]
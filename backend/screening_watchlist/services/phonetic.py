@@ -0,0 +1,79 @@
+"""
+Arabic-aware phonetic keys for names.
+
+Each token is reduced to a consonant skeleton in the spirit of Metaphone,
+with consonant classes chosen so that Latin transliterations of Arabic
+names and the Arabic-script original land on the same key::
+
+    Mohammed, Muhammad, Mohamad, محمد  ->  MHMT
+    Hussein, Husain, حسين              ->  HSN
+
+Names are first brought to their canonical Latin form (see
+``transliteration``), so Arabic-script and Cyrillic names are keyed through
+their transliteration. Vowels are dropped except at the start of a token,
+doubled consonants collapse, and Latin digraphs such as ``kh``/``sh``/``th``
+map to the class of the single Arabic letter they transliterate. Token keys
+are sorted, so word order does not matter. Keys are meant for blocking and
+exact-key lookups, not scoring.
+"""
+from typing import Dict, List, Optional, Tuple
+
+from .transliteration import canonical_tokens
+
+LATIN_VOWELS = set('aeiouy')
+
+# Longest match first
+LATIN_DIGRAPHS: Tuple[Tuple[str, str], ...] = (
+    ('sch', 'S'),
+    ('kh', 'K'), ('gh', 'G'), ('sh', 'S'), ('ch', 'S'), ('th', 'T'), ('dh', 'T'),
+    ('zh', 'Z'), ('ph', 'F'), ('ck', 'K'), ('qu', 'K'),
+)
+
+LATIN_LETTERS: Dict[str, str] = {
+    'b': 'B', 'p': 'B', 'd': 'T', 't': 'T', 'f': 'F', 'v': 'F', 'g': 'J', 'j': 'J',
+    'h': 'H', 'k': 'K', 'q': 'K', 'l': 'L', 'm': 'M', 'n': 'N', 'r': 'R',
+    's': 'S', 'z': 'Z', 'x': 'KS', 'w': 'W',
+}
+
+def _latin_token_key(token: str) -> str:
+    codes: List[str] = []
+    i = 0
+    while i < len(token):
+        for digraph, code in LATIN_DIGRAPHS:
+            if token.startswith(digraph, i):
+                codes.append(code)
+                i += len(digraph)
+                break
+        else:
+            char = token[i]
+            if char in LATIN_VOWELS or char == 'w':
+                if i == 0:
+                    codes.append({'y': 'Y', 'w': 'W'}.get(char, 'A'))
+            elif char == 'c':
+                codes.append('S' if token[i + 1:i + 2] in ('e', 'i', 'y') else 'K')
+            elif char in LATIN_LETTERS:
+                codes.append(LATIN_LETTERS[char])
+            elif char.isdigit():
+                codes.append(char)
+            i += 1
+    return _collapse(codes)
+
+
+def _collapse(codes: List[str]) -> str:
+    """Join codes, collapsing runs of the same code"""
+    key = []
+    for code in ''.join(codes):
+        if not key or key[-1] != code:
+            key.append(code)
+    return ''.join(key)
+
+
+def phonetic_token(token: str) -> str:
+    """Phonetic key of a single transliterated (Latin) token"""
+    return _latin_token_key(token)
+
+
+def phonetic_key(name: str, word_variants: Optional[Dict[str, str]] = None) -> str:
+    """Order-independent phonetic key of a full name, in any supported script"""
+    keys = (phonetic_token(token) for token in canonical_tokens(name, word_variants))
+    return ' '.join(sorted(key for key in keys if key))
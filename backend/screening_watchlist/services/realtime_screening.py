@@ -0,0 +1,218 @@
+"""
+Synchronous-answer screening for onboarding and payment release.
+
+A party is checked against independent sources at once:
+
+* ``WATCHLIST`` - name and identity document screening against the
+  in-memory watchlist index (through the result cache);
+* ``CONNECTED_PARTIES`` - screening of the customers connected to a known
+  customer through the relationship graph;
+* ``SANCTIONED_COUNTRIES`` - nationality and country against the
+  sanctioned country list.
+
+The sources run concurrently and the call returns once they have all
+finished or the latency budget has run out, whichever comes first.
+Sources still running at the deadline are left out and the result is
+flagged ``partial``; callers must treat a partial result as unscreened
+(e.g. hold the payment for review) rather than as clear.
+
+The blocking work of the sources (index lookups, scoring, queries) runs on
+a dedicated pool of ``SCREENING_API_WORKERS`` threads. A thread cannot be
+interrupted, so work that misses its deadline keeps its worker until it
+finishes; the pool bounds that leftover work, and work still queued when
+its request's deadline has passed is dropped without running. Under
+overload requests come back partial instead of crowding the default
+executor the rest of the process relies on.
+"""
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import date
+from typing import Callable, Dict, List, Optional, Set
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from ..models import SanctionedCountry
+from .connected_screening import relationship_graph, screen_customer_network
+from .screening import NameHit, PartyAttributes, match_type_for
+from .screening_cache import screen_name_cached
+from .screening_history import record_screening
+from .watchlist_index import WatchlistIndex, get_watchlist_index
+
+logger = logging.getLogger(__name__)
+
+SOURCES = ('WATCHLIST', 'CONNECTED_PARTIES', 'SANCTIONED_COUNTRIES')
+# Entity ID recorded in the screening history for names that are not customers
+NO_ENTITY_ID = '00000000-0000-0000-0000-000000000000'
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+@dataclass
+class ScreeningRequest:
+    name: str
+    date_of_birth: Optional[date] = None
+    nationality: str = ''
+    country: str = ''
+    identifiers: List[str] = field(default_factory=list)
+    # Known customer whose connected parties are screened as well
+    customer_id: Optional[str] = None
+
+    @property
+    def attributes(self) -> PartyAttributes:
+        return PartyAttributes.build(self.date_of_birth, self.nationality, self.country, self.identifiers)
+
+
+def _hit_payload(hit: NameHit) -> Dict:
+    entry, match_strength, match_type = hit
+    return {
+        'watchlist_entry_id': entry.entry_id,
+        'matched_name': entry.name,
+        'source': entry.source,
+        'watchlist_type': entry.source_type,
+        'match_type': match_type_for(match_type),
+        'match_basis': match_type,
+        'match_score': round(match_strength * 100, 2)
+    }
+
+
+def get_screening_executor() -> ThreadPoolExecutor:
+    """Process-wide pool running the blocking work of the screening sources"""
+    global _executor
+
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=settings.SCREENING_API_WORKERS,
+                    thread_name_prefix='realtime-screening'
+                )
+    return _executor
+
+
+async def _run(state: Dict, func: Callable, *args):
+    """Run blocking ``func`` on the screening pool, unless the deadline passed while it was queued"""
+    deadline = state.get('deadline')
+
+    def call():
+        if deadline is not None and time.perf_counter() > deadline:
+            raise TimeoutError(f"Deadline passed before {func.__name__} started")
+        return func(*args)
+
+    return await asyncio.get_running_loop().run_in_executor(get_screening_executor(), call)
+
+
+def _screen_watchlist(index: WatchlistIndex, request: ScreeningRequest) -> List[NameHit]:
+    return screen_name_cached(index, request.name, attributes=request.attributes)
+
+
+async def _watchlist(request: ScreeningRequest, state: Dict) -> List[Dict]:
+    index = await _run(state, get_watchlist_index)
+    state['index'] = index
+    hits = await _run(state, _screen_watchlist, index, request)
+    state['hits'] = hits
+    return [_hit_payload(hit) for hit in hits]
+
+
+async def _connected_parties(request: ScreeningRequest, state: Dict) -> List[Dict]:
+    if not request.customer_id:
+        return []
+    index = await _run(state, get_watchlist_index)
+    graph = await _run(state, relationship_graph)
+    if graph is None:
+        return []
+    _, connected = await _run(state, screen_customer_network, index, request.customer_id, graph)
+    return [
+        {
+            'customer_id': party.customer_id,
+            'hops': party.hops,
+            'relationship_path': list(party.path),
+            'matches': [_hit_payload(hit) for hit in hits]
+        }
+        for party, hits in connected
+    ]
+
+
+def _sanctioned_country_rows(values: Set[str]) -> List[Dict]:
+    query = Q()
+    for value in values:
+        query |= Q(country_code__iexact=value) | Q(country_name__iexact=value)
+    return list(SanctionedCountry.objects.filter(query, is_active=True).values(
+        'country_name', 'country_code', 'risk_level', 'sanctions_programs'
+    ))
+
+
+async def _sanctioned_countries(request: ScreeningRequest, state: Dict) -> List[Dict]:
+    values = {value.strip() for value in (request.nationality, request.country) if value and value.strip()}
+    if not values:
+        return []
+    return await _run(state, _sanctioned_country_rows, values)
+
+
+SOURCE_CHECKS = {
+    'WATCHLIST': _watchlist,
+    'CONNECTED_PARTIES': _connected_parties,
+    'SANCTIONED_COUNTRIES': _sanctioned_countries,
+}
+
+
+async def screen_party(
+    request: ScreeningRequest,
+    budget_ms: int,
+    sources=SOURCES,
+    created_by_id=None
+) -> Dict:
+    """Screen ``request`` against ``sources`` concurrently within ``budget_ms``"""
+    screened_at, started = timezone.now(), time.perf_counter()
+    state: Dict = {'deadline': started + budget_ms / 1000}
+    tasks = {
+        asyncio.ensure_future(SOURCE_CHECKS[source](request, state)): source
+        for source in sources
+    }
+    done, pending = await asyncio.wait(tasks, timeout=budget_ms / 1000)
+    for task in pending:
+        task.cancel()
+
+    results: Dict[str, List[Dict]] = {}
+    incomplete = [tasks[task] for task in pending]
+    for task in done:
+        source = tasks[task]
+        if task.exception() is not None:
+            logger.error(f"Real-time screening source {source} failed: {str(task.exception())}")
+            incomplete.append(source)
+        else:
+            results[source] = task.result()
+    elapsed = time.perf_counter() - started
+
+    index = state.get('index')
+    if 'hits' in state:
+        # Queued for the screening history off the event loop; never awaited
+        asyncio.get_running_loop().run_in_executor(
+            None,
+            lambda: record_screening(
+                index.matchers,
+                request.customer_id or NO_ENTITY_ID,
+                'CUSTOMER' if request.customer_id else 'PARTY',
+                state['hits'],
+                screened_at, elapsed, created_by_id, source='API'
+            )
+        )
+
+    return {
+        'name': request.name,
+        'watchlist_version': index.version if index else None,
+        'matches': results.get('WATCHLIST', []),
+        'connected_matches': results.get('CONNECTED_PARTIES', []),
+        'sanctioned_countries': results.get('SANCTIONED_COUNTRIES', []),
+        'partial': bool(incomplete),
+        'incomplete_sources': sorted(incomplete),
+        'elapsed_ms': round(elapsed * 1000, 2),
+        'budget_ms': budget_ms
+    }
+
@@ -0,0 +1,345 @@
+"""
+Parallel full-portfolio rescreening for ``PERIODIC`` and ``BACKFILL`` batches.
+
+Customers are split into partitions by primary key range. Primary keys
+are random UUIDs, so equal slices of the UUID space give partitions of
+roughly equal size without scanning the table. Partitions run either on a
+local process pool or as Celery tasks:
+
+* process pool: the watchlist index is built once in the parent and the
+  pool is forked, so workers share the index pages copy-on-write instead
+  of receiving a pickled copy each;
+* Celery: each worker process keeps its own process-wide index (see
+  ``get_watchlist_index``) and reuses it for every partition it runs.
+
+Each partition is screened in primary key order, one chunk at a time. The
+partition checkpoint (last primary key, counts) is stored in the batch's
+``metadata`` in the same transaction as the chunk's matches, so a crashed
+run resumes after its last committed chunk. Open matches of a chunk's
+customers that the rescreen no longer finds (removed or deactivated
+entries, changed names) are closed with the chunk.
+"""
+import gc
+import logging
+import multiprocessing
+import time
+import uuid
+from typing import Dict, List, Optional, Set, Tuple
+
+from django.db import connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from core.signals import risk_inputs_changed
+from core.utils import get_system_user_id
+from customer_management.models import Customer
+from ..models import ScreeningBatch, WatchlistMatch, WatchlistProvider
+from .connected_screening import related_matches, relationship_graph
+from .delta_screening import OPEN_MATCH_STATUSES, RETIRED_MATCH_STATUS
+from .screening import PartyAttributes, customer_matches, save_matches, screen_name
+from .screening_history import flush_screening_history, record_screening
+from .watchlist_index import WatchlistIndex, get_watchlist_index
+
+logger = logging.getLogger(__name__)
+
+RESCREEN_BATCH_TYPES = ('PERIODIC', 'BACKFILL')
+DEFAULT_CHUNK_SIZE = 2000
+UUID_SPACE = 1 << 128
+
+# Index inherited by forked pool workers
+_shared_index: Optional[WatchlistIndex] = None
+
+
+def partition_bounds(partitions: int) -> List[Tuple[str, Optional[str]]]:
+    """``partitions`` contiguous primary key ranges [lower, upper) covering all UUIDs"""
+    bounds = [str(uuid.UUID(int=UUID_SPACE * i // partitions)) for i in range(partitions)]
+    return list(zip(bounds, bounds[1:] + [None]))
+
+
+def create_rescreen_batch(
+    partitions: int,
+    batch_type: str = 'PERIODIC',
+    created_by=None
+) -> ScreeningBatch:
+    """
+    ``ScreeningBatch`` row with one pending checkpoint per partition
+
+    Scheduled and command-line runs have no requesting user and are
+    recorded under the system user.
+    """
+    if batch_type not in RESCREEN_BATCH_TYPES:
+        raise ValueError(f"Rescreening runs {RESCREEN_BATCH_TYPES} batches, not {batch_type}")
+    batch = ScreeningBatch.objects.create(
+        name=f"Portfolio rescreen {timezone.now():%Y-%m-%d %H:%M}",
+        batch_type=batch_type,
+        filters={'mode': 'FULL', 'partitions': partitions},
+        total_records=Customer.objects.filter(is_active=True).count(),
+        created_by_id=created_by.pk if created_by else get_system_user_id(),
+        metadata={
+            'partitions': {
+                str(number): {
+                    'lower': lower,
+                    'upper': upper,
+                    'last_id': None,
+                    'processed': 0,
+                    'matched': 0,
+                    'done': False
+                }
+                for number, (lower, upper) in enumerate(partition_bounds(partitions))
+            }
+        }
+    )
+    batch.providers.set(WatchlistProvider.objects.filter(is_active=True))
+    return batch
+
+
+def pending_partitions(batch: ScreeningBatch) -> List[str]:
+    return [key for key, state in batch.metadata['partitions'].items() if not state['done']]
+
+
+def _checkpoint(batch_id, key: str, last_id, processed: int, matched: int, done: bool) -> None:
+    """Advance a partition checkpoint and the batch counters (inside the chunk's transaction)"""
+    batch = ScreeningBatch.objects.select_for_update().only('metadata').get(pk=batch_id)
+    state = batch.metadata['partitions'][key]
+    state.update(
+        last_id=str(last_id) if last_id else state['last_id'],
+        processed=state['processed'] + processed,
+        matched=state['matched'] + matched,
+        done=done
+    )
+    ScreeningBatch.objects.filter(pk=batch_id).update(
+        metadata=batch.metadata,
+        processed_records=F('processed_records') + processed,
+        matched_records=F('matched_records') + matched
+    )
+
+
+def _stale_matches(customer_ids: List, found: Set[Tuple[str, str]]) -> Dict:
+    """
+    Open customer matches of a rescreened chunk that no longer hold, as
+    match ID -> customer ID
+
+    A direct match is stale when its customer no longer hits the entry; a
+    relationship match when the chunk customer it came through no longer
+    hits it. (customer, entry) pairs in ``found`` were matched again.
+    """
+    screened = {str(customer_id) for customer_id in customer_ids}
+    open_matches = WatchlistMatch.objects.filter(
+        Q(customer_id__in=customer_ids) | Q(match_details__related_customer_id__in=list(screened)),
+        transaction__isnull=True,
+        status__in=OPEN_MATCH_STATUSES
+    ).values_list('id', 'customer_id', 'entry_id', 'match_details__match_basis', 'match_details__related_customer_id')
+    stale = {}
+    for match_id, customer_id, entry_id, basis, related_id in open_matches:
+        via = related_id if basis == 'RELATED' else str(customer_id)
+        if via in screened and (str(customer_id), str(entry_id)) not in found:
+            stale[match_id] = customer_id
+    return stale
+
+
+def _retire_stale_matches(stale: Dict) -> None:
+    if not stale:
+        return
+    WatchlistMatch.objects.filter(id__in=list(stale)).update(
+        status=RETIRED_MATCH_STATUS,
+        review_date=timezone.now(),
+        review_notes='No longer matched by portfolio rescreening'
+    )
+    risk_inputs_changed.send(sender=WatchlistMatch, customer_ids=set(stale.values()), reason='WATCHLIST_MATCH')
+
+
+def rescreen_partition(batch_id, key: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> int:
+    """
+    Screen the customers of one partition, resuming after its checkpoint
+
+    Returns the number of customers screened by this call.
+    """
+    index = _shared_index or get_watchlist_index()
+    metadata, created_by_id = ScreeningBatch.objects.values_list('metadata', 'created_by_id').get(pk=batch_id)
+    state = metadata['partitions'][key]
+    if state['done']:
+        return 0
+
+    customers = Customer.objects.filter(is_active=True, pk__gte=state['lower'])
+    if state['upper']:
+        customers = customers.filter(pk__lt=state['upper'])
+    last_id = state['last_id']
+    screened = 0
+
+    while True:
+        chunk = customers.filter(pk__gt=last_id) if last_id else customers
+        rows = list(chunk.order_by('pk').values_list(
+            'id', 'name', 'normalized_name', 'sorted_name', 'phonetic_key',
+            'date_of_birth', 'nationality', 'identification_number'
+        )[:chunk_size])
+
+        hits_by_customer = {}
+        for (
+            customer_id, name, normalized, sorted_normalized, phonetic,
+            date_of_birth, nationality, identification_number
+        ) in rows:
+            screened_at, started = timezone.now(), time.perf_counter()
+            hits = screen_name(
+                index, name, normalized, sorted_normalized, phonetic,
+                PartyAttributes.build(date_of_birth, nationality, identifiers=identification_number)
+            )
+            record_screening(
+                index.matchers, customer_id, 'CUSTOMER', hits,
+                screened_at, time.perf_counter() - started,
+                created_by_id, screening_batch_id=str(batch_id)
+            )
+            if hits:
+                hits_by_customer[customer_id] = (name, hits)
+
+        # Customers connected to a matched customer are exposed to its entries
+        related = related_matches(
+            relationship_graph(), hits_by_customer, index.version,
+            screening_batch_id=str(batch_id)
+        )
+
+        # Customers already holding an open or confirmed match for an entry keep it
+        existing = set(WatchlistMatch.objects.filter(
+            customer_id__in=list(hits_by_customer) + [match.customer_id for match in related],
+            transaction__isnull=True,
+            status__in=OPEN_MATCH_STATUSES + ('CONFIRMED',)
+        ).values_list('customer_id', 'entry_id'))
+        matches = []
+        for customer_id, (name, hits) in hits_by_customer.items():
+            new_hits = [hit for hit in hits if (customer_id, uuid.UUID(hit[0].entry_id)) not in existing]
+            matches += customer_matches(
+                customer_id, name, new_hits, index.version,
+                screening_batch_id=str(batch_id)
+            )
+        matches += [
+            match for match in related
+            if (uuid.UUID(match.customer_id), uuid.UUID(match.entry_id)) not in existing
+        ]
+
+        found = {(str(match.customer_id), str(match.entry_id)) for match in related} | {
+            (str(customer_id), hit[0].entry_id)
+            for customer_id, (_, hits) in hits_by_customer.items()
+            for hit in hits
+        }
+        stale = _stale_matches([row[0] for row in rows], found)
+
+        done = len(rows) < chunk_size
+        with transaction.atomic():
+            save_matches(matches)
+            _retire_stale_matches(stale)
+            _checkpoint(
+                batch_id, key,
+                rows[-1][0] if rows else None,
+                len(rows),
+                len(hits_by_customer),
+                done
+            )
+        screened += len(rows)
+        if done:
+            flush_screening_history()
+            return screened
+        last_id = rows[-1][0]
+
+
+def finish_rescreen(
+    batch_id,
+    screened: Optional[int] = None,
+    elapsed: Optional[float] = None
+) -> Optional[ScreeningBatch]:
+    """
+    Mark the batch completed once every partition is done; returns it then
+
+    Throughput is ``screened / elapsed`` of the final run when given, else
+    the batch's counters over its wall-clock time.
+    """
+    with transaction.atomic():
+        batch = ScreeningBatch.objects.select_for_update().get(pk=batch_id)
+        if batch.status != 'RUNNING' or pending_partitions(batch):
+            return None
+        batch.status = 'COMPLETED'
+        batch.end_time = timezone.now()
+        if screened is None or elapsed is None:
+            screened = batch.processed_records
+            elapsed = (batch.end_time - batch.start_time).total_seconds()
+        batch.metadata['elapsed_seconds'] = round(elapsed, 2)
+        batch.metadata['rows_per_second'] = round(screened / elapsed, 1) if elapsed else None
+        batch.save(update_fields=['status', 'end_time', 'metadata'])
+    logger.info(
+        f"Rescreen batch {batch.id} completed: {batch.processed_records} customers, "
+        f"{batch.matched_records} matched, {batch.metadata['rows_per_second']} rows/s"
+    )
+    return batch
+
+
+def fail_rescreen(batch_id, error: Exception) -> None:
+    ScreeningBatch.objects.filter(pk=batch_id).update(
+        status='FAILED',
+        end_time=timezone.now(),
+        error_details={'error': str(error)}
+    )
+
+
+def start_rescreen(batch: ScreeningBatch) -> ScreeningBatch:
+    """Mark a new or interrupted batch as running"""
+    if batch.status == 'COMPLETED':
+        raise ValueError(f"Batch {batch.id} has already completed")
+    batch.status = 'RUNNING'
+    batch.start_time = batch.start_time or timezone.now()
+    batch.error_details = None
+    batch.save(update_fields=['status', 'start_time', 'error_details'])
+    return batch
+
+
+def _pool_worker(args) -> int:
+    batch_id, key, chunk_size = args
+    return rescreen_partition(batch_id, key, chunk_size)
+
+
+def run_rescreen_pool(
+    batch: ScreeningBatch,
+    workers: int,
+    chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> ScreeningBatch:
+    """Run the pending partitions of ``batch`` on a forked local process pool"""
+    global _shared_index
+
+    start_rescreen(batch)
+    started = time.monotonic()
+    _shared_index = get_watchlist_index(force_refresh=True)
+    # Built once here and inherited by the forked workers, like the index
+    relationship_graph()
+    ScreeningBatch.objects.filter(pk=batch.pk).update(
+        metadata={**batch.metadata, 'watchlist_version': _shared_index.version}
+    )
+    work = [(batch.pk, key, chunk_size) for key in pending_partitions(batch)]
+
+    # Children open their own database connections; move the index out of
+    # the collector's reach so forked pages stay shared
+    connections.close_all()
+    gc.freeze()
+    screened = 0
+    try:
+        with multiprocessing.get_context('fork').Pool(workers) as pool:
+            for partition_screened in pool.imap_unordered(_pool_worker, work):
+                screened += partition_screened
+    except Exception as e:
+        logger.exception(f"Rescreen batch {batch.pk} failed")
+        fail_rescreen(batch.pk, e)
+    finally:
+        gc.unfreeze()
+        _shared_index = None
+
+    finished = finish_rescreen(batch.pk, screened, time.monotonic() - started)
+    return finished or ScreeningBatch.objects.get(pk=batch.pk)
+
+
+def rescreen_progress(batch: ScreeningBatch) -> Dict[str, object]:
+    """Progress summary of a rescreen batch"""
+    elapsed = ((batch.end_time or timezone.now()) - batch.start_time).total_seconds() if batch.start_time else 0
+    return {
+        'status': batch.status,
+        'total': batch.total_records,
+        'processed': batch.processed_records,
+        'matched': batch.matched_records,
+        'pending_partitions': len(pending_partitions(batch)),
+        'rows_per_second': round(batch.processed_records / elapsed, 1) if elapsed else None
+    }
@@ -0,0 +1,178 @@
+"""
+Screening of a single name against a watchlist index.
+
+Entries listing one of the party's identity document numbers are matched
+first; the name then goes through the matcher cascade (see ``matchers``):
+exact and phonetic key lookups, then token and edit distance scoring of
+fuzzy candidates retrieved from the index.
+
+Date of birth, nationality and country agreement with each candidate
+entry adjusts its name score: agreement raises it a little, a conflict
+lowers it. Candidates whose adjusted score could not reach the threshold
+even with a perfect name score are dropped before name scoring.
+"""
+from dataclasses import dataclass
+from datetime import date
+from typing import FrozenSet, List, Optional, Tuple
+
+from core.signals import risk_inputs_changed
+from ..models import WatchlistMatch
+from .identifiers import extract_identifiers
+from .matchers import (
+    DEFAULT_ATTRIBUTE_WEIGHTS,
+    AttributeWeights,
+    CascadeState,
+    MatcherCascade,
+    ScreeningQuery,
+    default_cascade
+)
+from .name_normalization import normalize_name, sorted_name
+from .phonetic import phonetic_key
+from .watchlist_index import IndexedName, WatchlistIndex
+
+# (watchlist name, match strength 0-1, match type)
+NameHit = Tuple[IndexedName, float, str]
+
+
+@dataclass(frozen=True)
+class PartyAttributes:
+    """Secondary attributes of a screened party; empty values are unknown"""
+    date_of_birth: Optional[date] = None
+    nationality: str = ''
+    country: str = ''
+    identifiers: FrozenSet[str] = frozenset()
+
+    @classmethod
+    def build(cls, date_of_birth=None, nationality='', country='', identifiers=None) -> 'PartyAttributes':
+        """Attributes with normalized nationality, country and identity document numbers"""
+        return cls(
+            date_of_birth=date_of_birth,
+            nationality=normalize_name(nationality or ''),
+            country=normalize_name(country or ''),
+            identifiers=frozenset(extract_identifiers(identifiers))
+        )
+
+    def __bool__(self) -> bool:
+        return bool(self.date_of_birth or self.nationality or self.country or self.identifiers)
+
+
+NO_ATTRIBUTES = PartyAttributes()
+
+
+def _comparable_places(a: str, b: str) -> bool:
+    """Both values are codes (``AE``, ``IRN``) or both are names; codes and names never conflict"""
+    return (len(a) <= 3) == (len(b) <= 3)
+
+
+def attribute_adjustment(
+    record: IndexedName,
+    attributes: PartyAttributes,
+    weights: AttributeWeights = DEFAULT_ATTRIBUTE_WEIGHTS
+) -> float:
+    """Score adjustment of a watchlist name from date of birth, nationality and country agreement"""
+    adjustment = 0.0
+    if attributes.date_of_birth and record.date_of_birth:
+        if attributes.date_of_birth == record.date_of_birth:
+            adjustment += weights.dob_match
+        elif abs(attributes.date_of_birth.year - record.date_of_birth.year) > weights.dob_year_tolerance:
+            adjustment -= weights.dob_conflict
+    for party_value, entry_value, match, conflict in (
+        (attributes.nationality, record.nationality, weights.nationality_match, weights.nationality_conflict),
+        (attributes.country, record.country, weights.country_match, weights.country_conflict),
+    ):
+        if not party_value or not entry_value:
+            continue
+        if party_value == entry_value:
+            adjustment += match
+        elif _comparable_places(party_value, entry_value):
+            adjustment -= conflict
+    return adjustment
+
+
+def screen_name(
+    index: WatchlistIndex,
+    name: str,
+    normalized: str = '',
+    sorted_normalized: str = '',
+    phonetic: str = '',
+    attributes: PartyAttributes = NO_ATTRIBUTES,
+    cascade: Optional[MatcherCascade] = None
+) -> List[NameHit]:
+    """
+    Watchlist names matching ``name``, one per watchlist entry
+
+    The stored name keys of the screened row can be passed in; they are
+    computed here only when missing (rows not yet backfilled). Names go
+    through the matcher cascade the index was built with unless
+    ``cascade`` is given.
+    """
+    cascade = cascade or index.matchers or default_cascade()
+
+    # An identity document number match needs no name matching
+    identified = index.identifier_matches(attributes.identifiers) if attributes.identifiers else []
+
+    normalized = normalized or normalize_name(name)
+    canonical = index.canonical(normalized)
+    # Stored phonetic keys only reflect the default word variants
+    if not phonetic or index.word_variants:
+        phonetic = phonetic_key(normalized, index.word_variants)
+    query = ScreeningQuery(
+        normalized=normalized,
+        canonical=canonical,
+        sorted_normalized=sorted_normalized or sorted_name(normalized),
+        sorted_canonical=sorted_name(canonical),
+        phonetic=phonetic
+    )
+    state = CascadeState(
+        query=query,
+        hits=[(record, 1.0, 'IDENTIFIER') for record in identified],
+        decided={record.entry_id for record in identified}
+    )
+    if attributes:
+        weights = cascade.attribute_weights
+        state.attribute_adjustment = lambda record: attribute_adjustment(record, attributes, weights)
+    return cascade.screen(index, state)
+
+
+def match_type_for(hit_type: str) -> str:
+    """
+    ``WatchlistMatch.match_type`` of a hit; identical after transliteration
+    and identity document number matches count as exact
+    """
+    return 'EXACT' if hit_type in ('TRANSLITERATION', 'IDENTIFIER') else hit_type
+
+
+def customer_matches(customer_id, name: str, hits: List[NameHit], version: str, **details) -> List[WatchlistMatch]:
+    """Unsaved customer-level watchlist matches for the hits of a screened customer"""
+    return [
+        WatchlistMatch(
+            entry_id=entry.entry_id,
+            customer_id=customer_id,
+            match_type=match_type_for(match_type),
+            match_score=match_strength * 100,
+            match_details={
+                'match_basis': match_type,
+                'watchlist_entry_id': entry.entry_id,
+                'watchlist_type': entry.source_type,
+                'matched_name': entry.name,
+                'party_name': name,
+                'watchlist_version': version,
+                **details
+            }
+        )
+        for entry, match_strength, match_type in hits
+    ]
+
+
+def save_matches(matches: List[WatchlistMatch]) -> None:
+    """Insert matches in one query; bulk_create skips save(), so hash here"""
+    if not matches:
+        return
+    for match in matches:
+        match.hash = match._generate_hash()
+    WatchlistMatch.objects.bulk_create(matches)
+    risk_inputs_changed.send(
+        sender=WatchlistMatch,
+        customer_ids={match.customer_id for match in matches},
+        reason='WATCHLIST_MATCH'
+    )
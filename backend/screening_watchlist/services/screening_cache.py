@@ -0,0 +1,155 @@
+"""
+Screening result cache.
+
+Repeat counterparties (large corporates, frequent beneficiaries) are
+screened on every transaction. Results of ``screen_name`` are cached under
+(normalized name, secondary party attributes, watchlist index version) in
+two tiers:
+
+* an in-process LRU, checked first and free of network round-trips;
+* the shared Redis cache, so a result computed by one worker is reused by
+  all of them.
+
+The index version is part of every key, so a watchlist refresh invalidates
+all cached results at once; the local tier is also emptied when it sees a
+new version. Cache errors never fail screening - the name is screened as
+if the cache were empty.
+"""
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import List, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .name_normalization import normalize_name
+from .screening import NO_ATTRIBUTES, NameHit, PartyAttributes, screen_name
+from .watchlist_index import WatchlistIndex
+
+logger = logging.getLogger(__name__)
+
+RESULT_CACHE_PREFIX = 'screening:result'
+
+
+def result_cache_key(version: str, normalized: str, attributes: PartyAttributes = NO_ATTRIBUTES) -> str:
+    """Shared cache key of a screening result"""
+    version_digest = hashlib.sha1(version.encode()).hexdigest()[:12]
+    subject = '\x1f'.join((
+        normalized,
+        attributes.date_of_birth.isoformat() if attributes.date_of_birth else '',
+        attributes.nationality,
+        attributes.country,
+        ','.join(sorted(attributes.identifiers))
+    ))
+    return f"{RESULT_CACHE_PREFIX}:{version_digest}:{hashlib.sha1(subject.encode()).hexdigest()}"
+
+
+class ScreeningResultCache:
+    """Two-tier (process LRU, then Redis) cache of screening results"""
+
+    def __init__(self, max_size: int, timeout: int):
+        self.max_size = max_size
+        self.timeout = timeout
+        self.hits = 0
+        self.misses = 0
+        self._local: 'OrderedDict[str, List[NameHit]]' = OrderedDict()
+        self._version = ''
+        self._lock = threading.Lock()
+
+    def _local_get(self, key: str) -> Optional[List[NameHit]]:
+        with self._lock:
+            hits = self._local.get(key)
+            if hits is not None:
+                self._local.move_to_end(key)
+            return hits
+
+    def _local_set(self, key: str, hits: List[NameHit]) -> None:
+        with self._lock:
+            self._local[key] = hits
+            self._local.move_to_end(key)
+            while len(self._local) > self.max_size:
+                self._local.popitem(last=False)
+
+    def _check_version(self, version: str) -> None:
+        """Drop local results of older watchlist versions"""
+        if version != self._version:
+            with self._lock:
+                if version != self._version:
+                    self._local.clear()
+                    self._version = version
+
+    def screen(
+        self,
+        index: WatchlistIndex,
+        name: str,
+        normalized: str = '',
+        sorted_normalized: str = '',
+        phonetic: str = '',
+        attributes: PartyAttributes = NO_ATTRIBUTES
+    ) -> List[NameHit]:
+        """``screen_name`` through the cache"""
+        normalized = normalized or normalize_name(name)
+        self._check_version(index.version)
+        key = result_cache_key(index.version, normalized, attributes)
+
+        hits = self._local_get(key)
+        if hits is None:
+            try:
+                hits = cache.get(key)
+            except Exception as e:
+                logger.warning(f"Screening result cache read failed: {str(e)}")
+            if hits is not None:
+                self._local_set(key, hits)
+        if hits is not None:
+            self.hits += 1
+            return hits
+
+        self.misses += 1
+        hits = screen_name(index, name, normalized, sorted_normalized, phonetic, attributes)
+        self._local_set(key, hits)
+        try:
+            cache.set(key, hits, timeout=self.timeout)
+        except Exception as e:
+            logger.warning(f"Screening result cache write failed: {str(e)}")
+        return hits
+
+    def clear(self) -> None:
+        with self._lock:
+            self._local.clear()
+
+
+_result_cache: Optional[ScreeningResultCache] = None
+_result_cache_lock = threading.Lock()
+
+
+def get_screening_cache() -> Optional[ScreeningResultCache]:
+    """Process-wide result cache; None when disabled (``SCREENING_RESULT_CACHE_SIZE = 0``)"""
+    global _result_cache
+
+    if settings.SCREENING_RESULT_CACHE_SIZE <= 0:
+        return None
+    if _result_cache is None:
+        with _result_cache_lock:
+            if _result_cache is None:
+                _result_cache = ScreeningResultCache(
+                    settings.SCREENING_RESULT_CACHE_SIZE,
+                    settings.SCREENING_RESULT_CACHE_TIMEOUT
+                )
+    return _result_cache
+
+
+def screen_name_cached(
+    index: WatchlistIndex,
+    name: str,
+    normalized: str = '',
+    sorted_normalized: str = '',
+    phonetic: str = '',
+    attributes: PartyAttributes = NO_ATTRIBUTES
+) -> List[NameHit]:
+    """``screen_name`` through the process-wide result cache, when enabled"""
+    result_cache = get_screening_cache()
+    if result_cache is None:
+        return screen_name(index, name, normalized, sorted_normalized, phonetic, attributes)
+    return result_cache.screen(index, name, normalized, sorted_normalized, phonetic, attributes)
@@ -0,0 +1,256 @@
+"""
+Write-behind recording of screening outcomes.
+
+Every screened name yields a ``ScreeningHistory`` row (matches found and
+processing time). Inserting each one synchronously would double the
+write load of screening, so rows are buffered per process and written
+with one ``bulk_create`` once ``max_size`` rows are waiting or the oldest
+has waited ``max_wait`` seconds, whichever comes first. Buffered rows are
+also flushed at process exit and by batch jobs when they finish; rows of
+a process that dies abruptly are lost, which only costs telemetry.
+
+Recent processing times are kept per configuration in memory for live
+latency percentiles; ``latency_percentiles`` aggregates the stored rows.
+"""
+import atexit
+import logging
+import threading
+import time
+from collections import defaultdict, deque
+from datetime import datetime, timedelta
+from typing import Deque, Dict, Iterable, List, Optional
+
+import numpy as np
+from django.conf import settings
+from django.db.models import Aggregate, Count, DurationField
+
+from ..models import ScreeningConfiguration, ScreeningHistory
+
+logger = logging.getLogger(__name__)
+
+LATENCY_PERCENTILES = (50, 95, 99)
+# Processing times kept per configuration for live percentiles
+LATENCY_WINDOW = 10000
+
+
+class PercentileCont(Aggregate):
+    """PostgreSQL ``percentile_cont`` ordered-set aggregate"""
+    function = 'PERCENTILE_CONT'
+    template = '%(function)s(%(fraction)s) WITHIN GROUP (ORDER BY %(expressions)s)'
+
+    def __init__(self, expression, fraction: float, **extra):
+        super().__init__(expression, fraction=float(fraction), **extra)
+
+
+def _percentiles_ms(seconds: Iterable[float]) -> Dict[str, float]:
+    values = np.fromiter(seconds, dtype=float)
+    if not len(values):
+        return {'count': 0}
+    return {
+        'count': len(values),
+        **{
+            f"p{percentile}": round(float(value) * 1000, 2)
+            for percentile, value in zip(LATENCY_PERCENTILES, np.percentile(values, LATENCY_PERCENTILES))
+        }
+    }
+
+
+class ScreeningHistoryRecorder:
+    """Buffer ``ScreeningHistory`` rows and bulk insert them by count or age"""
+
+    def __init__(self, max_size: int = 500, max_wait: float = 5.0):
+        self.max_size = max_size
+        self.max_wait = max_wait
+        self._pending: List[ScreeningHistory] = []
+        self._oldest: Optional[float] = None
+        self._latencies: Dict[str, Deque[float]] = defaultdict(lambda: deque(maxlen=LATENCY_WINDOW))
+        self._owners: Dict[str, str] = {}
+        self._condition = threading.Condition()
+        self._closed = False
+        self._timer = threading.Thread(target=self._run_timer, name='screening-history-timer', daemon=True)
+        self._timer.start()
+
+    def _owner(self, configuration_id: str) -> Optional[str]:
+        """
+        Creator of the configuration; records screenings that have no
+        acting user. None when the configuration no longer exists.
+        """
+        if configuration_id not in self._owners:
+            self._owners[configuration_id] = ScreeningConfiguration.objects.filter(
+                pk=configuration_id
+            ).values_list('created_by_id', flat=True).first()
+            if self._owners[configuration_id] is None:
+                logger.warning(f"Screening configuration {configuration_id} not found; its screenings are not recorded")
+        return self._owners[configuration_id]
+
+    def record(
+        self,
+        configuration_id,
+        entity_id,
+        entity_type: str,
+        hits: List[tuple],
+        started_at: datetime,
+        elapsed: float,
+        created_by_id=None,
+        **details
+    ) -> None:
+        """Queue the outcome of one screening; flushes immediately when the buffer is full"""
+        if not configuration_id:
+            return
+        configuration_id = str(configuration_id)
+        owner_id = self._owner(configuration_id)
+        if owner_id is None:
+            # The row could not be inserted, and would fail the whole batch with it
+            return
+        entry = ScreeningHistory(
+            entity_id=entity_id,
+            entity_type=entity_type,
+            configuration_id=configuration_id,
+            created_by_id=created_by_id or owner_id,
+            screening_date=started_at,
+            completion_date=started_at + timedelta(seconds=elapsed),
+            status='COMPLETED',
+            matches_found=[
+                {
+                    'watchlist_entry_id': record.entry_id,
+                    'matched_name': record.name,
+                    'match_type': match_type,
+                    'match_score': round(match_strength * 100, 2)
+                }
+                for record, match_strength, match_type in hits
+            ],
+            processing_time=timedelta(seconds=elapsed),
+            metadata=details
+        )
+        entry.hash = entry._generate_hash()
+
+        with self._condition:
+            self._latencies[configuration_id].append(elapsed)
+            self._pending.append(entry)
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+                self._condition.notify()
+            if len(self._pending) < self.max_size:
+                return
+            batch = self._take()
+        self._flush(batch)
+
+    def latency_percentiles(self) -> Dict[str, Dict[str, float]]:
+        """Percentiles (ms) of the recent processing times of this process, per configuration id"""
+        with self._condition:
+            latencies = {configuration_id: list(values) for configuration_id, values in self._latencies.items()}
+        return {configuration_id: _percentiles_ms(values) for configuration_id, values in latencies.items()}
+
+    def flush(self) -> None:
+        """Write whatever is waiting"""
+        with self._condition:
+            batch = self._take()
+        self._flush(batch)
+
+    def close(self) -> None:
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        self.flush()
+
+    def _take(self) -> List[ScreeningHistory]:
+        batch, self._pending, self._oldest = self._pending, [], None
+        return batch
+
+    def _flush(self, batch: List[ScreeningHistory]) -> None:
+        if not batch:
+            return
+        try:
+            ScreeningHistory.objects.bulk_create(batch, batch_size=self.max_size)
+        except Exception as e:
+            logger.error(f"Failed to write {len(batch)} screening history rows: {str(e)}")
+
+    def _run_timer(self) -> None:
+        while True:
+            with self._condition:
+                while self._oldest is None and not self._closed:
+                    self._condition.wait()
+                if self._closed:
+                    return
+                remaining = self._oldest + self.max_wait - time.monotonic()
+                if remaining > 0:
+                    self._condition.wait(remaining)
+                    continue
+                batch = self._take()
+            self._flush(batch)
+
+
+_recorder: Optional[ScreeningHistoryRecorder] = None
+_recorder_lock = threading.Lock()
+
+
+def get_history_recorder() -> Optional[ScreeningHistoryRecorder]:
+    """Process-wide recorder; None when disabled (``SCREENING_HISTORY_BATCH_SIZE = 0``)"""
+    global _recorder
+
+    if settings.SCREENING_HISTORY_BATCH_SIZE <= 0:
+        return None
+    if _recorder is None:
+        with _recorder_lock:
+            if _recorder is None:
+                _recorder = ScreeningHistoryRecorder(
+                    max_size=settings.SCREENING_HISTORY_BATCH_SIZE,
+                    max_wait=settings.SCREENING_HISTORY_BATCH_WAIT_SECONDS
+                )
+                atexit.register(_recorder.close)
+    return _recorder
+
+
+def record_screening(
+    cascade,
+    entity_id,
+    entity_type: str,
+    hits: List[tuple],
+    started_at: datetime,
+    elapsed: float,
+    created_by_id=None,
+    **details
+) -> None:
+    """Queue a screening outcome under the configuration of ``cascade``, when recording is enabled"""
+    recorder = get_history_recorder()
+    if recorder is not None and cascade is not None:
+        recorder.record(
+            cascade.configuration_id, entity_id, entity_type, hits,
+            started_at, elapsed, created_by_id, **details
+        )
+
+
+def flush_screening_history() -> None:
+    """Write buffered history rows now (end of a batch job)"""
+    if _recorder is not None:
+        _recorder.flush()
+
+
+def latency_percentiles(since: Optional[datetime] = None) -> Dict[str, Dict[str, float]]:
+    """
+    Processing time percentiles (ms) of stored screenings, per configuration name
+
+    Computed in the database; covers every process, unlike
+    ``ScreeningHistoryRecorder.latency_percentiles``.
+    """
+    history = ScreeningHistory.objects.filter(processing_time__isnull=False)
+    if since is not None:
+        history = history.filter(screening_date__gte=since)
+    rows = history.values('configuration__name').annotate(
+        count=Count('id'),
+        **{
+            f"p{percentile}": PercentileCont('processing_time', percentile / 100, output_field=DurationField())
+            for percentile in LATENCY_PERCENTILES
+        }
+    ).order_by('configuration__name')
+    return {
+        row['configuration__name']: {
+            'count': row['count'],
+            **{
+                f"p{percentile}": round(row[f"p{percentile}"].total_seconds() * 1000, 2)
+                for percentile in LATENCY_PERCENTILES
+            }
+        }
+        for row in rows
+    }
+
@@ -0,0 +1,148 @@
+"""
+Transliteration of names into a canonical Latin form.
+
+Arabic-script (Arabic, Farsi, Urdu) and Cyrillic names are transliterated
+letter by letter into Latin, then common word-level spelling variants are
+folded together (``el``/``ul`` -> ``al``, ``ibn``/``ben`` -> ``bin``, and
+``Abdul Rahman``/``Abd al-Rahman``/``عبد الرحمن`` -> one ``abd...`` token).
+The result is used at index time so that cross-script renderings of the
+same name (Mohammed / Muhammad / محمد) share tokens, n-grams and phonetic
+keys, and can be found by index lookup rather than pairwise comparison.
+
+Extra word variants come from active ``NameMatchingRule`` rows with the
+``TRANSLITERATION`` algorithm, e.g.
+``{"word_variants": {"mohd": "mohammed", "md": "mohammed"}}``.
+"""
+import re
+from typing import Dict, List, Optional
+
+from .name_normalization import name_tokens, normalize_name
+
+# Arabic, Farsi and Urdu letters, after NFKD has split hamza carriers
+ARABIC_LATIN: Dict[str, str] = {
+    'ا': 'a', 'ٱ': 'a', 'ب': 'b', 'پ': 'p', 'ت': 't', 'ٹ': 't', 'ث': 'th',
+    'ج': 'j', 'چ': 'ch', 'ح': 'h', 'خ': 'kh', 'د': 'd', 'ڈ': 'd', 'ذ': 'dh',
+    'ر': 'r', 'ڑ': 'r', 'ز': 'z', 'ژ': 'zh', 'س': 's', 'ش': 'sh', 'ص': 's',
+    'ض': 'd', 'ط': 't', 'ظ': 'z', 'غ': 'gh', 'ف': 'f', 'ق': 'q', 'ك': 'k',
+    'ک': 'k', 'گ': 'g', 'ل': 'l', 'م': 'm', 'ن': 'n', 'ں': 'n', 'ه': 'h',
+    'ہ': 'h', 'ھ': 'h', 'ة': 'a', 'ۃ': 'a', 'ى': 'a', 'ے': 'e', 'ء': '',
+}
+# Letters read as a consonant at the start of a word and as a vowel elsewhere
+ARABIC_POSITIONAL: Dict[str, tuple] = {
+    'و': ('w', 'u'),
+    'ي': ('y', 'i'),
+    'ی': ('y', 'i'),
+    'ع': ('a', ''),
+}
+ARABIC_ARTICLE = 'ال'
+
+CYRILLIC_LATIN: Dict[str, str] = {
+    'а': 'a', 'б': 'b', 'в': 'v', 'г': 'g', 'д': 'd', 'е': 'e', 'ё': 'e',
+    'ж': 'zh', 'з': 'z', 'и': 'i', 'й': 'y', 'к': 'k', 'л': 'l', 'м': 'm',
+    'н': 'n', 'о': 'o', 'п': 'p', 'р': 'r', 'с': 's', 'т': 't', 'у': 'u',
+    'ф': 'f', 'х': 'kh', 'ц': 'ts', 'ч': 'ch', 'ш': 'sh', 'щ': 'shch',
+    'ъ': '', 'ы': 'y', 'ь': '', 'э': 'e', 'ю': 'yu', 'я': 'ya',
+    'і': 'i', 'ї': 'yi', 'є': 'ye', 'ґ': 'g',
+}
+
+DEFAULT_WORD_VARIANTS: Dict[str, str] = {
+    'el': 'al',
+    'ul': 'al',
+    'ibn': 'bin',
+    'ben': 'bin',
+    'bn': 'bin',
+}
+# "abd" compounds are written joined or split: Abdulrahman, Abdul Rahman, عبد الرحمن
+ABD_PREFIX = 'abd'
+ABD_LINKS = ('al', 'ul', 'el', 'ol', 'u', 'a', 'e', 'i')
+
+_ARABIC_RE = re.compile(r'[؀-ۿ]')
+_CYRILLIC_RE = re.compile(r'[Ѐ-ӿ]')
+
+
+def _arabic_token(token: str) -> List[str]:
+    """Transliterate one Arabic-script token; the article becomes its own token"""
+    tokens = []
+    if token.startswith(ARABIC_ARTICLE) and len(token) > len(ARABIC_ARTICLE) + 1:
+        tokens.append('al')
+        token = token[len(ARABIC_ARTICLE):]
+    letters = []
+    for position, char in enumerate(token):
+        if char in ARABIC_POSITIONAL:
+            initial, medial = ARABIC_POSITIONAL[char]
+            letters.append(initial if position == 0 else medial)
+        else:
+            letters.append(ARABIC_LATIN.get(char, ''))
+    tokens.append(''.join(letters))
+    return [token for token in tokens if token]
+
+
+def _cyrillic_token(token: str) -> str:
+    return ''.join(CYRILLIC_LATIN.get(char, char) for char in token)
+
+
+def transliterate_tokens(normalized_name: str) -> List[str]:
+    """Latin tokens of a normalized name, whatever its script"""
+    tokens = []
+    for token in name_tokens(normalized_name):
+        if _ARABIC_RE.search(token):
+            tokens.extend(_arabic_token(token))
+        elif _CYRILLIC_RE.search(token):
+            tokens.append(_cyrillic_token(token))
+        else:
+            tokens.append(token)
+    return tokens
+
+
+def _join_abd_compounds(tokens: List[str]) -> List[str]:
+    """Abd al Rahman / Abdul Rahman / Abdel Rahman -> abdalrahman"""
+    joined = []
+    i = 0
+    while i < len(tokens):
+        token = tokens[i]
+        if token.startswith(ABD_PREFIX) and i + 1 < len(tokens):
+            link = token[len(ABD_PREFIX):]
+            if link == '' and tokens[i + 1] in ABD_LINKS and i + 2 < len(tokens):
+                joined.append(ABD_PREFIX + 'al' + tokens[i + 2])
+                i += 3
+                continue
+            if link == '':
+                joined.append(ABD_PREFIX + tokens[i + 1])
+                i += 2
+                continue
+            if link in ABD_LINKS:
+                joined.append(ABD_PREFIX + 'al' + tokens[i + 1])
+                i += 2
+                continue
+        joined.append(token)
+        i += 1
+    return joined
+
+
+def canonical_tokens(name: str, word_variants: Optional[Dict[str, str]] = None) -> List[str]:
+    """Transliterated, variant-folded tokens of a name"""
+    variants = {**DEFAULT_WORD_VARIANTS, **(word_variants or {})}
+    tokens = []
+    for token in transliterate_tokens(normalize_name(name)):
+        tokens.extend(variants.get(token, token).split())
+    return _join_abd_compounds(tokens)
+
+
+def canonical_name(name: str, word_variants: Optional[Dict[str, str]] = None) -> str:
+    """Canonical Latin form of a name"""
+    return ' '.join(canonical_tokens(name, word_variants))
+
+
+def load_word_variants() -> Dict[str, str]:
+    """Word variants configured on active TRANSLITERATION name matching rules"""
+    from ..models import NameMatchingRule
+
+    variants: Dict[str, str] = {}
+    configs = NameMatchingRule.objects.filter(
+        is_active=True,
+        matching_algorithm='TRANSLITERATION'
+    ).values_list('algorithm_config', flat=True)
+    for config in configs:
+        for variant, canonical in (config or {}).get('word_variants', {}).items():
+            variants[normalize_name(variant)] = normalize_name(canonical)
+    return variants
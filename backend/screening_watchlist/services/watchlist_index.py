@@ -0,0 +1,409 @@
+"""
+In-memory candidate retrieval index over watchlist entry names.
+
+Screening used to score every active ``WatchlistEntry`` for every party.
+The index keeps inverted postings of normalized name tokens and character
+n-grams so that a query only touches entries sharing rare features with
+it; only the returned candidates go on to full similarity scoring.
+
+Every name is also indexed under its canonical Latin transliteration, so
+an Arabic-script or Cyrillic query reaches Latin-script entries (and the
+other way round) through the same postings. Identity document numbers of
+the entries are kept in an exact-lookup map.
+"""
+import logging
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import date
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.db.models import Count, Max
+
+from ..models import NameMatchingRule, ScreeningConfiguration, WatchlistEntry, WatchlistSource
+from .identifiers import extract_identifiers
+from .matchers import MatcherCascade, load_matcher_cascade
+from .name_normalization import name_ngrams, name_tokens, normalize_name, sorted_name
+from .phonetic import phonetic_key
+from .transliteration import canonical_name, load_word_variants
+
+logger = logging.getLogger(__name__)
+
+ALIAS_SEPARATORS = (';', '|')
+
+
+@dataclass(frozen=True)
+class IndexedName:
+    """A single searchable name (primary name or alias) of a watchlist entry"""
+    entry_id: str
+    name: str
+    normalized: str
+    source: str
+    source_type: str
+    is_alias: bool = False
+    phonetic: str = ''
+    # Canonical Latin transliteration; empty when equal to ``normalized``
+    canonical: str = ''
+    # Secondary attributes of the entry, used to adjust name scores
+    date_of_birth: Optional[date] = None
+    nationality: str = ''
+    country: str = ''
+    # Normalized identity document numbers; set on the primary name only
+    identifiers: Tuple[str, ...] = ()
+
+    @property
+    def comparable(self) -> str:
+        """Form of the name used for scoring against canonical queries"""
+        return self.canonical or self.normalized
+
+
+@dataclass(frozen=True)
+class Candidate:
+    """A watchlist name returned by candidate retrieval"""
+    record: IndexedName
+    retrieval_score: float
+
+
+class WatchlistIndex:
+    """
+    Inverted index over watchlist names
+
+    Postings whose document frequency exceeds ``max_df_ratio`` of the index
+    (very common n-grams such as ``#al``) are skipped at query time, which
+    keeps the cost of a lookup bounded by the rare features of the query
+    rather than by the size of the list.
+    """
+    MIN_POSTINGS_CAP = 1000
+
+    def __init__(
+        self,
+        records: Iterable[IndexedName],
+        version: str = '',
+        max_df_ratio: float = 0.05,
+        min_ngram_overlap: float = 0.35,
+        word_variants: Optional[Dict[str, str]] = None,
+        matchers: Optional[MatcherCascade] = None
+    ):
+        self.version = version
+        self.word_variants = word_variants or {}
+        # Matcher cascade of the screening configuration the index was built with
+        self.matchers = matchers
+        self.max_df_ratio = max_df_ratio
+        self.min_ngram_overlap = min_ngram_overlap
+        self.records: List[IndexedName] = []
+        self._token_postings: Dict[str, List[int]] = defaultdict(list)
+        self._ngram_postings: Dict[str, List[int]] = defaultdict(list)
+        self._exact_keys: Dict[str, List[int]] = defaultdict(list)
+        self._phonetic_keys: Dict[str, List[int]] = defaultdict(list)
+        self._canonical_keys: Dict[str, List[int]] = defaultdict(list)
+        self._identifier_keys: Dict[str, List[int]] = defaultdict(list)
+        self._build(records)
+        self.built_at = time.monotonic()
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def _build(self, records: Iterable[IndexedName]) -> None:
+        for record in records:
+            if not record.normalized:
+                continue
+            position = len(self.records)
+            self.records.append(record)
+            tokens = set(name_tokens(record.normalized))
+            grams = set(name_ngrams(record.normalized))
+            if record.canonical:
+                tokens.update(name_tokens(record.canonical))
+                grams.update(name_ngrams(record.canonical))
+                self._canonical_keys[sorted_name(record.canonical)].append(position)
+            for token in tokens:
+                self._token_postings[token].append(position)
+            for gram in grams:
+                self._ngram_postings[gram].append(position)
+            self._exact_keys[sorted_name(record.normalized)].append(position)
+            if record.phonetic:
+                self._phonetic_keys[record.phonetic].append(position)
+            for number in record.identifiers:
+                self._identifier_keys[number].append(position)
+        self._token_postings = dict(self._token_postings)
+        self._ngram_postings = dict(self._ngram_postings)
+        self._exact_keys = dict(self._exact_keys)
+        self._phonetic_keys = dict(self._phonetic_keys)
+        self._canonical_keys = dict(self._canonical_keys)
+        self._identifier_keys = dict(self._identifier_keys)
+
+    @property
+    def max_postings(self) -> int:
+        """Longest posting list still used at query time"""
+        return max(self.MIN_POSTINGS_CAP, int(len(self.records) * self.max_df_ratio))
+
+    def canonical(self, name: str) -> str:
+        """Canonical Latin form of a name, with this index's word variants"""
+        return canonical_name(name, self.word_variants)
+
+    def key_matches(
+        self,
+        sorted_normalized: str,
+        phonetic: str = '',
+        sorted_canonical: str = ''
+    ) -> List[Tuple[IndexedName, str]]:
+        """
+        Names sharing the token-sorted normalized form (``EXACT``), the
+        token-sorted canonical transliteration (``TRANSLITERATION``) or the
+        phonetic key (``PHONETIC``) with the query, one per watchlist entry
+        """
+        best: Dict[str, Tuple[IndexedName, str]] = {}
+        for position in self._exact_keys.get(sorted_normalized, ()):
+            record = self.records[position]
+            best.setdefault(record.entry_id, (record, 'EXACT'))
+        if sorted_canonical:
+            # Records are keyed here only when their canonical form differs
+            # from the normalized one, so look up both maps
+            positions = (
+                self._canonical_keys.get(sorted_canonical, []) +
+                self._exact_keys.get(sorted_canonical, [])
+            )
+            for position in positions:
+                record = self.records[position]
+                best.setdefault(record.entry_id, (record, 'TRANSLITERATION'))
+        for position in self._phonetic_keys.get(phonetic, ()) if phonetic else ():
+            record = self.records[position]
+            best.setdefault(record.entry_id, (record, 'PHONETIC'))
+        return list(best.values())
+
+    def identifier_matches(self, numbers: Iterable[str]) -> List[IndexedName]:
+        """Entries listing one of the normalized identity document ``numbers``, one per entry"""
+        best: Dict[str, IndexedName] = {}
+        for number in numbers:
+            for position in self._identifier_keys.get(number, ()):
+                record = self.records[position]
+                best.setdefault(record.entry_id, record)
+        return list(best.values())
+
+    def candidates(self, name: str, limit: Optional[int] = None) -> List[Candidate]:
+        """
+        Return the best candidate names for ``name``, one per watchlist entry,
+        ordered by retrieval score
+        """
+        if limit is None:
+            limit = settings.SCREENING_MAX_CANDIDATES
+
+        normalized = normalize_name(name)
+        canonical = self.canonical(normalized)
+        best: Dict[str, Candidate] = {}
+        # Cross-script queries are retrieved through their transliteration
+        for form in {normalized, canonical}:
+            self._collect_candidates(form, best)
+
+        ranked = sorted(best.values(), key=lambda c: c.retrieval_score, reverse=True)
+        return ranked[:limit]
+
+    def retrieves(
+        self,
+        normalized: str,
+        sorted_normalized: str = '',
+        phonetic: str = '',
+        identifiers: Iterable[str] = ()
+    ) -> bool:
+        """
+        Whether screening the name would consider any entry of the index,
+        through a document number, a name key or fuzzy retrieval; cheaper
+        than screening since nothing is scored
+        """
+        if identifiers and self.identifier_matches(identifiers):
+            return True
+        if not phonetic or self.word_variants:
+            phonetic = phonetic_key(normalized, self.word_variants)
+        sorted_canonical = sorted_name(self.canonical(normalized))
+        if self.key_matches(sorted_normalized or sorted_name(normalized), phonetic, sorted_canonical):
+            return True
+        return bool(self.candidates(normalized, limit=1))
+
+    def _collect_candidates(self, normalized: str, best: Dict[str, Candidate]) -> None:
+        """Score records sharing features with one form of the query into ``best``"""
+        tokens = set(name_tokens(normalized))
+        grams = name_ngrams(normalized)
+        if not tokens:
+            return
+
+        max_postings = self.max_postings
+        token_hits: Dict[int, int] = defaultdict(int)
+        for token in tokens:
+            postings = self._token_postings.get(token)
+            if postings and len(postings) <= max_postings:
+                for position in postings:
+                    token_hits[position] += 1
+
+        gram_hits: Dict[int, int] = defaultdict(int)
+        usable_grams = 0
+        for gram in grams:
+            postings = self._ngram_postings.get(gram)
+            if not postings or len(postings) > max_postings:
+                continue
+            usable_grams += 1
+            for position in postings:
+                gram_hits[position] += 1
+
+        for position in set(token_hits) | set(gram_hits):
+            overlap = gram_hits.get(position, 0) / usable_grams if usable_grams else 0.0
+            token_score = token_hits.get(position, 0) / len(tokens)
+            if overlap < self.min_ngram_overlap and not token_score:
+                continue
+            record = self.records[position]
+            score = max(overlap, token_score)
+            current = best.get(record.entry_id)
+            if current is None or score > current.retrieval_score:
+                best[record.entry_id] = Candidate(record=record, retrieval_score=score)
+
+
+def _split_aliases(alias: str) -> List[str]:
+    """Split the free-text alias column into individual names"""
+    if not alias:
+        return []
+    for separator in ALIAS_SEPARATORS:
+        alias = alias.replace(separator, ',')
+    return [part.strip() for part in alias.split(',') if part.strip()]
+
+
+def get_watchlist_version() -> str:
+    """
+    Version stamp of the active watchlists
+
+    Changes whenever a ``WatchlistSource`` is refreshed (``last_updated``)
+    or a source is added or deactivated, and whenever the name matching
+    rules or screening configurations the index is built with change.
+    """
+    summary = WatchlistSource.objects.filter(is_active=True).aggregate(
+        latest=Max('last_updated'),
+        sources=Count('id')
+    )
+    rules = NameMatchingRule.objects.aggregate(
+        latest=Max('updated_at'),
+        rules=Count('id')
+    )
+    configurations = ScreeningConfiguration.objects.filter(screening_type='NAME').aggregate(
+        latest=Max('updated_at'),
+        configurations=Count('id')
+    )
+    latest = summary['latest'].isoformat() if summary['latest'] else 'never'
+    rules_latest = rules['latest'].isoformat() if rules['latest'] else 'never'
+    configurations_latest = configurations['latest'].isoformat() if configurations['latest'] else 'never'
+    return (
+        f"{latest}:{summary['sources']}:{rules_latest}:{rules['rules']}:"
+        f"{configurations_latest}:{configurations['configurations']}"
+    )
+
+
+def build_watchlist_index(
+    version: Optional[str] = None,
+    entry_ids: Optional[Iterable] = None
+) -> WatchlistIndex:
+    """
+    Load all active watchlist entries and build a fresh index
+
+    With ``entry_ids`` only those entries are indexed (e.g. the added and
+    changed entries of a watchlist delta).
+    """
+    if version is None:
+        version = get_watchlist_version()
+
+    source_types = dict(WatchlistSource.objects.values_list('name', 'source_type'))
+    entries = WatchlistEntry.objects.filter(is_active=True)
+    if entry_ids is not None:
+        entries = entries.filter(id__in=list(entry_ids))
+    entries = entries.values_list(
+        'id', 'name', 'normalized_name', 'phonetic_key', 'alias', 'source',
+        'date_of_birth', 'nationality', 'country', 'identifiers'
+    )
+
+    word_variants = load_word_variants()
+
+    def transliteration_keys(normalized: str, phonetic: str = '') -> Dict[str, str]:
+        canonical = canonical_name(normalized, word_variants)
+        # Stored phonetic keys only reflect the default word variants
+        if not phonetic or word_variants:
+            phonetic = phonetic_key(normalized, word_variants)
+        return {
+            'phonetic': phonetic,
+            'canonical': canonical if canonical != normalized else ''
+        }
+
+    def records():
+        for (
+            entry_id, name, normalized, phonetic, alias, source,
+            date_of_birth, nationality, country, identifiers
+        ) in entries.iterator(chunk_size=5000):
+            source_type = source_types.get(source, source)
+            attributes = {
+                'date_of_birth': date_of_birth,
+                'nationality': normalize_name(nationality or ''),
+                'country': normalize_name(country or '')
+            }
+            # Stored keys are used when present (see backfill_name_keys)
+            normalized = normalized or normalize_name(name)
+            yield IndexedName(
+                entry_id=str(entry_id),
+                name=name,
+                normalized=normalized,
+                source=source,
+                source_type=source_type,
+                identifiers=tuple(sorted(extract_identifiers(identifiers))),
+                **attributes,
+                **transliteration_keys(normalized, phonetic)
+            )
+            for alias_name in _split_aliases(alias):
+                alias_normalized = normalize_name(alias_name)
+                yield IndexedName(
+                    entry_id=str(entry_id),
+                    name=alias_name,
+                    normalized=alias_normalized,
+                    source=source,
+                    source_type=source_type,
+                    is_alias=True,
+                    **attributes,
+                    **transliteration_keys(alias_normalized)
+                )
+
+    started = time.monotonic()
+    index = WatchlistIndex(
+        records(),
+        version=version,
+        word_variants=word_variants,
+        matchers=load_matcher_cascade()
+    )
+    logger.info(
+        f"Built watchlist index version {version} with {len(index)} names "
+        f"in {time.monotonic() - started:.2f}s"
+    )
+    return index
+
+
+_index: Optional[WatchlistIndex] = None
+_index_lock = threading.Lock()
+_last_version_check = 0.0
+
+
+def get_watchlist_index(force_refresh: bool = False) -> WatchlistIndex:
+    """
+    Process-wide watchlist index
+
+    The watchlist version is re-checked at most every
+    ``SCREENING_INDEX_VERSION_CHECK_SECONDS``; the index is rebuilt only
+    when the version has changed.
+    """
+    global _index, _last_version_check
+
+    now = time.monotonic()
+    if (
+        not force_refresh and _index is not None and
+        now - _last_version_check < settings.SCREENING_INDEX_VERSION_CHECK_SECONDS
+    ):
+        return _index
+
+    with _index_lock:
+        version = get_watchlist_version()
+        _last_version_check = time.monotonic()
+        if force_refresh or _index is None or _index.version != version:
+            _index = build_watchlist_index(version)
+        return _index
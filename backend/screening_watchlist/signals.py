@@ -0,0 +1,34 @@
+"""
+Screening Watchlist signals
+"""
+from django.db import transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from .models import WatchlistProvider, WatchlistSource
+from .tasks import screen_watchlist_delta
+
+def _refreshed(instance, update_fields) -> bool:
+    """A save that may carry new list content (not e.g. a status-only update)"""
+    return instance.is_active and (update_fields is None or 'last_updated' in update_fields)
+
+@receiver(post_save, sender=WatchlistSource)
+def screen_source_delta(sender, instance, update_fields=None, **kwargs):
+    """
+    Delta-screen customers once a refreshed watchlist source is committed
+    """
+    if _refreshed(instance, update_fields):
+        sources = [instance.name]
+        transaction.on_commit(lambda: screen_watchlist_delta.delay(sources))
+
+@receiver(post_save, sender=WatchlistProvider)
+def screen_provider_delta(sender, instance, update_fields=None, **kwargs):
+    """
+    Delta-screen customers against every source of a refreshed provider
+    """
+    if _refreshed(instance, update_fields):
+        sources = list(WatchlistSource.objects.filter(
+            provider=instance.name,
+            is_active=True
+        ).values_list('name', flat=True))
+        if sources:
+            transaction.on_commit(lambda: screen_watchlist_delta.delay(sources))
@@ -0,0 +1,75 @@
+from celery import group, shared_task
+from django.core.cache import cache
+from .models import ScreeningBatch
+from .services.delta_screening import run_delta_screening
+from .services.rescreen import (
+    DEFAULT_CHUNK_SIZE,
+    fail_rescreen,
+    finish_rescreen,
+    pending_partitions,
+    rescreen_partition,
+    start_rescreen
+)
+from typing import List, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+# One delta screening at a time, so two refreshes never screen the same delta twice
+DELTA_SCREENING_LOCK = 'screening:delta:lock'
+DELTA_SCREENING_LOCK_TIMEOUT = 6 * 60 * 60
+
+@shared_task(bind=True, max_retries=12, default_retry_delay=300)
+def screen_watchlist_delta(self, sources: Optional[List[str]] = None) -> Optional[str]:
+    """
+    Screen customers against the entries added or changed since the last
+    delta screening of ``sources`` (all sources by default)
+    """
+    if not cache.add(DELTA_SCREENING_LOCK, self.request.id or True, DELTA_SCREENING_LOCK_TIMEOUT):
+        # Picks up this refresh once the running delta has finished
+        raise self.retry()
+
+    try:
+        batch = run_delta_screening(sources)
+    finally:
+        cache.delete(DELTA_SCREENING_LOCK)
+
+    if batch is None:
+        logger.info(f"No watchlist changes to screen for sources {sources or 'all'}")
+        return None
+    return str(batch.id)
+
+@shared_task
+def rescreen_customers(batch_id: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> None:
+    """
+    Fan the pending partitions of a rescreen batch out as Celery tasks
+
+    Running it again for an interrupted batch resumes each partition from
+    its checkpoint.
+    """
+    batch = start_rescreen(ScreeningBatch.objects.get(pk=batch_id))
+    pending = pending_partitions(batch)
+    if not pending:
+        # Every partition finished before the interruption; no task is left
+        # to complete the batch
+        finish_rescreen(batch_id)
+        return
+    group(
+        rescreen_customer_partition.s(batch_id, key, chunk_size)
+        for key in pending
+    ).apply_async()
+
+@shared_task
+def rescreen_customer_partition(batch_id: str, key: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> int:
+    """
+    Screen one customer partition of a rescreen batch; the last partition
+    to finish completes the batch
+    """
+    try:
+        screened = rescreen_partition(batch_id, key, chunk_size)
+    except Exception as e:
+        logger.error(f"Rescreen batch {batch_id} partition {key} failed: {str(e)}")
+        fail_rescreen(batch_id, e)
+        raise
+    finish_rescreen(batch_id)
+    return screened
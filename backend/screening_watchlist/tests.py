@@ -1,3 +1,668 @@
-from django.test import TestCase
+import asyncio
+import io
+import time
+from datetime import date, datetime
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from customer_management.models import Customer
+from .models import ScreeningConfiguration, ScreeningHistory, WatchlistEntry, WatchlistMatch, WatchlistSource
+
+from .services.name_normalization import normalize_name, sorted_name
+from .services.name_keys import name_keys
+from .services import screening_history
+from .services.delta_screening import WatchlistDelta, entry_fingerprint, run_delta_screening
+from .services.identifiers import extract_identifiers
+from .services.list_loader import ParsedEntry, load_watchlist, parse_csv, parse_eu_xml, parse_ofac_xml, parse_un_xml
+from .services.matchers import MatcherCascade
+from .services.name_scoring import score_name_matrix, score_names
+from .services.phonetic import phonetic_key
+from .services import realtime_screening
+from .services.realtime_screening import ScreeningRequest, screen_party
+from .services.rescreen import create_rescreen_batch, partition_bounds
+from .services.screening import (
+    NO_ATTRIBUTES,
+    PartyAttributes,
+    attribute_adjustment,
+    match_type_for,
+    screen_name
+)
+from .services.screening_cache import ScreeningResultCache, result_cache_key
+from .services.screening_history import ScreeningHistoryRecorder
+from .services.transliteration import canonical_name
+from .services.watchlist_index import IndexedName, WatchlistIndex, build_watchlist_index, get_watchlist_index
+from .tasks import rescreen_customers
+
+
+def _record(entry_id, name, source_type='SANCTIONS', is_alias=False, **attributes):
+    normalized = normalize_name(name)
+    canonical = canonical_name(name)
+    return IndexedName(
+        entry_id=entry_id,
+        name=name,
+        normalized=normalized,
+        source='OFAC SDN',
+        source_type=source_type,
+        is_alias=is_alias,
+        phonetic=phonetic_key(name),
+        canonical=canonical if canonical != normalized else '',
+        **attributes
+    )
+
+
+class NameNormalizationTests(SimpleTestCase):
+    def test_normalize_name_strips_accents_and_punctuation(self):
+        self.assertEqual(normalize_name("  José  O'Neil-Díaz "), 'jose o neil diaz')
+
+    def test_normalize_name_keeps_arabic_letters(self):
+        self.assertEqual(normalize_name('محمد علي'), 'محمد علي')
+
+
+class WatchlistIndexTests(SimpleTestCase):
+    def setUp(self):
+        self.index = WatchlistIndex([
+            _record('1', 'Viktor Bout'),
+            _record('1', 'Victor Butt', is_alias=True),
+            _record('2', 'Acme Trading LLC'),
+            _record('3', 'Global Shipping Company'),
+            _record('4', 'Abdul Rahman Yousef'),
+        ], version='v1')
+
+    def test_exact_name_is_top_candidate(self):
+        candidates = self.index.candidates('Viktor Bout', limit=5)
+        self.assertEqual(candidates[0].record.entry_id, '1')
+
+    def test_misspelled_name_is_retrieved(self):
+        candidates = self.index.candidates('Wiktor Boutt', limit=5)
+        self.assertIn('1', [c.record.entry_id for c in candidates])
+
+    def test_one_candidate_per_entry(self):
+        candidates = self.index.candidates('Victor Bout', limit=5)
+        entry_ids = [c.record.entry_id for c in candidates]
+        self.assertEqual(len(entry_ids), len(set(entry_ids)))
+
+    def test_cyrillic_name_is_retrieved(self):
+        candidates = self.index.candidates('Виктор Бут', limit=5)
+        self.assertEqual(candidates[0].record.entry_id, '1')
+
+    def test_unrelated_name_returns_no_candidates(self):
+        self.assertEqual(self.index.candidates('Zzyzx Qwerty', limit=5), [])
+
+    def test_key_matches(self):
+        keys = name_keys('Bout Viktor')
+        self.assertEqual(
+            [(record.entry_id, match_type) for record, match_type in self.index.key_matches(keys.sorted_name)],
+            [('1', 'EXACT')]
+        )
+        keys = name_keys('Wiktor Boutt')
+        matches = self.index.key_matches(keys.sorted_name, keys.phonetic_key)
+        self.assertEqual([(r.entry_id, t) for r, t in matches], [])
+        keys = name_keys('Vicktor Boute')
+        matches = self.index.key_matches(keys.sorted_name, keys.phonetic_key)
+        self.assertEqual([(r.entry_id, t) for r, t in matches], [('1', 'PHONETIC')])
+
+    def test_transliteration_key_matches(self):
+        for name in ('Abd al-Rahman Yousef', 'عبد الرحمن يوسف'):
+            keys = name_keys(name)
+            matches = self.index.key_matches(
+                keys.sorted_name,
+                keys.phonetic_key,
+                sorted_name(self.index.canonical(name))
+            )
+            self.assertEqual([r.entry_id for r, _ in matches], ['4'], name)
+        keys = name_keys('Abd al-Rahman Yousef')
+        matches = self.index.key_matches(keys.sorted_name, '', sorted_name(self.index.canonical(keys.normalized_name)))
+        self.assertEqual([(r.entry_id, t) for r, t in matches], [('4', 'TRANSLITERATION')])
+
+
+class TransliterationTests(SimpleTestCase):
+    def test_arabic_and_cyrillic_are_transliterated(self):
+        self.assertEqual(canonical_name('محمد'), 'mhmd')
+        self.assertEqual(canonical_name('Виктор Бут'), 'viktor but')
+
+    def test_arabic_article_is_split(self):
+        self.assertEqual(canonical_name('الرشيد'), 'al rshid')
+
+    def test_abd_compounds_share_a_form(self):
+        self.assertEqual(
+            {canonical_name(name) for name in ('Abdul Rahman', 'Abd al-Rahman', 'Abdel Rahman', 'Abd ul Rahman')},
+            {'abdalrahman'}
+        )
+
+    def test_word_variants(self):
+        self.assertEqual(canonical_name('Ali ibn Mohd', {'mohd': 'mohammed'}), 'ali bin mohammed')
+
+
+class PhoneticKeyTests(SimpleTestCase):
+    def test_latin_and_arabic_spellings_share_a_key(self):
+        for variants in (
+            ['Mohammed', 'Muhammad', 'Mohamad', 'محمد'],
+            ['Hussein', 'Husain', 'حسين'],
+            ['Yousef', 'Yusuf', 'يوسف'],
+            ['Khalid', 'خالد'],
+        ):
+            self.assertEqual(len({phonetic_key(name) for name in variants}), 1, variants)
+
+    def test_key_ignores_word_order(self):
+        self.assertEqual(phonetic_key('Ali Mohammed'), phonetic_key('Muhammad Ali'))
+
+    def test_name_keys(self):
+        keys = name_keys("  O'Neil,  José ")
+        self.assertEqual(keys.normalized_name, 'o neil jose')
+        self.assertEqual(keys.sorted_name, 'jose neil o')
+
+
+class NameScoringTests(SimpleTestCase):
+    def test_identical_names_score_one(self):
+        scores = score_names('Viktor Bout', ['viktor  bout'])
+        self.assertAlmostEqual(scores.combined[0], 1.0)
+
+    def test_jaro_winkler_reference_value(self):
+        scores = score_names('MARTHA', ['MARHTA'])
+        self.assertAlmostEqual(scores.jaro_winkler[0], 0.9611, places=4)
+
+    def test_levenshtein_reference_value(self):
+        scores = score_names('kitten', ['sitting'])
+        self.assertAlmostEqual(scores.levenshtein[0], 1 - 3 / 7)
+
+    def test_token_set_ignores_order(self):
+        scores = score_names('Bout Viktor', ['Viktor Bout'])
+        self.assertAlmostEqual(scores.token_set[0], 1.0)
+
+    def test_matrix_shape_and_rows_match_single_calls(self):
+        queries = ['Viktor Bout', 'Acme Trading']
+        candidates = ['Victor Butt', 'Acme Trading LLC', 'Global Shipping']
+        matrix = score_name_matrix(queries, candidates)
+        self.assertEqual(matrix.shape, (2, 3))
+        for row, query in enumerate(queries):
+            single = score_names(query, candidates)
+            for column in range(len(candidates)):
+                self.assertAlmostEqual(matrix.combined[row, column], single.combined[column])
+
+
+class ScreenNameTests(SimpleTestCase):
+    def setUp(self):
+        self.index = WatchlistIndex([
+            _record('1', 'Viktor Bout'),
+            _record('2', 'Abdul Rahman Yousef'),
+            _record('3', 'Acme Trading LLC'),
+        ], version='v1')
+
+    def test_exact_and_cross_script_hits(self):
+        hits = screen_name(self.index, 'Bout Viktor')
+        self.assertEqual([(entry.entry_id, match_type) for entry, _, match_type in hits], [('1', 'EXACT')])
+        hits = screen_name(self.index, 'Abd al-Rahman Yousef')
+        self.assertEqual([(entry.entry_id, match_type) for entry, _, match_type in hits], [('2', 'TRANSLITERATION')])
+        hits = screen_name(self.index, 'Виктор Бут')
+        self.assertEqual([entry.entry_id for entry, _, _ in hits], ['1'])
+
+    def test_unrelated_name_has_no_hits(self):
+        self.assertEqual(screen_name(self.index, 'Global Shipping Company'), [])
+
+
+class SecondaryAttributeTests(SimpleTestCase):
+    def setUp(self):
+        self.index = WatchlistIndex([
+            _record(
+                '1', 'Viktor Bout', date_of_birth=date(1967, 1, 13), nationality='russia',
+                identifiers=('A1234567',)
+            ),
+            _record('2', 'Viktor Bouts', date_of_birth=date(1990, 5, 1), nationality='ru'),
+        ], version='v1')
+
+    def test_extract_identifiers(self):
+        self.assertEqual(
+            extract_identifiers([{'type': 'Passport', 'number': 'a-123 4567'}, {'number': '12'}]),
+            {'A1234567'}
+        )
+        self.assertEqual(
+            extract_identifiers({'emirates_id': '784-1985-1234567-1'}),
+            {'784198512345671'}
+        )
+        self.assertEqual(extract_identifiers(None), set())
+
+    def test_identifier_match_ignores_name(self):
+        attributes = PartyAttributes.build(identifiers='A 1234567')
+        hits = screen_name(self.index, 'Global Shipping Company', attributes=attributes)
+        self.assertEqual([(entry.entry_id, strength, match_type) for entry, strength, match_type in hits],
+                         [('1', 1.0, 'IDENTIFIER')])
+        self.assertEqual(match_type_for('IDENTIFIER'), 'EXACT')
+
+    def test_attribute_adjustment(self):
+        entry = self.index.records[0]
+        self.assertGreater(attribute_adjustment(entry, PartyAttributes.build(date(1967, 1, 13), 'Russia')), 0)
+        self.assertLess(attribute_adjustment(entry, PartyAttributes.build(date(1980, 1, 1))), 0)
+        # A nationality code is not compared with a country name
+        self.assertEqual(attribute_adjustment(entry, PartyAttributes.build(nationality='AE')), 0)
+        self.assertEqual(attribute_adjustment(entry, NO_ATTRIBUTES), 0)
+
+    def test_conflicting_attributes_prune_fuzzy_candidates(self):
+        plain = {entry.entry_id for entry, _, _ in screen_name(self.index, 'Viktor Bout')}
+        self.assertEqual(plain, {'1', '2'})
+        attributes = PartyAttributes.build(date(1967, 1, 13), 'Russia')
+        hits = screen_name(self.index, 'Viktor Bout', attributes=attributes)
+        self.assertEqual([entry.entry_id for entry, _, _ in hits], ['1'])
+
+
+class MatcherCascadeTests(SimpleTestCase):
+    def setUp(self):
+        self.index = WatchlistIndex([
+            _record('1', 'Viktor Bout'),
+            _record('2', 'Viktor Bouts'),
+            _record('3', 'Acme Trading LLC'),
+        ], version='v1')
+
+    def test_exact_hit_skips_later_stages(self):
+        cascade = MatcherCascade(stages=['EXACT', 'EDIT'])
+        hits = screen_name(self.index, 'Bout Viktor', cascade=cascade)
+        self.assertEqual((hits[0][0].entry_id, hits[0][2]), ('1', 'EXACT'))
+        stats = cascade.stats()
+        self.assertEqual(stats['EXACT']['accepted'], 1)
+        # Only 'Viktor Bouts' reached edit distance scoring
+        self.assertEqual(stats['EDIT']['candidates'], 1)
+
+    def test_thresholds_and_stages_are_configurable(self):
+        strict = MatcherCascade(fuzzy_threshold=0.99)
+        self.assertEqual([entry.entry_id for entry, _, _ in screen_name(self.index, 'Viktor Bout', cascade=strict)],
+                         ['1'])
+        with self.assertLogs('screening_watchlist.services.matchers', 'WARNING'):
+            exact_only = MatcherCascade(stages=['EXACT', 'UNKNOWN'])
+        self.assertEqual([matcher.name for matcher in exact_only.matchers], ['EXACT'])
+        self.assertEqual(screen_name(self.index, 'Viktr Bout', cascade=exact_only), [])
+
+    def test_stages_run_cheapest_first(self):
+        cascade = MatcherCascade(stages=['EDIT', 'TOKEN', 'EXACT', 'PHONETIC'])
+        self.assertEqual([matcher.name for matcher in cascade.matchers], ['EXACT', 'PHONETIC', 'TOKEN', 'EDIT'])
+
+    def test_token_stage_rejects_unreachable_candidates(self):
+        cascade = MatcherCascade()
+        screen_name(self.index, 'Acme Shipping Holdings Group', cascade=cascade)
+        stats = cascade.stats()
+        self.assertGreater(stats['TOKEN']['rejected'], 0)
+        self.assertEqual(stats['EDIT']['candidates'], stats['TOKEN']['candidates'] - stats['TOKEN']['rejected'])
+
+
+class WatchlistDeltaTests(SimpleTestCase):
+    def test_fingerprint_ignores_missing_values_but_not_changes(self):
+        self.assertEqual(entry_fingerprint('Viktor Bout', None), entry_fingerprint('Viktor Bout', ''))
+        self.assertNotEqual(entry_fingerprint('Viktor Bout', ''), entry_fingerprint('Viktor But', ''))
+
+    def test_delta_entries_to_screen(self):
+        delta = WatchlistDelta(added=['1'], changed=['2'], removed=['3'])
+        self.assertTrue(delta)
+        self.assertEqual(delta.to_screen, ['1', '2'])
+        self.assertEqual(delta.summary(), {'added': 1, 'changed': 1, 'removed': 1})
+        self.assertFalse(WatchlistDelta())
+
+
+@override_settings(SCREENING_HISTORY_BATCH_SIZE=100)
+class DeltaScreeningTests(TestCase):
+    def setUp(self):
+        self.admin = get_user_model().objects.create_superuser(
+            email='admin@example.com', username='admin', password='secret'
+        )
+        ScreeningConfiguration.objects.create(
+            name='Default', description='', screening_type='NAME', sources=[], matching_rules={},
+            threshold_settings={}, language_settings={}, created_by=self.admin
+        )
+        self.addCleanup(setattr, screening_history, '_recorder', None)
+
+    def customer(self, name, identification_number):
+        return Customer.objects.create(
+            customer_type='INDIVIDUAL', name=name, email=f"{identification_number}@example.com",
+            phone='+971500000000', address='Dubai', nationality='ARE', identification_type='PASSPORT',
+            identification_number=identification_number, created_by=self.admin
+        )
+
+    def test_only_customers_sharing_a_key_are_screened(self):
+        namesake = self.customer('Bout Viktor', 'P1000001')
+        document_holder = self.customer('Jane Smith', 'AB-123456')
+        self.customer('Omar Haddad', 'P1000003')
+        WatchlistEntry.objects.create(
+            name='Viktor Bout', nationality='RU', country='RU', risk_level='HIGH', source='OFAC',
+            details={}, identifiers={'passport': 'AB123456'}, created_by=self.admin
+        )
+
+        batch = run_delta_screening()
+        self.assertEqual(batch.status, 'COMPLETED')
+        self.assertEqual((batch.total_records, batch.processed_records, batch.matched_records), (2, 2, 2))
+        screened = {namesake.pk, document_holder.pk}
+        self.assertEqual(set(ScreeningHistory.objects.values_list('entity_id', flat=True)), screened)
+        self.assertEqual(set(WatchlistMatch.objects.values_list('customer_id', flat=True)), screened)
+        self.assertIsNone(run_delta_screening())
+
+    def test_fuzzy_only_match_is_screened(self):
+        customer = self.customer('Viktor A. Bout', 'P1000001')
+        # Retrieved through shared tokens, but too far apart to match
+        self.customer('Viktor Anatolyevich Bout', 'P1000002')
+        self.customer('Omar Haddad', 'P1000003')
+        WatchlistEntry.objects.create(
+            name='Viktor Bout', nationality='', country='', risk_level='HIGH', source='OFAC',
+            details={}, identifiers={}, created_by=self.admin
+        )
+
+        batch = run_delta_screening()
+        self.assertEqual((batch.total_records, batch.matched_records), (2, 1))
+        self.assertEqual(list(WatchlistMatch.objects.values_list('customer_id', flat=True)), [customer.pk])
+
+
+class RescreenPartitionTests(SimpleTestCase):
+    def test_partitions_cover_the_uuid_space_in_order(self):
+        bounds = partition_bounds(4)
+        self.assertEqual(len(bounds), 4)
+        self.assertEqual(bounds[0][0], '00000000-0000-0000-0000-000000000000')
+        self.assertEqual(bounds[1][0], '40000000-0000-0000-0000-000000000000')
+        self.assertIsNone(bounds[-1][1])
+        for (_, upper), (lower, _) in zip(bounds, bounds[1:]):
+            self.assertEqual(upper, lower)
+
+
+class RescreenResumeTests(TestCase):
+    def test_resuming_a_batch_with_no_pending_partitions_completes_it(self):
+        get_user_model().objects.create_superuser(
+            email='admin@example.com', username='admin', password='secret'
+        )
+        batch = create_rescreen_batch(2)
+        for state in batch.metadata['partitions'].values():
+            state['done'] = True
+        batch.status = 'FAILED'
+        batch.save(update_fields=['metadata', 'status'])
+
+        rescreen_customers(str(batch.pk))
+        batch.refresh_from_db()
+        self.assertEqual(batch.status, 'COMPLETED')
+        self.assertIsNotNone(batch.end_time)
+
+    def test_matches_no_longer_found_are_retired(self):
+        admin = get_user_model().objects.create_superuser(
+            email='admin@example.com', username='admin', password='secret'
+        )
+        ScreeningConfiguration.objects.create(
+            name='Default', description='', screening_type='NAME', sources=[], matching_rules={},
+            threshold_settings={}, language_settings={}, created_by=admin
+        )
+        self.addCleanup(setattr, screening_history, '_recorder', None)
+        customer = Customer.objects.create(
+            customer_type='INDIVIDUAL', name='Viktor Bout', email='P1000001@example.com',
+            phone='+971500000000', address='Dubai', nationality='', identification_type='PASSPORT',
+            identification_number='P1000001', created_by=admin
+        )
+        current = WatchlistEntry.objects.create(
+            name='Viktor Bout', nationality='', country='', risk_level='HIGH', source='OFAC',
+            details={}, identifiers={}, created_by=admin
+        )
+        delisted = WatchlistEntry.objects.create(
+            name='Viktor But', nationality='', country='', risk_level='HIGH', source='OFAC',
+            details={}, identifiers={}, is_active=False, created_by=admin
+        )
+        stale = WatchlistMatch.objects.create(
+            entry=delisted, customer=customer, match_type='FUZZY', match_score=90,
+            match_details={'match_basis': 'FUZZY'}, created_by=admin
+        )
+        get_watchlist_index(force_refresh=True)
+
+        rescreen_customers(str(create_rescreen_batch(2).pk))
+        stale.refresh_from_db()
+        self.assertEqual(stale.status, 'CLOSED')
+        self.assertEqual(
+            list(WatchlistMatch.objects.filter(status='PENDING').values_list('entry_id', flat=True)),
+            [current.pk]
+        )
+
+
+OFAC_XML = b"""<?xml version="1.0" standalone="yes"?>
+<sdnList xmlns="http://tempuri.org/sdnList.xsd">
+  <sdnEntry>
+    <uid>1001</uid><firstName>Viktor</firstName><lastName>BOUT</lastName><sdnType>Individual</sdnType>
+    <programList><program>SDGT</program></programList>
+    <akaList><aka><uid>2001</uid><firstName>Victor</firstName><lastName>BUTT</lastName></aka></akaList>
+    <idList><id><idType>Passport</idType><idNumber>21N0719999</idNumber><idCountry>Russia</idCountry></id></idList>
+    <dateOfBirthList><dateOfBirthItem><dateOfBirth>13 Jan 1967</dateOfBirth></dateOfBirthItem></dateOfBirthList>
+    <nationalityList><nationality><country>Russia</country></nationality></nationalityList>
+  </sdnEntry>
+  <sdnEntry><uid>1002</uid><lastName>ACME TRADING LLC</lastName><sdnType>Entity</sdnType></sdnEntry>
+</sdnList>"""
+
+UN_XML = b"""<CONSOLIDATED_LIST><INDIVIDUALS><INDIVIDUAL>
+  <DATAID>6908555</DATAID><FIRST_NAME>ABDUL</FIRST_NAME><SECOND_NAME>RAHMAN</SECOND_NAME>
+  <UN_LIST_TYPE>Al-Qaida</UN_LIST_TYPE>
+  <NATIONALITY><VALUE>Yemen</VALUE></NATIONALITY>
+  <INDIVIDUAL_ALIAS><QUALITY>Good</QUALITY><ALIAS_NAME>Abd al-Rahman</ALIAS_NAME></INDIVIDUAL_ALIAS>
+  <INDIVIDUAL_DATE_OF_BIRTH><YEAR>1970</YEAR></INDIVIDUAL_DATE_OF_BIRTH>
+</INDIVIDUAL></INDIVIDUALS></CONSOLIDATED_LIST>"""
+
+EU_XML = b"""<export xmlns="http://eu.europa.eu/fsd/fsd-export">
+  <sanctionEntity logicalId="13">
+    <regulation programme="SYR"/>
+    <subjectType code="person"/>
+    <nameAlias wholeName="Mohammed Hussein"/>
+    <nameAlias firstName="Muhammad" lastName="Husain"/>
+    <citizenship countryDescription="SYRIAN ARAB REPUBLIC"/>
+    <birthdate birthdate="1961-07-01"/>
+    <address city="Damascus" countryDescription="SYRIAN ARAB REPUBLIC"/>
+  </sanctionEntity>
+</export>"""
+
+
+class ListLoaderParserTests(SimpleTestCase):
+    def test_ofac_xml(self):
+        entries = list(parse_ofac_xml(io.BytesIO(OFAC_XML)))
+        self.assertEqual([entry.external_id for entry in entries], ['1001', '1002'])
+        viktor = entries[0]
+        self.assertEqual(viktor.name, 'Viktor BOUT')
+        self.assertEqual(viktor.aliases, ['Victor BUTT'])
+        self.assertEqual(viktor.programs, ['SDGT'])
+        self.assertEqual(viktor.identifiers[0]['number'], '21N0719999')
+        self.assertEqual(str(viktor.date_of_birth), '1967-01-13')
+        self.assertEqual(viktor.country, 'Russia')
+        self.assertEqual(entries[1].name, 'ACME TRADING LLC')
+
+    def test_un_xml(self):
+        [entry] = parse_un_xml(io.BytesIO(UN_XML))
+        self.assertEqual((entry.external_id, entry.name, entry.entity_type), ('6908555', 'ABDUL RAHMAN', 'Individual'))
+        self.assertEqual(entry.aliases, ['Abd al-Rahman'])
+        self.assertEqual(entry.nationalities, ['Yemen'])
+        self.assertEqual(entry.dates_of_birth, ['1970'])
+        self.assertIsNone(entry.date_of_birth)
+
+    def test_eu_xml(self):
+        [entry] = parse_eu_xml(io.BytesIO(EU_XML))
+        self.assertEqual((entry.external_id, entry.name), ('13', 'Mohammed Hussein'))
+        self.assertEqual(entry.aliases, ['Muhammad Husain'])
+        self.assertEqual(entry.entity_type, 'person')
+        self.assertEqual(str(entry.date_of_birth), '1961-07-01')
+        self.assertEqual(entry.country, 'SYRIAN ARAB REPUBLIC')
+
+    def test_csv(self):
+        data = b"id,name,aliases,nationality,id_type,id_number\n7,Viktor Bout,Victor Butt;Viktor But,Russia,Passport,21N07\n"
+        [entry] = parse_csv(io.BytesIO(data))
+        self.assertEqual(entry.aliases, ['Victor Butt', 'Viktor But'])
+        self.assertEqual(entry.identifiers, [{'type': 'Passport', 'number': '21N07', 'country': ''}])
+
+
+class ListLoaderTests(TestCase):
+    def test_every_alias_is_stored_and_indexed(self):
+        admin = get_user_model().objects.create_superuser(
+            email='admin@example.com', username='admin', password='secret'
+        )
+        source = WatchlistSource.objects.create(
+            name='OFAC', source_type='SANCTIONS', provider='OFAC', description='',
+            update_frequency='DAILY', created_by=admin
+        )
+        aliases = [f"Trading Company Number {number}" for number in range(40)]
+        load_watchlist(source, [ParsedEntry(external_id='1', name='Acme Holdings', aliases=aliases)])
+
+        entry = WatchlistEntry.objects.get(source='OFAC', external_id='1')
+        self.assertGreater(len(entry.alias), 200)
+        index = build_watchlist_index(version='v1')
+        self.assertEqual(len(index), 41)
+        self.assertEqual(index.candidates('Trading Company Number 39')[0].record.entry_id, str(entry.pk))
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class ScreeningResultCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.index = WatchlistIndex([_record('1', 'Viktor Bout')], version='v1')
+
+    def test_repeat_name_is_served_from_cache(self):
+        result_cache = ScreeningResultCache(max_size=10, timeout=60)
+        first = result_cache.screen(self.index, 'Viktor Bout')
+        second = result_cache.screen(self.index, 'VIKTOR  BOUT')
+        self.assertEqual(first, second)
+        self.assertEqual((result_cache.misses, result_cache.hits), (1, 1))
+
+    def test_shared_tier_is_used_by_other_processes(self):
+        ScreeningResultCache(max_size=10, timeout=60).screen(self.index, 'Viktor Bout')
+        other = ScreeningResultCache(max_size=10, timeout=60)
+        other.screen(self.index, 'Viktor Bout')
+        self.assertEqual((other.misses, other.hits), (0, 1))
+
+    def test_key_changes_with_version_and_attributes(self):
+        key = result_cache_key('v1', 'viktor bout')
+        self.assertNotEqual(key, result_cache_key('v2', 'viktor bout'))
+        self.assertNotEqual(key, result_cache_key('v1', 'viktor bout', PartyAttributes.build(nationality='Russia')))
+        self.assertNotEqual(key, result_cache_key('v1', 'viktor bout', PartyAttributes.build(identifiers='A1234567')))
+
+    def test_local_tier_is_bounded(self):
+        result_cache = ScreeningResultCache(max_size=2, timeout=60)
+        for name in ('Alpha One', 'Beta Two', 'Gamma Three'):
+            result_cache.screen(self.index, name)
+        self.assertEqual(len(result_cache._local), 2)
+
+
+class BufferedHistoryRecorder(ScreeningHistoryRecorder):
+    """Recorder keeping flushed batches instead of inserting them"""
+
+    def __init__(self, *args, **kwargs):
+        self.flushed = []
+        super().__init__(*args, **kwargs)
+
+    def _flush(self, batch):
+        if batch:
+            self.flushed.append(batch)
+
+    def _owner(self, configuration_id):
+        return 'u1'
+
+
+class ScreeningHistoryRecorderTests(SimpleTestCase):
+    def _record(self, recorder, elapsed, configuration_id='c1'):
+        recorder.record(configuration_id, '00000000-0000-0000-0000-000000000001', 'CUSTOMER', [],
+                        datetime(2026, 1, 1), elapsed, created_by_id='u1')
+
+    def test_flushes_by_count(self):
+        recorder = BufferedHistoryRecorder(max_size=3, max_wait=60)
+        for _ in range(7):
+            self._record(recorder, 0.01)
+        self.assertEqual([len(batch) for batch in recorder.flushed], [3, 3])
+        recorder.close()
+        self.assertEqual([len(batch) for batch in recorder.flushed], [3, 3, 1])
+
+    def test_flushes_by_age(self):
+        recorder = BufferedHistoryRecorder(max_size=100, max_wait=0.01)
+        self._record(recorder, 0.01)
+        deadline = time.monotonic() + 2
+        while not recorder.flushed and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual([len(batch) for batch in recorder.flushed], [1])
+        recorder.close()
+
+    def test_latency_percentiles_per_configuration(self):
+        recorder = BufferedHistoryRecorder(max_size=1000, max_wait=60)
+        for ms in range(1, 101):
+            self._record(recorder, ms / 1000)
+        self._record(recorder, 0.5, configuration_id='c2')
+        percentiles = recorder.latency_percentiles()
+        self.assertEqual(percentiles['c1']['count'], 100)
+        self.assertAlmostEqual(percentiles['c1']['p50'], 50.5, places=1)
+        self.assertGreater(percentiles['c1']['p99'], 98)
+        self.assertEqual(percentiles['c2']['p95'], 500.0)
+        # Screenings without a configuration are not recorded
+        recorder.record(None, '1', 'CUSTOMER', [], datetime(2026, 1, 1), 0.1)
+        self.assertEqual(sum(row['count'] for row in recorder.latency_percentiles().values()), 101)
+        recorder.close()
+
+
+class ScreeningHistoryWriteTests(TestCase):
+    def test_screening_of_a_missing_configuration_does_not_fail_the_batch(self):
+        admin = get_user_model().objects.create_superuser(
+            email='admin@example.com', username='admin', password='secret'
+        )
+        configuration = ScreeningConfiguration.objects.create(
+            name='Default', description='', screening_type='NAME', sources=[], matching_rules={},
+            threshold_settings={}, language_settings={}, created_by=admin
+        )
+        recorder = ScreeningHistoryRecorder(max_size=10, max_wait=60)
+        self.addCleanup(recorder.close)
+        entity_id, started = '00000000-0000-0000-0000-000000000001', timezone.now()
+        recorder.record(configuration.pk, entity_id, 'CUSTOMER', [], started, 0.01)
+        with self.assertLogs('screening_watchlist.services.screening_history', level='WARNING'):
+            recorder.record(
+                '00000000-0000-0000-0000-0000000000ff', entity_id, 'CUSTOMER', [], started, 0.01
+            )
+        recorder.flush()
+
+        self.assertEqual(
+            list(ScreeningHistory.objects.values_list('configuration_id', 'created_by_id')),
+            [(configuration.pk, admin.pk)]
+        )
+
+
+def _slow_source(delay, result):
+    async def check(request, state):
+        await asyncio.sleep(delay)
+        return result
+    return check
+
+
+async def _failing_source(request, state):
+    raise RuntimeError('source down')
+
+
+class RealtimeScreeningTests(SimpleTestCase):
+    def setUp(self):
+        self._checks = dict(realtime_screening.SOURCE_CHECKS)
+
+    def tearDown(self):
+        realtime_screening.SOURCE_CHECKS.clear()
+        realtime_screening.SOURCE_CHECKS.update(self._checks)
+
+    def _screen(self, budget_ms, **checks):
+        realtime_screening.SOURCE_CHECKS.update(checks)
+        return asyncio.run(screen_party(ScreeningRequest(name='John Smith'), budget_ms, sources=tuple(checks)))
+
+    def test_sources_run_concurrently(self):
+        result = self._screen(
+            500,
+            WATCHLIST=_slow_source(0.1, [{'matched_name': 'JOHN SMITH'}]),
+            SANCTIONED_COUNTRIES=_slow_source(0.1, [])
+        )
+        self.assertFalse(result['partial'])
+        self.assertEqual(result['matches'], [{'matched_name': 'JOHN SMITH'}])
+        self.assertLess(result['elapsed_ms'], 190)
+
+    def test_budget_exceeded_returns_partial_result(self):
+        result = self._screen(
+            50,
+            WATCHLIST=_slow_source(0, [{'matched_name': 'JOHN SMITH'}]),
+            CONNECTED_PARTIES=_slow_source(5, [])
+        )
+        self.assertTrue(result['partial'])
+        self.assertEqual(result['incomplete_sources'], ['CONNECTED_PARTIES'])
+        self.assertEqual(len(result['matches']), 1)
+        self.assertLess(result['elapsed_ms'], 1000)
+
+    def test_work_queued_past_the_deadline_is_not_run(self):
+        calls = []
+        with self.assertRaises(TimeoutError):
+            asyncio.run(realtime_screening._run({'deadline': time.perf_counter() - 1}, calls.append, 'late'))
+        asyncio.run(realtime_screening._run({'deadline': time.perf_counter() + 5}, calls.append, 'on time'))
+        self.assertEqual(calls, ['on time'])
+
+    def test_failed_source_is_incomplete(self):
+        with self.assertLogs('screening_watchlist.services.realtime_screening', level='ERROR'):
+            result = self._screen(500, WATCHLIST=_failing_source, SANCTIONED_COUNTRIES=_slow_source(0, []))
+        self.assertTrue(result['partial'])
+        self.assertEqual(result['incomplete_sources'], ['WATCHLIST'])
@@ -1,7 +1,11 @@
 from django.urls import path
 
+from .views import RealtimeScreeningView, ScreeningLatencyView
+
 app_name = 'screening_watchlist'
 
 urlpatterns = [
-    # Add screening and watchlist URLs here
-] 
\ No newline at end of file
+    # Real-time screening
+    path('screen/', RealtimeScreeningView.as_view(), name='screen'),
+    path('screen/latency/', ScreeningLatencyView.as_view(), name='screen_latency'),
+]
@@ -1,3 +1,110 @@
-from django.shortcuts import render
+"""
+Real-time screening API
 
-# Create your views here.
+These views are native async Django views served under ASGI, so a slow
+source never holds a worker thread: the sources of a screening are awaited
+concurrently and the answer is returned within the latency budget. DRF
+views are synchronous, so JWT authentication and payload validation are
+run through ``sync_to_async`` here.
+"""
+import json
+import logging
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import JsonResponse
+from django.utils.decorators import method_decorator
+from django.utils.translation import gettext_lazy as _
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import status
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+from .serializers import RealtimeScreeningSerializer
+from .services.realtime_screening import SOURCES, ScreeningRequest, screen_party
+from .services.screening_history import get_history_recorder
+
+logger = logging.getLogger(__name__)
+
+
+def _authenticate(request):
+    """Authenticated user of a JWT bearer request, or None"""
+    try:
+        result = JWTAuthentication().authenticate(request)
+    except AuthenticationFailed:
+        return None
+    if result is None:
+        return None
+    user, _token = result
+    return user if user.is_active else None
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class RealtimeScreeningView(View):
+    """
+    Screen a name or party within a latency budget
+
+    Responds with ``partial: true`` and the unfinished sources in
+    ``incomplete_sources`` when the budget ran out before every source
+    answered.
+    """
+    http_method_names = ['post']
+
+    async def post(self, request, *args, **kwargs):
+        user = await sync_to_async(_authenticate)(request)
+        if user is None:
+            return JsonResponse(
+                {'error': str(_('Authentication credentials were not provided or are invalid.'))},
+                status=status.HTTP_401_UNAUTHORIZED
+            )
+
+        try:
+            payload = json.loads(request.body or b'{}')
+        except ValueError:
+            return JsonResponse({'error': str(_('Invalid JSON payload.'))}, status=status.HTTP_400_BAD_REQUEST)
+        serializer = RealtimeScreeningSerializer(data=payload)
+        if not serializer.is_valid():
+            return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        data = serializer.validated_data
+
+        screening_request = ScreeningRequest(
+            name=data['name'],
+            date_of_birth=data.get('date_of_birth'),
+            nationality=data['nationality'],
+            country=data['country'],
+            identifiers=data['identifiers'],
+            customer_id=str(data['customer_id']) if data.get('customer_id') else None
+        )
+        try:
+            result = await screen_party(
+                screening_request,
+                data.get('budget_ms', settings.SCREENING_API_LATENCY_BUDGET_MS),
+                sources=tuple(data.get('sources', SOURCES)),
+                created_by_id=user.pk
+            )
+        except Exception as e:
+            logger.error(f"Real-time screening failed: {str(e)}")
+            return JsonResponse(
+                {'error': str(_('Screening failed. Please try again.'))},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+        return JsonResponse(result, status=status.HTTP_200_OK)
+
+
+class ScreeningLatencyView(View):
+    """Recent screening latency percentiles of this process against the budget"""
+    http_method_names = ['get']
+
+    async def get(self, request, *args, **kwargs):
+        user = await sync_to_async(_authenticate)(request)
+        if user is None:
+            return JsonResponse(
+                {'error': str(_('Authentication credentials were not provided or are invalid.'))},
+                status=status.HTTP_401_UNAUTHORIZED
+            )
+        recorder = get_history_recorder()
+        return JsonResponse({
+            'budget_ms': settings.SCREENING_API_LATENCY_BUDGET_MS,
+            'configurations': recorder.latency_percentiles() if recorder is not None else {}
+        }, status=status.HTTP_200_OK)
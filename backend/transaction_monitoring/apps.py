@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class TransactionMonitoringConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'transaction_monitoring'
+
+    def ready(self):
+        import transaction_monitoring.signals  # noqa
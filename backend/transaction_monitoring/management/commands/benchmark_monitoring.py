@@ -0,0 +1,372 @@
+"""
+Load benchmark for the transaction monitoring stack.
+
+Generates a synthetic portfolio (customers, transactions, watchlist entries
+and monitoring rules), drives the monitoring tasks with Celery in eager
+mode and reports per-stage latency percentiles, queries per transaction
+and rows/sec. Results are stored as reporting_analytics.PerformanceMetric
+rows tagged with the run id, so regressions can be tracked across runs.
+
+The generated rules and watchlist entries are live for every worker on the
+database, so the command only runs against the dedicated database named
+by ``AML_BENCHMARK_DATABASE``.
+"""
+import random
+import time
+import uuid
+from datetime import timedelta
+from decimal import Decimal
+from typing import Callable, Dict, List
+
+import numpy as np
+from celery import current_app
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import F
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from core.constants import CustomerType, TransactionType
+from customer_management.models import Customer
+from reporting_analytics.models import PerformanceMetric
+from screening_watchlist.models import WatchlistEntry, WatchlistSource
+from screening_watchlist.services.name_keys import set_name_keys
+from screening_watchlist.services.watchlist_index import get_watchlist_index
+from transaction_monitoring.models import MonitoringRule, Transaction
+from transaction_monitoring.services.rule_engine import bump_rule_version
+from transaction_monitoring.tasks import (
+    analyze_transaction_patterns,
+    apply_monitoring_rules,
+    monitor_transaction,
+    monitor_transactions_batch,
+    screen_against_watchlists
+)
+
+FIRST_NAMES = [
+    'Mohammed', 'Ahmed', 'Fatima', 'Aisha', 'Omar', 'Khalid', 'Layla', 'Yousef',
+    'Maryam', 'Hassan', 'John', 'Maria', 'Wei', 'Olga', 'Ivan', 'Priya', 'Rahul',
+    'Elena', 'Viktor', 'Sara', 'Abdullah', 'Noura', 'Hamdan', 'Rashid',
+]
+LAST_NAMES = [
+    'Al Maktoum', 'Al Nahyan', 'Hassan', 'Khan', 'Al Falasi', 'Al Mansoori',
+    'Smith', 'Garcia', 'Chen', 'Petrov', 'Ivanov', 'Sharma', 'Patel', 'Bout',
+    'Al Qasimi', 'Haddad', 'Nasser', 'Rahman', 'Kuznetsov', 'Lopez',
+]
+COMPANY_WORDS = [
+    'Gulf', 'Trading', 'Global', 'Shipping', 'Emirates', 'Gold', 'Holdings',
+    'Logistics', 'Capital', 'Energy', 'Marine', 'General', 'Star', 'Falcon',
+]
+NATIONALITIES = ['ARE', 'IND', 'PAK', 'EGY', 'GBR', 'RUS', 'CHN', 'IRN', 'SYR', 'PHL']
+PERCENTILES = (50, 95, 99)
+# Share of customers named after a watchlist entry, so screening produces hits
+WATCHLIST_HIT_RATE = 0.01
+
+
+def _person_name(rng: random.Random) -> str:
+    return f"{rng.choice(FIRST_NAMES)} {rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+
+
+def _company_name(rng: random.Random) -> str:
+    return ' '.join(rng.sample(COMPANY_WORDS, 3)) + ' LLC'
+
+
+class Command(BaseCommand):
+    help = 'Benchmark transaction monitoring throughput on a synthetic dataset'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--customers', type=int, default=10_000)
+        parser.add_argument('--transactions', type=int, default=10_000)
+        parser.add_argument('--watchlist-entries', type=int, default=10_000)
+        parser.add_argument('--rules', type=int, default=25)
+        parser.add_argument(
+            '--sample', type=int, default=500,
+            help='Transactions driven through each stage (the rest is history)'
+        )
+        parser.add_argument('--batch-size', type=int, default=500, help='IDs per monitor_transactions_batch call')
+        parser.add_argument('--chunk-size', type=int, default=5000, help='Rows per bulk insert')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--keep', action='store_true', help='Keep the generated dataset')
+
+    def handle(self, *args, **options):
+        if options['transactions'] < 3 * options['sample']:
+            raise CommandError('--transactions must be at least 3 x --sample')
+        if options['customers'] < 2:
+            raise CommandError('--customers must be at least 2')
+        benchmark_database = settings.AML_BENCHMARK_DATABASE
+        if not benchmark_database or connection.settings_dict['NAME'] != benchmark_database:
+            raise CommandError(
+                'Refusing to generate benchmark data: set AML_BENCHMARK_DATABASE to the name '
+                'of a dedicated benchmark database and point DATABASE_URL at it'
+            )
+
+        current_app.conf.update(task_always_eager=True, task_eager_propagates=True)
+        self.rng = random.Random(options['seed'])
+        self.chunk_size = options['chunk_size']
+        self.run_id = uuid.uuid4().hex[:12]
+        self.user = self._benchmark_user()
+        self.metrics: List[PerformanceMetric] = []
+        self.tags = {
+            'run_id': self.run_id,
+            'customers': options['customers'],
+            'transactions': options['transactions'],
+            'watchlist_entries': options['watchlist_entries'],
+            'rules': options['rules'],
+            'sample': options['sample'],
+            'pipeline': settings.AML_MONITORING_PIPELINE,
+            'velocity_store': settings.AML_VELOCITY_STORE,
+            'database': connection.vendor,
+        }
+        self.stdout.write(f"Benchmark run {self.run_id}")
+
+        try:
+            watchlist_names = self._generate_watchlist(options['watchlist_entries'])
+            customer_ids = self._generate_customers(options['customers'], watchlist_names)
+            self._generate_rules(options['rules'])
+            sample_ids = self._generate_transactions(
+                options['transactions'], customer_ids, 3 * options['sample']
+            )
+
+            # Warm shared state outside the measured calls
+            bump_rule_version()
+            get_watchlist_index(force_refresh=True)
+
+            sample = options['sample']
+            stage_ids, monitor_ids, batch_ids = (
+                sample_ids[:sample], sample_ids[sample:2 * sample], sample_ids[2 * sample:]
+            )
+            for stage, task in (
+                ('rules', apply_monitoring_rules),
+                ('screening', screen_against_watchlists),
+                ('patterns', analyze_transaction_patterns),
+            ):
+                self._measure(stage, stage_ids, lambda transaction_id, task=task: task.delay(transaction_id))
+            self._measure('monitor_transaction', monitor_ids, monitor_transaction.delay)
+            self._measure_batches(batch_ids, options['batch_size'])
+
+            PerformanceMetric.objects.bulk_create(self.metrics)
+            self.stdout.write(self.style.SUCCESS(
+                f"Stored {len(self.metrics)} performance metrics for run {self.run_id}"
+            ))
+        finally:
+            if not options['keep']:
+                self._cleanup()
+
+    def _benchmark_user(self):
+        user, _ = get_user_model().objects.get_or_create(
+            username='aml-benchmark',
+            defaults={'email': 'aml-benchmark@benchmark.invalid', 'is_active': False}
+        )
+        return user
+
+    def _insert(self, model, rows, total: int, label: str) -> None:
+        """Bulk insert a row generator in chunks and record rows/sec"""
+        started = time.perf_counter()
+        chunk = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) >= self.chunk_size:
+                model.objects.bulk_create(chunk)
+                chunk = []
+        if chunk:
+            model.objects.bulk_create(chunk)
+        elapsed = time.perf_counter() - started
+        self._record(f'benchmark.generate.{label}.rows_per_sec', total / elapsed, 'rows/s')
+        self.stdout.write(f"Generated {total} {label} in {elapsed:.1f}s ({total / elapsed:,.0f} rows/s)")
+
+    def _generate_watchlist(self, count: int) -> List[str]:
+        source = WatchlistSource.objects.create(
+            name=f'BENCHMARK {self.run_id}',
+            source_type='SANCTIONS',
+            provider='benchmark',
+            description='Synthetic benchmark list',
+            update_frequency='DAILY',
+            last_updated=timezone.now(),
+            created_by=self.user
+        )
+        names = [
+            _person_name(self.rng) if self.rng.random() < 0.7 else _company_name(self.rng)
+            for _ in range(count)
+        ]
+
+        def rows():
+            for name in names:
+                entry = WatchlistEntry(
+                    name=name,
+                    alias=_person_name(self.rng) if self.rng.random() < 0.2 else '',
+                    nationality=self.rng.choice(NATIONALITIES),
+                    country=self.rng.choice(NATIONALITIES),
+                    risk_level='HIGH',
+                    source=source.name,
+                    details={},
+                    identifiers={},
+                    created_by=self.user
+                )
+                set_name_keys(entry, name)
+                yield entry
+
+        self._insert(WatchlistEntry, rows(), count, 'watchlist_entries')
+        return names
+
+    def _generate_customers(self, count: int, watchlist_names: List[str]) -> List[uuid.UUID]:
+        customer_ids = [uuid.uuid4() for _ in range(count)]
+
+        def rows():
+            for i, customer_id in enumerate(customer_ids):
+                is_individual = self.rng.random() < 0.8
+                if watchlist_names and self.rng.random() < WATCHLIST_HIT_RATE:
+                    name = self.rng.choice(watchlist_names)
+                else:
+                    name = _person_name(self.rng) if is_individual else _company_name(self.rng)
+                customer = Customer(
+                    id=customer_id,
+                    customer_type=CustomerType.INDIVIDUAL if is_individual else CustomerType.LLC,
+                    name=name,
+                    email=f'{self.run_id}-{i}@benchmark.invalid',
+                    phone=f'+9715{self.rng.randrange(10**7, 10**8)}',
+                    address='Dubai, UAE',
+                    nationality=self.rng.choice(NATIONALITIES),
+                    identification_type='PASSPORT',
+                    identification_number=f'P{self.rng.randrange(10**8, 10**9)}',
+                    created_by=self.user
+                )
+                # bulk_create skips save(), which maintains the name keys
+                set_name_keys(customer, name)
+                yield customer
+
+        self._insert(Customer, rows(), count, 'customers')
+        return customer_ids
+
+    def _generate_rules(self, count: int) -> None:
+        templates: List[Callable[[int], Dict]] = [
+            lambda i: {'rule_type': 'AMOUNT_THRESHOLD', 'threshold_amount': Decimal(self.rng.randrange(20, 200) * 1000)},
+            lambda i: {
+                'rule_type': 'FREQUENCY',
+                'threshold_count': self.rng.randrange(3, 10),
+                'time_window_hours': self.rng.choice([1, 24, 168]),
+                'rule_conditions': {'cooldown_hours': 24},
+            },
+            lambda i: {'rule_type': 'TIME_BASED', 'rule_conditions': {'expression': {'all': [
+                {'field': 'amount', 'op': 'gte', 'value': self.rng.randrange(5, 50) * 1000},
+                {'field': 'hour', 'op': 'in', 'value': [0, 1, 2, 3, 4]},
+            ]}}},
+            lambda i: {'rule_type': 'VELOCITY', 'rule_conditions': {'expression': {
+                'field': 'transaction_total', 'op': 'gt', 'window_hours': 24,
+                'value': self.rng.randrange(50, 500) * 1000,
+            }}},
+        ]
+        MonitoringRule.objects.bulk_create([
+            MonitoringRule(
+                name=f'BENCHMARK {self.run_id} #{i}',
+                description='Synthetic benchmark rule',
+                created_by=self.user,
+                **templates[i % len(templates)](i)
+            )
+            for i in range(count)
+        ])
+
+    def _generate_transactions(self, count: int, customer_ids: List[uuid.UUID], sample: int) -> List[str]:
+        """Transactions spread over the last 30 days; the newest ``sample`` are returned"""
+        now = timezone.now()
+        start = now - timedelta(days=30)
+        step = timedelta(days=30) / count
+        types = list(TransactionType.values)
+        transaction_ids: List[uuid.UUID] = []
+        sample_ids: List[str] = []
+
+        def rows():
+            for i in range(count):
+                occurred_at = start + step * i
+                originator = self.rng.choice(customer_ids)
+                # Pending rows are the sample; everything older is history
+                pending = i >= count - sample
+                transaction_id = uuid.uuid4()
+                transaction_ids.append(transaction_id)
+                if pending:
+                    sample_ids.append(str(transaction_id))
+                yield Transaction(
+                    id=transaction_id,
+                    transaction_type=self.rng.choice(types),
+                    amount=Decimal(str(round(self.rng.lognormvariate(8, 1.5), 2))),
+                    source_account=f'AE{self.rng.randrange(10**12, 10**13)}',
+                    destination_account=f'AE{self.rng.randrange(10**12, 10**13)}',
+                    transaction_date=occurred_at,
+                    originator_id=originator,
+                    beneficiary_id=self.rng.choice(customer_ids) if self.rng.random() < 0.5 else None,
+                    screening_status='PENDING' if pending else 'COMPLETED',
+                    created_by=self.user
+                )
+
+        self._insert(Transaction, rows(), count, 'transactions')
+        # auto_now_add stamps the insert time; the windows key on created_at
+        for offset in range(0, len(transaction_ids), self.chunk_size):
+            Transaction.objects.filter(
+                id__in=transaction_ids[offset:offset + self.chunk_size]
+            ).update(created_at=F('transaction_date'))
+        return sample_ids
+
+    def _measure(self, stage: str, transaction_ids: List[str], call: Callable[[str], object]) -> None:
+        """Time one call per transaction, counting the queries each one issues"""
+        latencies, queries = [], []
+        started = time.perf_counter()
+        for transaction_id in transaction_ids:
+            with CaptureQueriesContext(connection) as captured:
+                call_started = time.perf_counter()
+                call(transaction_id)
+                latencies.append((time.perf_counter() - call_started) * 1000)
+            queries.append(len(captured))
+        elapsed = time.perf_counter() - started
+        self._report(stage, latencies, queries, len(transaction_ids) / elapsed)
+
+    def _measure_batches(self, transaction_ids: List[str], batch_size: int) -> None:
+        latencies, queries = [], []
+        started = time.perf_counter()
+        for offset in range(0, len(transaction_ids), batch_size):
+            batch = transaction_ids[offset:offset + batch_size]
+            with CaptureQueriesContext(connection) as captured:
+                call_started = time.perf_counter()
+                monitor_transactions_batch.delay(batch)
+                latencies.append((time.perf_counter() - call_started) * 1000)
+            queries.append(len(captured) / len(batch))
+        elapsed = time.perf_counter() - started
+        self._report('monitor_transactions_batch', latencies, queries, len(transaction_ids) / elapsed)
+
+    def _report(self, stage: str, latencies: List[float], queries: List[float], rows_per_sec: float) -> None:
+        values = np.percentile(latencies, PERCENTILES)
+        for percentile, value in zip(PERCENTILES, values):
+            self._record(f'monitoring.{stage}.latency_p{percentile}', float(value), 'ms')
+        queries_per_call = float(np.mean(queries))
+        self._record(f'monitoring.{stage}.queries_per_call', queries_per_call, 'queries')
+        self._record(f'monitoring.{stage}.rows_per_sec', rows_per_sec, 'rows/s')
+        self.stdout.write(
+            f"{stage:<28} p50 {values[0]:8.2f} ms  p95 {values[1]:8.2f} ms  p99 {values[2]:8.2f} ms  "
+            f"{queries_per_call:6.1f} queries  {rows_per_sec:10,.1f} rows/s"
+        )
+
+    def _record(self, name: str, value: float, unit: str) -> None:
+        self.metrics.append(PerformanceMetric(
+            metric_name=name,
+            metric_category='SYSTEM',
+            value=value,
+            unit=unit,
+            measurement_time=timezone.now(),
+            tags=self.tags,
+            created_by=self.user
+        ))
+
+    def _cleanup(self) -> None:
+        """Delete the generated dataset in chunks"""
+        customers = Customer.objects.filter(email__endswith='@benchmark.invalid', email__startswith=f'{self.run_id}-')
+        transactions = Transaction.objects.filter(originator__in=customers)
+        while True:
+            chunk = list(transactions.values_list('id', flat=True)[:self.chunk_size])
+            if not chunk:
+                break
+            Transaction.objects.filter(id__in=chunk).delete()
+        customers.delete()
+        WatchlistEntry.objects.filter(source=f'BENCHMARK {self.run_id}').delete()
+        WatchlistSource.objects.filter(name=f'BENCHMARK {self.run_id}').delete()
+        MonitoringRule.objects.filter(name__startswith=f'BENCHMARK {self.run_id} ').delete()
+        bump_rule_version()
+        self.stdout.write(f"Removed benchmark dataset {self.run_id}")
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.4 on 2026-10-16 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transaction_monitoring', '0003_monitoringrule_transactionalert'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transactionalert',
+            name='cooldown_key',
+            field=models.CharField(blank=True, default='', help_text='Customer and monitoring rule that raised the alert, for rule cooldowns', max_length=100),
+        ),
+        migrations.AddIndex(
+            model_name='transactionalert',
+            index=models.Index(fields=['cooldown_key', 'created_at'], name='transaction_cooldow_b0230c_idx'),
+        ),
+    ]
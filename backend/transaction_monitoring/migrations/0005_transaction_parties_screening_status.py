@@ -0,0 +1,34 @@
+# Generated by Django 5.2.4 on 2026-10-16 12:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customer_management', '0003_customer_last_segment_review_and_more'),
+        ('transaction_monitoring', '0004_transactionalert_cooldown_key'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transaction',
+            name='originator',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='originated_transactions', to='customer_management.customer'),
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='beneficiary',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='received_transactions', to='customer_management.customer'),
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='screening_status',
+            field=models.CharField(db_index=True, default='PENDING', max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['originator', 'created_at'], name='transaction_origina_378a39_idx'),
+        ),
+    ]
@@ -33,6 +33,21 @@ class Transaction(AbstractBaseModel, RiskLevelMixin, StatusMixin):
     monitoring_status = models.CharField(max_length=50, default='PENDING')
     monitoring_notes = models.TextField(blank=True)
     monitoring_history = models.JSONField(default=list)
+    originator = models.ForeignKey(
+        'customer_management.Customer',
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        related_name='originated_transactions'
+    )
+    beneficiary = models.ForeignKey(
+        'customer_management.Customer',
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        related_name='received_transactions'
+    )
+    screening_status = models.CharField(max_length=20, default='PENDING', db_index=True)
 
     class Meta:
         verbose_name = _('Transaction')
@@ -42,6 +57,7 @@ class Transaction(AbstractBaseModel, RiskLevelMixin, StatusMixin):
             models.Index(fields=['transaction_type', 'amount']),
             models.Index(fields=['source_account', 'destination_account']),
             models.Index(fields=['is_suspicious', 'alert_generated']),
+            models.Index(fields=['originator', 'created_at']),
         ]
 
     def __str__(self):
@@ -190,9 +206,17 @@ class MonitoringRule(AbstractBaseModel, StatusMixin):
         Evaluate if a transaction triggers this rule
         Returns tuple: (is_triggered, alert_message)
         """
-        # This would contain the logic to evaluate the rule against a transaction
-        # For now, just a placeholder
-        return False, ""
+        from .services.rule_engine import build_transaction_context, compile_rule, load_window_aggregates
+
+        compiled = compile_rule(self)
+        context = build_transaction_context(
+            transaction,
+            load_window_aggregates(transaction, compiled.window_hours)
+        )
+        match = compiled.evaluate(context)
+        if not match:
+            return False, ""
+        return True, f"{self.name}: {match.reason}"
 
     def activate(self):
         """Activate the rule"""
@@ -271,6 +295,12 @@ class TransactionAlert(AbstractBaseModel, StatusMixin):
         blank=True,
         help_text="Notes about how the alert was resolved"
     )
+    cooldown_key = models.CharField(
+        max_length=100,
+        blank=True,
+        default='',
+        help_text="Customer and monitoring rule that raised the alert, for rule cooldowns"
+    )
 
     class Meta:
         db_table = 'transaction_alerts'
@@ -282,6 +312,7 @@ class TransactionAlert(AbstractBaseModel, StatusMixin):
             models.Index(fields=['severity']),
             models.Index(fields=['is_escalated']),
             models.Index(fields=['created_at']),
+            models.Index(fields=['cooldown_key', 'created_at']),
         ]
 
     def __str__(self):
@@ -0,0 +1,123 @@
+"""
+Micro-batching of transaction monitoring requests.
+
+Instead of one Celery message per transaction, callers hand transaction
+IDs to a ``TransactionBatchCollector``, which flushes them as a single
+``monitor_transactions_batch`` task once ``max_size`` IDs are waiting or
+the oldest has waited ``max_wait`` seconds, whichever comes first.
+Waiting IDs are only held in memory; if the process dies before a flush,
+the transactions stay PENDING until ``sweep_pending_transactions``
+resubmits them.
+"""
+import atexit
+import logging
+import threading
+import time
+from typing import Callable, List, Optional
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class TransactionBatchCollector:
+    """Group transaction IDs by count or age and hand them to ``flush_callback``"""
+
+    def __init__(
+        self,
+        flush_callback: Callable[[List[str]], None],
+        max_size: int = 500,
+        max_wait: float = 0.2
+    ):
+        self.flush_callback = flush_callback
+        self.max_size = max_size
+        self.max_wait = max_wait
+        self._pending: List[str] = []
+        self._oldest: Optional[float] = None
+        self._condition = threading.Condition()
+        self._closed = False
+        self._timer = threading.Thread(target=self._run_timer, name='monitoring-batch-timer', daemon=True)
+        self._timer.start()
+
+    def add(self, transaction_id: str) -> None:
+        """Queue one transaction; flushes immediately when the batch is full"""
+        with self._condition:
+            self._pending.append(str(transaction_id))
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+                self._condition.notify()
+            if len(self._pending) < self.max_size:
+                return
+            batch = self._take()
+        self._flush(batch)
+
+    def flush(self) -> None:
+        """Flush whatever is waiting"""
+        with self._condition:
+            batch = self._take()
+        self._flush(batch)
+
+    def close(self) -> None:
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        self.flush()
+
+    def _take(self) -> List[str]:
+        batch, self._pending, self._oldest = self._pending, [], None
+        return batch
+
+    def _flush(self, batch: List[str]) -> None:
+        if not batch:
+            return
+        try:
+            self.flush_callback(batch)
+        except Exception as e:
+            logger.error(f"Failed to dispatch monitoring batch of {len(batch)}: {str(e)}")
+
+    def _run_timer(self) -> None:
+        while True:
+            with self._condition:
+                while self._oldest is None and not self._closed:
+                    self._condition.wait()
+                if self._closed:
+                    return
+                remaining = self._oldest + self.max_wait - time.monotonic()
+                if remaining > 0:
+                    self._condition.wait(remaining)
+                    continue
+                batch = self._take()
+            self._flush(batch)
+
+
+_collector: Optional[TransactionBatchCollector] = None
+_collector_lock = threading.Lock()
+
+
+def _dispatch_batch(transaction_ids: List[str]) -> None:
+    from ..tasks import monitor_transactions_batch
+    monitor_transactions_batch.delay(transaction_ids)
+
+
+def get_batch_collector() -> TransactionBatchCollector:
+    """Process-wide collector feeding ``monitor_transactions_batch``"""
+    global _collector
+    if _collector is None:
+        with _collector_lock:
+            if _collector is None:
+                _collector = TransactionBatchCollector(
+                    _dispatch_batch,
+                    max_size=settings.AML_MONITORING_BATCH_SIZE,
+                    max_wait=settings.AML_MONITORING_BATCH_WAIT_MS / 1000
+                )
+                atexit.register(_collector.close)
+    return _collector
+
+
+def enqueue_transaction_monitoring(transaction_id: str) -> None:
+    """Submit a transaction for batched monitoring, or on its own with batching off"""
+    if settings.AML_MONITORING_BATCH_SIZE <= 1:
+        from ..tasks import monitor_transaction
+        monitor_transaction.delay(str(transaction_id))
+        return
+    get_batch_collector().add(transaction_id)
@@ -0,0 +1,186 @@
+"""
+Alert cooldown registry.
+
+A rule with ``cooldown_hours`` raises at most one alert per customer per
+cooldown period. The time of the last alert for each (customer, rule) pair
+is kept in the shared cache with a TTL equal to the rule's cooldown, so
+rules still cooling down are skipped before they are evaluated, with one
+cache round-trip per transaction and no database query.
+
+Every rule alert also stores its pair in the indexed
+``TransactionAlert.cooldown_key`` column. When the cache is empty (cold
+start or flush) one worker rebuilds the registry from that column with one
+query and only then marks it warm; until then cooldowns are read from the
+alerts table. The warm flag expires after the shortest cooldown, so
+entries the cache evicted are restored by the next rebuild at the latest
+when they would have expired anyway.
+"""
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, FrozenSet, Iterable, Optional, Tuple
+
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from ..models import TransactionAlert
+from .rule_engine import CompiledRule, CompiledRuleSet
+
+logger = logging.getLogger(__name__)
+
+COOLDOWN_CACHE_PREFIX = 'transaction_monitoring:cooldown'
+REGISTRY_WARM_CACHE_KEY = f'{COOLDOWN_CACHE_PREFIX}:warm'
+REGISTRY_REBUILDING_CACHE_KEY = f'{COOLDOWN_CACHE_PREFIX}:rebuilding'
+REBUILD_CLAIM_SECONDS = 60
+
+
+def cooldown_key(customer_id, rule_id: str) -> str:
+    """Value of ``TransactionAlert.cooldown_key`` for a (customer, rule) pair"""
+    return f"{customer_id}:{rule_id}"
+
+
+def _cache_key(key: str) -> str:
+    return f"{COOLDOWN_CACHE_PREFIX}:{key}"
+
+
+class CooldownRegistry:
+    """Last alert time per (customer, rule), for rules with a cooldown period"""
+
+    def __init__(self, ruleset: CompiledRuleSet):
+        self.rules: Dict[str, CompiledRule] = {
+            rule.rule_id: rule for rule in ruleset.rules if rule.cooldown_period
+        }
+        self.shortest_cooldown: Optional[timedelta] = min(
+            (rule.cooldown_period for rule in self.rules.values()), default=None
+        )
+
+    def rebuild(self, now: Optional[datetime] = None) -> int:
+        """Reload the registry from ``TransactionAlert.cooldown_key``"""
+        if not self.rules:
+            return 0
+        now = now or timezone.now()
+        longest = max(rule.cooldown_period for rule in self.rules.values())
+        last_alerted: Dict[str, datetime] = {}
+        rows = TransactionAlert.objects.filter(
+            created_at__gte=now - longest
+        ).exclude(cooldown_key='').values_list('cooldown_key', 'created_at').order_by()
+        for key, created_at in rows.iterator(chunk_size=5000):
+            rule = self.rules.get(key.rsplit(':', 1)[-1])
+            if rule and created_at >= now - rule.cooldown_period:
+                if key not in last_alerted or created_at > last_alerted[key]:
+                    last_alerted[key] = created_at
+
+        for key, created_at in last_alerted.items():
+            rule = self.rules[key.rsplit(':', 1)[-1]]
+            remaining = created_at + rule.cooldown_period - now
+            cache.set(_cache_key(key), created_at.timestamp(), timeout=max(int(remaining.total_seconds()), 1))
+        logger.info(f"Rebuilt alert cooldown registry with {len(last_alerted)} entries")
+        return len(last_alerted)
+
+    def ensure_warm(self) -> bool:
+        """
+        Rebuild once after the cache was emptied
+
+        Returns False while the registry is not warm yet (another worker is
+        rebuilding it).
+        """
+        if not self.rules or cache.get(REGISTRY_WARM_CACHE_KEY):
+            return True
+        if not cache.add(REGISTRY_REBUILDING_CACHE_KEY, 1, timeout=REBUILD_CLAIM_SECONDS):
+            return False
+        try:
+            self.rebuild()
+            # Published only once every entry is back in the cache
+            cache.set(
+                REGISTRY_WARM_CACHE_KEY, 1,
+                timeout=max(int(self.shortest_cooldown.total_seconds()), 1)
+            )
+        finally:
+            cache.delete(REGISTRY_REBUILDING_CACHE_KEY)
+        return True
+
+    def cooling_down(self, customer_id, now: Optional[datetime] = None) -> FrozenSet[str]:
+        """IDs of the rules that may not alert for this customer yet"""
+        if not customer_id or not self.rules:
+            return frozenset()
+        now = now or timezone.now()
+        keys = {_cache_key(cooldown_key(customer_id, rule_id)): rule_id for rule_id in self.rules}
+        cooling = set()
+        for key, alerted_at in cache.get_many(list(keys)).items():
+            rule = self.rules[keys[key]]
+            if alerted_at >= (now - rule.cooldown_period).timestamp():
+                cooling.add(rule.rule_id)
+        return frozenset(cooling)
+
+    def start(self, customer_id, rule_id: str, alerted_at: Optional[datetime] = None) -> None:
+        """Record an alert; the entry expires when the cooldown ends"""
+        rule = self.rules.get(rule_id)
+        if not customer_id or rule is None:
+            return
+        alerted_at = alerted_at or timezone.now()
+        cache.set(
+            _cache_key(cooldown_key(customer_id, rule_id)),
+            alerted_at.timestamp(),
+            timeout=int(rule.cooldown_period.total_seconds())
+        )
+
+
+class CooldownSession:
+    """Cooldown checks for one task run
+
+    Alerts raised during the run are visible to later transactions of the
+    same run immediately, and are published to the shared registry only
+    once the surrounding database transaction commits.
+    """
+
+    def __init__(self, ruleset: CompiledRuleSet):
+        self.registry = CooldownRegistry(ruleset)
+        self._started: Dict[Tuple[str, str], datetime] = {}
+        try:
+            self._warm = self.registry.ensure_warm()
+        except Exception as e:
+            logger.warning(f"Alert cooldown registry unavailable: {str(e)}")
+            self._warm = False
+
+    def cooling_down(self, customer_id) -> FrozenSet[str]:
+        if self._warm:
+            try:
+                cooling = self.registry.cooling_down(customer_id)
+            except Exception as e:
+                logger.warning(f"Alert cooldown registry unavailable, reading alerts: {str(e)}")
+                cooling = self._cooling_down_from_database(customer_id)
+        else:
+            cooling = self._cooling_down_from_database(customer_id)
+        started = {rule_id for customer, rule_id in self._started if customer == str(customer_id)}
+        return cooling | started
+
+    def start(self, customer_id, rule_ids: Iterable[str]) -> None:
+        now = timezone.now()
+        for rule_id in rule_ids:
+            if rule_id not in self.registry.rules or not customer_id:
+                continue
+            self._started[(str(customer_id), rule_id)] = now
+            transaction.on_commit(
+                lambda customer_id=customer_id, rule_id=rule_id: self._publish(customer_id, rule_id, now)
+            )
+
+    def _publish(self, customer_id, rule_id: str, alerted_at: datetime) -> None:
+        try:
+            self.registry.start(customer_id, rule_id, alerted_at)
+        except Exception as e:
+            logger.warning(f"Failed to record alert cooldown: {str(e)}")
+
+    def _cooling_down_from_database(self, customer_id) -> FrozenSet[str]:
+        if not customer_id or not self.registry.rules:
+            return frozenset()
+        now = timezone.now()
+        keys = {cooldown_key(customer_id, rule_id): rule for rule_id, rule in self.registry.rules.items()}
+        longest = max(rule.cooldown_period for rule in keys.values())
+        rows = TransactionAlert.objects.filter(
+            cooldown_key__in=list(keys),
+            created_at__gte=now - longest
+        ).values_list('cooldown_key', 'created_at')
+        return frozenset(
+            keys[key].rule_id for key, created_at in rows
+            if created_at >= now - keys[key].cooldown_period
+        )
@@ -0,0 +1,134 @@
+"""
+Transaction pattern analysis.
+
+Structuring and rapid-movement checks only need a customer's transaction
+count and amount total over a few windows. Those are either read from the
+velocity store or computed here in the database: one ``aggregate()`` query
+per customer with a filtered Count/Sum per window, or one grouped query for
+many customers at once. Transactions are never loaded into Python.
+"""
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional
+
+from django.conf import settings
+from django.db.models import Count, DecimalField, Q, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from ..models import Transaction
+from .velocity_store import STANDARD_WINDOWS, WindowAggregate
+
+LAST_24_HOURS = 24
+LAST_30_DAYS = 720
+PATTERN_WINDOWS = (LAST_24_HOURS, LAST_30_DAYS)
+
+
+def _window_expressions(window_hours: Iterable[int], now: datetime) -> Dict[str, object]:
+    """A filtered Count and Sum per window, for aggregate()/annotate()"""
+    expressions = {}
+    for hours in window_hours:
+        window = Q(created_at__gte=now - timedelta(hours=hours))
+        expressions[f'count_{hours}'] = Count('id', filter=window)
+        expressions[f'total_{hours}'] = Coalesce(
+            Sum('amount', filter=window),
+            Value(Decimal('0')),
+            output_field=DecimalField(max_digits=20, decimal_places=2)
+        )
+    return expressions
+
+
+def _windows_from_row(row: Dict, window_hours: Iterable[int]) -> Dict[int, WindowAggregate]:
+    return {
+        hours: WindowAggregate(count=row[f'count_{hours}'], total=row[f'total_{hours}'])
+        for hours in window_hours
+    }
+
+
+def customer_window_aggregates(
+    customer_id,
+    window_hours: Iterable[int] = STANDARD_WINDOWS,
+    now: Optional[datetime] = None
+) -> Dict[int, WindowAggregate]:
+    """Count and total of one customer's transactions per window, in one query"""
+    window_hours = sorted(set(window_hours))
+    now = now or timezone.now()
+    row = Transaction.objects.filter(
+        originator_id=customer_id,
+        created_at__gte=now - timedelta(hours=window_hours[-1]),
+        created_at__lte=now
+    ).aggregate(**_window_expressions(window_hours, now))
+    return _windows_from_row(row, window_hours)
+
+
+def batch_window_aggregates(
+    customer_ids: Iterable,
+    window_hours: Iterable[int] = STANDARD_WINDOWS,
+    now: Optional[datetime] = None
+) -> Dict[str, Dict[int, WindowAggregate]]:
+    """Per-window count and total for many customers, in one grouped query
+
+    Customers without transactions in the longest window get zero windows.
+    """
+    window_hours = sorted(set(window_hours))
+    customer_ids = {str(customer_id) for customer_id in customer_ids}
+    now = now or timezone.now()
+    rows = Transaction.objects.filter(
+        originator_id__in=customer_ids,
+        created_at__gte=now - timedelta(hours=window_hours[-1]),
+        created_at__lte=now
+    ).values('originator_id').annotate(**_window_expressions(window_hours, now)).order_by()
+
+    empty = {hours: WindowAggregate(0, Decimal('0')) for hours in window_hours}
+    result = {customer_id: dict(empty) for customer_id in customer_ids}
+    for row in rows:
+        result[str(row['originator_id'])] = _windows_from_row(row, window_hours)
+    return result
+
+
+def is_structuring(amount: Decimal, windows: Dict[int, WindowAggregate]) -> bool:
+    """A sub-threshold transaction whose 30-day total crosses the threshold"""
+    threshold = Decimal(str(settings.AML_STRUCTURING_THRESHOLD))
+    if amount < threshold:
+        return windows[LAST_30_DAYS].total > threshold
+    return False
+
+
+def is_rapid_movement(windows: Dict[int, WindowAggregate]) -> bool:
+    """Too many other transactions in the last 24 hours"""
+    # Window counts include the current transaction
+    previous_count = windows[LAST_24_HOURS].count - 1
+    return previous_count >= int(settings.AML_RAPID_MOVEMENT_THRESHOLD)
+
+
+def analyze_patterns(amount: Decimal, windows: Dict[int, WindowAggregate]) -> List[Dict]:
+    """Suspicious patterns for a transaction, given its originator's windows"""
+    patterns = []
+
+    # Check for structuring (multiple smaller transactions)
+    if is_structuring(amount, windows):
+        patterns.append({
+            'type': 'STRUCTURING',
+            'is_suspicious': True,
+            'risk_level': 'HIGH',
+            'details': {
+                'pattern': 'Multiple smaller transactions',
+                'period': '30 days',
+                'total_amount': str(windows[LAST_30_DAYS].total)
+            }
+        })
+
+    # Check for rapid movement of funds
+    if is_rapid_movement(windows):
+        patterns.append({
+            'type': 'RAPID_MOVEMENT',
+            'is_suspicious': True,
+            'risk_level': 'HIGH',
+            'details': {
+                'pattern': 'Rapid movement of funds',
+                'period': '24 hours',
+                'transaction_count': windows[LAST_24_HOURS].count
+            }
+        })
+
+    return patterns
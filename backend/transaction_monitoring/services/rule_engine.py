@@ -0,0 +1,348 @@
+"""
+Compiled monitoring rule engine.
+
+Every active ``MonitoringRule`` is compiled once into a ``CompiledRule``
+holding plain Python predicates built from its thresholds and
+``rule_conditions`` JSON. The compiled ruleset is cached per process and
+keyed by a version stamp kept in the shared cache; saving, activating,
+deactivating or deleting a rule bumps the stamp (see ``signals.py``) and
+every process recompiles on its next evaluation.
+
+``rule_conditions`` supports the legacy flat keys (``amount_threshold``,
+``high_risk_countries``, ``frequency_threshold``, ``transaction_types``,
+``restricted_hours``, ``cooldown_hours``, ``severity``, ``priority``) and
+an ``expression`` tree of ``all``/``any``/``not`` nodes whose leaves look
+like ``{"field": "amount", "op": "gte", "value": 50000}``.
+"""
+import logging
+import operator
+import threading
+import uuid
+from dataclasses import dataclass, field
+from datetime import timedelta
+from decimal import Decimal
+from typing import Any, Callable, Dict, FrozenSet, Iterable, List, Optional, Set
+
+from django.core.cache import cache
+
+from ..models import MonitoringRule, Transaction
+from .velocity_store import WindowAggregate, get_window_aggregates
+
+logger = logging.getLogger(__name__)
+
+RULE_VERSION_CACHE_KEY = 'transaction_monitoring:rule_version'
+
+ALERT_TYPE_BY_RULE_TYPE = {
+    'AMOUNT_THRESHOLD': 'AMOUNT_THRESHOLD',
+    'FREQUENCY': 'FREQUENCY',
+    'VELOCITY': 'VELOCITY',
+    'PATTERN': 'PATTERN',
+    'GEOGRAPHY': 'GEOGRAPHY',
+    'TIME_BASED': 'BEHAVIOR',
+    'CUSTOMER_BEHAVIOR': 'BEHAVIOR',
+}
+
+OPERATORS: Dict[str, Callable[[Any, Any], bool]] = {
+    'eq': operator.eq,
+    'ne': operator.ne,
+    'gt': operator.gt,
+    'gte': operator.ge,
+    'lt': operator.lt,
+    'lte': operator.le,
+    'in': lambda actual, expected: actual in expected,
+    'not_in': lambda actual, expected: actual not in expected,
+    'intersects': lambda actual, expected: bool(set(actual) & set(expected)),
+}
+
+EXPRESSION_FIELDS = {
+    'amount', 'currency', 'transaction_type', 'countries', 'hour',
+    'transaction_count', 'transaction_total',
+}
+
+
+@dataclass(frozen=True)
+class TransactionContext:
+    """Everything the compiled rules need to know about one transaction"""
+    transaction_id: str
+    originator_id: Optional[str]
+    transaction_type: str
+    amount: Decimal
+    currency: str
+    countries: FrozenSet[str]
+    hour: int
+    window_counts: Dict[int, int] = field(default_factory=dict)
+    window_totals: Dict[int, Decimal] = field(default_factory=dict)
+
+    def value(self, name: str, window_hours: Optional[int] = None) -> Any:
+        if name == 'transaction_count':
+            return self.window_counts.get(window_hours, 0)
+        if name == 'transaction_total':
+            return self.window_totals.get(window_hours, Decimal('0'))
+        return getattr(self, name)
+
+
+@dataclass(frozen=True)
+class RuleCheck:
+    """A single compiled condition of a rule"""
+    reason: str
+    predicate: Callable[[TransactionContext], bool]
+    threshold: Optional[Decimal] = None
+    actual: Optional[Callable[[TransactionContext], Any]] = None
+
+
+@dataclass(frozen=True)
+class RuleMatch:
+    """A rule triggered by a transaction"""
+    rule: 'CompiledRule'
+    reason: str
+    threshold_value: Optional[Decimal]
+    actual_value: Optional[Decimal]
+
+
+@dataclass(frozen=True)
+class CompiledRule:
+    """A ``MonitoringRule`` reduced to precompiled predicates"""
+    rule_id: str
+    name: str
+    rule_type: str
+    alert_type: str
+    severity: str
+    priority: int
+    auto_escalate: bool
+    transaction_types: Optional[FrozenSet[str]]
+    checks: List[RuleCheck]
+    window_hours: FrozenSet[int]
+    cooldown_period: Optional[timedelta] = None
+
+    def applies_to(self, context: TransactionContext) -> bool:
+        return self.transaction_types is None or context.transaction_type in self.transaction_types
+
+    def evaluate(self, context: TransactionContext) -> Optional[RuleMatch]:
+        """Return the first triggered check, if any"""
+        for check in self.checks:
+            if check.predicate(context):
+                actual = check.actual(context) if check.actual else None
+                return RuleMatch(
+                    rule=self,
+                    reason=check.reason,
+                    threshold_value=check.threshold,
+                    actual_value=Decimal(str(actual)) if actual is not None else None
+                )
+        return None
+
+
+class CompiledRuleSet:
+    """All active rules of one version, ordered by priority"""
+
+    def __init__(self, rules: Iterable[CompiledRule], version: str):
+        self.rules = sorted(rules, key=lambda rule: (-rule.priority, rule.name))
+        self.version = version
+        windows: Set[int] = set()
+        for rule in self.rules:
+            windows |= rule.window_hours
+        self.window_hours = frozenset(windows)
+
+    def __len__(self) -> int:
+        return len(self.rules)
+
+    def evaluate(
+        self,
+        context: TransactionContext,
+        skip_rule_ids: FrozenSet[str] = frozenset()
+    ) -> List[RuleMatch]:
+        """Evaluate the transaction against the whole ruleset in one pass"""
+        matches = []
+        for rule in self.rules:
+            if rule.rule_id in skip_rule_ids or not rule.applies_to(context):
+                continue
+            try:
+                match = rule.evaluate(context)
+            except Exception as e:
+                logger.error(f"Rule evaluation failed for {rule.name}: {str(e)}")
+                continue
+            if match:
+                matches.append(match)
+        return matches
+
+
+def _decimal(value: Any) -> Decimal:
+    return Decimal(str(value))
+
+
+def _compile_expression(node: Dict[str, Any], windows: Set[int]) -> Callable[[TransactionContext], bool]:
+    """Compile an ``all``/``any``/``not`` condition tree into a predicate"""
+    if 'all' in node:
+        parts = [_compile_expression(child, windows) for child in node['all']]
+        return lambda context: all(part(context) for part in parts)
+    if 'any' in node:
+        parts = [_compile_expression(child, windows) for child in node['any']]
+        return lambda context: any(part(context) for part in parts)
+    if 'not' in node:
+        inner = _compile_expression(node['not'], windows)
+        return lambda context: not inner(context)
+
+    name = node['field']
+    if name not in EXPRESSION_FIELDS:
+        raise ValueError(f"Unsupported rule field: {name}")
+    compare = OPERATORS[node['op']]
+    expected = node['value']
+    if name in ('amount', 'transaction_total'):
+        expected = _decimal(expected)
+    elif isinstance(expected, list):
+        expected = frozenset(expected)
+
+    window_hours = None
+    if name in ('transaction_count', 'transaction_total'):
+        window_hours = int(node.get('window_hours', 24))
+        windows.add(window_hours)
+
+    return lambda context: compare(context.value(name, window_hours), expected)
+
+
+def compile_rule(rule: MonitoringRule) -> CompiledRule:
+    """Compile a single ``MonitoringRule``"""
+    conditions = rule.rule_conditions or {}
+    checks: List[RuleCheck] = []
+    windows: Set[int] = set()
+
+    amount_threshold = rule.threshold_amount
+    if amount_threshold is None and 'amount_threshold' in conditions:
+        amount_threshold = conditions['amount_threshold']
+    if amount_threshold is not None:
+        amount_limit = _decimal(amount_threshold)
+        checks.append(RuleCheck(
+            reason='amount_threshold',
+            predicate=lambda context: context.amount > amount_limit,
+            threshold=amount_limit,
+            actual=lambda context: context.amount
+        ))
+
+    high_risk_countries = conditions.get('high_risk_countries')
+    if high_risk_countries:
+        country_set = frozenset(country.upper() for country in high_risk_countries)
+        checks.append(RuleCheck(
+            reason='high_risk_country',
+            predicate=lambda context: bool(context.countries & country_set)
+        ))
+
+    count_threshold = rule.threshold_count
+    if count_threshold is None and 'frequency_threshold' in conditions:
+        count_threshold = conditions['frequency_threshold']
+    if count_threshold is not None:
+        count_limit = int(count_threshold)
+        window_hours = int(conditions.get('lookback_hours', rule.time_window_hours))
+        windows.add(window_hours)
+        checks.append(RuleCheck(
+            reason='frequency_threshold',
+            predicate=lambda context: context.window_counts.get(window_hours, 0) > count_limit,
+            threshold=Decimal(count_limit),
+            actual=lambda context: context.window_counts.get(window_hours, 0)
+        ))
+
+    restricted_hours = conditions.get('restricted_hours')
+    if restricted_hours:
+        start, end = (int(hour) for hour in restricted_hours)
+        wraps_midnight = start > end
+        checks.append(RuleCheck(
+            reason='restricted_hours',
+            predicate=lambda context: (
+                (context.hour >= start or context.hour < end) if wraps_midnight
+                else start <= context.hour < end
+            )
+        ))
+
+    if conditions.get('expression'):
+        checks.append(RuleCheck(
+            reason='expression',
+            predicate=_compile_expression(conditions['expression'], windows)
+        ))
+
+    transaction_types = conditions.get('transaction_types')
+    cooldown_hours = conditions.get('cooldown_hours')
+
+    return CompiledRule(
+        rule_id=str(rule.id),
+        name=rule.name,
+        rule_type=rule.rule_type,
+        alert_type=ALERT_TYPE_BY_RULE_TYPE.get(rule.rule_type, 'PATTERN'),
+        severity=conditions.get('severity', 'HIGH' if rule.auto_escalate else 'MEDIUM'),
+        priority=int(conditions.get('priority', 0)),
+        auto_escalate=rule.auto_escalate,
+        transaction_types=frozenset(transaction_types) if transaction_types else None,
+        checks=checks,
+        window_hours=frozenset(windows),
+        cooldown_period=timedelta(hours=float(cooldown_hours)) if cooldown_hours else None
+    )
+
+
+def get_rule_version() -> str:
+    """Current ruleset version stamp shared by all processes"""
+    version = cache.get(RULE_VERSION_CACHE_KEY)
+    if version is None:
+        cache.add(RULE_VERSION_CACHE_KEY, uuid.uuid4().hex, timeout=None)
+        version = cache.get(RULE_VERSION_CACHE_KEY)
+    return version
+
+
+def bump_rule_version() -> None:
+    """Invalidate every process's compiled ruleset"""
+    cache.set(RULE_VERSION_CACHE_KEY, uuid.uuid4().hex, timeout=None)
+
+
+def compile_ruleset(version: str) -> CompiledRuleSet:
+    """Load and compile all active rules"""
+    compiled = []
+    for rule in MonitoringRule.objects.filter(is_active=True):
+        try:
+            compiled.append(compile_rule(rule))
+        except (KeyError, TypeError, ValueError) as e:
+            logger.error(f"Skipping monitoring rule {rule.name}: invalid conditions ({str(e)})")
+    logger.info(f"Compiled {len(compiled)} monitoring rules (version {version})")
+    return CompiledRuleSet(compiled, version)
+
+
+_ruleset: Optional[CompiledRuleSet] = None
+_ruleset_lock = threading.Lock()
+
+
+def get_compiled_ruleset() -> CompiledRuleSet:
+    """Process-wide compiled ruleset, recompiled when the version stamp changes"""
+    global _ruleset
+
+    version = get_rule_version()
+    if _ruleset is not None and _ruleset.version == version:
+        return _ruleset
+
+    with _ruleset_lock:
+        if _ruleset is None or _ruleset.version != version:
+            _ruleset = compile_ruleset(version)
+        return _ruleset
+
+
+def load_window_aggregates(txn: Transaction, window_hours: Iterable[int]) -> Dict[int, WindowAggregate]:
+    """Originator count/total for every window the ruleset needs, from the velocity store"""
+    return get_window_aggregates(txn.originator_id, window_hours)
+
+
+def build_transaction_context(
+    txn: Transaction,
+    window_aggregates: Optional[Dict[int, WindowAggregate]] = None
+) -> TransactionContext:
+    """Build the evaluation context of a transaction"""
+    countries = frozenset(
+        country.upper() for country in (
+            getattr(txn, 'originating_country', None),
+            getattr(txn, 'destination_country', None)
+        ) if country
+    )
+    return TransactionContext(
+        transaction_id=str(txn.id),
+        originator_id=str(txn.originator_id) if getattr(txn, 'originator_id', None) else None,
+        transaction_type=txn.transaction_type,
+        amount=_decimal(txn.amount),
+        currency=txn.currency,
+        countries=countries,
+        hour=txn.transaction_date.hour,
+        window_counts={hours: window.count for hours, window in (window_aggregates or {}).items()},
+        window_totals={hours: window.total for hours, window in (window_aggregates or {}).items()}
+    )
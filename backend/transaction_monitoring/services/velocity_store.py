@@ -0,0 +1,394 @@
+"""
+Per-customer sliding-window transaction aggregates.
+
+Counts and amount totals are kept in time buckets at three granularities
+(5 minutes, 1 hour, 1 day) and updated incrementally as transactions are
+monitored. Reading a window sums a bounded number of buckets (at most
+``MAX_BUCKETS_PER_WINDOW``), so velocity, frequency and structuring checks
+no longer scan the customer's transaction history. Windows are exact to
+the bucket size of the granularity used to serve them.
+
+Buckets live in Redis (one small hash per bucket, expiring on its own) so
+all workers share them; if Redis is unavailable the process falls back to
+an in-memory store until Redis answers again. A customer's buckets are
+warmed from the database the first time they are needed: one worker
+claims the warm-up, loads the history and only then marks the customer
+warm; until then readers get exact windows from the database. Every
+transaction is added under its ID at most once, whether by warm-up or by
+``record_transaction``, so the two never double count. Setting
+``AML_VELOCITY_STORE = 'database'`` skips the buckets and computes exact
+windows with one aggregate query per read (see ``pattern_analysis``).
+"""
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.utils import timezone
+
+from ..models import Transaction
+
+try:
+    from django_redis import get_redis_connection
+    from redis.exceptions import RedisError
+    HAS_REDIS = True
+except ImportError:
+    HAS_REDIS = False
+
+    class RedisError(Exception):
+        pass
+
+logger = logging.getLogger(__name__)
+
+# (name, bucket size in seconds, retention in seconds)
+GRANULARITIES = (
+    ('5m', 300, 2 * 3600),
+    ('1h', 3600, 8 * 86400),
+    ('1d', 86400, 32 * 86400),
+)
+STANDARD_WINDOWS = (1, 24, 168, 720)  # 1h, 24h, 7d, 30d
+MAX_BUCKETS_PER_WINDOW = 200
+WARM_LOOKBACK = timedelta(days=31)
+# Transactions this recent may still be waiting for their own record() call
+# when a customer is warmed; they are added under their ID so the later
+# record() is ignored (and vice versa).
+WARM_SEEN_WINDOW = timedelta(minutes=15)
+SEEN_TTL_SECONDS = 86400
+# A warm-up claim expires on its own if the worker holding it dies
+WARM_CLAIM_SECONDS = 60
+FALLBACK_RETRY_SECONDS = 60
+
+KEY_PREFIX = 'aml:velocity'
+
+
+@dataclass(frozen=True)
+class WindowAggregate:
+    """Transaction count and total amount over a time window"""
+    count: int
+    total: Decimal
+
+
+def _granularity_for(window_hours: int) -> Tuple[str, int, int]:
+    """Pick the finest granularity that retains the window within the bucket budget"""
+    window_seconds = window_hours * 3600
+    for name, size, retention in GRANULARITIES:
+        if window_seconds <= retention - size and window_seconds / size <= MAX_BUCKETS_PER_WINDOW:
+            return name, size, math.ceil(window_seconds / size)
+    name, size, retention = GRANULARITIES[-1]
+    return name, size, min(math.ceil(window_seconds / size), retention // size - 1)
+
+
+def _bucket_ids(window_hours: int, now: datetime) -> Tuple[str, List[int]]:
+    name, size, buckets = _granularity_for(window_hours)
+    current = int(now.timestamp()) // size
+    return name, list(range(current - buckets + 1, current + 1))
+
+
+class InMemoryVelocityStore:
+    """Process-local bucket store; used when Redis is not available"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets: Dict[Tuple[str, str], Dict[int, List]] = defaultdict(dict)
+        self._warm: set = set()
+        self._warming: Dict[str, float] = {}
+        # Transaction ID -> expiry, oldest first (every entry has the same TTL)
+        self._seen: 'OrderedDict[str, float]' = OrderedDict()
+
+    def is_warm(self, customer_id: str) -> bool:
+        return customer_id in self._warm
+
+    def claim_warm(self, customer_id: str) -> bool:
+        """Claim the warm-up of a customer that is neither warm nor being warmed"""
+        now = time.monotonic()
+        with self._lock:
+            if customer_id in self._warm or self._warming.get(customer_id, 0) > now:
+                return False
+            self._warming[customer_id] = now + WARM_CLAIM_SECONDS
+            return True
+
+    def mark_warm(self, customer_id: str) -> None:
+        with self._lock:
+            self._warm.add(customer_id)
+            self._warming.pop(customer_id, None)
+
+    def release_warm(self, customer_id: str) -> None:
+        with self._lock:
+            self._warming.pop(customer_id, None)
+
+    def _claim_seen(self, transaction_id: str, now: float) -> bool:
+        """Record a transaction ID; False if it was already recorded (call with the lock held)"""
+        seen = self._seen
+        while seen:
+            oldest, expires = next(iter(seen.items()))
+            if expires > now:
+                break
+            del seen[oldest]
+        if transaction_id in seen:
+            return False
+        seen[transaction_id] = now + SEEN_TTL_SECONDS
+        return True
+
+    def add_many(self, customer_id: str, rows: Iterable[Tuple[Optional[str], Decimal, datetime]]) -> int:
+        """
+        Add ``(transaction ID, amount, time)`` rows; rows whose ID was
+        already added are skipped (rows without an ID are always added)
+
+        Returns the number of rows added.
+        """
+        added = 0
+        with self._lock:
+            now = time.monotonic()
+            for transaction_id, amount, occurred_at in rows:
+                if transaction_id is not None and not self._claim_seen(transaction_id, now):
+                    continue
+                added += 1
+                timestamp = int(occurred_at.timestamp())
+                for name, size, retention in GRANULARITIES:
+                    buckets = self._buckets[(customer_id, name)]
+                    bucket = buckets.setdefault(timestamp // size, [0, Decimal('0')])
+                    bucket[0] += 1
+                    bucket[1] += Decimal(amount)
+                    oldest = (timestamp - retention) // size
+                    for stale in [b for b in buckets if b < oldest]:
+                        del buckets[stale]
+        return added
+
+    def add(self, customer_id: str, transaction_id: str, amount: Decimal, occurred_at: datetime) -> bool:
+        return self.add_many(customer_id, [(transaction_id, amount, occurred_at)]) == 1
+
+    def aggregates(self, customer_id: str, windows: Iterable[int], now: datetime) -> Dict[int, WindowAggregate]:
+        result = {}
+        with self._lock:
+            for hours in windows:
+                name, bucket_ids = _bucket_ids(hours, now)
+                buckets = self._buckets.get((customer_id, name), {})
+                count, total = 0, Decimal('0')
+                for bucket_id in bucket_ids:
+                    if bucket_id in buckets:
+                        count += buckets[bucket_id][0]
+                        total += buckets[bucket_id][1]
+                result[hours] = WindowAggregate(count=count, total=total)
+        return result
+
+
+class RedisVelocityStore:
+    """Bucket store shared by all workers through Redis"""
+
+    def __init__(self, alias: str = 'default'):
+        self.alias = alias
+
+    @property
+    def client(self):
+        return get_redis_connection(self.alias)
+
+    def _bucket_key(self, customer_id: str, granularity: str, bucket_id: int) -> str:
+        return f"{KEY_PREFIX}:{customer_id}:{granularity}:{bucket_id}"
+
+    def _warm_key(self, customer_id: str) -> str:
+        return f"{KEY_PREFIX}:{customer_id}:warm"
+
+    def _warming_key(self, customer_id: str) -> str:
+        return f"{KEY_PREFIX}:{customer_id}:warming"
+
+    def _seen_key(self, transaction_id: str) -> str:
+        return f"{KEY_PREFIX}:seen:{transaction_id}"
+
+    def is_warm(self, customer_id: str) -> bool:
+        return bool(self.client.exists(self._warm_key(customer_id)))
+
+    def claim_warm(self, customer_id: str) -> bool:
+        if self.is_warm(customer_id):
+            return False
+        return bool(self.client.set(self._warming_key(customer_id), 1, nx=True, ex=WARM_CLAIM_SECONDS))
+
+    def mark_warm(self, customer_id: str) -> None:
+        # Warm state outlives the longest bucket so a warmed customer is never re-warmed
+        pipeline = self.client.pipeline(transaction=False)
+        pipeline.set(self._warm_key(customer_id), 1, ex=GRANULARITIES[-1][2])
+        pipeline.delete(self._warming_key(customer_id))
+        pipeline.execute()
+
+    def release_warm(self, customer_id: str) -> None:
+        self.client.delete(self._warming_key(customer_id))
+
+    def add_many(self, customer_id: str, rows: Iterable[Tuple[Optional[str], Decimal, datetime]]) -> int:
+        """Add ``(transaction ID, amount, time)`` rows, skipping IDs already added"""
+        rows = list(rows)
+        identified = [row for row in rows if row[0] is not None]
+        if identified:
+            pipeline = self.client.pipeline(transaction=False)
+            for transaction_id, _, _ in identified:
+                pipeline.set(self._seen_key(transaction_id), 1, nx=True, ex=SEEN_TTL_SECONDS)
+            claimed = iter(pipeline.execute())
+            rows = [row for row in rows if row[0] is None or next(claimed)]
+
+        pipeline = self.client.pipeline(transaction=False)
+        for _, amount, occurred_at in rows:
+            timestamp = int(occurred_at.timestamp())
+            for name, size, retention in GRANULARITIES:
+                key = self._bucket_key(customer_id, name, timestamp // size)
+                pipeline.hincrby(key, 'count', 1)
+                pipeline.hincrbyfloat(key, 'total', float(amount))
+                pipeline.expireat(key, timestamp - timestamp % size + size + retention)
+        pipeline.execute()
+        return len(rows)
+
+    def add(self, customer_id: str, transaction_id: str, amount: Decimal, occurred_at: datetime) -> bool:
+        return self.add_many(customer_id, [(transaction_id, amount, occurred_at)]) == 1
+
+    def aggregates(self, customer_id: str, windows: Iterable[int], now: datetime) -> Dict[int, WindowAggregate]:
+        windows = list(windows)
+        pipeline = self.client.pipeline(transaction=False)
+        plans = []
+        for hours in windows:
+            name, bucket_ids = _bucket_ids(hours, now)
+            for bucket_id in bucket_ids:
+                pipeline.hmget(self._bucket_key(customer_id, name, bucket_id), 'count', 'total')
+            plans.append((hours, len(bucket_ids)))
+        replies = iter(pipeline.execute())
+
+        result = {}
+        for hours, bucket_count in plans:
+            count, total = 0, Decimal('0')
+            for _ in range(bucket_count):
+                bucket_count_value, bucket_total = next(replies)
+                if bucket_count_value is not None:
+                    count += int(bucket_count_value)
+                    total += Decimal(bucket_total.decode() if isinstance(bucket_total, bytes) else bucket_total)
+            result[hours] = WindowAggregate(count=count, total=total.quantize(Decimal('0.01')))
+        return result
+
+
+class DatabaseVelocityStore:
+    """Exact windows computed by the database on every read; nothing to warm or record"""
+
+    def is_warm(self, customer_id: str) -> bool:
+        return True
+
+    def add(self, customer_id: str, transaction_id: str, amount: Decimal, occurred_at: datetime) -> bool:
+        return False
+
+    def aggregates(self, customer_id: str, windows: Iterable[int], now: datetime) -> Dict[int, WindowAggregate]:
+        from .pattern_analysis import customer_window_aggregates
+        return customer_window_aggregates(customer_id, windows, now)
+
+
+class FallbackVelocityStore:
+    """Use the primary store, switching to the fallback while it is unreachable"""
+
+    def __init__(self, primary, fallback):
+        self.primary = primary
+        self.fallback = fallback
+        self._retry_at = 0.0
+
+    def _call(self, method: str, *args):
+        if time.monotonic() >= self._retry_at:
+            try:
+                return getattr(self.primary, method)(*args)
+            except RedisError as e:
+                logger.warning(f"Velocity store unavailable, using in-process fallback: {str(e)}")
+                self._retry_at = time.monotonic() + FALLBACK_RETRY_SECONDS
+        return getattr(self.fallback, method)(*args)
+
+    def is_warm(self, customer_id):
+        return self._call('is_warm', customer_id)
+
+    def claim_warm(self, customer_id):
+        return self._call('claim_warm', customer_id)
+
+    def mark_warm(self, customer_id):
+        return self._call('mark_warm', customer_id)
+
+    def release_warm(self, customer_id):
+        return self._call('release_warm', customer_id)
+
+    def add_many(self, customer_id, rows):
+        return self._call('add_many', customer_id, list(rows))
+
+    def add(self, customer_id, transaction_id, amount, occurred_at):
+        return self._call('add', customer_id, transaction_id, amount, occurred_at)
+
+    def aggregates(self, customer_id, windows, now):
+        return self._call('aggregates', customer_id, list(windows), now)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_velocity_store():
+    """Process-wide velocity store"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                if HAS_REDIS and settings.AML_VELOCITY_STORE == 'redis':
+                    _store = FallbackVelocityStore(RedisVelocityStore(), InMemoryVelocityStore())
+                elif settings.AML_VELOCITY_STORE == 'database':
+                    _store = DatabaseVelocityStore()
+                else:
+                    _store = InMemoryVelocityStore()
+    return _store
+
+
+def _warm_customer(store, customer_id: str, now: datetime) -> bool:
+    """
+    Load a customer's recent history into the store, unless another worker
+    is already doing so; True once this call has warmed the customer
+    """
+    if not store.claim_warm(customer_id):
+        return False
+    try:
+        rows = Transaction.objects.filter(
+            originator_id=customer_id,
+            created_at__gte=now - WARM_LOOKBACK
+        ).values_list('id', 'amount', 'created_at')
+        # Recent transactions may be recorded concurrently, so they are added under their ID
+        store.add_many(customer_id, [
+            (str(transaction_id) if created_at >= now - WARM_SEEN_WINDOW else None, amount, created_at)
+            for transaction_id, amount, created_at in rows
+        ])
+    except Exception:
+        store.release_warm(customer_id)
+        raise
+    store.mark_warm(customer_id)
+    return True
+
+
+def record_transaction(txn: Transaction) -> None:
+    """Add a newly monitored transaction to its originator's windows"""
+    if not txn.originator_id:
+        return
+    store = get_velocity_store()
+    customer_id = str(txn.originator_id)
+    if not store.is_warm(customer_id):
+        # Warming reads the database, which already contains this transaction;
+        # the add below is then ignored as a repeat
+        _warm_customer(store, customer_id, timezone.now())
+    store.add(customer_id, str(txn.id), txn.amount, txn.created_at)
+
+
+def get_window_aggregates(
+    customer_id,
+    window_hours: Iterable[int] = STANDARD_WINDOWS,
+    now: Optional[datetime] = None
+) -> Dict[int, WindowAggregate]:
+    """Count and total of a customer's transactions for each window (in hours)"""
+    window_hours = sorted(set(window_hours))
+    if not customer_id or not window_hours:
+        return {hours: WindowAggregate(0, Decimal('0')) for hours in window_hours}
+    store = get_velocity_store()
+    now = now or timezone.now()
+    customer_id = str(customer_id)
+    if not store.is_warm(customer_id) and not _warm_customer(store, customer_id, now):
+        # Being warmed by another worker: read exact windows meanwhile
+        from .pattern_analysis import customer_window_aggregates
+        return customer_window_aggregates(customer_id, window_hours, now)
+    return store.aggregates(customer_id, window_hours, now)
@@ -0,0 +1,30 @@
+"""
+Transaction Monitoring signals
+"""
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from .models import MonitoringRule, Transaction
+from .services.batch_collector import enqueue_transaction_monitoring
+from .services.rule_engine import bump_rule_version
+
+@receiver(post_save, sender=MonitoringRule)
+@receiver(post_delete, sender=MonitoringRule)
+def invalidate_compiled_rules(sender, instance, **kwargs):
+    """
+    Bump the ruleset version whenever a rule is saved (including
+    activate/deactivate) or deleted, so every worker recompiles
+    """
+    bump_rule_version()
+
+
+@receiver(post_save, sender=Transaction)
+def queue_transaction_monitoring(sender, instance, created, **kwargs):
+    """
+    Submit new transactions for monitoring once they are committed, so
+    the worker can load them; ``sweep_pending_transactions`` resubmits any
+    lost before they reached Celery
+    """
+    if created and instance.screening_status == 'PENDING':
+        transaction_id = str(instance.pk)
+        transaction.on_commit(lambda: enqueue_transaction_monitoring(transaction_id))
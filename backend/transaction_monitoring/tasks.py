@@ -1,17 +1,32 @@
 from celery import shared_task
 from django.conf import settings
-from django.utils import timezone
 from django.db import transaction
+from django.utils import timezone
+from core.signals import risk_inputs_changed
 from .models import (
     Transaction,
-    TransactionAlert,
-    MonitoringRule,
-    WatchlistMatch,
-    MonitoringMetrics
+    TransactionAlert
 )
-from screening_watchlist.models import WatchlistEntry
+from .services.rule_engine import (
+    CompiledRuleSet,
+    build_transaction_context,
+    get_compiled_ruleset,
+    load_window_aggregates
+)
+from .services.cooldown_registry import CooldownSession, cooldown_key
+from .services.pattern_analysis import PATTERN_WINDOWS, analyze_patterns, batch_window_aggregates
+from .services.velocity_store import WindowAggregate, get_window_aggregates, record_transaction
+from screening_watchlist.models import WatchlistMatch
+from screening_watchlist.services.screening import NameHit, PartyAttributes, match_type_for
+from screening_watchlist.services.screening_cache import screen_name_cached
+from screening_watchlist.services.screening_history import record_screening
+from screening_watchlist.services.watchlist_index import WatchlistIndex, get_watchlist_index
+from collections import defaultdict
 from datetime import timedelta
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
@@ -26,7 +41,7 @@ def monitor_transaction(transaction_id: str) -> None:
             txn = Transaction.objects.select_related(
                 'originator',
                 'beneficiary'
-            ).get(id=transaction_id)
+            ).select_for_update(of=('self',)).get(id=transaction_id)
 
             # Skip if already processed
             if txn.screening_status != 'PENDING':
@@ -36,20 +51,118 @@ def monitor_transaction(transaction_id: str) -> None:
             txn.screening_status = 'IN_PROGRESS'
             txn.save()
 
-            # Apply monitoring rules
-            apply_monitoring_rules.delay(transaction_id)
+            # Add to the originator's sliding-window aggregates
+            record_transaction(txn)
 
-            # Perform watchlist screening
-            screen_against_watchlists.delay(transaction_id)
+            if settings.AML_MONITORING_PIPELINE == 'fanout':
+                # One task per stage, each reloading the transaction
+                apply_monitoring_rules.delay(transaction_id)
+                screen_against_watchlists.delay(transaction_id)
+                analyze_transaction_patterns.delay(transaction_id)
+                return
 
-            # Check transaction patterns
-            analyze_transaction_patterns.delay(transaction_id)
+            # Fused: run every stage on the transaction loaded above
+            ruleset = get_compiled_ruleset()
+            windows = get_window_aggregates(
+                txn.originator_id,
+                ruleset.window_hours | frozenset(PATTERN_WINDOWS)
+            )
+            alerts = _rule_alerts(txn, ruleset, windows, CooldownSession(ruleset))
+            alerts += _pattern_alerts(txn, windows)
+            matches = _watchlist_matches(txn, get_watchlist_index())
+            _bulk_create(TransactionAlert, alerts)
+            _bulk_create(WatchlistMatch, matches)
 
     except Transaction.DoesNotExist:
         logger.error(f"Transaction {transaction_id} not found")
     except Exception as e:
         logger.error(f"Transaction monitoring failed: {str(e)}")
 
+@shared_task(bind=True, max_retries=3, default_retry_delay=60)
+def monitor_transactions_batch(self, transaction_ids: List[str]) -> None:
+    """
+    Monitor a batch of transactions with shared lookups and bulk writes
+
+    A failure rolls the whole batch back to PENDING and the task is
+    retried; batches still failing are left to ``sweep_pending_transactions``.
+    """
+    try:
+        with transaction.atomic():
+            # Rows locked by a concurrent batch (e.g. a sweep resubmitting a
+            # queued transaction) are left to it
+            txns = [
+                txn for txn in Transaction.objects.select_related(
+                    'originator',
+                    'beneficiary'
+                ).select_for_update(skip_locked=True, of=('self',)).in_bulk(transaction_ids).values()
+                if txn.screening_status == 'PENDING'
+            ]
+            if not txns:
+                return
+
+            Transaction.objects.filter(
+                id__in=[txn.id for txn in txns]
+            ).update(screening_status='IN_PROGRESS')
+
+            # Loaded once for the whole batch
+            ruleset = get_compiled_ruleset()
+            index = get_watchlist_index()
+            cooldowns = CooldownSession(ruleset)
+            window_hours = ruleset.window_hours | frozenset(PATTERN_WINDOWS)
+            hits_by_party = {}
+
+            for txn in txns:
+                record_transaction(txn)
+            # One grouped query for every originator in the batch
+            now = timezone.now()
+            windows_by_transaction = _windows_as_of_transactions(
+                txns,
+                batch_window_aggregates({txn.originator_id for txn in txns if txn.originator_id}, window_hours, now),
+                window_hours,
+                now
+            )
+
+            alerts, matches = [], []
+            for txn in sorted(txns, key=lambda txn: txn.transaction_date):
+                windows = windows_by_transaction[txn.pk]
+                alerts += _rule_alerts(txn, ruleset, windows, cooldowns)
+                alerts += _pattern_alerts(txn, windows)
+                matches += _watchlist_matches(txn, index, hits_by_party)
+
+            _bulk_create(TransactionAlert, alerts)
+            _bulk_create(WatchlistMatch, matches)
+            logger.info(
+                f"Monitored {len(txns)} transactions: "
+                f"{len(alerts)} alerts, {len(matches)} watchlist matches"
+            )
+
+    except Exception as e:
+        logger.error(f"Batch transaction monitoring failed: {str(e)}")
+        raise self.retry(exc=e)
+
+@shared_task
+def sweep_pending_transactions() -> int:
+    """
+    Resubmit transactions still PENDING well after they were created
+
+    Monitoring requests wait in an in-memory batch before they reach Celery
+    and are lost if the process dies first; batches that ran out of retries
+    are left PENDING as well. Scheduled in ``CELERY_BEAT_SCHEDULE``.
+    """
+    cutoff = timezone.now() - timedelta(seconds=settings.AML_MONITORING_SWEEP_AGE_SECONDS)
+    transaction_ids = [
+        str(pk) for pk in Transaction.objects.filter(
+            screening_status='PENDING',
+            created_at__lt=cutoff
+        ).order_by('created_at').values_list('pk', flat=True)
+    ]
+    batch_size = max(settings.AML_MONITORING_BATCH_SIZE, 1)
+    for start in range(0, len(transaction_ids), batch_size):
+        monitor_transactions_batch.delay(transaction_ids[start:start + batch_size])
+    if transaction_ids:
+        logger.warning(f"Resubmitted {len(transaction_ids)} transactions left pending since before {cutoff}")
+    return len(transaction_ids)
+
 @shared_task
 def apply_monitoring_rules(transaction_id: str) -> None:
     """
@@ -57,31 +170,13 @@ def apply_monitoring_rules(transaction_id: str) -> None:
     """
     try:
         with transaction.atomic():
-            txn = Transaction.objects.get(id=transaction_id)
-            rules = MonitoringRule.objects.filter(
-                is_active=True,
-                transaction_types__contains=[txn.transaction_type]
-            ).order_by('priority')
-
-            for rule in rules:
-                # Check cooldown period
-                if not _check_rule_cooldown(txn, rule):
-                    continue
-
-                # Evaluate rule conditions
-                if _evaluate_rule_conditions(txn, rule):
-                    # Create alert
-                    TransactionAlert.objects.create(
-                        transaction=txn,
-                        alert_type=rule.rule_type,
-                        severity=rule.risk_level,
-                        detection_rules={'rule_id': str(rule.id)},
-                        alert_details={
-                            'rule_name': rule.name,
-                            'threshold': rule.thresholds,
-                            'conditions': rule.conditions
-                        }
-                    )
+            txn = Transaction.objects.select_related('originator').get(id=transaction_id)
+
+            # Compiled ruleset is cached per process and keyed by rule version
+            ruleset = get_compiled_ruleset()
+            windows = load_window_aggregates(txn, ruleset.window_hours)
+            alerts = _rule_alerts(txn, ruleset, windows, CooldownSession(ruleset))
+            _bulk_create(TransactionAlert, alerts)
 
     except Transaction.DoesNotExist:
         logger.error(f"Transaction {transaction_id} not found")
@@ -100,15 +195,9 @@ def screen_against_watchlists(transaction_id: str) -> None:
                 'beneficiary'
             ).get(id=transaction_id)
 
-            # Get active watchlist entries
-            watchlist_entries = WatchlistEntry.objects.filter(is_active=True)
-
-            # Screen originator
-            _screen_party_against_watchlist(txn, txn.originator, watchlist_entries)
-
-            # Screen beneficiary
-            if txn.beneficiary:
-                _screen_party_against_watchlist(txn, txn.beneficiary, watchlist_entries)
+            # Get the in-memory watchlist index (rebuilt when a source is refreshed)
+            index = get_watchlist_index()
+            _bulk_create(WatchlistMatch, _watchlist_matches(txn, index))
 
     except Transaction.DoesNotExist:
         logger.error(f"Transaction {transaction_id} not found")
@@ -122,165 +211,195 @@ def analyze_transaction_patterns(transaction_id: str) -> None:
     """
     try:
         with transaction.atomic():
-            txn = Transaction.objects.select_related('originator').get(id=transaction_id)
+            txn = Transaction.objects.get(id=transaction_id)
+
+            # Get customer's 24h/30d aggregates (includes this transaction)
+            record_transaction(txn)
+            windows = get_window_aggregates(txn.originator_id, PATTERN_WINDOWS)
 
-            # Get customer's recent transactions
-            lookback_period = timezone.now() - timedelta(days=30)
-            recent_transactions = Transaction.objects.filter(
-                originator=txn.originator,
-                created_at__gte=lookback_period
-            ).exclude(id=txn.id)
-
-            # Analyze patterns
-            patterns = _analyze_patterns(txn, recent_transactions)
-
-            # Create alerts for suspicious patterns
-            for pattern in patterns:
-                if pattern['is_suspicious']:
-                    TransactionAlert.objects.create(
-                        transaction=txn,
-                        alert_type='UNUSUAL_PATTERN',
-                        severity=pattern['risk_level'],
-                        detection_rules={'pattern_type': pattern['type']},
-                        alert_details=pattern['details']
-                    )
+            _bulk_create(TransactionAlert, _pattern_alerts(txn, windows))
 
     except Transaction.DoesNotExist:
         logger.error(f"Transaction {transaction_id} not found")
     except Exception as e:
         logger.error(f"Pattern analysis failed: {str(e)}")
 
-def _check_rule_cooldown(txn: Transaction, rule: MonitoringRule) -> bool:
-    """Check if rule cooldown period has passed"""
-    if not rule.cooldown_period:
-        return True
-
-    last_alert = TransactionAlert.objects.filter(
-        transaction__originator=txn.originator,
-        detection_rules__rule_id=str(rule.id),
-        created_at__gte=timezone.now() - rule.cooldown_period
-    ).first()
-
-    return not last_alert
-
-def _evaluate_rule_conditions(txn: Transaction, rule: MonitoringRule) -> bool:
-    """Evaluate rule conditions against transaction"""
-    try:
-        conditions = rule.conditions
-        thresholds = rule.thresholds
-
-        # Check amount threshold
-        if 'amount_threshold' in thresholds:
-            if txn.amount > thresholds['amount_threshold']:
-                return True
-
-        # Check high-risk countries
-        if 'high_risk_countries' in conditions:
-            if (txn.originating_country in conditions['high_risk_countries'] or
-                txn.destination_country in conditions['high_risk_countries']):
-                return True
-
-        # Check transaction frequency
-        if 'frequency_threshold' in thresholds:
-            recent_count = Transaction.objects.filter(
-                originator=txn.originator,
-                created_at__gte=timezone.now() - rule.lookback_period
-            ).count()
-            if recent_count > thresholds['frequency_threshold']:
-                return True
-
-        return False
-    except Exception as e:
-        logger.error(f"Rule evaluation failed: {str(e)}")
-        return False
-
-def _screen_party_against_watchlist(
-    txn: Transaction,
-    party: 'Customer',
-    watchlist_entries: 'QuerySet[WatchlistEntry]'
-) -> None:
-    """Screen a party against watchlist entries"""
-    for entry in watchlist_entries:
-        # Check primary name
-        if party.customer_type == 'INDIVIDUAL':
-            party_name = f"{party.first_name} {party.last_name}"
-        else:
-            party_name = party.company_name
-
-        # Calculate match strength
-        match_strength = _calculate_name_match_strength(party_name, entry.name_primary)
-
-        if match_strength > 0.8:  # High confidence match
-            WatchlistMatch.objects.create(
-                transaction=txn,
-                watchlist_type=entry.source.source_type,
-                match_status='POTENTIAL',
-                match_details={
-                    'watchlist_entry_id': str(entry.id),
-                    'matched_name': entry.name_primary,
-                    'party_name': party_name
-                },
-                match_strength=match_strength
+def _bulk_create(model, objs: List) -> None:
+    """Insert pipeline rows in one query; bulk_create skips save(), so hash here"""
+    if not objs:
+        return
+    for obj in objs:
+        obj.hash = obj._generate_hash()
+    model.objects.bulk_create(objs)
+
+    # bulk_create sends no post_save, so report the customers whose risk changed
+    if model is TransactionAlert:
+        customer_ids, reason = {obj.transaction.originator_id for obj in objs}, 'ALERT'
+    else:
+        customer_ids, reason = {obj.customer_id for obj in objs}, 'WATCHLIST_MATCH'
+    risk_inputs_changed.send(sender=model, customer_ids=customer_ids, reason=reason)
+
+def _windows_as_of_transactions(
+    txns: List[Transaction],
+    windows_by_customer: Dict[str, Dict[int, WindowAggregate]],
+    window_hours: Iterable[int],
+    now
+) -> Dict:
+    """
+    Windows of each transaction of a batch as ``monitor_transaction`` sees
+    them: ``windows_by_customer`` end at ``now`` and hold the whole batch,
+    so the batch members created after each transaction are taken out
+    """
+    empty = {hours: WindowAggregate(0, Decimal('0')) for hours in window_hours}
+    later: Dict[str, Dict[int, WindowAggregate]] = defaultdict(lambda: dict(empty))
+    windows_by_transaction = {}
+    for txn in sorted(txns, key=lambda txn: (txn.created_at, str(txn.pk)), reverse=True):
+        if not txn.originator_id:
+            windows_by_transaction[txn.pk] = empty
+            continue
+        customer_id = str(txn.originator_id)
+        windows, excluded = windows_by_customer.get(customer_id, empty), later[customer_id]
+        windows_by_transaction[txn.pk] = {
+            hours: WindowAggregate(
+                windows[hours].count - excluded[hours].count,
+                windows[hours].total - excluded[hours].total
             )
+            for hours in empty
+        }
+        for hours in empty:
+            if txn.created_at >= now - timedelta(hours=hours):
+                excluded[hours] = WindowAggregate(excluded[hours].count + 1, excluded[hours].total + txn.amount)
+    return windows_by_transaction
+
+def _rule_alerts(
+    txn: Transaction,
+    ruleset: CompiledRuleSet,
+    windows: Dict[int, WindowAggregate],
+    cooldowns: CooldownSession
+) -> List[TransactionAlert]:
+    """Unsaved alerts for every rule the transaction triggers"""
+    context = build_transaction_context(txn, windows)
+
+    # Rules still cooling down for this customer are not evaluated at all
+    matches = ruleset.evaluate(context, skip_rule_ids=cooldowns.cooling_down(context.originator_id))
+    cooldowns.start(context.originator_id, [match.rule.rule_id for match in matches])
+
+    alerts = []
+    for match in matches:
+        alerts.append(TransactionAlert(
+            transaction=txn,
+            created_by_id=txn.created_by_id,
+            cooldown_key=cooldown_key(context.originator_id, match.rule.rule_id) if context.originator_id else '',
+            alert_type=match.rule.alert_type,
+            severity=match.rule.severity,
+            alert_message=f"{match.rule.name}: {match.reason}",
+            threshold_value=match.threshold_value,
+            actual_value=match.actual_value,
+            metadata={
+                'rule_id': match.rule.rule_id,
+                'rule_name': match.rule.name,
+                'rule_version': ruleset.version,
+                'reason': match.reason
+            }
+        ))
+    return alerts
 
-def _calculate_name_match_strength(name1: str, name2: str) -> float:
-    """Calculate string similarity for name matching"""
-    # Implement fuzzy string matching
-    # This is a placeholder - implement actual name matching logic
-    from difflib import SequenceMatcher
-    return SequenceMatcher(None, name1.lower(), name2.lower()).ratio()
+def _watchlist_matches(
+    txn: Transaction,
+    index: WatchlistIndex,
+    hits_by_party: Optional[Dict] = None
+) -> List[WatchlistMatch]:
+    """Unsaved watchlist matches for the transaction's parties
 
-def _analyze_patterns(
+    ``hits_by_party`` caches screening results per customer so a party
+    appearing in several transactions of a batch is screened once.
+    """
+    matches = []
+    for party in (txn.originator, txn.beneficiary):
+        if party is None:
+            continue
+        hits = None
+        if hits_by_party is not None:
+            if party.pk not in hits_by_party:
+                hits_by_party[party.pk] = _party_watchlist_hits(party, index, txn)
+            hits = hits_by_party[party.pk]
+        matches += _screen_party_against_watchlist(txn, party, index, hits)
+    return matches
+
+def _pattern_alerts(
     txn: Transaction,
-    recent_transactions: 'QuerySet[Transaction]'
-) -> list:
-    """Analyze transaction patterns"""
-    patterns = []
-
-    # Check for structuring (multiple smaller transactions)
-    if _check_structuring_pattern(txn, recent_transactions):
-        patterns.append({
-            'type': 'STRUCTURING',
-            'is_suspicious': True,
-            'risk_level': 'HIGH',
-            'details': {
-                'pattern': 'Multiple smaller transactions',
-                'period': '30 days',
-                'total_amount': sum(t.amount for t in recent_transactions) + txn.amount
-            }
-        })
-
-    # Check for rapid movement of funds
-    if _check_rapid_movement_pattern(txn, recent_transactions):
-        patterns.append({
-            'type': 'RAPID_MOVEMENT',
-            'is_suspicious': True,
-            'risk_level': 'HIGH',
-            'details': {
-                'pattern': 'Rapid movement of funds',
-                'period': '24 hours',
-                'transaction_count': recent_transactions.count() + 1
+    windows: Dict[int, WindowAggregate]
+) -> List[TransactionAlert]:
+    """Unsaved alerts for suspicious patterns"""
+    return [
+        TransactionAlert(
+            transaction=txn,
+            created_by_id=txn.created_by_id,
+            alert_type='PATTERN',
+            severity=pattern['risk_level'],
+            alert_message=pattern['details']['pattern'],
+            metadata={
+                'pattern_type': pattern['type'],
+                **pattern['details']
             }
-        })
+        )
+        for pattern in analyze_patterns(txn.amount, windows)
+        if pattern['is_suspicious']
+    ]
 
-    return patterns
+def _party_watchlist_hits(
+    party: 'Customer',
+    index: WatchlistIndex,
+    txn: Optional[Transaction] = None
+) -> List[NameHit]:
+    """Watchlist entries a party matches, as (entry name, strength, match type)
 
-def _check_structuring_pattern(
-    txn: Transaction,
-    recent_transactions: 'QuerySet[Transaction]'
-) -> bool:
-    """Check for transaction structuring pattern"""
-    threshold = settings.AML_STRUCTURING_THRESHOLD
-    if txn.amount < threshold:
-        total_amount = sum(t.amount for t in recent_transactions) + txn.amount
-        return total_amount > threshold
-    return False
-
-def _check_rapid_movement_pattern(
+    Repeat counterparties are answered from the screening result cache.
+    The outcome is queued for the screening history.
+    """
+    screened_at, started = timezone.now(), time.perf_counter()
+    hits = screen_name_cached(
+        index,
+        party.name,
+        party.normalized_name,
+        party.sorted_name,
+        party.phonetic_key,
+        PartyAttributes.build(party.date_of_birth, party.nationality, identifiers=party.identification_number)
+    )
+    record_screening(
+        index.matchers, party.pk, 'CUSTOMER', hits,
+        screened_at, time.perf_counter() - started,
+        txn.created_by_id if txn else None,
+        **({'transaction_id': str(txn.pk)} if txn else {})
+    )
+    return hits
+
+def _screen_party_against_watchlist(
     txn: Transaction,
-    recent_transactions: 'QuerySet[Transaction]'
-) -> bool:
-    """Check for rapid movement of funds pattern"""
-    last_24h = timezone.now() - timedelta(hours=24)
-    rapid_transactions = recent_transactions.filter(created_at__gte=last_24h)
-    return rapid_transactions.count() >= settings.AML_RAPID_MOVEMENT_THRESHOLD 
\ No newline at end of file
+    party: 'Customer',
+    index: WatchlistIndex,
+    hits: Optional[List[NameHit]] = None
+) -> List[WatchlistMatch]:
+    """Screen a party against watchlist candidates retrieved from the index"""
+    if hits is None:
+        hits = _party_watchlist_hits(party, index, txn)
+
+    return [
+        WatchlistMatch(
+            entry_id=entry.entry_id,
+            created_by_id=txn.created_by_id,
+            customer=party,
+            transaction=txn,
+            match_type=match_type_for(match_type),
+            match_score=match_strength * 100,
+            match_details={
+                'match_basis': match_type,
+                'watchlist_entry_id': entry.entry_id,
+                'watchlist_type': entry.source_type,
+                'matched_name': entry.name,
+                'party_name': party.name,
+                'watchlist_version': index.version
+            }
+        )
+        for entry, match_strength, match_type in hits
+    ]
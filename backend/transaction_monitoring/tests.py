@@ -1,3 +1,349 @@
-from django.test import TestCase
+import threading
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from customer_management.models import Customer
+from screening_watchlist.models import WatchlistEntry, WatchlistMatch
+from screening_watchlist.services.watchlist_index import get_watchlist_index
+from .models import MonitoringRule, Transaction, TransactionAlert
+from .services import velocity_store
+from .services.batch_collector import TransactionBatchCollector
+from .services.cooldown_registry import (
+    REGISTRY_REBUILDING_CACHE_KEY,
+    REGISTRY_WARM_CACHE_KEY,
+    CooldownRegistry
+)
+from .services.pattern_analysis import analyze_patterns
+from .services.rule_engine import CompiledRuleSet, TransactionContext, compile_rule
+from .services.velocity_store import InMemoryVelocityStore, WindowAggregate
+from .tasks import (
+    analyze_transaction_patterns,
+    apply_monitoring_rules,
+    monitor_transaction,
+    monitor_transactions_batch,
+    screen_against_watchlists,
+    sweep_pending_transactions
+)
+
+
+def _context(amount='1000.00', transaction_type='WIRE_TRANSFER', countries=(), hour=12, window_counts=None):
+    return TransactionContext(
+        transaction_id='txn-1',
+        originator_id='cust-1',
+        transaction_type=transaction_type,
+        amount=Decimal(amount),
+        currency='AED',
+        countries=frozenset(countries),
+        hour=hour,
+        window_counts=window_counts or {}
+    )
+
+
+class RuleCompilerTests(SimpleTestCase):
+    def test_amount_threshold_rule(self):
+        rule = compile_rule(MonitoringRule(
+            name='Large wire', rule_type='AMOUNT_THRESHOLD', threshold_amount=Decimal('50000')
+        ))
+        self.assertIsNone(rule.evaluate(_context(amount='49999.99')))
+        match = rule.evaluate(_context(amount='50000.01'))
+        self.assertEqual(match.reason, 'amount_threshold')
+        self.assertEqual(match.actual_value, Decimal('50000.01'))
+
+    def test_frequency_rule_registers_window(self):
+        rule = compile_rule(MonitoringRule(
+            name='Burst', rule_type='FREQUENCY', threshold_count=5, time_window_hours=1
+        ))
+        self.assertEqual(rule.window_hours, frozenset({1}))
+        self.assertIsNone(rule.evaluate(_context(window_counts={1: 5})))
+        self.assertIsNotNone(rule.evaluate(_context(window_counts={1: 6})))
+
+    def test_expression_conditions(self):
+        rule = compile_rule(MonitoringRule(
+            name='Night cash', rule_type='TIME_BASED',
+            rule_conditions={
+                'transaction_types': ['CASH_DEPOSIT'],
+                'expression': {'all': [
+                    {'field': 'amount', 'op': 'gte', 'value': 10000},
+                    {'field': 'hour', 'op': 'in', 'value': [0, 1, 2, 3]},
+                ]},
+            }
+        ))
+        ruleset = CompiledRuleSet([rule], version='v1')
+        self.assertEqual(ruleset.evaluate(_context(amount='20000', hour=2)), [])
+        context = _context(amount='20000', hour=2, transaction_type='CASH_DEPOSIT')
+        self.assertEqual(len(ruleset.evaluate(context)), 1)
+        context = _context(amount='20000', hour=14, transaction_type='CASH_DEPOSIT')
+        self.assertEqual(ruleset.evaluate(context), [])
+
+    def test_ruleset_skips_rules_in_cooldown(self):
+        rule = compile_rule(MonitoringRule(
+            name='Large wire', rule_type='AMOUNT_THRESHOLD', threshold_amount=Decimal('100'),
+            rule_conditions={'cooldown_hours': 24}
+        ))
+        ruleset = CompiledRuleSet([rule], version='v1')
+        self.assertEqual(len(ruleset.evaluate(_context())), 1)
+        self.assertEqual(ruleset.evaluate(_context(), skip_rule_ids=frozenset({rule.rule_id})), [])
+
+    def test_high_risk_country_rule(self):
+        rule = compile_rule(MonitoringRule(
+            name='Geo', rule_type='GEOGRAPHY', rule_conditions={'high_risk_countries': ['irn', 'PRK']}
+        ))
+        self.assertIsNotNone(rule.evaluate(_context(countries={'IRN'})))
+        self.assertIsNone(rule.evaluate(_context(countries={'ARE'})))
+
+
+class InMemoryVelocityStoreTests(SimpleTestCase):
+    def setUp(self):
+        self.store = InMemoryVelocityStore()
+        self.now = datetime(2024, 5, 1, 12, 0, tzinfo=dt_timezone.utc)
+
+    def test_windows_sum_buckets_in_range(self):
+        self.store.add('cust-1', 'txn-1', Decimal('100.00'), self.now - timedelta(minutes=10))
+        self.store.add('cust-1', 'txn-2', Decimal('250.50'), self.now - timedelta(hours=5))
+        self.store.add('cust-1', 'txn-3', Decimal('1000.00'), self.now - timedelta(days=10))
+        windows = self.store.aggregates('cust-1', (1, 24, 720), self.now)
+        self.assertEqual(windows[1], WindowAggregate(1, Decimal('100.00')))
+        self.assertEqual(windows[24], WindowAggregate(2, Decimal('350.50')))
+        self.assertEqual(windows[720], WindowAggregate(3, Decimal('1350.50')))
+
+    def test_transaction_is_counted_once(self):
+        self.assertTrue(self.store.add('cust-1', 'txn-1', Decimal('10'), self.now))
+        self.assertFalse(self.store.add('cust-1', 'txn-1', Decimal('10'), self.now))
+        self.assertEqual(self.store.aggregates('cust-1', (1,), self.now)[1].count, 1)
+
+    def test_warm_rows_and_recorded_transactions_are_counted_once(self):
+        self.assertTrue(self.store.add('cust-1', 'txn-1', Decimal('10'), self.now))
+        added = self.store.add_many('cust-1', [
+            ('txn-1', Decimal('10'), self.now),
+            ('txn-2', Decimal('20'), self.now),
+            (None, Decimal('30'), self.now - timedelta(days=2)),
+        ])
+        self.assertEqual(added, 2)
+        self.assertFalse(self.store.add('cust-1', 'txn-2', Decimal('20'), self.now))
+        self.assertEqual(self.store.aggregates('cust-1', (720,), self.now)[720], WindowAggregate(3, Decimal('60')))
+
+    def test_customer_is_warm_only_after_the_claimed_warm_up(self):
+        self.assertTrue(self.store.claim_warm('cust-1'))
+        self.assertFalse(self.store.claim_warm('cust-1'))
+        self.assertFalse(self.store.is_warm('cust-1'))
+        self.store.release_warm('cust-1')
+        self.assertTrue(self.store.claim_warm('cust-1'))
+        self.store.mark_warm('cust-1')
+        self.assertTrue(self.store.is_warm('cust-1'))
+        self.assertFalse(self.store.claim_warm('cust-1'))
+
+    def test_expired_seen_ids_are_evicted(self):
+        self.store.add('cust-1', 'txn-1', Decimal('10'), self.now)
+        # Expire the first entry
+        self.store._seen['txn-1'] = 0.0
+        self.store.add('cust-1', 'txn-2', Decimal('10'), self.now)
+        self.assertEqual(list(self.store._seen), ['txn-2'])
+
+
+class TransactionBatchCollectorTests(SimpleTestCase):
+    def setUp(self):
+        self.batches = []
+        self.flushed = threading.Event()
+
+        def flush(batch):
+            self.batches.append(batch)
+            self.flushed.set()
+
+        self.flush = flush
+
+    def test_flushes_when_batch_is_full(self):
+        collector = TransactionBatchCollector(self.flush, max_size=3, max_wait=60)
+        for transaction_id in ('a', 'b', 'c', 'd'):
+            collector.add(transaction_id)
+        self.assertEqual(self.batches, [['a', 'b', 'c']])
+        collector.close()
+        self.assertEqual(self.batches, [['a', 'b', 'c'], ['d']])
+
+    def test_flushes_after_max_wait(self):
+        collector = TransactionBatchCollector(self.flush, max_size=100, max_wait=0.05)
+        collector.add('a')
+        collector.add('b')
+        self.assertTrue(self.flushed.wait(2))
+        self.assertEqual(self.batches, [['a', 'b']])
+        collector.close()
+
+
+class CooldownRegistryTests(TestCase):
+    def setUp(self):
+        rule = compile_rule(MonitoringRule(
+            name='Large wire', rule_type='AMOUNT_THRESHOLD', threshold_amount=Decimal('100'),
+            rule_conditions={'cooldown_hours': 24}
+        ))
+        self.ruleset = CompiledRuleSet([rule], version='v1')
+        cache.delete_many([REGISTRY_WARM_CACHE_KEY, REGISTRY_REBUILDING_CACHE_KEY])
+
+    def test_registry_is_warm_only_after_rebuild(self):
+        registry = CooldownRegistry(self.ruleset)
+        cache.add(REGISTRY_REBUILDING_CACHE_KEY, 1)
+        self.assertFalse(registry.ensure_warm())
+        self.assertIsNone(cache.get(REGISTRY_WARM_CACHE_KEY))
+
+        cache.delete(REGISTRY_REBUILDING_CACHE_KEY)
+        self.assertTrue(registry.ensure_warm())
+        self.assertEqual(cache.get(REGISTRY_WARM_CACHE_KEY), 1)
+
+    def test_warm_flag_expires_with_the_shortest_cooldown(self):
+        rules = [
+            compile_rule(MonitoringRule(
+                name=name, rule_type='AMOUNT_THRESHOLD', threshold_amount=Decimal('100'),
+                rule_conditions={'cooldown_hours': hours}
+            ))
+            for name, hours in (('Large wire', 24), ('Large cash', 2))
+        ]
+        registry = CooldownRegistry(CompiledRuleSet(rules, version='v1'))
+        self.assertEqual(registry.shortest_cooldown, timedelta(hours=2))
+        self.assertIsNone(CooldownRegistry(CompiledRuleSet([], version='v1')).shortest_cooldown)
+
+    def test_failed_rebuild_leaves_registry_cold(self):
+        class FailingRegistry(CooldownRegistry):
+            def rebuild(self, now=None):
+                raise RuntimeError('database unavailable')
+
+        with self.assertRaises(RuntimeError):
+            FailingRegistry(self.ruleset).ensure_warm()
+        self.assertIsNone(cache.get(REGISTRY_WARM_CACHE_KEY))
+        self.assertIsNone(cache.get(REGISTRY_REBUILDING_CACHE_KEY))
+
+
+@override_settings(AML_STRUCTURING_THRESHOLD=10000, AML_RAPID_MOVEMENT_THRESHOLD=5)
+class PatternAnalysisTests(SimpleTestCase):
+    def _windows(self, count_24h, total_30d):
+        return {
+            24: WindowAggregate(count_24h, Decimal('0')),
+            720: WindowAggregate(count_24h, Decimal(total_30d)),
+        }
+
+    def test_structuring_needs_sub_threshold_amount(self):
+        patterns = analyze_patterns(Decimal('9000'), self._windows(1, '12000'))
+        self.assertEqual([p['type'] for p in patterns], ['STRUCTURING'])
+        self.assertEqual(analyze_patterns(Decimal('11000'), self._windows(1, '12000')), [])
+
+    def test_rapid_movement_excludes_current_transaction(self):
+        self.assertEqual(analyze_patterns(Decimal('10'), self._windows(5, '50')), [])
+        patterns = analyze_patterns(Decimal('10'), self._windows(6, '60'))
+        self.assertEqual([p['type'] for p in patterns], ['RAPID_MOVEMENT'])
+
+
+@override_settings(
+    AML_VELOCITY_STORE='database',
+    SCREENING_RESULT_CACHE_SIZE=0,
+    SCREENING_HISTORY_BATCH_SIZE=0,
+    AML_STRUCTURING_THRESHOLD=10000,
+    AML_RAPID_MOVEMENT_THRESHOLD=5
+)
+class MonitoringPipelineTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(email='analyst@example.com', username='analyst')
+        self.originator = self._customer('Viktor Bout', 'viktor@example.com')
+        self.beneficiary = self._customer('Jane Smith', 'jane@example.com')
+        WatchlistEntry.objects.create(
+            name='Viktor Bout', nationality='RU', country='RU', risk_level='HIGH',
+            source='OFAC', details={}, identifiers={}, created_by=self.user
+        )
+        MonitoringRule.objects.create(
+            name='Large wire', description='', rule_type='AMOUNT_THRESHOLD',
+            threshold_amount=Decimal('5000'), created_by=self.user
+        )
+        self.txn = Transaction.objects.create(
+            transaction_type='WIRE_TRANSFER', amount=Decimal('9500'), source_account='A1',
+            destination_account='B1', transaction_date=timezone.now(),
+            originator=self.originator, beneficiary=self.beneficiary, created_by=self.user
+        )
+        # A prior transaction makes the 30-day total cross the structuring threshold
+        Transaction.objects.create(
+            transaction_type='WIRE_TRANSFER', amount=Decimal('3000'), source_account='A1',
+            destination_account='B2', transaction_date=timezone.now(),
+            originator=self.originator, created_by=self.user, screening_status='COMPLETED'
+        )
+        velocity_store._store = None
+        self.addCleanup(setattr, velocity_store, '_store', None)
+        get_watchlist_index(force_refresh=True)
+
+    def _customer(self, name, email):
+        return Customer.objects.create(
+            customer_type='INDIVIDUAL', name=name, email=email, phone='+971500000000',
+            address='Dubai', nationality='AE', identification_type='PASSPORT',
+            identification_number=email, created_by=self.user
+        )
+
+    def _collect_results(self):
+        alerts = sorted(
+            (alert.alert_type, alert.severity, alert.alert_message)
+            for alert in TransactionAlert.objects.filter(transaction=self.txn)
+        )
+        matches = sorted(
+            (str(match.entry_id), str(match.customer_id), match.match_type, round(match.match_score, 4))
+            for match in WatchlistMatch.objects.filter(transaction=self.txn)
+        )
+        TransactionAlert.objects.all().delete()
+        WatchlistMatch.objects.all().delete()
+        return alerts, matches
+
+    def test_fused_and_fanout_pipelines_agree(self):
+        with override_settings(AML_MONITORING_PIPELINE='fused'):
+            monitor_transaction(str(self.txn.pk))
+        fused = self._collect_results()
+
+        # The stage tasks that the fanout pipeline dispatches, run in turn
+        for stage in (apply_monitoring_rules, screen_against_watchlists, analyze_transaction_patterns):
+            stage(str(self.txn.pk))
+        fanout = self._collect_results()
+
+        alerts, matches = fused
+        self.assertEqual(sorted(alert_type for alert_type, _, _ in alerts), ['AMOUNT_THRESHOLD', 'PATTERN'])
+        self.assertEqual(len(matches), 1)
+        self.assertEqual(fused, fanout)
+
+    def test_batch_windows_end_at_each_transaction(self):
+        customer = self._customer('Omar Haddad', 'omar@example.com')
+        first, second = [
+            Transaction.objects.create(
+                transaction_type='WIRE_TRANSFER', amount=Decimal('4000'), source_account='A2',
+                destination_account=f"B{number}", transaction_date=timezone.now(),
+                originator=customer, created_by=self.user
+            )
+            for number in (5, 6)
+        ]
+        Transaction.objects.filter(pk=first.pk).update(created_at=timezone.now() - timedelta(minutes=1))
+        Transaction.objects.create(
+            transaction_type='WIRE_TRANSFER', amount=Decimal('3000'), source_account='A2',
+            destination_account='B7', transaction_date=timezone.now(),
+            originator=customer, created_by=self.user, screening_status='COMPLETED'
+        )
+        Transaction.objects.filter(destination_account='B7').update(created_at=timezone.now() - timedelta(days=1))
+
+        monitor_transactions_batch([str(first.pk), str(second.pk)])
+        # 7,000 before the second transaction, 11,000 with it
+        structuring = TransactionAlert.objects.filter(
+            alert_type='PATTERN', alert_message='Multiple smaller transactions'
+        )
+        self.assertEqual(list(structuring.values_list('transaction_id', flat=True)), [second.pk])
+
+    def test_stale_pending_transactions_are_resubmitted(self):
+        Transaction.objects.filter(pk=self.txn.pk).update(created_at=timezone.now() - timedelta(hours=1))
+        Transaction.objects.create(
+            transaction_type='WIRE_TRANSFER', amount=Decimal('100'), source_account='A1',
+            destination_account='B8', transaction_date=timezone.now(),
+            originator=self.originator, created_by=self.user
+        )
+        # Only the transaction pending for longer than the sweep age
+        self.assertEqual(sweep_pending_transactions(), 1)
+
+    def test_new_transactions_are_queued_on_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            Transaction.objects.create(
+                transaction_type='WIRE_TRANSFER', amount=Decimal('100'), source_account='A1',
+                destination_account='B4', transaction_date=timezone.now(),
+                originator=self.originator, created_by=self.user
+            )
+        self.assertEqual(len(callbacks), 1)